@@ -46,13 +46,20 @@ if check_password():
 
     # --- Tab-Module importieren (JETZT erst, nach erfolgreicher Authentifizierung) ---
     from tabs import coop_sortiment, fp_sortiment, matching, gap_analyse
+    from match_decisions import MatchDecisionStore, apply_decisions, DECISIONS_FILE
+    from data_loading import add_match_keys, add_matching_keys, data_version, weitere_haendler_dateien
+    from producer_index import load_or_build_produzenten_index
+
+    COOP_FILE = "data/coop_weine_kombiniert.xlsx"
+    FP_FILE = "data/flaschenpost_weine.xlsx"
+    MATCHING_FILE = "data/manuelle_matches_final2.xlsx"
 
     # --- Daten laden ---
     @st.cache_data
-    def load_coop():
+    def load_coop(version=None): # version: data_version(...) -> Cache verfällt bei neuer Datei
         try:
-            df = pd.read_excel("data/coop_weine_kombiniert.xlsx")
-            return df
+            df = pd.read_excel(COOP_FILE)
+            return add_match_keys(df) # Jahrgang_Key / Flasche_cl als Match-Schlüssel
         except FileNotFoundError:
             st.error("FEHLER: Die Datei 'data/coop_weine_kombiniert.xlsx' wurde nicht gefunden.")
             return pd.DataFrame()
@@ -61,10 +68,10 @@ if check_password():
             return pd.DataFrame()
 
     @st.cache_data
-    def load_fp():
+    def load_fp(version=None): # version: data_version(...) -> Cache verfällt bei neuer Datei
         try:
-            df = pd.read_excel("data/flaschenpost_weine.xlsx")
-            return df
+            df = pd.read_excel(FP_FILE)
+            return add_match_keys(df) # Jahrgang_Key / Flasche_cl als Match-Schlüssel
         except FileNotFoundError:
             st.error("FEHLER: Die Datei 'data/flaschenpost_weine.xlsx' wurde nicht gefunden.")
             return pd.DataFrame()
@@ -73,10 +80,10 @@ if check_password():
             return pd.DataFrame()
 
     @st.cache_data
-    def load_matching():
+    def load_matching(version=None): # version: data_version(...) -> Cache verfällt bei neuer Datei
         try:
-            df = pd.read_excel("data/manuelle_matches_final2.xlsx")
-            return df
+            df = pd.read_excel(MATCHING_FILE)
+            return add_matching_keys(df) # Coop_/FP_Jahrgang_Key und Coop_/FP_Flasche_cl
         except FileNotFoundError:
             st.error("FEHLER: Die Datei 'data/manuelle_matches_final2.xlsx' wurde nicht gefunden.")
             return pd.DataFrame()
@@ -84,10 +91,43 @@ if check_password():
             st.error(f"FEHLER beim Laden von 'data/manuelle_matches_final2.xlsx': {e}")
             return pd.DataFrame()
 
+    @st.cache_data
+    def load_weitere_haendler(dateien, versionen=None): # versionen: data_version(...) je Datei -> Cache verfällt bei neuer Datei
+        haendler = {}
+        for name, pfad in dateien:
+            try:
+                haendler[name] = pd.read_excel(pfad, dtype={"ID": str, "FP_Sku": str})
+            except Exception as e:
+                st.error(f"FEHLER beim Laden von '{pfad}': {e}")
+        return haendler
+
+    @st.cache_resource
+    def get_decision_store():
+        # Eine Instanz pro Server-Prozess: Entscheidungen aus der Review-Queue aktualisieren Log und Index gemeinsam
+        return MatchDecisionStore(DECISIONS_FILE)
+
+    @st.cache_resource
+    def get_produzenten_index(_fp_df, version):
+        # Einmal pro FP-Datenversion gebaut und unter data/.cache/ persistiert
+        return load_or_build_produzenten_index(_fp_df, version)
+
     # --- Datenbasis laden ---
-    coop_df = load_coop()
-    fp_df = load_fp() # Wird jetzt im GAP-Tab benötigt
-    matching_df = load_matching()
+    data_versions = {
+        "coop": data_version(COOP_FILE),
+        "fp": data_version(FP_FILE),
+        "matching": data_version(MATCHING_FILE),
+        "decisions": data_version(DECISIONS_FILE),
+    }
+    weitere_dateien = weitere_haendler_dateien()
+    data_versions["weitere_haendler"] = {name: data_version(pfad) for name, pfad in weitere_dateien.items()}
+    coop_df = load_coop(data_versions["coop"])
+    fp_df = load_fp(data_versions["fp"]) # Wird jetzt im GAP-Tab benötigt
+    decision_store = get_decision_store()
+    matching_df = load_matching(data_versions["matching"])
+    weitere_haendler = load_weitere_haendler(tuple(weitere_dateien.items()), tuple(data_versions["weitere_haendler"].items()))
+    if not matching_df.empty:
+        # Manuelle Entscheidungen (Review-Queue) gelten für Matching- und Gap-Analyse
+        matching_df = apply_decisions(matching_df, decision_store)
 
     # --- Navigation ---
     st.sidebar.success("Zugriff gewährt!")
@@ -106,7 +146,7 @@ if check_password():
     if tab == TAB_COOP:
         if coop_df is not None and not coop_df.empty:
             try:
-                coop_sortiment.show_coop_sortiment_tab(coop_df)
+                coop_sortiment.show_coop_sortiment_tab(coop_df, data_version=data_versions["coop"])
             except Exception as e:
                 st.error(f"Fehler im {TAB_COOP} Tab: {e}")
                 import traceback
@@ -117,7 +157,7 @@ if check_password():
     elif tab == TAB_FP:
         if fp_df is not None and not fp_df.empty:
             try:
-                fp_sortiment.show_fp_sortiment_tab(fp_df)
+                fp_sortiment.show_fp_sortiment_tab(fp_df, data_version=data_versions["fp"])
             except Exception as e:
                 st.error(f"Fehler im {TAB_FP} Tab: {e}")
                 import traceback
@@ -128,7 +168,7 @@ if check_password():
     elif tab == TAB_MATCHING:
         if matching_df is not None and not matching_df.empty:
             try:
-                matching.show_matching_tab(matching_df) 
+                matching.show_matching_tab(matching_df, decision_store=decision_store)
             except Exception as e:
                 st.error(f"Fehler im {TAB_MATCHING} Tab: {e}")
                 import traceback
@@ -141,7 +181,9 @@ if check_password():
            matching_df is not None and not matching_df.empty and \
            fp_df is not None and not fp_df.empty:
             try:
-                gap_analyse.show_gap_analysis_tab(coop_df, matching_df, fp_df)
+                produzenten_index = get_produzenten_index(fp_df, data_versions["fp"])
+                gap_analyse.show_gap_analysis_tab(coop_df, matching_df, fp_df, produzenten_index=produzenten_index,
+                                                  data_versions=data_versions, weitere_haendler=weitere_haendler)
             except Exception as e:
                 st.error(f"Fehler im {TAB_GAP} Tab: {e}")
                 import traceback
@@ -1,3 +1,7 @@
+import os
+import re
+
+import numpy as np
 import pandas as pd
 
 def load_all_data():
@@ -11,4 +15,129 @@ def load_all_data():
         data['umsatz'] = pd.read_excel("data/umsatzdaten.xlsx")
     except:
         data['umsatz'] = pd.DataFrame()
-    return data
\ No newline at end of file
+    return data
+
+# === Datenversionen ===
+def data_version(path):
+    """
+    Version einer Datendatei (Änderungszeit + Grösse). Wird als Argument an die gecachten Loader/Indizes
+    übergeben, damit deren Cache automatisch verfällt, sobald die Datei ersetzt wird.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+WEITERE_HAENDLER_DIR = os.path.join("data", "weitere_haendler")
+
+
+def weitere_haendler_dateien(verzeichnis=WEITERE_HAENDLER_DIR) -> dict:
+    """
+    Sortimente weiterer Händler: eine Excel-Datei pro Händler in data/weitere_haendler/, Dateiname = Händlername.
+    Spalten: 'ID' und optional 'Coop_URL' / 'FP_Sku' (Matching auf Coop bzw. Flaschenpost).
+    """
+    try:
+        dateien = sorted(os.listdir(verzeichnis))
+    except OSError:
+        return {}
+    return {os.path.splitext(datei)[0]: os.path.join(verzeichnis, datei)
+            for datei in dateien if datei.endswith(".xlsx") and not datei.startswith("~$")}
+
+
+def data_stand(version):
+    """Lesbarer Stand einer Datenversion (Änderungszeit der Datei, 'YYYY-MM-DD HH:MM'); None ohne Version."""
+    if not version:
+        return None
+    return pd.Timestamp.fromtimestamp(int(str(version).split("-")[0]) / 1e9).strftime("%Y-%m-%d %H:%M")
+
+
+# === Match-Schlüssel: Jahrgang & Flaschengrösse ===
+STANDARD_FLASCHE_CL = 75
+JAHRGANG_MIN = 1900
+JAHRGANG_MAX = pd.Timestamp.now().year + 1
+
+_JAHRGANG_PATTERN = re.compile(r"\b(19\d{2}|20\d{2})\b")
+# "75cl", "150 cl", "37,5cl", "1.5 l", "1,5L", "500ml" (auch in "2 x 75cl" -> 75)
+_VOLUMEN_PATTERN = re.compile(r"(\d+(?:[.,]\d+)?)\s*(cl|ml|l|lt|liter)\b", re.IGNORECASE)
+_FORMAT_NAMEN_CL = [
+    (re.compile(r"doppel[\s-]?magnum|double[\s-]?magnum|j[ée]roboam", re.IGNORECASE), 300),
+    (re.compile(r"\bmagnum\b", re.IGNORECASE), 150),
+    (re.compile(r"halbe flasche|demi[\s-]?bouteille|mezza bottiglia", re.IGNORECASE), 38),
+    (re.compile(r"\bpiccolo\b", re.IGNORECASE), 20),
+]
+_EINHEIT_FAKTOR_CL = {"cl": 1.0, "ml": 0.1, "l": 100.0, "lt": 100.0, "liter": 100.0}
+
+
+def parse_jahrgang(werte: pd.Series, namen: pd.Series = None) -> pd.Series:
+    """
+    Normalisierter Jahrgang (Int64): gültige Werte aus der Quellspalte, sonst eine Jahreszahl im Namen.
+    Unplausible Werte (z.B. 2, 172, 9921) und Weine ohne Jahrgang -> <NA>.
+    """
+    jahrgang = pd.to_numeric(werte, errors="coerce")
+    jahrgang = jahrgang.where((jahrgang >= JAHRGANG_MIN) & (jahrgang <= JAHRGANG_MAX))
+    if namen is not None:
+        aus_name = pd.to_numeric(namen.astype(str).str.extract(_JAHRGANG_PATTERN, expand=False), errors="coerce")
+        aus_name = aus_name.where(aus_name <= JAHRGANG_MAX)
+        jahrgang = jahrgang.fillna(aus_name)
+    return jahrgang.round().astype("Int64")
+
+
+def parse_flasche_cl(namen: pd.Series, volumen: pd.Series = None) -> pd.Series:
+    """
+    Flaschengrösse in cl (Int64): aus einer Volumen-Spalte (falls vorhanden), sonst aus dem Namen
+    ("75cl", "1.5 l", "Magnum", "Halbe Flasche" …). Ohne Angabe gilt die Standardflasche (75 cl).
+    """
+    texte = namen.astype(str)
+    treffer = texte.str.extract(_VOLUMEN_PATTERN)
+    zahl = pd.to_numeric(treffer[0].str.replace(",", ".", regex=False), errors="coerce")
+    faktor = treffer[1].str.lower().map(_EINHEIT_FAKTOR_CL)
+    flasche = zahl * faktor
+    flasche = flasche.where((flasche >= 10) & (flasche <= 1500))  # Plausibilitätsgrenzen (10 cl – 15 l)
+
+    for pattern, cl in _FORMAT_NAMEN_CL:
+        flasche = flasche.fillna(pd.Series(np.where(texte.str.contains(pattern), cl, np.nan), index=texte.index))
+
+    if volumen is not None:
+        vol = pd.to_numeric(volumen, errors="coerce")
+        vol = vol.where(vol >= 10, vol * 100)  # Liter-Angaben (0.75, 1.5) in cl umrechnen
+        flasche = vol.where(vol.notna(), flasche)
+
+    return flasche.fillna(STANDARD_FLASCHE_CL).round().astype("Int64")
+
+
+def add_match_keys(df: pd.DataFrame, name_col: str = "Name", jahrgang_col: str = "Jahrgang",
+                   volumen_col: str = None, prefix: str = "") -> pd.DataFrame:
+    """
+    Ergänzt die Match-Schlüssel '<prefix>Jahrgang_Key' und '<prefix>Flasche_cl' (beide Int64).
+    Fehlende Quellspalten werden toleriert (Jahrgang -> <NA>, Flasche -> 75 cl).
+    """
+    if df.empty:
+        return df
+    namen = df[name_col] if name_col in df.columns else pd.Series("", index=df.index)
+    jahrgang = df[jahrgang_col] if jahrgang_col in df.columns else pd.Series(np.nan, index=df.index)
+    volumen = df[volumen_col] if volumen_col and volumen_col in df.columns else None
+    df[f"{prefix}Jahrgang_Key"] = parse_jahrgang(jahrgang, namen)
+    df[f"{prefix}Flasche_cl"] = parse_flasche_cl(namen, volumen)
+    return df
+
+
+def add_matching_keys(df_matching: pd.DataFrame) -> pd.DataFrame:
+    """Match-Schlüssel für beide Seiten des Matching-Files (Coop_Jahrgang_Key, Coop_Flasche_cl, FP_…)."""
+    df_matching = add_match_keys(df_matching, name_col="Coop_Name", jahrgang_col="Coop_Jahrgang", prefix="Coop_")
+    df_matching = add_match_keys(df_matching, name_col="FP_Name", jahrgang_col="FP_Jahrgang", prefix="FP_")
+    return df_matching
+
+
+def match_keys_equal(df_matching: pd.DataFrame) -> pd.Series:
+    """
+    True, wenn Coop- und FP-Seite eines Paars dieselben Schlüssel haben (gleicher Jahrgang, gleiche Flaschengrösse).
+    Fehlt der Jahrgang auf einer Seite (z.B. Champagner ohne Jahrgang), gilt er als kompatibel.
+    """
+    if "Coop_Jahrgang_Key" not in df_matching.columns or "FP_Jahrgang_Key" not in df_matching.columns:
+        return pd.Series(True, index=df_matching.index)
+    coop_j, fp_j = df_matching["Coop_Jahrgang_Key"], df_matching["FP_Jahrgang_Key"]
+    jahrgang_ok = (coop_j.isna() | fp_j.isna() | (coop_j == fp_j)).fillna(True).astype(bool)
+    flasche_ok = (df_matching["Coop_Flasche_cl"] == df_matching["FP_Flasche_cl"]).fillna(True).astype(bool)
+    return jahrgang_ok & flasche_ok
\ No newline at end of file
@@ -0,0 +1,166 @@
+# fp_alternatives.py
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from gap_comparison import default_preisklassen
+from gap_engine import GapIndex
+from normalization import normalize_produzent_name
+from regionen import fp_land, normalize_region_string, split_region
+from sortiment_cube import preisklassen
+
+ANZAHL_ALTERNATIVEN = 5
+CHUNK_GROESSE = 512  # Coop-Zeilen pro Distanzblock (512 x ~24k FP-Weine)
+
+# Gewichte der Distanz: Abweichung in einem kategorialen Merkmal kostet das jeweilige Gewicht,
+# der Preis geht als quadrierte Differenz der log-Preise ein, gleiche Region/gleicher Produzent senken die Distanz.
+DISTANZ_GEWICHTE = {
+    "Weintyp": 4.0,
+    "Flasche_cl": 2.0,
+    "Land": 2.0,
+    "Preisband": 1.0,
+    "Preis": 2.0,
+    "Region": 1.0,
+    "Produzent": 1.5,
+}
+
+
+def _subregion(werte: pd.Series, trenner: str) -> pd.Series:
+    """
+    Zweiter Teil der Herkunftsangabe ('Land, Region' bzw. 'Land > Region'), normalisiert; None ohne Region.
+    Coop-Zusätze wie 'Burgund - Côte de Nuits' werden auf die Region vor ' - ' gekürzt.
+    """
+    teile = werte.astype("string").str.split(trenner, n=2)
+    region = teile.str[1].str.split(" - ", n=1).str[0].str.strip()
+    eindeutig = {r: normalize_region_string(r, True) for r in region.dropna().unique()}
+    return region.map(eindeutig).astype(object).where(region.notna(), None)
+
+
+def _merkmale(df: pd.DataFrame, land: pd.Series, region: pd.Series, bins, labels) -> pd.DataFrame:
+    preise = pd.to_numeric(df["Preis"], errors="coerce")
+    log_preis = np.log1p(preise.clip(lower=0))
+    return pd.DataFrame({
+        "Weintyp": df["Weintyp"].astype(object) if "Weintyp" in df else None,
+        "Flasche_cl": df["Flasche_cl"].astype(object) if "Flasche_cl" in df else None,
+        "Land": land.to_numpy(),
+        "Preisband": preisklassen(preise, bins, labels).astype(object),
+        "Region": region.to_numpy(),
+        "Produzent": df["Produzent"].map(normalize_produzent_name, na_action="ignore").replace("", None) if "Produzent" in df else None,
+        "LogPreis": log_preis,
+    }, index=df.index)
+
+
+def _one_hot(coop: pd.DataFrame, fp: pd.DataFrame, spalten) -> tuple:
+    """One-Hot-Matrizen (float32) über das gemeinsame Vokabular; Spalten mit sqrt(Gewicht/2) skaliert,
+    damit die quadrierte euklidische Distanz genau 'Gewicht je abweichendem Merkmal' ergibt."""
+    bloecke_coop, bloecke_fp = [], []
+    for spalte in spalten:
+        codes, _ = pd.factorize(pd.concat([coop[spalte], fp[spalte]], ignore_index=True), use_na_sentinel=True)
+        n_kat = codes.max() + 2  # +1 für fehlende Werte (eigene Kategorie)
+        codes = np.where(codes < 0, n_kat - 1, codes)
+        eye = np.eye(n_kat, dtype=np.float32) * np.float32(np.sqrt(DISTANZ_GEWICHTE[spalte] / 2))
+        bloecke_coop.append(eye[codes[:len(coop)]])
+        bloecke_fp.append(eye[codes[len(coop):]])
+    return np.hstack(bloecke_coop), np.hstack(bloecke_fp)
+
+
+def _gemeinsame_codes(coop: pd.Series, fp: pd.Series) -> tuple:
+    """Integer-Codes über beide Seiten; fehlende Werte -1 (zählen nie als gleich)."""
+    codes, _ = pd.factorize(pd.concat([coop, fp], ignore_index=True), use_na_sentinel=True)
+    return codes[:len(coop)], codes[len(coop):]
+
+
+def compute_fp_alternatives(
+    df_gaps: pd.DataFrame,
+    df_fp: pd.DataFrame,
+    k: int = ANZAHL_ALTERNATIVEN,
+    chunk_groesse: int = CHUNK_GROESSE,
+    coop_url_col: str = "URL",
+) -> pd.DataFrame:
+    """
+    Batch-Nearest-Neighbour: für alle Gap-Weine die k ähnlichsten FP-Weine.
+    Merkmale: One-Hot für Weintyp, Flaschengrösse, Land und Preisband, log-Preis als Skalar,
+    dazu Gleichheit von Region und (normalisiertem) Produzent über Integer-Codes.
+    Die Distanzen werden blockweise (chunk_groesse Coop-Zeilen gegen alle FP-Weine) per Matrixprodukt berechnet,
+    die Top-k je Zeile über np.argpartition bestimmt.
+
+    Ergebnis im Long-Format: Coop_URL, Rang (1..k), FP_Sku, FP_Name, FP_Produzent, FP_Preis, FP_Herkunft, Distanz.
+    """
+    spalten = ["Coop_URL", "Rang", "FP_Sku", "FP_Name", "FP_Produzent", "FP_Preis", "FP_Herkunft", "Distanz"]
+    if df_gaps.empty or df_fp.empty:
+        return pd.DataFrame(columns=spalten)
+
+    preise = pd.concat([pd.to_numeric(df_gaps["Preis"], errors="coerce"), pd.to_numeric(df_fp["Preis"], errors="coerce")])
+    bins, labels = default_preisklassen(preise.max())
+    coop = _merkmale(df_gaps, split_region(df_gaps["Region"])["Land"], _subregion(df_gaps["Region"], ","), bins, labels)
+    fp = _merkmale(df_fp, fp_land(df_fp["Herkunft"]), _subregion(df_fp["Herkunft"], ">"), bins, labels)
+
+    # Preis-Skalar als zusätzliche Spalte: Gewicht * (Δ log-Preis)^2; fehlende Preise -> Median
+    median = float(np.nanmedian(np.log1p(preise.clip(lower=0))))
+    preis_faktor = np.float32(np.sqrt(DISTANZ_GEWICHTE["Preis"]))
+    x_coop, x_fp = _one_hot(coop, fp, ["Weintyp", "Flasche_cl", "Land", "Preisband"])
+    x_coop = np.hstack([x_coop, (coop["LogPreis"].fillna(median).to_numpy(np.float32) * preis_faktor)[:, None]])
+    x_fp = np.hstack([x_fp, (fp["LogPreis"].fillna(median).to_numpy(np.float32) * preis_faktor)[:, None]])
+    norm_fp = np.einsum("ij,ij->i", x_fp, x_fp)
+
+    region_coop, region_fp = _gemeinsame_codes(coop["Region"], fp["Region"])
+    prod_coop, prod_fp = _gemeinsame_codes(coop["Produzent"], fp["Produzent"])
+
+    k = min(k, len(df_fp))
+    top_pos = np.empty((len(coop), k), dtype=np.int64)
+    top_dist = np.empty((len(coop), k), dtype=np.float32)
+    for start in range(0, len(coop), chunk_groesse):
+        ende = min(start + chunk_groesse, len(coop))
+        block = x_coop[start:ende]
+        dist = np.einsum("ij,ij->i", block, block)[:, None] + norm_fp[None, :] - 2.0 * (block @ x_fp.T)
+        r = region_coop[start:ende, None]
+        dist -= DISTANZ_GEWICHTE["Region"] * ((r == region_fp[None, :]) & (r >= 0))
+        p = prod_coop[start:ende, None]
+        dist -= DISTANZ_GEWICHTE["Produzent"] * ((p == prod_fp[None, :]) & (p >= 0))
+
+        kandidaten = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        kandidaten_dist = np.take_along_axis(dist, kandidaten, axis=1)
+        reihenfolge = np.argsort(kandidaten_dist, axis=1, kind="stable")
+        top_pos[start:ende] = np.take_along_axis(kandidaten, reihenfolge, axis=1)
+        top_dist[start:ende] = np.take_along_axis(kandidaten_dist, reihenfolge, axis=1)
+
+    pos = top_pos.ravel()
+    spalte = lambda name: df_fp[name].to_numpy()[pos] if name in df_fp else None
+    return pd.DataFrame({
+        "Coop_URL": np.repeat(df_gaps[coop_url_col].astype(str).str.strip().to_numpy(), k),
+        "Rang": np.tile(np.arange(1, k + 1), len(coop)),
+        "FP_Sku": spalte("Sku"),
+        "FP_Name": spalte("Name"),
+        "FP_Produzent": spalte("Produzent"),
+        "FP_Preis": spalte("Preis"),
+        "FP_Herkunft": spalte("Herkunft"),
+        "Distanz": top_dist.ravel().round(3),
+    })[spalten]
+
+
+class FPAlternativen:
+    """Vorberechnete FP-Alternativen, abrufbar über die Coop-URL (ohne Berechnung pro Klick)."""
+
+    def __init__(self, alternativen: pd.DataFrame):
+        self.alternativen = alternativen
+        preis = pd.to_numeric(alternativen["FP_Preis"], errors="coerce")
+        text = alternativen["FP_Name"].astype(str) + np.where(preis.notna(), " (CHF " + preis.map("{:.2f}".format) + ")", "")
+        # Eine Textzeile pro Coop-URL für die Inline-Anzeige in der Gap-Tabelle
+        self.kurztext = text.groupby(alternativen["Coop_URL"], sort=False).agg(" | ".join)
+
+    def __len__(self):
+        return len(self.kurztext)
+
+    def fuer(self, coop_url) -> pd.DataFrame:
+        """Alle Alternativen zu einer Coop-URL (nach Rang)."""
+        return self.alternativen[self.alternativen["Coop_URL"] == str(coop_url).strip()]
+
+    def kurztext_fuer(self, coop_urls: pd.Series) -> pd.Series:
+        return coop_urls.astype(str).str.strip().map(self.kurztext)
+
+
+@st.cache_resource(max_entries=4, show_spinner="Berechne FP-Alternativen für alle Lücken …")
+def get_fp_alternatives(_df_coop, _df_fp, _gap_index: GapIndex, coop_version, matching_version, fp_version,
+                        status_rule: tuple = ("Kein Match", None, True)) -> FPAlternativen:
+    """Gecachter Batch-Job, Schlüssel: (Coop-, Matching-, FP-Datenversion, Status-Regel)."""
+    return FPAlternativen(compute_fp_alternatives(_df_coop[_gap_index.gap_mask], _df_fp))
@@ -0,0 +1,85 @@
+# gap_browser.py
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from gap_engine import GapIndex
+from normalization import normalize_wein_text
+
+SUCH_SPALTEN = ("Name", "Produzent", "Region")
+SORTIER_SPALTEN = ("Name", "Produzent", "Preis", "Weintyp", "Region", "Jahrgang_Key", "Flasche_cl")
+SEITENGROESSEN = [25, 50, 100, 250]
+
+
+class GapBrowser:
+    """
+    Such- und Sortierindex über die Gap-Zeilen, einmal pro Gap-Menge aufgebaut:
+    - tokens / postings: sortierte Tokens aus Name, Produzent und Region (normalize_wein_text) und je Token
+      die Zeilenpositionen; Suchbegriffe werden als Präfix über np.searchsorted aufgelöst
+    - sortierungen: je Spalte die vorberechnete Reihenfolge der Positionen (aufsteigend, fehlende Werte zuletzt)
+    - fehlend: je Sortierspalte die Maske der fehlenden Werte
+    Die Positionen beziehen sich auf df_gaps (iloc), angezeigt wird nur die jeweilige Seite.
+    """
+
+    def __init__(self, df_gaps: pd.DataFrame, such_spalten=SUCH_SPALTEN, sortier_spalten=SORTIER_SPALTEN):
+        self.n = len(df_gaps)
+        spalten = [s for s in such_spalten if s in df_gaps.columns]
+        if spalten and self.n:
+            texte = df_gaps[spalten[0]].astype("string").fillna("")
+            for spalte in spalten[1:]:
+                texte = texte + " " + df_gaps[spalte].astype("string").fillna("")
+            token_listen = pd.Series([normalize_wein_text(t).split() for t in texte], dtype=object)
+            lang = pd.DataFrame({"token": token_listen, "pos": np.arange(self.n)}).explode("token").dropna()
+            lang = lang.drop_duplicates().sort_values(["token", "pos"], kind="stable")
+            self.tokens, start = np.unique(lang["token"].to_numpy(dtype=str), return_index=True)
+            self.postings = np.split(lang["pos"].to_numpy(dtype=np.int64), start[1:])
+        else:
+            self.tokens, self.postings = np.array([], dtype=str), []
+
+        self.sortierungen, self.fehlend = {}, {}
+        for spalte in sortier_spalten:
+            if spalte in df_gaps.columns:
+                werte = df_gaps[spalte]
+                if not pd.api.types.is_numeric_dtype(werte):
+                    werte = werte.astype("string").str.lower()
+                codes, _ = pd.factorize(werte, sort=True)  # Rang der Werte, fehlende Werte -1
+                self.fehlend[spalte] = codes < 0
+                # Fehlende Werte zuletzt, bei gleichen Werten stabil nach Position
+                self.sortierungen[spalte] = np.argsort(np.where(codes < 0, self.n, codes), kind="stable")
+
+    def __len__(self):
+        return self.n
+
+    def _treffer(self, term: str) -> np.ndarray:
+        """Positionen aller Zeilen mit einem Token, das mit term beginnt."""
+        lo = np.searchsorted(self.tokens, term, side="left")
+        hi = np.searchsorted(self.tokens, term + "\uffff", side="left")
+        if lo == hi:
+            return np.array([], dtype=np.int64)
+        return np.concatenate(self.postings[lo:hi])
+
+    def suche(self, suchbegriff: str) -> np.ndarray:
+        """bool-Maske über die Gap-Zeilen: alle Suchwörter (UND-verknüpft, Präfix) kommen in Name/Produzent/Region vor."""
+        maske = np.ones(self.n, dtype=bool)
+        for term in normalize_wein_text(suchbegriff or "").split():
+            treffer = np.zeros(self.n, dtype=bool)
+            treffer[self._treffer(term)] = True
+            maske &= treffer
+        return maske
+
+    def sortiert(self, auswahl: np.ndarray, spalte: str = None, absteigend: bool = False) -> np.ndarray:
+        """Positionen der ausgewählten Zeilen in Sortierreihenfolge (ohne Spalte: ursprüngliche Reihenfolge)."""
+        if spalte not in self.sortierungen:
+            return np.flatnonzero(auswahl)
+        reihenfolge = self.sortierungen[spalte]
+        if absteigend:
+            # Umkehren, fehlende Werte aber weiterhin am Ende
+            fehlt = self.fehlend[spalte]
+            reihenfolge = np.concatenate([reihenfolge[~fehlt[reihenfolge]][::-1], reihenfolge[fehlt[reihenfolge]]])
+        return reihenfolge[auswahl[reihenfolge]]
+
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def get_gap_browser(_df_coop, _gap_index: GapIndex, coop_version, matching_version, status_rule: tuple = ("Kein Match", None, True)) -> GapBrowser:
+    """Gecachter Such-/Sortierindex der Gap-Zeilen, Schlüssel wie beim Gap-Index."""
+    return GapBrowser(_df_coop[_gap_index.gap_mask])
@@ -0,0 +1,311 @@
+# gap_comparison.py
+import numpy as np
+import pandas as pd
+import streamlit as st
+from scipy.stats import hypergeom
+
+from gap_engine import GapIndex
+from normalization import normalize_produzent_name
+from regionen import fp_land, split_region
+from sortiment_cube import DIM_LAND, DIM_PREISKLASSE, DIM_REGION, DIM_WEINTYP, WEINTYP_REIHENFOLGE, preisklassen
+
+# Weintyp, Preisklasse, Land und Region teilen die Gap-Vergleiche mit den Sortiment-Panels (sortiment_cube)
+DIM_PREIS_WEINTYP = "Preisklasse × Weintyp"
+DIM_HAUPTREGION = "Hauptregion"
+DIM_PRODUZENT = "Produzent"
+DIM_LIEFERANT = "Lieferant"
+
+DEFAULT_DIMENSIONEN = (DIM_WEINTYP, DIM_PREISKLASSE, DIM_PREIS_WEINTYP, DIM_LAND, DIM_HAUPTREGION, DIM_PRODUZENT)
+# Umgekehrte Richtung (FP-Weine, die Coop nicht führt)
+REVERSE_DIMENSIONEN = (DIM_WEINTYP, DIM_PREISKLASSE, DIM_LAND, DIM_REGION, DIM_LIEFERANT)
+
+# Ab dieser Abweichung (Prozentpunkte) gilt eine Kategorie als auffällig – die bisherigen Schwellen der Expander
+AUFFAELLIG_SCHWELLEN_PP = {
+    DIM_WEINTYP: 3.0,
+    DIM_PREISKLASSE: 5.0,
+    DIM_PREIS_WEINTYP: 2.0,
+    DIM_LAND: 1.5,
+    DIM_HAUPTREGION: 5.0,
+    DIM_PRODUZENT: 3.0,
+    DIM_REGION: 2.0,
+    DIM_LIEFERANT: 1.0,
+}
+
+# Signifikanzniveau nach Benjamini-Hochberg-Korrektur (False Discovery Rate je Dimension)
+SIGNIFIKANZ_NIVEAU = 0.05
+
+# Dimensionen, deren Anteile sich auf alle Zeilen beziehen (auch ohne Kategorie, z.B. fehlender Produzent)
+_BASIS_ALLE_ZEILEN = {DIM_PRODUZENT}
+
+VERGLEICH_SPALTEN = ["Dimension", "Gruppe", "Kategorie", "Sortierung", "Anzahl_Luecken", "Anzahl_Gesamt",
+                     "Basis_Luecken", "Basis_Gesamt", "Anteil_Luecken", "Anteil_Gesamt", "Differenz_pp", "Auffaellig",
+                     "p_Wert", "q_Wert", "Signifikant"]
+
+
+def default_preisklassen(max_preis):
+    """Preisklassen-Bins und -Labels wie in den Expandern 2/3: 0–20, 20–50, 50–100 und 100–max CHF."""
+    max_preis = max(float(max_preis) if pd.notna(max_preis) else 0.0, 101.0)
+    return [0, 20, 50, 100, max_preis], ["0–20 CHF", "20–50 CHF", "50–100 CHF", f"100–{int(round(max_preis))} CHF"]
+
+
+def hypergeom_p_values(anzahl_luecken, basis_luecken, anzahl_gesamt, basis_gesamt) -> np.ndarray:
+    """
+    Zweiseitige p-Werte für alle Kategorien auf einmal: Die Lücken sind eine Teilmenge des Coop-Gesamtsortiments,
+    unter H0 ist die Anzahl Lücken einer Kategorie daher hypergeometrisch verteilt (Ziehen ohne Zurücklegen,
+    exakter Test wie Fisher). p = min(1, 2 * min(P(X <= k), P(X >= k))).
+    """
+    k = np.asarray(anzahl_luecken, dtype=float)
+    n = np.asarray(basis_luecken, dtype=float)
+    K = np.asarray(anzahl_gesamt, dtype=float)
+    M = np.asarray(basis_gesamt, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        unten = hypergeom.cdf(k, M, K, n)
+        oben = hypergeom.sf(k - 1, M, K, n)
+    p = np.minimum(1.0, 2 * np.minimum(unten, oben))
+    return np.where(np.isfinite(p) & (M > 0), p, 1.0)
+
+
+def benjamini_hochberg(p_werte: pd.Series, familien: pd.Series) -> pd.Series:
+    """BH-korrigierte p-Werte (q-Werte), je Familie (z.B. Dimension) vektorisiert über Ränge und kumulatives Minimum."""
+    df = pd.DataFrame({"p": p_werte.to_numpy(dtype=float), "familie": familien.to_numpy()}, index=p_werte.index)
+    df = df.sort_values(["familie", "p"], ascending=[True, False], kind="stable")
+    gruppen = df.groupby("familie", sort=False)["p"]
+    m = gruppen.transform("size")
+    rang = m - gruppen.cumcount()  # absteigend sortiert -> Rang des kleinsten p-Werts ist 1
+    df["q"] = (df["p"] * m / rang).groupby(df["familie"], sort=False).cummin().clip(upper=1.0)
+    return df["q"].reindex(p_werte.index)
+
+
+def _long(dimension, kategorie, luecke, gruppe=None, sortierung=None):
+    n = len(kategorie)
+    return pd.DataFrame({
+        "Dimension": dimension,
+        "Gruppe": "" if gruppe is None else np.asarray(gruppe, dtype=object),
+        "Kategorie": np.asarray(kategorie, dtype=object),
+        "Sortierung": 0 if sortierung is None else np.asarray(sortierung),
+        "Luecke": luecke,
+    }, index=pd.RangeIndex(n))
+
+
+def compute_gap_comparison(
+    df_coop: pd.DataFrame,
+    df_matching: pd.DataFrame,
+    gap_index: GapIndex,
+    dimensionen=DEFAULT_DIMENSIONEN,
+    preis_bins=None,
+    preis_labels=None,
+    weintyp_col: str = "Weintyp",
+    preis_col: str = "Preis",
+    region_col: str = "Region",
+    produzent_col_matching: str = "Coop_Produzent",
+) -> pd.DataFrame:
+    """
+    Vergleich Lücken vs. Coop-Gesamt für alle Dimensionen in einem gruppierten Durchlauf.
+    Jede Dimension liefert pro Coop-Zeile (Gruppe, Kategorie); alle Dimensionen werden in einem Long-Format
+    gestapelt und einmal nach (Dimension, Gruppe, Kategorie) aggregiert.
+
+    Ergebnis (eine Zeile pro Kategorie): Anzahl und Anteil (%) bei Lücken und im Coop-Gesamtsortiment,
+    Differenz in Prozentpunkten und 'Auffaellig' (|Differenz| >= AUFFAELLIG_SCHWELLEN_PP) sowie p-Wert
+    (hypergeometrischer Test), BH-korrigierter q-Wert je Dimension und 'Signifikant' (q < SIGNIFIKANZ_NIVEAU).
+    Anteile beziehen sich auf die jeweilige Gruppe (Preisklasse bei Preis × Weintyp, Land bei Hauptregion).
+    Weintyp, Preisklasse, Land und Hauptregion stammen aus df_coop (gap_index.gap_mask),
+    Produzent aus df_matching (gap_index.matching_gap_mask), wie in den bisherigen Expandern.
+    """
+    teile = []
+    luecke = np.asarray(gap_index.gap_mask, dtype=bool)
+
+    weintyp = df_coop[weintyp_col].where(df_coop[weintyp_col].isin(WEINTYP_REIHENFOLGE)) if weintyp_col in df_coop else None
+    weintyp_rang = weintyp.map({t: i for i, t in enumerate(WEINTYP_REIHENFOLGE)}).fillna(-1).astype(int) if weintyp is not None else None
+
+    preisklasse = preis_rang = None
+    if preis_col in df_coop and (DIM_PREISKLASSE in dimensionen or DIM_PREIS_WEINTYP in dimensionen):
+        if preis_bins is None or preis_labels is None:
+            preis_bins, preis_labels = default_preisklassen(df_coop[preis_col].max())
+        klassen = preisklassen(df_coop[preis_col], preis_bins, preis_labels)
+        preisklasse = klassen.astype(object).where(klassen.notna())
+        preis_rang = klassen.cat.codes.to_numpy()
+
+    if DIM_WEINTYP in dimensionen and weintyp is not None:
+        teile.append(_long(DIM_WEINTYP, weintyp, luecke, sortierung=weintyp_rang))
+    if DIM_PREISKLASSE in dimensionen and preisklasse is not None:
+        teile.append(_long(DIM_PREISKLASSE, preisklasse, luecke, sortierung=preis_rang))
+    if DIM_PREIS_WEINTYP in dimensionen and preisklasse is not None and weintyp is not None:
+        # Ohne Preisklasse kein Bezugsrahmen -> Kategorie leer, damit die Zeile nicht in die Basis eingeht
+        kategorie = weintyp.where(preisklasse.notna())
+        teile.append(_long(DIM_PREIS_WEINTYP, kategorie, luecke, gruppe=preisklasse.fillna(""),
+                           sortierung=preis_rang * len(WEINTYP_REIHENFOLGE) + weintyp_rang))
+
+    if region_col in df_coop and (DIM_LAND in dimensionen or DIM_HAUPTREGION in dimensionen):
+        regionen = split_region(df_coop[region_col])
+        if DIM_LAND in dimensionen:
+            teile.append(_long(DIM_LAND, regionen["Land"], luecke))
+        if DIM_HAUPTREGION in dimensionen:
+            land = regionen["Land"].where(regionen["Hauptregion"].notna(), "")
+            teile.append(_long(DIM_HAUPTREGION, regionen["Hauptregion"], luecke, gruppe=land))
+
+    if DIM_PRODUZENT in dimensionen and produzent_col_matching in df_matching:
+        teile.append(_long(DIM_PRODUZENT, df_matching[produzent_col_matching],
+                           np.asarray(gap_index.matching_gap_mask, dtype=bool)))
+
+    return _aggregiere(teile)
+
+
+def _aggregiere(teile) -> pd.DataFrame:
+    """Stapelt die Long-Frames aller Dimensionen, aggregiert einmal und ergänzt Anteile, Differenz und Signifikanz."""
+    if not teile:
+        return pd.DataFrame(columns=VERGLEICH_SPALTEN)
+
+    lang = pd.concat(teile, ignore_index=True)
+    agg = (lang.groupby(["Dimension", "Gruppe", "Kategorie"], dropna=False, sort=False)
+           .agg(Sortierung=("Sortierung", "first"), Anzahl_Luecken=("Luecke", "sum"), Anzahl_Gesamt=("Luecke", "size"))
+           .reset_index())
+
+    # Basis je (Dimension, Gruppe): Zeilen mit Kategorie, bei _BASIS_ALLE_ZEILEN alle Zeilen
+    zaehlt = agg["Kategorie"].notna() | agg["Dimension"].isin(_BASIS_ALLE_ZEILEN)
+    basis = agg[["Anzahl_Luecken", "Anzahl_Gesamt"]].mul(zaehlt, axis=0).groupby([agg["Dimension"], agg["Gruppe"]]).transform("sum")
+    agg["Basis_Luecken"] = basis["Anzahl_Luecken"].to_numpy()
+    agg["Basis_Gesamt"] = basis["Anzahl_Gesamt"].to_numpy()
+    agg = agg[agg["Kategorie"].notna()].reset_index(drop=True)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        agg["Anteil_Luecken"] = np.where(agg["Basis_Luecken"] > 0, agg["Anzahl_Luecken"] / agg["Basis_Luecken"] * 100, 0.0)
+        agg["Anteil_Gesamt"] = np.where(agg["Basis_Gesamt"] > 0, agg["Anzahl_Gesamt"] / agg["Basis_Gesamt"] * 100, 0.0)
+    agg["Differenz_pp"] = agg["Anteil_Luecken"] - agg["Anteil_Gesamt"]
+    schwelle = agg["Dimension"].map(AUFFAELLIG_SCHWELLEN_PP).fillna(np.inf)
+    agg["Auffaellig"] = agg["Differenz_pp"].abs() >= schwelle
+
+    # Signifikanz: ein Array-Aufruf für alle Kategorien aller Dimensionen, Korrektur je Dimension
+    agg["p_Wert"] = hypergeom_p_values(agg["Anzahl_Luecken"], agg["Basis_Luecken"], agg["Anzahl_Gesamt"], agg["Basis_Gesamt"])
+    agg["q_Wert"] = benjamini_hochberg(agg["p_Wert"], agg["Dimension"])
+    agg["Signifikant"] = agg["q_Wert"] < SIGNIFIKANZ_NIVEAU
+    return agg[VERGLEICH_SPALTEN]
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def get_gap_comparison(_df_coop, _df_matching, _gap_index, coop_version, matching_version, status_rule: tuple = ("Kein Match", None, True)):
+    """
+    Gecachter Vergleich, Schlüssel wie beim Gap-Index: (Coop-Datenversion, Matching-Datenversion, Status-Regel).
+    Die Expander rendern nur noch Ausschnitte dieses Ergebnisses (siehe comparison_slice).
+    """
+    return compute_gap_comparison(_df_coop, _df_matching, _gap_index)
+
+
+def compute_reverse_gap_comparison(
+    df_fp: pd.DataFrame,
+    reverse_index: GapIndex,
+    dimensionen=REVERSE_DIMENSIONEN,
+    weintyp_col: str = "Weintyp",
+    preis_col: str = "Preis",
+    herkunft_col: str = "Herkunft",
+    lieferant_col: str = "Lieferant",
+) -> pd.DataFrame:
+    """
+    Vergleich FP-exklusive Weine (reverse_index.gap_mask, siehe gap_engine.compute_reverse_gap_index) vs. FP-Gesamt,
+    im selben Long-Format wie compute_gap_comparison: 'Luecken' sind hier die FP-Weine ohne Coop-Gegenstück.
+    Region = zweite Ebene der FP-Herkunft ('Land > Region > ...'), gruppiert nach Land.
+    Es wird nur über die Masken gruppiert, der FP-Katalog (~24k Zeilen) wird nicht kopiert.
+    """
+    teile = []
+    luecke = np.asarray(reverse_index.gap_mask, dtype=bool)
+
+    if DIM_WEINTYP in dimensionen and weintyp_col in df_fp:
+        weintyp = df_fp[weintyp_col].where(df_fp[weintyp_col].isin(WEINTYP_REIHENFOLGE))
+        teile.append(_long(DIM_WEINTYP, weintyp, luecke,
+                           sortierung=weintyp.map({t: i for i, t in enumerate(WEINTYP_REIHENFOLGE)}).fillna(-1).astype(int)))
+    if DIM_PREISKLASSE in dimensionen and preis_col in df_fp:
+        preise = pd.to_numeric(df_fp[preis_col], errors="coerce")
+        preis_bins, preis_labels = default_preisklassen(preise.max())
+        klassen = preisklassen(preise, preis_bins, preis_labels)
+        teile.append(_long(DIM_PREISKLASSE, klassen.astype(object).where(klassen.notna()), luecke,
+                           sortierung=klassen.cat.codes.to_numpy()))
+    if herkunft_col in df_fp and (DIM_LAND in dimensionen or DIM_REGION in dimensionen):
+        land = fp_land(df_fp[herkunft_col])
+        if DIM_LAND in dimensionen:
+            teile.append(_long(DIM_LAND, land, luecke))
+        if DIM_REGION in dimensionen:
+            region = df_fp[herkunft_col].astype("string").str.split(">", n=2).str[1].str.strip().astype(object)
+            region = region.where(region.notna() & (region != ""))
+            teile.append(_long(DIM_REGION, region, luecke, gruppe=land.where(region.notna(), "")))
+    if DIM_LIEFERANT in dimensionen and lieferant_col in df_fp:
+        teile.append(_long(DIM_LIEFERANT, df_fp[lieferant_col], luecke))
+
+    return _aggregiere(teile)
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def get_reverse_gap_comparison(_df_fp, _reverse_index, fp_version, matching_version, status_rule: tuple = ("Kein Match", None, True)):
+    """Gecachter Vergleich der FP-exklusiven Weine, Schlüssel wie beim Reverse-Gap-Index."""
+    return compute_reverse_gap_comparison(_df_fp, _reverse_index)
+
+
+def comparison_slice(vergleich: pd.DataFrame, dimension: str, gruppe=None) -> pd.DataFrame:
+    """Zeilen einer Dimension (optional einer Gruppe, z.B. eines Landes), in Kategorie-Reihenfolge."""
+    maske = vergleich["Dimension"] == dimension
+    if gruppe is not None:
+        maske &= vergleich["Gruppe"] == gruppe
+    return vergleich[maske].sort_values(["Sortierung", "Gruppe", "Kategorie"], kind="stable")
+
+
+# === Produzenten-Rollup: Abdeckung je Coop-Produzent ===
+ROLLUP_SPALTEN = ["Produzent", "SKUs_Coop", "SKUs_Gematcht", "SKUs_Luecken", "Abdeckung_Prozent",
+                  "Bei_FP", "FP_Produzent", "Ähnlichkeit", "FP_Weine"]
+
+
+def compute_produzenten_rollup(
+    df_matching: pd.DataFrame,
+    gap_index: GapIndex,
+    produzenten_index=None,
+    df_fp: pd.DataFrame = None,
+    produzent_col_matching: str = "Coop_Produzent",
+    coop_id_col_matching: str = "Coop_URL",
+    fp_produzent_col: str = "Produzent",
+    fp_produzent_col_matching: str = "FP_Produzent",
+) -> pd.DataFrame:
+    """
+    Eine Zeile pro Coop-Produzent (gruppiert über den normalisierten Namen, Schreibvarianten fallen zusammen):
+    Coop-SKUs, davon bei FP gematcht, Lücken, Abdeckung in % und ob der Produzent bei FP überhaupt geführt wird
+    (ProduzentenIndex, ähnlichster FP-Produzent samt Anzahl FP-Weine). Ein gruppierter Durchlauf über das Matching-File.
+    Findet der Index keinen FP-Produzenten, gilt der häufigste FP-Produzent der gematchten Paare im Matching-File.
+    """
+    eindeutig = ~df_matching[coop_id_col_matching].duplicated().to_numpy() & df_matching[produzent_col_matching].notna().to_numpy()
+    produzenten = df_matching[produzent_col_matching][eindeutig].astype(str).str.strip()
+    if produzenten.empty:
+        return pd.DataFrame(columns=ROLLUP_SPALTEN)
+    normalisiert_je_name = {p: normalize_produzent_name(p) or p.lower() for p in produzenten.unique()}
+    schluessel = produzenten.map(normalisiert_je_name)
+
+    luecke = np.asarray(gap_index.matching_gap_mask, dtype=bool)[eindeutig]
+    rollup = (pd.DataFrame({"Schluessel": schluessel.to_numpy(), "Produzent": produzenten.to_numpy(), "Luecke": luecke})
+              .groupby("Schluessel", sort=False)
+              .agg(Produzent=("Produzent", "first"), SKUs_Coop=("Luecke", "size"), SKUs_Luecken=("Luecke", "sum")))
+    rollup["SKUs_Gematcht"] = rollup["SKUs_Coop"] - rollup["SKUs_Luecken"]
+    rollup["Abdeckung_Prozent"] = rollup["SKUs_Gematcht"] / rollup["SKUs_Coop"] * 100
+
+    if produzenten_index is not None:
+        lookup = produzenten_index.lookup_batch(rollup["Produzent"]).set_index(rollup.index)
+        # Ein Produzent mit gematchten Weinen ist bei FP vorhanden, auch wenn der Name dort anders geschrieben ist
+        rollup["Bei_FP"] = lookup["Bei_FP"].to_numpy() | (rollup["SKUs_Gematcht"] > 0).to_numpy()
+        rollup["FP_Produzent"] = lookup["FP_Produzent"].where(lookup["Bei_FP"])
+        rollup["Ähnlichkeit"] = lookup["Ähnlichkeit"]
+    else:
+        rollup["Bei_FP"] = rollup["SKUs_Gematcht"] > 0
+        rollup["FP_Produzent"] = None
+        rollup["Ähnlichkeit"] = np.nan
+    if fp_produzent_col_matching in df_matching:
+        # FP-Produzent der gematchten Paare (Schreibweise wie im FP-Katalog), je Coop-Produzent der häufigste
+        gematcht = pd.DataFrame({"Schluessel": schluessel.to_numpy()[~luecke],
+                                 "FP_Produzent": df_matching[fp_produzent_col_matching][eindeutig].to_numpy()[~luecke]}).dropna()
+        aus_matches = gematcht.groupby("Schluessel")["FP_Produzent"].agg(lambda s: s.value_counts().index[0])
+        rollup["FP_Produzent"] = rollup["FP_Produzent"].fillna(rollup.index.to_series().map(aus_matches)).where(rollup["Bei_FP"])
+    if df_fp is not None and fp_produzent_col in df_fp:
+        rollup["FP_Weine"] = rollup["FP_Produzent"].map(df_fp[fp_produzent_col].value_counts()).fillna(0).astype(int)
+    else:
+        rollup["FP_Weine"] = 0
+    return rollup.sort_values(["SKUs_Luecken", "SKUs_Coop"], ascending=False).reset_index(drop=True)[ROLLUP_SPALTEN]
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def get_produzenten_rollup(_df_matching, _gap_index, _produzenten_index, _df_fp, matching_version, fp_version,
+                           status_rule: tuple = ("Kein Match", None, True)):
+    """Gecachter Produzenten-Rollup, Schlüssel: (Matching-, FP-Datenversion, Status-Regel)."""
+    return compute_produzenten_rollup(_df_matching, _gap_index, _produzenten_index, _df_fp)
@@ -0,0 +1,270 @@
+# gap_engine.py
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from data_loading import match_keys_equal
+from match_decisions import manuell_bestaetigt
+
+
+def frame_version(df: pd.DataFrame, version=None):
+    """Version eines DataFrames für Cache-Schlüssel: die übergebene Datenversion oder ein Inhalts-Hash als Fallback."""
+    if version is not None:
+        return version
+    return int(pd.util.hash_pandas_object(df, index=True).sum())
+
+
+def _normalize_ids(ids: pd.Series) -> np.ndarray:
+    return ids.astype(str).str.strip().to_numpy(dtype=object)
+
+
+class GapIndex:
+    """
+    Ergebnis der Gap-Berechnung für ein (Coop-Daten, Matching-Daten, Status-Regel)-Tripel:
+    - gap_mask: bool-Array, ausgerichtet auf die Zeilen des Coop-DataFrames (True = Lücke)
+    - matching_gap_mask: bool-Array, ausgerichtet auf die Zeilen des Matching-DataFrames
+    - matched_ids: Menge der Coop-IDs mit echtem Match bei FP
+    """
+
+    def __init__(self, gap_mask, matching_gap_mask, matched_ids):
+        self.gap_mask = gap_mask
+        self.matching_gap_mask = matching_gap_mask
+        self.matched_ids = matched_ids
+
+    @property
+    def n_total(self):
+        return len(self.gap_mask)
+
+    @property
+    def n_gaps(self):
+        return int(self.gap_mask.sum())
+
+    @property
+    def n_matched(self):
+        return len(self.matched_ids)
+
+
+def _normalize_skus(skus: pd.Series) -> np.ndarray:
+    """FP-SKUs als Text ohne '.0' (im Matching-File als float gespeichert, im FP-Export als int)."""
+    numerisch = pd.to_numeric(skus, errors="coerce")
+    als_text = numerisch.round().astype("Int64").astype("string")
+    return als_text.fillna(skus.astype("string").str.strip()).to_numpy(dtype=object)
+
+
+def _echte_matches(df_matching, match_status_col_in_matching_df, non_match_status_value, valid_match_statuses,
+                   require_equal_keys) -> np.ndarray:
+    """bool-Array über die Matching-Zeilen: Paar zählt als echter Match (Status-Regel, optional gleiche Schlüssel)."""
+    status = df_matching[match_status_col_in_matching_df]
+    if valid_match_statuses:
+        echte_matches = status.isin(valid_match_statuses).to_numpy()
+    else:
+        echte_matches = (status != non_match_status_value).to_numpy()
+    if require_equal_keys:
+        # Manuell bestätigte Paare gelten auch bei abweichendem Jahrgang bzw. Flaschengrösse
+        echte_matches = echte_matches & (match_keys_equal(df_matching).to_numpy() | manuell_bestaetigt(df_matching))
+    return echte_matches
+
+
+def compute_gap_index(
+    df_coop: pd.DataFrame,
+    df_matching: pd.DataFrame,
+    coop_id_col_in_coop_df: str = "URL",
+    coop_id_col_in_matching_df: str = "Coop_URL",
+    match_status_col_in_matching_df: str = "Match_Status",
+    non_match_status_value: str = "Kein Match",
+    valid_match_statuses: tuple = None,
+    require_equal_keys: bool = True,
+) -> GapIndex:
+    """Berechnet Gap-Maske und Match-Menge (ohne Kopie des Coop-Frames)."""
+    echte_matches = _echte_matches(df_matching, match_status_col_in_matching_df, non_match_status_value,
+                                   valid_match_statuses, require_equal_keys)
+
+    matching_ids = _normalize_ids(df_matching[coop_id_col_in_matching_df])
+    matched_ids = frozenset(matching_ids[echte_matches & df_matching[coop_id_col_in_matching_df].notna().to_numpy()])
+
+    gap_mask = ~pd.Series(_normalize_ids(df_coop[coop_id_col_in_coop_df])).isin(matched_ids).to_numpy()
+    matching_gap_mask = ~pd.Series(matching_ids).isin(matched_ids).to_numpy()
+    return GapIndex(gap_mask, matching_gap_mask, matched_ids)
+
+
+def compute_reverse_gap_index(
+    df_fp: pd.DataFrame,
+    df_matching: pd.DataFrame,
+    fp_id_col_in_fp_df: str = "Sku",
+    fp_id_col_in_matching_df: str = "FP_Sku",
+    match_status_col_in_matching_df: str = "Match_Status",
+    non_match_status_value: str = "Kein Match",
+    valid_match_statuses: tuple = None,
+    require_equal_keys: bool = True,
+) -> GapIndex:
+    """
+    Umgekehrte Richtung (FP -> Coop): FP-Weine ohne echten Match zu einem Coop-Wein.
+    Gleiche Status-Regel wie compute_gap_index, nur über die FP-SKUs des Matching-Files;
+    gap_mask ist auf die Zeilen des FP-DataFrames ausgerichtet, matched_ids enthält die gematchten FP-SKUs.
+    """
+    echte_matches = _echte_matches(df_matching, match_status_col_in_matching_df, non_match_status_value,
+                                   valid_match_statuses, require_equal_keys)
+
+    matching_skus = _normalize_skus(df_matching[fp_id_col_in_matching_df])
+    matched_ids = frozenset(matching_skus[echte_matches & df_matching[fp_id_col_in_matching_df].notna().to_numpy()])
+
+    gap_mask = ~pd.Series(_normalize_skus(df_fp[fp_id_col_in_fp_df])).isin(matched_ids).to_numpy()
+    matching_gap_mask = ~pd.Series(matching_skus).isin(matched_ids).to_numpy()
+    return GapIndex(gap_mask, matching_gap_mask, matched_ids)
+
+
+# === N Händler: Abdeckung kanonischer Wein-Schlüssel als Bitset ===
+HAENDLER_COOP = "Coop"
+HAENDLER_FP = "Flaschenpost"
+MAX_HAENDLER = 64  # ein Bit pro Händler in einem uint64
+
+
+class RetailerCoverage:
+    """
+    Abdeckung kanonischer Wein-Schlüssel durch N Händler:
+    - schluessel: pd.Index der kanonischen Schlüssel (ein Eintrag pro Wein)
+    - bits: uint64-Array über die Schlüssel, Bit i gesetzt = Händler i führt den Wein
+    - zeilen_codes: je Händler die Schlüsselposition jeder Zeile seines DataFrames
+    Fragen wie "bei Coop und Händler B, aber nicht bei FP" sind damit bitweise Operationen über alle Schlüssel.
+    """
+
+    def __init__(self, haendler: dict):
+        """haendler: Name -> (Schlüssel je Zeile, zusätzlich abgedeckte Schlüssel oder None), in Bit-Reihenfolge."""
+        if len(haendler) > MAX_HAENDLER:
+            raise ValueError(f"Maximal {MAX_HAENDLER} Händler unterstützt, erhalten: {len(haendler)}")
+        self.haendler = list(haendler)
+        arrays = [np.asarray(zeilen, dtype=object) for zeilen, _ in haendler.values()]
+        arrays += [np.asarray(extra, dtype=object) for _, extra in haendler.values() if extra is not None]
+        self.schluessel = pd.Index(pd.unique(np.concatenate(arrays)) if arrays else [], dtype=object)
+        self.bits = np.zeros(len(self.schluessel), dtype=np.uint64)
+        self.zeilen_codes = {}
+        for name, (zeilen, extra) in haendler.items():
+            codes = self.schluessel.get_indexer(np.asarray(zeilen, dtype=object))
+            self.zeilen_codes[name] = codes
+            self.bits[codes] |= self.bit(name)
+            if extra is not None:
+                self.bits[self.schluessel.get_indexer(np.asarray(extra, dtype=object))] |= self.bit(name)
+
+    def __len__(self):
+        return len(self.schluessel)
+
+    def bit(self, name) -> np.uint64:
+        return np.uint64(1) << np.uint64(self.haendler.index(name))
+
+    def _bits(self, namen) -> np.uint64:
+        maske = np.uint64(0)
+        for name in namen:
+            maske |= self.bit(name)
+        return maske
+
+    def key_mask(self, vorhanden_bei=(), fehlt_bei=()) -> np.ndarray:
+        """bool-Array über die Schlüssel: bei allen Händlern aus vorhanden_bei geführt, bei keinem aus fehlt_bei."""
+        vorhanden, fehlt = self._bits(vorhanden_bei), self._bits(fehlt_bei)
+        return ((self.bits & vorhanden) == vorhanden) & ((self.bits & fehlt) == 0)
+
+    def anzahl(self, vorhanden_bei=(), fehlt_bei=()) -> int:
+        return int(self.key_mask(vorhanden_bei, fehlt_bei).sum())
+
+    def row_mask(self, haendler, vorhanden_bei=(), fehlt_bei=()) -> np.ndarray:
+        """Dieselbe Abfrage, ausgerichtet auf die Zeilen des DataFrames eines Händlers."""
+        return self.key_mask(vorhanden_bei, fehlt_bei)[self.zeilen_codes[haendler]]
+
+    def gap_index(self, haendler, fehlt_bei, vorhanden_bei=(), matching_schluessel=None) -> GapIndex:
+        """
+        GapIndex für beliebige Händler-Kombinationen: Zeilen von 'haendler', die bei allen aus vorhanden_bei
+        und bei keinem aus fehlt_bei geführt werden. matched_ids = Schlüssel der Basis-Zeilen, die mindestens ein
+        Händler aus fehlt_bei führt. matching_schluessel (kanonische Schlüssel der Matching-Zeilen für die Basis-Seite)
+        liefert die matching_gap_mask für die Analysen auf dem Matching-File.
+        """
+        maske = self.key_mask(vorhanden_bei, fehlt_bei)
+        codes = self.zeilen_codes[haendler]
+        abgedeckt = (self.bits[codes] & self._bits(fehlt_bei)) != 0
+        matched_ids = frozenset(self.schluessel[codes[abgedeckt]])
+        matching_gap_mask = None
+        if matching_schluessel is not None:
+            matching_codes = self.schluessel.get_indexer(np.asarray(matching_schluessel, dtype=object))
+            # Schlüssel ausserhalb des Universums gelten als von niemandem geführt
+            matching_gap_mask = np.where(matching_codes >= 0, maske[matching_codes], len(vorhanden_bei) == 0)
+        return GapIndex(maske[codes], matching_gap_mask, matched_ids)
+
+
+def coop_schluessel(urls: pd.Series) -> np.ndarray:
+    """Kanonischer Schlüssel eines Coop-Weins (die Coop-URL)."""
+    return ("coop:" + urls.astype("string").str.strip().fillna("")).to_numpy(dtype=object)
+
+
+def build_retailer_coverage(
+    df_coop: pd.DataFrame,
+    df_fp: pd.DataFrame,
+    df_matching: pd.DataFrame,
+    non_match_status_value: str = "Kein Match",
+    valid_match_statuses: tuple = None,
+    require_equal_keys: bool = True,
+    weitere_haendler: dict = None,
+) -> RetailerCoverage:
+    """
+    Baut die Bitset-Abdeckung für Coop, Flaschenpost und optional weitere Händler.
+    Kanonischer Schlüssel ist die Coop-URL; FP-Weine mit echtem Match (gleiche Status-Regel wie compute_gap_index)
+    erhalten den Schlüssel ihres Coop-Gegenstücks, alle anderen einen eigenen ('fp:<SKU>').
+    Jedes echte Match-Paar setzt das Coop- und das FP-Bit seines Coop-Schlüssels, die Coop- und FP-Masken
+    entsprechen damit compute_gap_index bzw. compute_reverse_gap_index.
+    weitere_haendler: Name -> DataFrame mit 'ID' und optional 'Coop_URL'/'FP_Sku' (Matching des Händlers auf Coop bzw. FP);
+    ohne Match erhält ein Wein den Schlüssel '<Name>:<ID>'.
+    """
+    echte_matches = _echte_matches(df_matching, "Match_Status", non_match_status_value, valid_match_statuses, require_equal_keys)
+    echte_matches = echte_matches & df_matching["Coop_URL"].notna().to_numpy() & df_matching["FP_Sku"].notna().to_numpy()
+    paar_schluessel = coop_schluessel(df_matching["Coop_URL"])[echte_matches]
+    paar_skus = _normalize_skus(df_matching["FP_Sku"])[echte_matches]
+    sku_zu_schluessel = pd.Series(paar_schluessel, index=paar_skus, dtype=object)
+    sku_zu_schluessel = sku_zu_schluessel[~sku_zu_schluessel.index.duplicated()]
+
+    fp_skus = pd.Series(_normalize_skus(df_fp["Sku"]), index=df_fp.index)
+    fp_zeilen = fp_skus.map(sku_zu_schluessel).fillna("fp:" + fp_skus).to_numpy(dtype=object)
+
+    haendler = {
+        HAENDLER_COOP: (coop_schluessel(df_coop["URL"]), paar_schluessel),
+        HAENDLER_FP: (fp_zeilen, paar_schluessel),
+    }
+    fp_sku_zu_schluessel = pd.Series(fp_zeilen, index=fp_skus.to_numpy())
+    fp_sku_zu_schluessel = fp_sku_zu_schluessel[~fp_sku_zu_schluessel.index.duplicated()]
+    for name, df_haendler in (weitere_haendler or {}).items():
+        schluessel = name + ":" + df_haendler["ID"].astype("string").str.strip().fillna("").astype(object)
+        if "FP_Sku" in df_haendler:
+            ueber_fp = pd.Series(_normalize_skus(df_haendler["FP_Sku"]), index=df_haendler.index).map(fp_sku_zu_schluessel)
+            schluessel = ueber_fp.where(df_haendler["FP_Sku"].notna()).fillna(schluessel)
+        if "Coop_URL" in df_haendler:
+            ueber_coop = pd.Series(coop_schluessel(df_haendler["Coop_URL"]), index=df_haendler.index)
+            schluessel = ueber_coop.where(df_haendler["Coop_URL"].notna(), schluessel)
+        haendler[name] = (schluessel.to_numpy(dtype=object), None)
+    return RetailerCoverage(haendler)
+
+
+@st.cache_resource(max_entries=8)
+def get_retailer_coverage(_df_coop, _df_fp, _df_matching, coop_version, fp_version, matching_version,
+                          status_rule: tuple = ("Kein Match", None, True),
+                          _weitere_haendler: dict = None, weitere_versionen: tuple = ()):
+    """
+    Gecachte Händler-Abdeckung, Schlüssel: (Coop-, FP-, Matching-Datenversion, Status-Regel, weitere Händler).
+    weitere_versionen: ((Name, Datenversion), ...) passend zu _weitere_haendler (siehe build_retailer_coverage).
+    """
+    non_match_status_value, valid_match_statuses, require_equal_keys = status_rule
+    return build_retailer_coverage(
+        _df_coop, _df_fp, _df_matching,
+        non_match_status_value=non_match_status_value,
+        valid_match_statuses=valid_match_statuses,
+        require_equal_keys=require_equal_keys,
+        weitere_haendler=_weitere_haendler,
+    )
+
+
+@st.cache_resource(max_entries=16)
+def get_gap_index(_coverage: RetailerCoverage, _df_matching, coverage_version: tuple, gap_regel: tuple) -> GapIndex:
+    """
+    Gecachter Gap-Index einer Händler-Kombination, Schlüssel: (Version der Abdeckung, gap_regel).
+    coverage_version: die Versionen, mit denen _coverage aus get_retailer_coverage geholt wurde;
+    gap_regel = (Status-Regel, Basis, fehlt_bei, vorhanden_bei) mit Tupeln für die Händlerlisten.
+    Für die Basis Coop wird matching_gap_mask auf die Zeilen von _df_matching ausgerichtet.
+    """
+    _, basis, fehlt_bei, vorhanden_bei = gap_regel
+    matching_schluessel = coop_schluessel(_df_matching["Coop_URL"]) if basis == HAENDLER_COOP else None
+    return _coverage.gap_index(basis, list(fehlt_bei), list(vorhanden_bei), matching_schluessel=matching_schluessel)
@@ -0,0 +1,116 @@
+# gap_opportunity.py
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from gap_comparison import default_preisklassen
+from gap_engine import GapIndex
+from regionen import fp_land, split_region
+from sortiment_cube import preisklassen
+
+# Gewichte der Teil-Scores (Summe 1.0); jeder Teil-Score liegt zwischen 0 und 1
+OPPORTUNITY_GEWICHTE = {
+    "Score_Preisband": 0.2,       # Preisband bei FP im Verhältnis zu Coop schwach besetzt
+    "Score_Region": 0.3,          # Herkunftsland bei FP im Verhältnis zu Coop schwach besetzt
+    "Score_Produzent": 0.3,       # Produzent bei FP nicht gelistet (ProduzentenIndex)
+    "Score_Preisposition": 0.2,   # Coop-Preis liegt im Kernbereich der FP-Preise desselben Weintyps
+}
+NEUTRAL = 0.5  # Teil-Score, wenn die Information fehlt
+
+
+def _untervertretung(coop_kategorie: pd.Series, fp_kategorie: pd.Series) -> pd.Series:
+    """
+    Je Kategorie: Anteil im Coop-Sortiment / (Anteil Coop + Anteil FP).
+    0.5 = gleich stark vertreten, gegen 1 = bei FP (relativ) kaum vorhanden.
+    """
+    anteile = pd.concat([coop_kategorie.value_counts(normalize=True), fp_kategorie.value_counts(normalize=True)],
+                        axis=1, keys=["coop", "fp"]).fillna(0.0)
+    summe = anteile["coop"] + anteile["fp"]
+    return (anteile["coop"] / summe).where(summe > 0, NEUTRAL)
+
+
+def _preisposition(preise: pd.Series, weintypen: pd.Series, df_fp: pd.DataFrame) -> pd.Series:
+    """Perzentil des Preises in der FP-Preisverteilung desselben Weintyps, als Score 1 - |2p - 1| (Median = 1)."""
+    score = pd.Series(NEUTRAL, index=preise.index, dtype=float)
+    fp_preise = pd.to_numeric(df_fp["Preis"], errors="coerce")
+    for weintyp, fp_gruppe in fp_preise.groupby(df_fp["Weintyp"]):
+        sortiert = np.sort(fp_gruppe.dropna().to_numpy())
+        maske = (weintypen == weintyp).to_numpy() & preise.notna().to_numpy()
+        if len(sortiert) == 0 or not maske.any():
+            continue
+        perzentil = np.searchsorted(sortiert, preise.to_numpy()[maske], side="right") / len(sortiert)
+        score.iloc[np.flatnonzero(maske)] = 1.0 - np.abs(2.0 * perzentil - 1.0)
+    return score
+
+
+class OpportunityScores:
+    """
+    Opportunity-Score (0-100) für jede Sortimentslücke, einmal pro Datenversion berechnet.
+    - scores: DataFrame, Index = Index der Gap-Zeilen im Coop-DataFrame, Teil-Scores, 'Opportunity_Score' und 'Rang'
+    - reihenfolge: Gap-Index-Labels absteigend nach Score (vorsortiert für die Top-N-Ansicht)
+    """
+
+    def __init__(self, scores: pd.DataFrame):
+        self.scores = scores
+        self.reihenfolge = scores.index[np.argsort(-scores["Opportunity_Score"].to_numpy(), kind="stable")]
+
+    def __len__(self):
+        return len(self.scores)
+
+    def top_n(self, auswahl: pd.Index, n: int) -> pd.Index:
+        """Die n Gap-Labels mit dem höchsten Score innerhalb der Auswahl (z.B. der aktuell gefilterten Zeilen)."""
+        in_auswahl = self.reihenfolge.isin(auswahl)
+        return self.reihenfolge[in_auswahl][:n]
+
+
+def compute_opportunity_scores(
+    df_coop: pd.DataFrame,
+    df_fp: pd.DataFrame,
+    gap_index: GapIndex,
+    produzenten_index=None,
+    gewichte: dict = None,
+) -> OpportunityScores:
+    """
+    Berechnet die Teil-Scores für alle Gap-Weine in einem vektorisierten Durchlauf:
+    Preisband- und Länder-Untervertretung bei FP (relativ zum Coop-Sortiment), fehlender Produzent bei FP
+    und Preisposition innerhalb der FP-Preise desselben Weintyps. Der Gesamtscore ist die gewichtete Summe * 100.
+    """
+    gewichte = gewichte or OPPORTUNITY_GEWICHTE
+    gaps = df_coop[gap_index.gap_mask]
+    coop_preise = pd.to_numeric(df_coop["Preis"], errors="coerce")
+    fp_preise = pd.to_numeric(df_fp["Preis"], errors="coerce")
+    scores = pd.DataFrame(index=gaps.index)
+
+    # Preisband: dieselben Preisklassen wie im Vergleich (Expander 2)
+    bins, labels = default_preisklassen(max(coop_preise.max(), fp_preise.max()))
+    coop_band = preisklassen(coop_preise, bins, labels).astype(object)
+    fp_band = preisklassen(fp_preise, bins, labels).astype(object)
+    band_score = _untervertretung(coop_band.dropna(), fp_band.dropna())
+    scores["Score_Preisband"] = coop_band[gap_index.gap_mask].map(band_score).astype(float).fillna(NEUTRAL)
+
+    # Region: Land-Ebene, da die FP-Subregionen ('Land > Region') nicht auf die Coop-Hauptregionen abbilden
+    coop_land = split_region(df_coop["Region"])["Land"] if "Region" in df_coop else pd.Series("Unbekannt", index=df_coop.index)
+    land_score = _untervertretung(coop_land, fp_land(df_fp["Herkunft"]) if "Herkunft" in df_fp else pd.Series(dtype=object))
+    scores["Score_Region"] = coop_land[gap_index.gap_mask].map(land_score).astype(float).fillna(NEUTRAL)
+
+    # Produzent: 1, wenn der Produzent bei FP nicht (ausreichend ähnlich) gelistet ist; ohne Produzent neutral
+    if produzenten_index is not None and "Produzent" in gaps:
+        produzenten = gaps["Produzent"].fillna("").astype(str)
+        bei_fp = produzenten_index.lookup_batch(produzenten)["Bei_FP"].to_numpy()
+        scores["Score_Produzent"] = np.where(produzenten.str.strip().ne("").to_numpy(), (~bei_fp).astype(float), NEUTRAL)
+    else:
+        scores["Score_Produzent"] = NEUTRAL
+
+    scores["Score_Preisposition"] = _preisposition(coop_preise[gap_index.gap_mask], gaps["Weintyp"], df_fp)
+
+    gesamt = sum(scores[spalte] * gewicht for spalte, gewicht in gewichte.items())
+    scores["Opportunity_Score"] = (gesamt * 100).round(1)
+    scores["Rang"] = scores["Opportunity_Score"].rank(ascending=False, method="first").astype(int)
+    return OpportunityScores(scores)
+
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def get_opportunity_scores(_df_coop, _df_fp, _gap_index, _produzenten_index, coop_version, matching_version, fp_version,
+                           status_rule: tuple = ("Kein Match", None, True)):
+    """Gecachte Opportunity-Scores, Schlüssel: (Coop-, Matching-, FP-Datenversion, Status-Regel)."""
+    return compute_opportunity_scores(_df_coop, _df_fp, _gap_index, _produzenten_index)
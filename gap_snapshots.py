@@ -0,0 +1,248 @@
+# gap_snapshots.py
+import argparse
+import glob
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from gap_engine import GapIndex
+
+# Definiere Dateipfade (relativ zum Skript)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+SNAPSHOT_DIR = os.path.join(DATA_DIR, "gap_snapshots")
+
+COOP_FILE = os.path.join(DATA_DIR, "coop_weine_kombiniert.xlsx")
+FP_FILE = os.path.join(DATA_DIR, "flaschenpost_weine.xlsx")
+MATCHING_FILE = os.path.join(DATA_DIR, "manuelle_matches_final2.xlsx")
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+# Zustand eines Coop-Weins in einem Snapshot
+ZUSTAND_FEHLT = -1   # nicht (mehr) im Coop-Sortiment
+ZUSTAND_GEDECKT = 0  # bei FP gematcht
+ZUSTAND_LUECKE = 1   # Sortimentslücke
+
+# Datenversionen, die einen Gap-Stand bestimmen (App und CLI legen nur diese ab und hashen nur diese)
+SNAPSHOT_VERSIONEN = ("coop", "fp", "matching", "decisions")
+
+TREND_SPALTEN = ["Stichtag", "Lücken", "Neu", "Geschlossen", "Entfallen", "Bestehend"]
+
+
+class GapSnapshot:
+    """
+    Gespeicherter Gap-Stand: stabile Schlüssel (Coop-URLs) und die Gap-Maske darüber als Bitset.
+    - stichtag: pd.Timestamp des Snapshots
+    - schluessel: np.ndarray (str) der Coop-URLs im damaligen Sortiment
+    - luecken: bool-Array, ausgerichtet auf schluessel (True = Lücke)
+    - versionen: Datenversionen (Coop, FP, Matching, Entscheidungen), aus denen der Stand berechnet wurde
+    """
+
+    def __init__(self, stichtag, schluessel, luecken, versionen: dict = None, pfad: str = None):
+        self.stichtag = pd.Timestamp(stichtag)
+        self.schluessel = np.asarray(schluessel, dtype=str)
+        self.luecken = np.asarray(luecken, dtype=bool)
+        self.versionen = versionen or {}
+        self.pfad = pfad
+
+    def __len__(self):
+        return len(self.schluessel)
+
+    @property
+    def n_luecken(self):
+        return int(self.luecken.sum())
+
+
+def snapshot_versionen(versionen: dict) -> dict:
+    """Die für den Gap-Stand relevanten Datenversionen (SNAPSHOT_VERSIONEN) aus einem Versions-Dict, z.B. data_versions der App."""
+    return {k: (versionen or {}).get(k) for k in SNAPSHOT_VERSIONEN}
+
+
+def _versions_hash(versionen: dict) -> str:
+    roh = json.dumps({"format": SNAPSHOT_FORMAT_VERSION, **{k: str(v) for k, v in snapshot_versionen(versionen).items()}})
+    return hashlib.sha1(roh.encode("utf-8")).hexdigest()[:12]
+
+
+def snapshot_from_gap_index(df_coop: pd.DataFrame, gap_index: GapIndex, versionen: dict = None, stichtag=None,
+                            coop_id_col: str = "URL") -> GapSnapshot:
+    """Snapshot aus einem berechneten Gap-Index (eine Zeile pro eindeutiger Coop-URL)."""
+    schluessel = df_coop[coop_id_col].astype("string").str.strip().fillna("").to_numpy(dtype=str)
+    eindeutig = ~pd.Series(schluessel).duplicated().to_numpy() & (schluessel != "")
+    return GapSnapshot(stichtag if stichtag is not None else pd.Timestamp.now(),
+                       schluessel[eindeutig], np.asarray(gap_index.gap_mask, dtype=bool)[eindeutig],
+                       snapshot_versionen(versionen) if versionen else None)
+
+
+def save_gap_snapshot(snapshot: GapSnapshot, verzeichnis: str = SNAPSHOT_DIR, ueberschreiben: bool = False):
+    """
+    Speichert den Snapshot als komprimierte .npz-Datei (Schlüssel + per np.packbits gepackte Gap-Bits).
+    Pro Datenstand (Hash der Versionen) gibt es nur einen Snapshot; gibt den Pfad zurück bzw. None,
+    wenn dieser Stand bereits gespeichert ist.
+    """
+    versions_hash = _versions_hash(snapshot.versionen)
+    if not ueberschreiben and glob.glob(os.path.join(verzeichnis, f"gaps_*_{versions_hash}.npz")):
+        return None
+    os.makedirs(verzeichnis, exist_ok=True)
+    pfad = os.path.join(verzeichnis, f"gaps_{snapshot.stichtag:%Y%m%d_%H%M%S}_{versions_hash}.npz")
+    with open(pfad + ".tmp", "wb") as f:
+        np.savez_compressed(
+            f,
+            format_version=np.array(SNAPSHOT_FORMAT_VERSION),
+            stichtag=np.array(snapshot.stichtag.isoformat()),
+            versionen=np.array(json.dumps({k: str(v) for k, v in snapshot.versionen.items()})),
+            schluessel=snapshot.schluessel,
+            luecken_bits=np.packbits(snapshot.luecken),
+            anzahl=np.array(len(snapshot)),
+        )
+    os.replace(pfad + ".tmp", pfad)
+    snapshot.pfad = pfad
+    return pfad
+
+
+def load_gap_snapshot(pfad: str) -> GapSnapshot:
+    with np.load(pfad, allow_pickle=False) as daten:
+        anzahl = int(daten["anzahl"])
+        return GapSnapshot(
+            str(daten["stichtag"]), daten["schluessel"],
+            np.unpackbits(daten["luecken_bits"], count=anzahl).astype(bool),
+            json.loads(str(daten["versionen"])), pfad,
+        )
+
+
+def load_gap_snapshots(verzeichnis: str = SNAPSHOT_DIR) -> list:
+    """Alle Snapshots des Verzeichnisses, nach Stichtag sortiert (defekte Dateien werden übersprungen)."""
+    snapshots = []
+    for pfad in glob.glob(os.path.join(verzeichnis, "gaps_*.npz")):
+        try:
+            snapshots.append(load_gap_snapshot(pfad))
+        except (OSError, ValueError, KeyError):
+            continue
+    return sorted(snapshots, key=lambda s: s.stichtag)
+
+
+def snapshot_dir_version(verzeichnis: str = SNAPSHOT_DIR) -> tuple:
+    """Version des Snapshot-Verzeichnisses (Dateinamen + Änderungszeiten) für den Cache-Schlüssel."""
+    dateien = sorted(glob.glob(os.path.join(verzeichnis, "gaps_*.npz")))
+    return tuple((os.path.basename(p), os.path.getmtime(p)) for p in dateien)
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def get_gap_snapshots(verzeichnis: str = SNAPSHOT_DIR, verzeichnis_version: tuple = ()) -> list:
+    """Gecachte Snapshots; verzeichnis_version (snapshot_dir_version) invalidiert den Cache bei neuen Dateien."""
+    return load_gap_snapshots(verzeichnis)
+
+
+def ist_gespeichert(snapshot: GapSnapshot, snapshots: list) -> bool:
+    """True, wenn derselbe Datenstand (Versionen) bereits unter den Snapshots ist."""
+    versions_hash = _versions_hash(snapshot.versionen)
+    return any(s.versionen and _versions_hash(s.versionen) == versions_hash for s in snapshots)
+
+
+def zustands_matrix(snapshots: list):
+    """
+    Zustände aller Snapshots über die Vereinigung der Schlüssel: int8-Matrix (Snapshots x Schlüssel)
+    mit ZUSTAND_FEHLT / ZUSTAND_GEDECKT / ZUSTAND_LUECKE, dazu der gemeinsame Schlüssel-Index.
+    """
+    alle = pd.Index(pd.unique(np.concatenate([s.schluessel for s in snapshots]))) if snapshots else pd.Index([])
+    matrix = np.full((len(snapshots), len(alle)), ZUSTAND_FEHLT, dtype=np.int8)
+    for i, snapshot in enumerate(snapshots):
+        matrix[i, alle.get_indexer(snapshot.schluessel)] = snapshot.luecken.astype(np.int8)
+    return matrix, alle
+
+
+def diff_gap_snapshots(alt: GapSnapshot, neu: GapSnapshot) -> pd.DataFrame:
+    """
+    Vergleich zweier Snapshots über die Coop-URL: eine Zeile pro Schlüssel, der in mindestens einem
+    der beiden eine Lücke ist. Status: 'Neu' (jetzt Lücke, vorher gedeckt oder nicht im Sortiment),
+    'Geschlossen' (vorher Lücke, jetzt bei FP gematcht), 'Entfallen' (vorher Lücke, nicht mehr bei Coop), 'Bestehend'.
+    """
+    matrix, alle = zustands_matrix([alt, neu])
+    vorher, jetzt = matrix[0], matrix[1]
+    status = np.select(
+        [(vorher == ZUSTAND_LUECKE) & (jetzt == ZUSTAND_LUECKE),
+         (vorher != ZUSTAND_LUECKE) & (jetzt == ZUSTAND_LUECKE),
+         (vorher == ZUSTAND_LUECKE) & (jetzt == ZUSTAND_GEDECKT),
+         (vorher == ZUSTAND_LUECKE) & (jetzt == ZUSTAND_FEHLT)],
+        ["Bestehend", "Neu", "Geschlossen", "Entfallen"], default="",
+    )
+    relevant = status != ""
+    return pd.DataFrame({"Coop_URL": alle[relevant], "Status": status[relevant]})
+
+
+def gap_trend(snapshots: list) -> pd.DataFrame:
+    """Anzahl Lücken je Snapshot und Übergänge zum jeweils vorherigen Snapshot, vektorisiert über die Zustandsmatrix."""
+    if not snapshots:
+        return pd.DataFrame(columns=TREND_SPALTEN)
+    matrix, _ = zustands_matrix(snapshots)
+    luecke = matrix == ZUSTAND_LUECKE
+    vorher, jetzt = luecke[:-1], luecke[1:]
+    trend = pd.DataFrame({
+        "Stichtag": [s.stichtag for s in snapshots],
+        "Lücken": luecke.sum(axis=1),
+        "Neu": np.r_[0, (~vorher & jetzt).sum(axis=1)],
+        "Geschlossen": np.r_[0, (vorher & (matrix[1:] == ZUSTAND_GEDECKT)).sum(axis=1)],
+        "Entfallen": np.r_[0, (vorher & (matrix[1:] == ZUSTAND_FEHLT)).sum(axis=1)],
+        "Bestehend": np.r_[0, (vorher & jetzt).sum(axis=1)],
+    })
+    return trend[TREND_SPALTEN]
+
+
+def _aktueller_snapshot(stichtag=None) -> GapSnapshot:
+    """Berechnet den Gap-Stand aus den aktuellen Dateien (wie die App: Match-Schlüssel und manuelle Entscheidungen)."""
+    from data_loading import add_match_keys, add_matching_keys, data_version
+    from gap_engine import compute_gap_index
+    from match_decisions import MatchDecisionStore, apply_decisions, DECISIONS_FILE
+
+    df_coop = add_match_keys(pd.read_excel(COOP_FILE))
+    df_matching = apply_decisions(add_matching_keys(pd.read_excel(MATCHING_FILE)), MatchDecisionStore(DECISIONS_FILE))
+    versionen = snapshot_versionen({"coop": data_version(COOP_FILE), "fp": data_version(FP_FILE),
+                                    "matching": data_version(MATCHING_FILE), "decisions": data_version(DECISIONS_FILE)})
+    return snapshot_from_gap_index(df_coop, compute_gap_index(df_coop, df_matching), versionen, stichtag)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gap-Snapshots speichern und Veränderungen der Sortimentslücken auswerten.")
+    parser.add_argument("befehl", choices=["speichern", "trend", "diff"],
+                        help="speichern: aktuellen Stand ablegen | trend: Verlauf aller Snapshots | diff: letzte zwei Snapshots vergleichen")
+    parser.add_argument("--verzeichnis", default=SNAPSHOT_DIR, help="Ablage der Snapshots (.npz)")
+    parser.add_argument("--stichtag", default=None, help="Stichtag für 'speichern' (z.B. 2025-05-31), Standard: jetzt")
+    parser.add_argument("--csv", default=None, help="Ergebnis von 'trend'/'diff' zusätzlich als CSV speichern")
+    args = parser.parse_args()
+
+    if args.befehl == "speichern":
+        try:
+            snapshot = _aktueller_snapshot(args.stichtag)
+        except FileNotFoundError as e:
+            print(f"FEHLER: Datei nicht gefunden: {e.filename}")
+            return
+        pfad = save_gap_snapshot(snapshot, args.verzeichnis)
+        if pfad is None:
+            print("Dieser Datenstand ist bereits als Snapshot gespeichert.")
+        else:
+            print(f"Snapshot gespeichert: {pfad} ({len(snapshot)} Coop-Weine, {snapshot.n_luecken} Lücken)")
+        return
+
+    snapshots = load_gap_snapshots(args.verzeichnis)
+    print(f"{len(snapshots)} Snapshots in {args.verzeichnis}")
+    if args.befehl == "trend":
+        ergebnis = gap_trend(snapshots)
+        print(ergebnis.to_string(index=False))
+    else:
+        if len(snapshots) < 2:
+            print("WARNUNG: Für einen Vergleich werden mindestens zwei Snapshots benötigt.")
+            return
+        alt, neu = snapshots[-2], snapshots[-1]
+        ergebnis = diff_gap_snapshots(alt, neu)
+        print(f"Vergleich {alt.stichtag:%Y-%m-%d %H:%M} -> {neu.stichtag:%Y-%m-%d %H:%M}:")
+        print(ergebnis["Status"].value_counts().to_string())
+    if args.csv:
+        ergebnis.to_csv(args.csv, index=False, sep=";", encoding="utf-8-sig")
+        print(f"CSV gespeichert: {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
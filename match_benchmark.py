@@ -0,0 +1,157 @@
+# match_benchmark.py
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from matcher import (
+    match_sortimente,
+    block_keys,
+    ensure_match_keys,
+    PreisBlockIndex,
+    DEFAULT_PREIS_TOLERANZ_PCT,
+    DEFAULT_BLOCK_COLS,
+    AUTO_MATCH_SCHWELLE,
+)
+from merge import normalize_sku
+
+# Definiere Dateipfade (relativ zum Skript)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+
+COOP_FILE = os.path.join(DATA_DIR, "coop_weine_kombiniert.xlsx")
+FP_FILE = os.path.join(DATA_DIR, "flaschenpost_weine.xlsx")
+MATCHING_FILE = os.path.join(DATA_DIR, "manuelle_matches_final2.xlsx")
+
+MANUELL_SCORE = -1  # Fuzzy_Score == -1: von Hand bestätigtes Paar (Ground Truth)
+DEFAULT_SCHWELLEN = [40, 50, 60, 70, 80, 90]
+
+
+def load_ground_truth(df_matching: pd.DataFrame) -> pd.DataFrame:
+    """Manuell bestätigte Paare (Fuzzy_Score == -1) als DataFrame [Coop_URL, FP_Sku] mit normalisierter SKU."""
+    scores = pd.to_numeric(df_matching["Fuzzy_Score"], errors="coerce")
+    gt = df_matching.loc[scores == MANUELL_SCORE, ["Coop_URL", "FP_Sku"]].copy()
+    gt["FP_Sku"] = normalize_sku(gt["FP_Sku"])
+    return gt.dropna().drop_duplicates(subset=["Coop_URL"])
+
+
+def evaluate_thresholds(ergebnis: pd.DataFrame, ground_truth: pd.DataFrame, schwellen=DEFAULT_SCHWELLEN) -> pd.DataFrame:
+    """
+    Precision/Recall/F1 je Score-Schwelle, gemessen auf den Coop-Weinen der Ground Truth.
+    Ein Paar gilt als vorhergesagt, wenn Bester_Score > Schwelle; korrekt, wenn die FP-SKU der Ground Truth entspricht.
+    """
+    pred = ergebnis[["Coop_URL", "Bester_FP_Sku", "Bester_Score"]].copy()
+    pred["Bester_FP_Sku"] = normalize_sku(pred["Bester_FP_Sku"])
+    df = ground_truth.merge(pred, on="Coop_URL", how="left")
+    df["Bester_Score"] = df["Bester_Score"].fillna(0)
+    treffer = df["Bester_FP_Sku"].eq(df["FP_Sku"])
+
+    zeilen = []
+    for schwelle in schwellen:
+        vorhergesagt = df["Bester_Score"] > schwelle
+        tp = int((vorhergesagt & treffer).sum())
+        n_pred = int(vorhergesagt.sum())
+        precision = tp / n_pred if n_pred else 0.0
+        recall = tp / len(df) if len(df) else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if (precision + recall) else 0.0
+        zeilen.append({
+            "Schwelle": schwelle,
+            "Vorhergesagt": n_pred,
+            "Korrekt": tp,
+            "Precision": round(precision, 3),
+            "Recall": round(recall, 3),
+            "F1": round(f1, 3),
+        })
+    return pd.DataFrame(zeilen)
+
+
+def prefilter_recall(df_coop, df_fp, ground_truth, index: PreisBlockIndex, tol_pct=DEFAULT_PREIS_TOLERANZ_PCT, tol_chf=None) -> pd.DataFrame:
+    """Prüft je Ground-Truth-Paar, ob die richtige FP-SKU den Vorfilter (Block + Preisfenster) überhaupt passiert."""
+    coop = ensure_match_keys(df_coop, index.block_cols).drop_duplicates(subset=["URL"]).set_index("URL")
+    fp_skus = normalize_sku(df_fp["Sku"]).to_numpy()
+    keys = block_keys(coop, index.block_cols)
+    im_vorfilter = []
+    for url, sku in zip(ground_truth["Coop_URL"], ground_truth["FP_Sku"]):
+        if url not in coop.index:
+            im_vorfilter.append(False)
+            continue
+        key = tuple(keys.loc[url, index.block_cols])
+        kandidaten = index.kandidaten(key, pd.to_numeric(coop.at[url, "Preis"], errors="coerce"), tol_pct, tol_chf)
+        im_vorfilter.append(bool((fp_skus[kandidaten] == sku).any()))
+    return ground_truth.assign(Im_Vorfilter=im_vorfilter)
+
+
+def run_benchmark(df_coop, df_fp, ground_truth, nur_ground_truth=True, schwellen=DEFAULT_SCHWELLEN, **matcher_kwargs):
+    """Führt eine Matcher-Konfiguration aus und liefert (Qualitäts-Tabelle, Status-Verteilung, Laufzeit-Kennzahlen)."""
+    if nur_ground_truth:
+        df_coop = df_coop[df_coop["URL"].isin(ground_truth["Coop_URL"])]
+
+    start = time.perf_counter()
+    index = PreisBlockIndex(df_fp, block_cols=matcher_kwargs.pop("block_cols", DEFAULT_BLOCK_COLS))
+    index_sekunden = time.perf_counter() - start
+    ergebnis, stats = match_sortimente(df_coop, df_fp, index=index, return_stats=True, **matcher_kwargs)
+    wall = time.perf_counter() - start
+
+    qualitaet = evaluate_thresholds(ergebnis, ground_truth, schwellen)
+    vorfilter = prefilter_recall(df_coop, df_fp, ground_truth, index,
+                                 matcher_kwargs.get("tol_pct", DEFAULT_PREIS_TOLERANZ_PCT), matcher_kwargs.get("tol_chf"))
+    status = ergebnis["Match_Status"].value_counts()
+    speed = {
+        "coop_weine": stats["coop_weine"],
+        "paare": stats["paare"],
+        "paare_pro_sekunde": stats["paare"] / stats["sekunden"] if stats["sekunden"] else 0.0,
+        "index_sekunden": index_sekunden,
+        "match_sekunden": stats["sekunden"],
+        "wall_sekunden": wall,
+        "vorfilter_recall": vorfilter["Im_Vorfilter"].mean() if len(vorfilter) else 0.0,
+    }
+    return qualitaet, status, speed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des Matchers gegen die manuell bestätigten Paare (Fuzzy_Score == -1).")
+    parser.add_argument("--tol-pct", type=float, default=DEFAULT_PREIS_TOLERANZ_PCT, help="Relative Preistoleranz (z.B. 0.25 = ±25%%)")
+    parser.add_argument("--tol-chf", type=float, default=None, help="Absolute Preistoleranz in CHF")
+    parser.add_argument("--schwelle", type=float, default=AUTO_MATCH_SCHWELLE, help="Score-Schwelle für Match_Status")
+    parser.add_argument("--schwellen", type=float, nargs="+", default=DEFAULT_SCHWELLEN, help="Schwellen für Precision/Recall")
+    parser.add_argument("--alle", action="store_true", help="Ganzes Coop-Sortiment matchen (Durchsatz-Messung), nicht nur Ground-Truth-Weine")
+    args = parser.parse_args()
+
+    print(f"Lade Daten aus: {DATA_DIR}")
+    try:
+        df_coop = pd.read_excel(COOP_FILE)
+        df_fp = pd.read_excel(FP_FILE, dtype={"Sku": str})
+        df_matching = pd.read_excel(MATCHING_FILE, dtype={"FP_Sku": str})
+    except FileNotFoundError as e:
+        print(f"FEHLER: Datei nicht gefunden: {e.filename}")
+        return
+
+    ground_truth = load_ground_truth(df_matching)
+    print(f"Ground Truth: {len(ground_truth)} manuell bestätigte Paare")
+    if ground_truth.empty:
+        print("WARNUNG: Keine Zeilen mit Fuzzy_Score == -1 gefunden. Abbruch.")
+        return
+
+    qualitaet, status, speed = run_benchmark(
+        df_coop, df_fp, ground_truth,
+        nur_ground_truth=not args.alle,
+        schwellen=args.schwellen,
+        tol_pct=args.tol_pct,
+        tol_chf=args.tol_chf,
+        score_schwelle=args.schwelle,
+    )
+
+    print("\nQualität je Schwelle:")
+    print(qualitaet.to_string(index=False))
+    print(f"\nVorfilter-Recall (richtige SKU unter den Kandidaten): {speed['vorfilter_recall']:.1%}")
+    print("\nVerteilung Match_Status:")
+    print(status.to_string())
+    print("\nGeschwindigkeit:")
+    print(f"  Coop-Weine: {speed['coop_weine']} | bewertete Paare: {speed['paare']}")
+    print(f"  Paare/Sekunde: {speed['paare_pro_sekunde']:,.0f}")
+    print(f"  Index-Aufbau: {speed['index_sekunden']:.2f}s | Matching: {speed['match_sekunden']:.2f}s | Wall: {speed['wall_sekunden']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
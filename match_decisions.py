@@ -0,0 +1,179 @@
+# match_decisions.py
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from merge import normalize_sku
+
+# Definiere Dateipfade (relativ zum Skript)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+DECISIONS_FILE = os.path.join(DATA_DIR, "match_decisions.jsonl")
+
+ENTSCHEIDUNG_BESTAETIGT = "bestätigt"
+ENTSCHEIDUNG_ABGELEHNT = "abgelehnt"
+
+# Bestätigte Paare werden wie die bisherigen Experten-Matches behandelt (Score -1), abgelehnte wie "Kein Match"
+STATUS_MANUELL = "Match (Manuelle SKU)"
+STATUS_KEIN_MATCH = "Kein Match"
+SCORE_MANUELL = -1
+# Bester_Score eines bestätigten Paars im Matcher-Ergebnis: über jeder Schwelle der Namensähnlichkeit (0-100)
+BESTER_SCORE_BESTAETIGT = 100.0
+
+
+def manuell_bestaetigt(df_matching: pd.DataFrame, status_col: str = "Match_Status", score_col: str = "Fuzzy_Score") -> np.ndarray:
+    """bool-Array über die Matching-Zeilen: Paar von Experten oder in der Review-Queue bestätigt (Status bzw. Score -1)."""
+    bestaetigt = np.zeros(len(df_matching), dtype=bool)
+    if status_col in df_matching.columns:
+        bestaetigt |= (df_matching[status_col] == STATUS_MANUELL).to_numpy()
+    if score_col in df_matching.columns:
+        bestaetigt |= (pd.to_numeric(df_matching[score_col], errors="coerce") == SCORE_MANUELL).to_numpy()
+    return bestaetigt
+
+
+def _pair_key(coop_url, fp_sku):
+    return (str(coop_url).strip(), str(fp_sku).strip())
+
+
+class MatchDecisionStore:
+    """
+    Append-only Entscheidungs-Log (JSON-Lines) für manuelle Match-Entscheidungen pro (Coop_URL, FP_Sku).
+    Beim Laden wird ein Dict-Index aufgebaut (letzte Entscheidung gewinnt), Abfragen sind damit O(1) pro Paar.
+    """
+
+    def __init__(self, path: str = DECISIONS_FILE):
+        self.path = path
+        self._index = {}        # (coop_url, fp_sku) -> Eintrag
+        self._bestaetigt = {}   # coop_url -> {fp_sku: None} der bestätigten SKUs in Entscheidungsreihenfolge
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for zeile in f:
+                    zeile = zeile.strip()
+                    if not zeile:
+                        continue
+                    try:
+                        self._index_entry(json.loads(zeile))
+                    except (json.JSONDecodeError, KeyError):
+                        continue  # Defekte Zeile (z.B. abgebrochener Schreibvorgang) überspringen
+
+    def _index_entry(self, eintrag):
+        key = _pair_key(eintrag["coop_url"], eintrag["fp_sku"])
+        self._index[key] = eintrag
+        # Jede Entscheidung zieht die SKU ans Ende bzw. entfernt sie; gültig ist die zuletzt bestätigte, noch nicht abgelehnte
+        skus = self._bestaetigt.setdefault(key[0], {})
+        skus.pop(key[1], None)
+        if eintrag["entscheidung"] == ENTSCHEIDUNG_BESTAETIGT:
+            skus[key[1]] = None
+        elif not skus:
+            del self._bestaetigt[key[0]]
+
+    def __len__(self):
+        return len(self._index)
+
+    def get(self, coop_url, fp_sku):
+        """Letzte Entscheidung für das Paar ('bestätigt' / 'abgelehnt') oder None."""
+        eintrag = self._index.get(_pair_key(coop_url, fp_sku))
+        return eintrag["entscheidung"] if eintrag else None
+
+    def bestaetigte_sku(self, coop_url):
+        """FP-SKU, die für diesen Coop-Wein zuletzt bestätigt (und seither nicht abgelehnt) wurde, oder None."""
+        skus = self._bestaetigt.get(str(coop_url).strip())
+        return next(reversed(skus)) if skus else None
+
+    def record(self, coop_url, fp_sku, entscheidung, user=None):
+        """Hängt eine Entscheidung an das Log an und aktualisiert den Index."""
+        if entscheidung not in (ENTSCHEIDUNG_BESTAETIGT, ENTSCHEIDUNG_ABGELEHNT):
+            raise ValueError(f"Unbekannte Entscheidung: {entscheidung}")
+        coop_url, fp_sku = _pair_key(coop_url, normalize_sku(pd.Series([fp_sku])).iat[0])
+        eintrag = {
+            "coop_url": coop_url,
+            "fp_sku": fp_sku,
+            "entscheidung": entscheidung,
+            "zeitpunkt": pd.Timestamp.now().isoformat(timespec="seconds"),
+        }
+        if user:
+            eintrag["user"] = user
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(eintrag, ensure_ascii=False) + "\n")
+        self._index_entry(eintrag)
+        return eintrag
+
+    def decision_series(self, coop_urls: pd.Series, fp_skus: pd.Series) -> pd.Series:
+        """Entscheidung je Zeile (None, falls keine) – ein Dict-Lookup pro Paar."""
+        skus = normalize_sku(fp_skus)
+        werte = [self._index.get(_pair_key(u, s), {}).get("entscheidung") for u, s in zip(coop_urls, skus)]
+        return pd.Series(werte, index=coop_urls.index, dtype=object)
+
+
+def apply_decisions(df_matching: pd.DataFrame, store: MatchDecisionStore,
+                    coop_url_col: str = "Coop_URL", fp_sku_col: str = "FP_Sku") -> pd.DataFrame:
+    """
+    Überträgt die gespeicherten Entscheidungen auf das Matching-DataFrame:
+    bestätigt -> Match_Status 'Match (Manuelle SKU)', Fuzzy_Score -1; abgelehnt -> 'Kein Match', Fuzzy_Score 0.
+    Gibt eine Kopie mit zusätzlicher Spalte 'Entscheidung' zurück.
+    """
+    df = df_matching.copy()
+    if len(store) == 0 or coop_url_col not in df.columns or fp_sku_col not in df.columns:
+        df["Entscheidung"] = None
+        return df
+
+    entscheidung = store.decision_series(df[coop_url_col], df[fp_sku_col])
+    df["Entscheidung"] = entscheidung
+    bestaetigt = (entscheidung == ENTSCHEIDUNG_BESTAETIGT).to_numpy()
+    abgelehnt = (entscheidung == ENTSCHEIDUNG_ABGELEHNT).to_numpy()
+    if "Match_Status" in df.columns:
+        df.loc[bestaetigt, "Match_Status"] = STATUS_MANUELL
+        df.loc[abgelehnt, "Match_Status"] = STATUS_KEIN_MATCH
+    if "Fuzzy_Score" in df.columns:
+        df["Fuzzy_Score"] = pd.to_numeric(df["Fuzzy_Score"], errors="coerce")
+        df.loc[bestaetigt, "Fuzzy_Score"] = SCORE_MANUELL
+        df.loc[abgelehnt, "Fuzzy_Score"] = 0
+    return df
+
+
+def apply_decisions_to_matcher_result(ergebnis: pd.DataFrame, df_fp: pd.DataFrame, store: MatchDecisionStore) -> pd.DataFrame:
+    """
+    Entscheidungen auf ein Ergebnis von matcher.match_sortimente anwenden: abgelehnte Paare fallen auf 'Kein Match',
+    für Coop-Weine mit bestätigter SKU wird diese SKU (samt FP-Spalten) eingesetzt.
+    Bester_FP_Sku / Bester_Score (Basis von match_benchmark) folgen denselben Entscheidungen: ein abgelehnter bester
+    Kandidat zählt nicht mehr als Vorschlag, eine bestätigte SKU wird mit BESTER_SCORE_BESTAETIGT vorgeschlagen.
+    """
+    if len(store) == 0:
+        return ergebnis
+    df = apply_decisions(ergebnis, store)
+    # SKU-Spalten des Matchers sind numerisch (NaN ohne Kandidat); bestätigte SKUs werden normalisiert als Text eingesetzt
+    for col in ("FP_Sku", "Bester_FP_Sku"):
+        if col in df.columns:
+            df[col] = df[col].astype(object)
+    if "Bester_FP_Sku" in df.columns:
+        bester_abgelehnt = (store.decision_series(df["Coop_URL"], df["Bester_FP_Sku"]) == ENTSCHEIDUNG_ABGELEHNT).to_numpy()
+        df.loc[bester_abgelehnt, "Bester_FP_Sku"] = pd.NA
+        if "Bester_Score" in df.columns:
+            df.loc[bester_abgelehnt, "Bester_Score"] = 0.0
+    fp_spalten = {"FP_Name": "Name", "FP_Produzent": "Produzent", "FP_Jahrgang": "Jahrgang",
+                  "FP_Herkunft": "Herkunft", "FP_Preis": "Preis", "FP_Weintyp": "Weintyp"}
+    for col in ["FP_Sku", *fp_spalten]:
+        if col in df.columns:
+            df.loc[df["Entscheidung"] == ENTSCHEIDUNG_ABGELEHNT, col] = pd.NA
+
+    sku_pos = pd.Series(np.arange(len(df_fp)), index=normalize_sku(df_fp["Sku"]))
+    sku_pos = sku_pos[~sku_pos.index.duplicated()]
+    for i, url in zip(df.index, df["Coop_URL"]):
+        sku = store.bestaetigte_sku(url)
+        if sku is None or sku not in sku_pos.index:
+            continue
+        pos = sku_pos[sku]
+        df.at[i, "FP_Sku"] = sku
+        if "Bester_FP_Sku" in df.columns:
+            df.at[i, "Bester_FP_Sku"] = sku
+            df.at[i, "Bester_Score"] = BESTER_SCORE_BESTAETIGT
+        for ziel, quelle in fp_spalten.items():
+            if quelle in df_fp.columns:
+                df.at[i, ziel] = df_fp[quelle].iat[pos]
+        df.at[i, "Match_Status"] = STATUS_MANUELL
+        df.at[i, "Fuzzy_Score"] = SCORE_MANUELL
+        df.at[i, "Entscheidung"] = ENTSCHEIDUNG_BESTAETIGT
+    return df
@@ -0,0 +1,253 @@
+# matcher.py
+import time
+from difflib import SequenceMatcher
+
+import numpy as np
+import pandas as pd
+
+from normalization import normalize_wein_text
+from data_loading import add_match_keys, add_matching_keys
+from match_decisions import apply_decisions_to_matcher_result
+
+# --- Vorfilter-Parameter ---
+# "Ähnlicher Preis": relative Toleranz (Anteil vom Coop-Preis) und/oder absolute Toleranz in CHF.
+# Sind beide gesetzt, gilt das breitere Preisfenster.
+DEFAULT_PREIS_TOLERANZ_PCT = 0.25
+DEFAULT_PREIS_TOLERANZ_CHF = None
+DEFAULT_BLOCK_COLS = ("Jahrgang_Key", "Flasche_cl", "Weintyp")  # exakte Schlüssel, siehe data_loading.add_match_keys
+MATCH_KEY_COLS = ("Jahrgang_Key", "Flasche_cl")
+AUTO_MATCH_SCHWELLE = 50  # Score > 50 gilt als automatischer Match-Kandidat (siehe plot_matching_overview_gemini)
+
+OHNE_JAHRGANG = 0  # Block-Schlüssel für fehlenden Jahrgang
+
+STATUS_MATCH = "Match"
+STATUS_KEIN_MATCH = "Kein Match"
+
+
+def block_keys(df: pd.DataFrame, block_cols) -> pd.DataFrame:
+    """Normalisiert die Block-Spalten (Jahrgang als Integer, fehlend = OHNE_JAHRGANG; Text gestrippt), damit Coop und FP exakt vergleichbar sind."""
+    keys = pd.DataFrame(index=df.index)
+    for col in block_cols:
+        if col not in df.columns:
+            keys[col] = 0
+        elif "jahrgang" in col.lower() or col.lower().endswith("_cl") or pd.api.types.is_numeric_dtype(df[col]):
+            keys[col] = pd.to_numeric(df[col], errors="coerce").fillna(OHNE_JAHRGANG).astype("int64")
+        else:
+            keys[col] = df[col].astype(str).str.strip()
+    return keys
+
+
+def ensure_match_keys(df: pd.DataFrame, block_cols) -> pd.DataFrame:
+    """Ergänzt Jahrgang_Key/Flasche_cl, falls als Block-Spalte verlangt, aber (noch) nicht geladen."""
+    if any(col in MATCH_KEY_COLS and col not in df.columns for col in block_cols):
+        df = add_match_keys(df.copy())
+    return df
+
+
+def sequence_ratio_scores(query_text: str, candidate_texts) -> np.ndarray:
+    """
+    Standard-Namensscorer: difflib-Ähnlichkeit (0-100) des Coop-Texts gegen jeden Kandidaten-Text.
+    Kandidaten, deren obere Schranke (real_quick_ratio/quick_ratio) den bisher besten Score nicht
+    übertreffen kann, werden übersprungen und mit 0 bewertet – das Maximum bleibt dadurch exakt.
+    """
+    matcher = SequenceMatcher(autojunk=False)
+    matcher.set_seq2(query_text)  # seq2 wird von SequenceMatcher vorverarbeitet und gecacht
+    scores = np.zeros(len(candidate_texts), dtype=float)
+    bester = -1.0
+    for i, text in enumerate(candidate_texts):
+        matcher.set_seq1(text)
+        if matcher.real_quick_ratio() <= bester or matcher.quick_ratio() <= bester:
+            continue
+        ratio = matcher.ratio()
+        scores[i] = ratio * 100
+        bester = max(bester, ratio)
+    return scores
+
+
+class PreisBlockIndex:
+    """
+    Preis-sortierter Index über das Flaschenpost-Sortiment, ein Block pro (Jahrgang, Flaschengrösse, Weintyp).
+    FP-Weine ohne Jahrgang gelten als Platzhalter: sie stehen zusätzlich in jedem Jahrgangs-Block mit gleicher
+    Flasche/Weintyp, und Coop-Jahrgänge ohne eigenen FP-Block fallen auf den Block ohne Jahrgang zurück.
+    Kandidaten mit ähnlichem Preis werden per np.searchsorted in O(log n) gefunden und
+    als zusammenhängende Scheibe (Positionen im FP-DataFrame) an den Namensscorer übergeben.
+    """
+
+    def __init__(
+        self,
+        df_fp: pd.DataFrame,
+        preis_col: str = "Preis",
+        block_cols=DEFAULT_BLOCK_COLS,
+        name_col: str = "Name",
+        produzent_col: str = "Produzent",
+    ):
+        self.block_cols = list(block_cols)
+        df_fp = ensure_match_keys(df_fp, self.block_cols)
+        preise = pd.to_numeric(df_fp[preis_col], errors="coerce").to_numpy(dtype=float)
+        keys = block_keys(df_fp, self.block_cols)
+
+        self._jahrgang_pos = next((i for i, col in enumerate(self.block_cols) if "jahrgang" in col.lower()), None)
+        gueltig = ~np.isnan(preise)
+        gruppen = {}
+        for key, positionen in keys[gueltig].groupby(self.block_cols, sort=False).indices.items():
+            # .indices liefert Positionen relativ zu keys[gueltig] -> zurück auf Positionen in df_fp
+            gruppen[key if isinstance(key, tuple) else (key,)] = np.flatnonzero(gueltig)[positionen]
+
+        self._blocks = {}
+        for key, positionen in gruppen.items():
+            platzhalter = self._ohne_jahrgang(key)
+            if platzhalter is not None and platzhalter in gruppen:
+                positionen = np.concatenate([positionen, gruppen[platzhalter]])
+            reihenfolge = np.argsort(preise[positionen], kind="stable")
+            self._blocks[key] = (preise[positionen][reihenfolge], positionen[reihenfolge])
+
+        # Vergleichstexte einmal pro Index vorberechnen statt pro Coop-Wein
+        namen = df_fp[name_col] if name_col in df_fp.columns else pd.Series("", index=df_fp.index)
+        produzenten = df_fp[produzent_col] if produzent_col in df_fp.columns else pd.Series(None, index=df_fp.index)
+        self.texte = np.array([normalize_wein_text(n, p) for n, p in zip(namen, produzenten)], dtype=object)
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def _ohne_jahrgang(self, key: tuple):
+        """Schlüssel des Platzhalter-Blocks (gleicher Key, Jahrgang fehlend); None ohne Jahrgangs-Spalte oder wenn key selbst keinen Jahrgang hat."""
+        if self._jahrgang_pos is None or key[self._jahrgang_pos] == OHNE_JAHRGANG:
+            return None
+        return key[:self._jahrgang_pos] + (OHNE_JAHRGANG,) + key[self._jahrgang_pos + 1:]
+
+    @staticmethod
+    def preisfenster(preise, tol_pct=DEFAULT_PREIS_TOLERANZ_PCT, tol_chf=DEFAULT_PREIS_TOLERANZ_CHF):
+        """Untere/obere Preisgrenze (vektorisiert); bei beiden Toleranzen gilt das breitere Fenster."""
+        preise = np.asarray(preise, dtype=float)
+        breite = np.zeros_like(preise)
+        if tol_pct is not None:
+            breite = np.maximum(breite, np.abs(preise) * tol_pct)
+        if tol_chf is not None:
+            breite = np.maximum(breite, tol_chf)
+        return preise - breite, preise + breite
+
+    def bereiche(self, key, preise, tol_pct=DEFAULT_PREIS_TOLERANZ_PCT, tol_chf=DEFAULT_PREIS_TOLERANZ_CHF):
+        """
+        Liefert (lo, hi, positionen) für alle übergebenen Preise eines Blocks:
+        Kandidaten für preise[i] sind positionen[lo[i]:hi[i]]. Ein Jahrgang ohne eigenen Block greift auf den
+        Block ohne Jahrgang zurück; unbekannter Block -> leere Bereiche.
+        """
+        preise = np.asarray(preise, dtype=float)
+        key = key if isinstance(key, tuple) else (key,)
+        block = self._blocks.get(key)
+        if block is None and self._ohne_jahrgang(key) is not None:
+            block = self._blocks.get(self._ohne_jahrgang(key))
+        if block is None:
+            leer = np.zeros(len(preise), dtype=np.intp)
+            return leer, leer, np.empty(0, dtype=np.intp)
+        block_preise, block_positionen = block
+        untere, obere = self.preisfenster(preise, tol_pct, tol_chf)
+        lo = np.searchsorted(block_preise, untere, side="left")
+        hi = np.searchsorted(block_preise, obere, side="right")
+        return lo, hi, block_positionen
+
+    def kandidaten(self, key, preis, tol_pct=DEFAULT_PREIS_TOLERANZ_PCT, tol_chf=DEFAULT_PREIS_TOLERANZ_CHF) -> np.ndarray:
+        """Positionen (im FP-DataFrame) aller Kandidaten im Block mit ähnlichem Preis."""
+        lo, hi, positionen = self.bereiche(key, [preis], tol_pct, tol_chf)
+        return positionen[lo[0]:hi[0]]
+
+
+def match_sortimente(
+    df_coop: pd.DataFrame,
+    df_fp: pd.DataFrame,
+    tol_pct: float = DEFAULT_PREIS_TOLERANZ_PCT,
+    tol_chf: float = DEFAULT_PREIS_TOLERANZ_CHF,
+    score_schwelle: float = AUTO_MATCH_SCHWELLE,
+    block_cols=DEFAULT_BLOCK_COLS,
+    scorer=None,
+    index: PreisBlockIndex = None,
+    decisions=None,
+    return_stats: bool = False,
+):
+    """
+    Matcht jeden Coop-Wein gegen das FP-Sortiment: Vorfilter über (Jahrgang, Flasche, Weintyp)-Block und Preisfenster,
+    danach Namensabgleich nur auf den Kandidaten. Ergebnis im Spaltenformat von manuelle_matches_final2.xlsx
+    (Coop_*, FP_*, Match_Status, Fuzzy_Score) plus Bester_Score / Bester_FP_Sku / Anzahl_Kandidaten.
+    Mit `decisions` (MatchDecisionStore) werden manuelle Entscheidungen übernommen: bestätigte Paare gewinnen immer,
+    abgelehnte Paare werden nie als Match ausgegeben.
+    """
+    start = time.perf_counter()
+    scorer = scorer or sequence_ratio_scores
+    if index is None:
+        index = PreisBlockIndex(df_fp, block_cols=block_cols)
+
+    df_coop = ensure_match_keys(df_coop, index.block_cols)
+    coop_keys = block_keys(df_coop, index.block_cols)
+    coop_preise = pd.to_numeric(df_coop["Preis"], errors="coerce").to_numpy(dtype=float)
+    coop_texte = [normalize_wein_text(n, p) for n, p in zip(df_coop["Name"], df_coop.get("Produzent", pd.Series(None, index=df_coop.index)))]
+
+    n = len(df_coop)
+    beste_pos = np.full(n, -1, dtype=np.intp)
+    beste_scores = np.zeros(n, dtype=float)
+    anzahl_kandidaten = np.zeros(n, dtype=np.int64)
+    paare = 0
+
+    for key, coop_pos in coop_keys.groupby(index.block_cols, sort=False).indices.items():
+        lo, hi, fp_positionen = index.bereiche(key, coop_preise[coop_pos], tol_pct, tol_chf)
+        anzahl_kandidaten[coop_pos] = hi - lo
+        for i, start_i, ende_i in zip(coop_pos, lo, hi):
+            if ende_i <= start_i:
+                continue
+            kandidaten = fp_positionen[start_i:ende_i]
+            scores = scorer(coop_texte[i], index.texte[kandidaten])
+            paare += len(kandidaten)
+            best = int(np.argmax(scores))
+            beste_pos[i] = kandidaten[best]
+            beste_scores[i] = scores[best]
+
+    ist_match = (beste_pos >= 0) & (beste_scores > score_schwelle)
+    ergebnis = pd.DataFrame({
+        "Coop_URL": df_coop["URL"].to_numpy() if "URL" in df_coop.columns else pd.NA,
+        "Coop_Name": df_coop["Name"].to_numpy(),
+        "Coop_Produzent": df_coop["Produzent"].to_numpy() if "Produzent" in df_coop.columns else pd.NA,
+        "Coop_Jahrgang": df_coop["Jahrgang"].to_numpy() if "Jahrgang" in df_coop.columns else pd.NA,
+        "Coop_Region": df_coop["Region"].to_numpy() if "Region" in df_coop.columns else pd.NA,
+        "Coop_Preis": coop_preise,
+        "Coop_Weintyp": df_coop["Weintyp"].to_numpy() if "Weintyp" in df_coop.columns else pd.NA,
+    }, index=df_coop.index)
+
+    fp_spalten = {"FP_Sku": "Sku", "FP_Name": "Name", "FP_Produzent": "Produzent", "FP_Jahrgang": "Jahrgang",
+                  "FP_Herkunft": "Herkunft", "FP_Preis": "Preis", "FP_Weintyp": "Weintyp"}
+    match_pos = np.where(ist_match, beste_pos, 0)
+    for ziel, quelle in fp_spalten.items():
+        if quelle in df_fp.columns:
+            werte = pd.Series(df_fp[quelle].to_numpy()[match_pos], index=df_coop.index)
+            ergebnis[ziel] = werte.where(ist_match)
+        else:
+            ergebnis[ziel] = pd.NA
+
+    ergebnis["Match_Status"] = np.where(ist_match, STATUS_MATCH, STATUS_KEIN_MATCH)
+    ergebnis["Fuzzy_Score"] = np.where(ist_match, beste_scores, 0.0)
+    ergebnis["Bester_Score"] = beste_scores
+    if "Sku" in df_fp.columns:
+        ergebnis["Bester_FP_Sku"] = pd.Series(df_fp["Sku"].to_numpy()[np.maximum(beste_pos, 0)], index=df_coop.index).where(beste_pos >= 0)
+    ergebnis["Anzahl_Kandidaten"] = anzahl_kandidaten
+    ergebnis = add_matching_keys(ergebnis)
+    if decisions is not None:
+        ergebnis = apply_decisions_to_matcher_result(ergebnis, df_fp, decisions)
+
+    if return_stats:
+        stats = {
+            "coop_weine": n,
+            "paare": paare,
+            "ohne_kandidaten": int((anzahl_kandidaten == 0).sum()),
+            "bloecke_fp": len(index),
+            "sekunden": time.perf_counter() - start,
+        }
+        return ergebnis, stats
+    return ergebnis
+
+
+if __name__ == "__main__":
+    import os
+    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+    df_coop_main = pd.read_excel(os.path.join(BASE_DIR, "data", "coop_weine_kombiniert.xlsx"))
+    df_fp_main = pd.read_excel(os.path.join(BASE_DIR, "data", "flaschenpost_weine.xlsx"), dtype={"Sku": str})
+    df_result, match_stats = match_sortimente(df_coop_main, df_fp_main, return_stats=True)
+    print(df_result["Match_Status"].value_counts())
+    print(f"Paare bewertet: {match_stats['paare']} | Laufzeit: {match_stats['sekunden']:.1f}s")
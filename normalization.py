@@ -0,0 +1,45 @@
+# normalization.py
+import re
+import unicodedata
+import pandas as pd
+
+# === Normalisierungs-Konstanten und Funktion für Produzentennamen ===
+# Wird von plot_utils.py (GAP-Analyse) und matcher.py (Matching) gemeinsam genutzt.
+_SORTED_AUSSCHLUSS_BEGRIFFE_PROD = sorted([ # DEINE AKTUALISIERTE LISTE
+    "azienda agricola", "marchesi de", "barons de", "baron philippe", "feudi di", "feudi", "ac", "a.c.", "aoc", "aop", "do", "doc", "igt", "docg", "igp", "doca", "vinhos",
+    "appellation", "controlee", "maison", "fratelli", "tenuta", "cantina", "famille", "marchesi", "raventos", "tenimenti",
+    "azienda", "agricola", "cantine", "bodega", "estate", "winery", "bodegas", "domaine", "domaines", "weingut"
+], key=len, reverse=True)
+
+_EXCLUSION_PATTERN_PROD = re.compile(
+    r'\b(?:' + '|'.join(map(re.escape, _SORTED_AUSSCHLUSS_BEGRIFFE_PROD)) + r')\b',
+    flags=re.IGNORECASE
+)
+_NORMALIZE_PATTERN_PROD = re.compile(r"[-/,;.:\"'’()`*&]")
+_MULTI_SPACE_PATTERN_PROD = re.compile(r"\s+")
+
+def normalize_produzent_name(text):
+    if pd.isna(text) or text == "": return ""
+    text = str(text); text = unicodedata.normalize("NFKD", text)
+    text = "".join([c for c in text if not unicodedata.combining(c)])
+    text = text.lower(); text = _NORMALIZE_PATTERN_PROD.sub(" ", text)
+    text = text.replace(" e figli", "").replace(" et fils", "").replace(" & fils", "").replace(" y hijos", "")
+    text = text.replace(" vigneron", "").replace(" vignerons", "")
+    text = _EXCLUSION_PATTERN_PROD.sub("", text) 
+    text = _MULTI_SPACE_PATTERN_PROD.sub(" ", text); return text.strip()
+
+
+_NORMALIZE_PATTERN_WEIN = re.compile(r"[^0-9a-z ]+")
+
+def normalize_wein_text(name, produzent=None):
+    """Vergleichstext für den Namensabgleich: Kleinschreibung, ohne Akzente/Sonderzeichen, Produzent angehängt (falls nicht schon im Namen)."""
+    name_norm = "" if pd.isna(name) else str(name)
+    name_norm = "".join(c for c in unicodedata.normalize("NFKD", name_norm) if not unicodedata.combining(c)).lower()
+    name_norm = _MULTI_SPACE_PATTERN_PROD.sub(" ", _NORMALIZE_PATTERN_WEIN.sub(" ", name_norm)).strip()
+    if produzent is None or pd.isna(produzent) or str(produzent).strip() == "":
+        return name_norm
+    prod_norm = "".join(c for c in unicodedata.normalize("NFKD", str(produzent)) if not unicodedata.combining(c)).lower()
+    prod_norm = _MULTI_SPACE_PATTERN_PROD.sub(" ", _NORMALIZE_PATTERN_WEIN.sub(" ", prod_norm)).strip()
+    if prod_norm and prod_norm not in name_norm:
+        name_norm = f"{name_norm} {prod_norm}".strip()
+    return name_norm
@@ -1,12 +1,139 @@
+import functools
+
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
+from data_loading import data_stand
+from regionen import fp_land, split_herkunft, split_region
+from render_cache import daten_hash, gecachte_figur, zeige_figur
+from sortiment_cube import DIM_LAND, DIM_PREISKLASSE, DIM_REGION, DIM_WEINTYP, WEINTYP_REIHENFOLGE, preisklassen
+from table_export import export_button
+
+BALKEN_FARBE = "#2B4C7E"  # CI-Blau der Länder-/Regionen-Balken
+
+
+def _anzahl_balken(werte: pd.Series, xaxis_title: str, chart_height: int, xaxis_tickangle: int = -35, textfont_size: int = 13):
+    """Balkendiagramm der Anzahl Weine je Kategorie (Länder/Regionen), über den Figure-Cache aufgerufen."""
+    fig = px.bar(
+        x=werte.index,
+        y=werte.values,
+        text=werte.values,
+        color_discrete_sequence=[BALKEN_FARBE]
+    )
+    fig.update_traces(textposition="outside", textfont_size=textfont_size)
+    fig.update_layout(
+        height=chart_height,
+        plot_bgcolor="#ffffff",
+        paper_bgcolor="#ffffff",
+        xaxis_title=xaxis_title,
+        yaxis_title="Anzahl Weine",
+        xaxis_tickangle=xaxis_tickangle,
+        margin=dict(t=35, r=15, l=5, b=60)
+    )
+    return fig
+
+
+def zeilen_prozente(werte: np.ndarray) -> np.ndarray:
+    """Zeilenprozente einer Anzahl-Matrix; Zeilen ohne Werte ergeben 0 %."""
+    nenner = werte.sum(axis=1, keepdims=True)
+    return np.divide(werte * 100.0, nenner, out=np.zeros(werte.shape), where=nenner > 0)
+
+
+def anzahl_prozent_text(anzahl: np.ndarray, prozent: np.ndarray, trenner: str = " ") -> np.ndarray:
+    """Zellen "n (x.x%)" für ganze Arrays (trenner z.B. "<br>" für Balkenbeschriftungen)."""
+    text = np.char.add(anzahl.astype(np.int64).astype(str), trenner + "(")
+    return np.char.add(np.char.add(text, np.round(prozent, 1).astype(str)), "%)")
+
+
+def format_crosstab(tabelle: pd.DataFrame, index_name: str, total_label: str = "Total") -> pd.DataFrame:
+    """
+    Formatiert eine Kreuztabelle mit Anzahlen (Zeilen x Spalten, z.B. Preisklasse x Weintyp) für die Anzeige:
+    jede Zelle als "n (x.x%)" mit Zeilenprozenten, dazu eine Spalte Total und eine Summenzeile
+    (deren Prozente beziehen sich auf das Gesamttotal). Reine Array-Operationen, unabhängig von der Grösse.
+    """
+    werte = tabelle.to_numpy(dtype=float)
+    mit_summe = np.vstack([werte, werte.sum(axis=0, keepdims=True)])
+    ergebnis = pd.DataFrame(anzahl_prozent_text(mit_summe, zeilen_prozente(mit_summe)), columns=[str(c) for c in tabelle.columns])
+    ergebnis.insert(0, index_name, [*tabelle.index.astype(str), total_label])
+    ergebnis[total_label] = mit_summe.sum(axis=1).astype(np.int64)
+    return ergebnis
+
+
+# === Verteilungs-Panels: Diagramm + Tabelle mit Total + CSV + Caption aus einer Anzahl-Serie ===
+@st.cache_data(max_entries=128, show_spinner=False)
+def _gecachte_verteilung(_werte, _aggregation, schluessel, parameter):
+    return _aggregation(_werte, **dict(parameter))
+
+
+def verteilung(werte: pd.Series, aggregation, data_version=None, **parameter):
+    """
+    Memoisierte Aggregation aggregation(werte, **parameter), z.B. Anzahl Weine je Region (werte: Series oder DataFrame).
+    Schlüssel: qualifizierter Funktionsname, Spalte(n), Datenversion, Inhalts-Hash der Werte und Parameter.
+    Der Inhalts-Hash trennt gefilterte Teilmengen derselben Datenversion, auch bei gleicher Zeilenzahl.
+    aggregation muss eine reine Funktion ihrer Argumente sein.
+    """
+    inhalt = (data_version, daten_hash(werte))
+    spalten = werte.name if isinstance(werte, pd.Series) else tuple(werte.columns)
+    schluessel = (f"{aggregation.__module__}.{aggregation.__qualname__}", spalten, inhalt)
+    return _gecachte_verteilung(werte, aggregation, schluessel, tuple(sorted(parameter.items())))
+
+
+def verteilung_tabelle(anzahl: pd.Series, kategorie_label: str) -> pd.DataFrame:
+    """Tabelle Kategorie / Anzahl / Anteil % (auf eine Stelle gerundet) mit Total-Zeile."""
+    gesamt = anzahl.sum()
+    prozent = (anzahl / gesamt * 100).round(1)
+    return pd.DataFrame({
+        kategorie_label: [*anzahl.index, "Total"],
+        "Anzahl": [*anzahl.to_numpy(), gesamt],
+        "Anteil %": [*prozent.to_numpy(), prozent.sum().round(1)],
+    })
+
+
+def render_distribution_panel(
+    anzahl: pd.Series,
+    kategorie_label: str,
+    titel: str,
+    dateiname: str,
+    figur=_anzahl_balken,
+    figur_parameter: dict = None,
+    spalten: tuple = (1.5, 1),
+    hinweis: str = None,
+    info: str = None,
+    fusszeile: str = None,
+    data_version=None,
+):
+    """
+    Gemeinsames Panel der Sortiments- und Regionenanalysen: Titel, Diagramm (figur über den Figure-Cache)
+    und Tabelle mit Total-Zeile nebeneinander, CSV-Export, Caption.
+    Der Stand in Caption und Dateiname kommt aus der Datenversion, nicht aus der Uhrzeit; gleiche Daten
+    ergeben also dieselbe Ausgabe.
+    """
+    stand = data_stand(data_version)
+    st.subheader(titel)
+    if info:
+        st.info(info)
+    if hinweis:
+        st.caption(hinweis)
+
+    col1, col2 = st.columns(list(spalten))
+    with col1:
+        zeige_figur(figur, anzahl, **(figur_parameter or {}))
+    with col2:
+        table_df = verteilung_tabelle(anzahl, kategorie_label)
+        st.dataframe(table_df, width="stretch", hide_index=True)
+        datei_suffix = f"_{stand[:10]}" if stand else ""
+        export_button("Tabelle als CSV herunterladen", table_df, f"{dateiname}{datei_suffix}.csv")
+    teile = [fusszeile or f"Total: {anzahl.sum()} Weine", f"Stand: {stand}" if stand else None]
+    st.caption(" | ".join(teil for teil in teile if teil))
+
 
 def plot_weintypen_pie_and_table(
     df: pd.DataFrame,
     weintyp_col: str = "Weintyp",
     titel: str = "Verteilung der Weintypen im Sortiment",
-    chart_height: int = 500
+    chart_height: int = 500,
+    data_version=None,
 ):
     """
     Zeigt Pie-Chart (Kreisdiagramm) und Weintypen-Tabelle nebeneinander an,
@@ -21,17 +148,12 @@ def plot_weintypen_pie_and_table(
         "Roséwein": "#F6ADC6",
         "Schaumwein": "#E6E6FA"
     }
-    # Value Counts sortieren wie oben
-    weintyp_anteile = df[weintyp_col].value_counts().reindex(order, fill_value=0)
-    gesamt = weintyp_anteile.sum()
-    percent = (weintyp_anteile / gesamt * 100).round(1)
-    
-    st.subheader(titel)
-    st.info("Hinweis: Nur 75 cl Flaschen berücksichtigt.")
 
-    col1, col2 = st.columns([1.4, 1])
+    def weintypen_zaehlen(weintypen, order):
+        # Value Counts in der vorgegebenen Reihenfolge
+        return weintypen.value_counts().reindex(order, fill_value=0)
 
-    with col1:
+    def weintypen_pie(weintyp_anteile, farben, chart_height):
         fig = px.pie(
             names=weintyp_anteile.index,
             values=weintyp_anteile.values,
@@ -52,37 +174,14 @@ def plot_weintypen_pie_and_table(
                 font=dict(size=15)
             )
         )
-        st.plotly_chart(fig, use_container_width=True)
-
-    with col2:
-        # Tabelle aufbauen inkl. Total als letzte Zeile
-        table_df = pd.DataFrame({
-            "Weintyp": weintyp_anteile.index,
-            "Anzahl": weintyp_anteile.values,
-            "Anteil %": percent.values
-        })
-        # Totalsumme hinzufügen
-        total_row = pd.DataFrame({
-            "Weintyp": ["Total"],
-            "Anzahl": [gesamt],
-            "Anteil %": [percent.sum().round(1)]
-        })
-        table_df = pd.concat([table_df, total_row], ignore_index=True)
-
-        st.dataframe(
-            table_df,
-            use_container_width=True,
-            hide_index=True
-        )
-        # Download-Button für Tabelle
-        st.download_button(
-            label="Tabelle als CSV herunterladen",
-            data=table_df.to_csv(index=False).encode("utf-8"),
-            file_name=f"weintypen_{pd.Timestamp.now().date()}.csv",
-            mime="text/csv"
-        )
+        return fig
 
-    st.caption(f"Total: {gesamt} Weine | Stand: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M')}")
+    weintyp_anteile = verteilung(df[weintyp_col], weintypen_zaehlen, data_version, order=tuple(order))
+    render_distribution_panel(
+        weintyp_anteile, "Weintyp", titel, "weintypen",
+        figur=weintypen_pie, figur_parameter=dict(farben=farben, chart_height=chart_height), spalten=(1.4, 1),
+        info="Hinweis: Nur 75 cl Flaschen berücksichtigt.", data_version=data_version,
+    )
 
 import streamlit as st
 import pandas as pd
@@ -94,28 +193,21 @@ def plot_preisklassen_pie_and_table(
     bins = [0, 20, 50, 100, 9999],
     labels = ["0–20 CHF", "20–50 CHF", "50–100 CHF", "100+ CHF"],
     titel: str = "Verteilung der Preisklassen im Sortiment",
-    chart_height: int = 500
+    chart_height: int = 500,
+    data_version=None,
 ):
     """
     Zeigt Piechart und Tabelle der Preisklassen-Verteilung nebeneinander, 
     mit kontrastreichen Farben, Totalsumme und Download-Möglichkeit.
     Farben: Dunkles Blau → kräftiges Blau → Petrol → Dunkelgrau.
     """
-    # Preisklasse bauen
-    df = df.copy()
-    df["Preisklasse"] = pd.cut(df[preis_col], bins=bins, labels=labels, include_lowest=True)
-
-    preisklassen_anzahl = df["Preisklasse"].value_counts().reindex(labels, fill_value=0)
-    total_weine = preisklassen_anzahl.sum()
-    prozent = (preisklassen_anzahl / total_weine * 100).round(1)
-
     # Farbpalette: Kräftig, kein hellblau!
     farben = ["#104E8B", "#1874CD", "#42A5A2", "#252525"]  # dunkelblau – mittelblau – petrol – dunkelgrau 
 
-    st.subheader(titel)
-    col1, col2 = st.columns([1.3, 1])
+    def preisklassen_zaehlen(preise, bins, labels):
+        return preisklassen(preise, bins, labels).value_counts().reindex(list(labels), fill_value=0)
 
-    with col1:
+    def preisklassen_pie(preisklassen_anzahl, farben, chart_height):
         fig = px.pie(
             names=preisklassen_anzahl.index,
             values=preisklassen_anzahl.values,
@@ -136,34 +228,14 @@ def plot_preisklassen_pie_and_table(
                 font=dict(size=15)
             )
         )
-        st.plotly_chart(fig, use_container_width=True)
+        return fig
 
-    with col2:
-        # Tabelle inkl. Prozent und Total
-        table_df = pd.DataFrame({
-            "Preisklasse": preisklassen_anzahl.index,
-            "Anzahl": preisklassen_anzahl.values,
-            "Anteil %": prozent.values
-        })
-        # Totalsumme rein
-        total_row = pd.DataFrame({
-            "Preisklasse": ["Total"],
-            "Anzahl": [total_weine],
-            "Anteil %": [prozent.sum().round(1)]
-        })
-        table_df = pd.concat([table_df, total_row], ignore_index=True)
-        st.dataframe(
-            table_df,
-            use_container_width=True,
-            hide_index=True
-        )
-        st.download_button(
-            label="Tabelle als CSV herunterladen",
-            data=table_df.to_csv(index=False).encode("utf-8"),
-            file_name=f"preisklassen_{pd.Timestamp.now().date()}.csv",
-            mime="text/csv"
-        )
-    st.caption(f"Total: {total_weine} Weine | Stand: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M')}")
+    preisklassen_anzahl = verteilung(df[preis_col], preisklassen_zaehlen, data_version, bins=tuple(bins), labels=tuple(labels))
+    render_distribution_panel(
+        preisklassen_anzahl, "Preisklasse", titel, "preisklassen",
+        figur=preisklassen_pie, figur_parameter=dict(farben=farben, chart_height=chart_height), spalten=(1.3, 1),
+        data_version=data_version,
+    )
 
 import streamlit as st
 import pandas as pd
@@ -177,6 +249,7 @@ def plot_preisverteilung_nach_weintyp(
     labels = ["0–20 CHF", "20–50 CHF", "50–100 CHF", "100+ CHF"],
     titel: str = "Preisverteilung nach Weintyp im Sortiment",
     chart_height: int = 500,
+    data_version=None,
 ):
     """
     Zeigt gestapeltes Balkendiagramm (Preisklasse x Weintyp, absolute & Prozentzahlen) + Tabelle mit Total und Download.
@@ -192,34 +265,38 @@ def plot_preisverteilung_nach_weintyp(
         "Schaumwein": "#E6E6FA",
     }
 
-    # Preisklassen-Kategorie anlegen
-    df = df.copy()
-    df["Preisklasse"] = pd.cut(df[preis_col], bins=bins, labels=labels, include_lowest=True)
-    # Pivot: Preisklasse (Index) x Weintyp (Columns), Reihenfolge wie im Pie!
-    pivot_table = df.pivot_table(index="Preisklasse", columns=weintyp_col, aggfunc="size", fill_value=0)
-    for typ in order:
-        if typ not in pivot_table.columns:
-            pivot_table[typ] = 0  # Fehlende Sparten auf 0 (für spätere Sortierung)
-    pivot_table = pivot_table[order].reindex(labels, fill_value=0)
+    def preisklasse_x_weintyp(werte, preis_col, weintyp_col, bins, labels, order):
+        # Preisklassen-Kategorie anlegen
+        werte = werte.assign(Preisklasse=preisklassen(werte[preis_col], bins, labels))
+        # Pivot: Preisklasse (Index) x Weintyp (Columns), Reihenfolge wie im Pie!
+        pivot_table = werte.pivot_table(index="Preisklasse", columns=weintyp_col, aggfunc="size", fill_value=0)
+        for typ in order:
+            if typ not in pivot_table.columns:
+                pivot_table[typ] = 0  # Fehlende Sparten auf 0 (für spätere Sortierung)
+        return pivot_table[list(order)].reindex(list(labels), fill_value=0)
+
+    pivot_table = verteilung(
+        df[[preis_col, weintyp_col]], preisklasse_x_weintyp, data_version,
+        preis_col=preis_col, weintyp_col=weintyp_col, bins=tuple(bins), labels=tuple(labels), order=tuple(order),
+    )
+    stand = data_stand(data_version)
 
     st.subheader(titel)
     st.caption("Nur 75 cl Flaschen berücksichtigt.")
 
     col1, col2 = st.columns([1.5, 1])
 
-    with col1:
-        totals = pivot_table.sum(axis=1)
+    def preisverteilung_balken(pivot_table, order, farben, chart_height):
+        werte = pivot_table[order].to_numpy(dtype=float)
+        beschriftung = np.where(werte > 0, anzahl_prozent_text(werte, zeilen_prozente(werte), trenner="<br>"), "")
         fig = go.Figure()
         for i, weintyp in enumerate(order):
-            y = pivot_table[weintyp]
-            proz = [v/tot*100 if tot > 0 else 0 for v, tot in zip(y.values, totals.values)]
-            customtxt = [f"{int(v)}<br>({p:.1f}%)" if v > 0 else "" for v, p in zip(y.values, proz)]
             fig.add_bar(
                 x=pivot_table.index,
-                y=y.values,
+                y=werte[:, i],
                 name=weintyp,
                 marker_color=farben[weintyp],
-                text=customtxt,
+                text=beschriftung[:, i],
                 textposition="auto",
                 hovertemplate=f'{weintyp}: %{{y}}<br>%{{text}}<extra></extra>'
             )
@@ -239,47 +316,23 @@ def plot_preisverteilung_nach_weintyp(
             ),
             margin=dict(t=30, l=0, r=0, b=0),
         )
-        st.plotly_chart(fig, use_container_width=True)
+        return fig
+
+    with col1:
+        zeige_figur(preisverteilung_balken, pivot_table, order=order, farben=farben, chart_height=chart_height)
 
     with col2:
         # Tabelle: alle Zellwerte als "n (x.x%)"
-        table_rows = []
-        gesamt_total = 0
-        for preisklasse in pivot_table.index:
-            row = [preisklasse]
-            total = pivot_table.loc[preisklasse].sum()
-            gesamt_total += total
-            for weintyp in order:
-                anz = pivot_table.loc[preisklasse, weintyp]
-                proz = (anz / total * 100) if total > 0 else 0
-                row.append(f"{int(anz)} ({proz:.1f}%)")
-            row.append(total)
-            table_rows.append(row)
-        # Totalsummen-Reihe:
-        sum_row = ["Total"]
-        tổng = pivot_table.sum()
-        total_sum = tổng.sum()
-        for weintyp in order:
-            wert = tổng[weintyp]
-            proz = wert / total_sum * 100 if total_sum else 0
-            sum_row.append(f"{int(wert)} ({proz:.1f}%)")
-        sum_row.append(total_sum)
-        table_rows.append(sum_row)
-        col_names = ["Preisklasse"] + order + ["Total"]
-        table_df = pd.DataFrame(table_rows, columns=col_names)
+        table_df = format_crosstab(pivot_table[order], "Preisklasse")
+        total_sum = int(table_df["Total"].iloc[-1])
 
         st.dataframe(
             table_df,
-            use_container_width=True,
+            width="stretch",
             hide_index=True
         )
-        st.download_button(
-            label="Tabelle als CSV herunterladen",
-            data=table_df.to_csv(index=False).encode("utf-8"),
-            file_name=f"preisverteilung_weintyp_{pd.Timestamp.now().date()}.csv",
-            mime="text/csv"
-        )
-    st.caption(f"Total: {total_sum} Weine | Stand: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M')}")
+        export_button("Tabelle als CSV herunterladen", table_df, f"preisverteilung_weintyp{'_' + stand[:10] if stand else ''}.csv")
+    st.caption(f"Total: {total_sum} Weine" + (f" | Stand: {stand}" if stand else ""))
 
 
 import streamlit as st
@@ -290,555 +343,71 @@ def plot_top_herkunftslaender(
     df: pd.DataFrame,
     region_col: str = "Region",
     titel: str = "Top-10 Herkunftsländer im Sortiment",
-    chart_height: int = 450
+    chart_height: int = 450,
+    data_version=None,
 ):
     """
     Zeigt die Top-10 Herkunftsländer als Balkendiagramm und Tabelle nebeneinander.
     Kräftige Farben, Totalzeile, Download. Regionenspaltung wie im Originalscript.
     """
-    # Land aus "Region" extrahieren (wie im Script)
-    df = df.copy()
-    df["Land"] = df[region_col].apply(lambda x: str(x).split(",")[0].strip() if "," in str(x) else str(x))
-    top_laender = df["Land"].value_counts().head(10)
-    total_weine = top_laender.sum()
-    prozent = (top_laender / total_weine * 100).round(1)
-
-    st.subheader(titel)
-    col1, col2 = st.columns([1.5, 1])
-
-    with col1:
-        # Kräftiges Blaugrau für Business-Look, kein Hellblau
-        bar_color = "#2B4C7E"
-        fig = px.bar(
-            x=top_laender.index,
-            y=top_laender.values,
-            text=top_laender.values,
-            color_discrete_sequence=[bar_color]
-        )
-        fig.update_traces(textposition="outside", textfont_size=14)
-        fig.update_layout(
-            height=chart_height,
-            plot_bgcolor="#ffffff",  # konsistent weiß
-            paper_bgcolor="#ffffff",
-            xaxis_title="Land",
-            yaxis_title="Anzahl Weine",
-            xaxis_tickangle=-45,
-            margin=dict(t=35, r=15, l=5, b=60)
-        )
-        st.plotly_chart(fig, use_container_width=True)
-
-    with col2:
-        table_df = pd.DataFrame({
-            "Land": top_laender.index,
-            "Anzahl": top_laender.values,
-            "Anteil %": prozent.values
-        })
-        # Totalsumme hinzufügen
-        total_row = pd.DataFrame({
-            "Land": ["Total"],
-            "Anzahl": [total_weine],
-            "Anteil %": [prozent.sum().round(1)]
-        })
-        table_df = pd.concat([table_df, total_row], ignore_index=True)
-
-        st.dataframe(
-            table_df,
-            use_container_width=True,
-            hide_index=True
-        )
-        st.download_button(
-            label="Tabelle als CSV herunterladen",
-            data=table_df.to_csv(index=False).encode("utf-8"),
-            file_name=f"top10_laender_{pd.Timestamp.now().date()}.csv",
-            mime="text/csv"
-        )
-    st.caption(f"Top 10 machen {100*total_weine/df.shape[0]:.1f}% des Sortiments aus | Stand: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M')}")
-
-
-import streamlit as st
-import pandas as pd
-import plotly.express as px
-import unicodedata
-
-def plot_frankreich_regionen(
-    df: pd.DataFrame,
-    region_col: str = "Region",
-    titel: str = "Weinregionen Frankreichs im Sortiment",
-    chart_height: int = 450
-):
-    """
-    Zeigt die Regionen Frankreichs als Balkendiagramm und Tabelle nebeneinander (inkl. Normalisierung und Mapping).
-    Farblich consistent, Totalreihe, Downloadbutton.
-    """
-    # Subregionen-Logik (wie in deinem Skript)
-    def normalize_string(text):
-        text = str(text).lower()
-        text = ''.join(c for c in unicodedata.normalize('NFD', text) if unicodedata.category(c) != 'Mn')
-        text = text.replace('–', '-').replace(' ', '-')
-        return text
-
-    subregion_mapping = {
-        # Burgund
-        "maconnais": "Burgund",
-        "chablis": "Burgund",
-        "beaujolais": "Burgund",
-        "cote-de-beaune": "Burgund",
-        "cote-de-nuits": "Burgund",
-        "cote-chalon": "Burgund",
-        "coteaux-du-lyonnais": "Burgund",
-        "bouzeron": "Burgund",
-        "givry": "Burgund",
-        "mercurey": "Burgund",
-        "montagny": "Burgund",
-        "rully": "Burgund",
-        "cote-d-or": "Burgund",
-        "irancy": "Burgund",
-        "pouilly-fuisse": "Burgund",
-        "saint-veran": "Burgund",
-        "vire-clesse": "Burgund",
-        "saint-bris": "Burgund",
-        # Bordeaux
-        "fronsac": "Bordeaux",
-        "saint-emilion": "Bordeaux",
-        "pomerol": "Bordeaux",
-        "margaux": "Bordeaux",
-        "pauillac": "Bordeaux",
-        "saint-julien": "Bordeaux",
-        "saint-estephe": "Bordeaux",
-        "graves": "Bordeaux",
-        "medoc": "Bordeaux",
-        "castillon": "Bordeaux",
-        "listrac": "Bordeaux",
-        "moulis": "Bordeaux",
-        "entre-deux-mers": "Bordeaux",
-        "sauternes": "Bordeaux",
-        "barsac": "Bordeaux",
-        "canon-fronsac": "Bordeaux",
-        # Rhône
-        "hermitage": "Rhône",
-        "chateauneuf-du-pape": "Rhône",
-        "cornas": "Rhône",
-        "saint-joseph": "Rhône",
-        "gigondas": "Rhône",
-        "cote-rotie": "Rhône",
-        "vacqueyras": "Rhône",
-        "crozes-hermitage": "Rhône",
-        "rasteau": "Rhône",
-        "lirac": "Rhône",
-        "condrieu": "Rhône",
-        "luberon": "Rhône",
-        "cote-du-luberon": "Rhône",
-        # Andere
-        "keine-subregion": "Andere",
-        "ubrige-regionen-eu": "Andere"
-    }
-
-    def categorize_region(subregion_normalized):
-        if "burgund" in subregion_normalized:
-            return "Burgund"
-        elif "bordeaux" in subregion_normalized:
-            return "Bordeaux"
-        elif "rhone" in subregion_normalized:
-            return "Rhône"
-        return subregion_mapping.get(subregion_normalized, subregion_normalized.capitalize())
-
-    df = df.copy()
-    # Land aus Region
-    df["Land"] = df[region_col].apply(lambda x: str(x).split(",")[0].strip() if "," in str(x) else str(x))
-    # Subregion
-    df["Subregion"] = df[region_col].apply(lambda x: str(x).split(",")[1].strip() if "," in str(x) else "Keine Subregion")
-    # Nur Frankreich
-    df_fr = df[df["Land"] == "Frankreich"].copy()
-    df_fr["Subregion_normalized"] = df_fr["Subregion"].apply(normalize_string)
-    df_fr["Region_plot"] = df_fr["Subregion_normalized"].apply(categorize_region)
-    regionen_fr = df_fr["Region_plot"].value_counts()
-    total_weine = regionen_fr.sum()
-    prozent = (regionen_fr / total_weine * 100).round(1)
-
-    st.subheader(titel)
-    st.caption("Nur 75 cl Flaschen berücksichtigt.")
-
-    col1, col2 = st.columns([1.5, 1])
-
-    with col1:
-        bar_color = "#2B4C7E"  # CI-blau wie überall sonst
-        fig = px.bar(
-            x=regionen_fr.index,
-            y=regionen_fr.values,
-            text=regionen_fr.values,
-            color_discrete_sequence=[bar_color]
-        )
-        fig.update_traces(textposition="outside", textfont_size=13)
-        fig.update_layout(
-            height=chart_height,
-            plot_bgcolor="#ffffff",
-            paper_bgcolor="#ffffff",
-            xaxis_title="Region",
-            yaxis_title="Anzahl Weine",
-            xaxis_tickangle=-35,
-            margin=dict(t=35, r=15, l=5, b=60)
-        )
-        st.plotly_chart(fig, use_container_width=True)
-
-    with col2:
-        table_df = pd.DataFrame({
-            "Region": regionen_fr.index,
-            "Anzahl": regionen_fr.values,
-            "Anteil %": prozent.values
-        })
-        total_row = pd.DataFrame({
-            "Region": ["Total"],
-            "Anzahl": [total_weine],
-            "Anteil %": [prozent.sum().round(1)]
-        })
-        table_df = pd.concat([table_df, total_row], ignore_index=True)
-
-        st.dataframe(
-            table_df,
-            use_container_width=True,
-            hide_index=True
-        )
-        st.download_button(
-            label="Tabelle als CSV herunterladen",
-            data=table_df.to_csv(index=False).encode("utf-8"),
-            file_name=f"frankreich_regionen_{pd.Timestamp.now().date()}.csv",
-            mime="text/csv"
-        )
-    st.caption(f"Total: {total_weine} Frankreich-Weine | Stand: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M')}")
-
-
-import streamlit as st
-import pandas as pd
-import plotly.express as px
-import unicodedata
-
-def plot_italien_regionen(
-    df: pd.DataFrame,
-    region_col: str = "Region",
-    titel: str = "Weinregionen Italiens im Sortiment",
-    chart_height: int = 450
-):
-    """
-    Zeigt die Regionen Italiens als Balkendiagramm und Tabelle nebeneinander.
-    Mapping/Normalisierung sowie Tabellendarstellung und Download im gewohnten Stil.
-    """
-    # Subregionen-Logik
-    def normalize_string(text):
-        text = str(text).lower()
-        text = ''.join(c for c in unicodedata.normalize('NFD', text) if unicodedata.category(c) != 'Mn')
-        text = text.replace('–', '-').replace(' ', '-')
-        return text
-
-    subregion_mapping = {
-        "lombardei/veltlin": "Lombardei",
-        "keine-subregion": "Andere",
-        "ubrige-regionen-eu": "Andere",
-        "brda": "Andere",
-        "abruzzen-und-apulien": "Andere"
-    }
-
-    def categorize_region(subregion_normalized):
-        if subregion_normalized in subregion_mapping:
-            return subregion_mapping[subregion_normalized]
-        return subregion_normalized.capitalize()
-
-    df = df.copy()
-    # Land extrahieren (wie bei Frankreich)
-    df["Land"] = df[region_col].apply(lambda x: str(x).split(",")[0].strip() if "," in str(x) else str(x))
-    df["Subregion"] = df[region_col].apply(lambda x: str(x).split(",")[1].strip() if "," in str(x) else "Keine Subregion")
-    # Nur Italien
-    df_it = df[df["Land"] == "Italien"].copy()
-    df_it["Subregion_normalized"] = df_it["Subregion"].apply(normalize_string)
-    df_it["Region_plot"] = df_it["Subregion_normalized"].apply(categorize_region)
-    regionen_it = df_it["Region_plot"].value_counts()
-    total_weine = regionen_it.sum()
-    prozent = (regionen_it / total_weine * 100).round(1)
-
-    st.subheader(titel)
-    st.caption("Nur 75 cl Flaschen berücksichtigt.")
-
-    col1, col2 = st.columns([1.5, 1])
-
-    with col1:
-        bar_color = "#2B4C7E"  # Gleiches CI-Blau wie überall
-        fig = px.bar(
-            x=regionen_it.index,
-            y=regionen_it.values,
-            text=regionen_it.values,
-            color_discrete_sequence=[bar_color]
-        )
-        fig.update_traces(textposition="outside", textfont_size=13)
-        fig.update_layout(
-            height=chart_height,
-            plot_bgcolor="#ffffff",
-            paper_bgcolor="#ffffff",
-            xaxis_title="Region",
-            yaxis_title="Anzahl Weine",
-            xaxis_tickangle=-35,
-            margin=dict(t=35, r=15, l=5, b=60)
-        )
-        st.plotly_chart(fig, use_container_width=True)
+    def top_laender_zaehlen(regionen, top_n):
+        # Land = Teil vor dem ersten Komma (regionen.split_region)
+        return split_region(regionen)["Land"].value_counts().head(top_n)
+
+    top_laender = verteilung(df[region_col], top_laender_zaehlen, data_version, top_n=10)
+    render_distribution_panel(
+        top_laender, "Land", titel, "top10_laender",
+        figur_parameter=dict(xaxis_title="Land", chart_height=chart_height, xaxis_tickangle=-45, textfont_size=14),
+        fusszeile=f"Top 10 machen {100*top_laender.sum()/df.shape[0]:.1f}% des Sortiments aus", data_version=data_version,
+    )
 
-    with col2:
-        table_df = pd.DataFrame({
-            "Region": regionen_it.index,
-            "Anzahl": regionen_it.values,
-            "Anteil %": prozent.values
-        })
-        total_row = pd.DataFrame({
-            "Region": ["Total"],
-            "Anzahl": [total_weine],
-            "Anteil %": [prozent.sum().round(1)]
-        })
-        table_df = pd.concat([table_df, total_row], ignore_index=True)
-        st.dataframe(
-            table_df,
-            use_container_width=True,
-            hide_index=True
-        )
-        st.download_button(
-            label="Tabelle als CSV herunterladen",
-            data=table_df.to_csv(index=False).encode("utf-8"),
-            file_name=f"italien_regionen_{pd.Timestamp.now().date()}.csv",
-            mime="text/csv"
-        )
-    st.caption(f"Total: {total_weine} Italien-Weine | Stand: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M')}")
 
+# Regionen eines Landes im Coop-Sortiment – Zuordnung Subregion -> Hauptregion aus regionen.REGIONEN_REGELN
+def _coop_regionen_anzahl(regionen: pd.Series, land: str) -> pd.Series:
+    """Anzahl Weine je Hauptregion für die Weine eines Landes (Coop-Spalte 'Region')."""
+    zerlegt = split_region(regionen)
+    return zerlegt.loc[zerlegt["Land"] == land, "Hauptregion"].value_counts()
 
-import streamlit as st
-import pandas as pd
-import plotly.express as px
-import unicodedata
 
-def plot_schweiz_regionen(
+def plot_coop_regionen(
     df: pd.DataFrame,
+    land: str,
+    titel: str,
     region_col: str = "Region",
-    titel: str = "Weinregionen der Schweiz im Sortiment",
-    chart_height: int = 450
+    chart_height: int = 450,
+    data_version=None,
 ):
     """
-    Zeigt die Regionen der Schweiz als Balkendiagramm und Tabelle nebeneinander.
-    Spezial- und Normalisierungslogik wie im Quellskript.
+    Zeigt die Regionen eines Landes als Balkendiagramm und Tabelle nebeneinander (inkl. Normalisierung und Mapping).
+    Totalreihe, Downloadbutton.
     """
-    def normalize_string(text):
-        text = str(text).lower()
-        text = ''.join(c for c in unicodedata.normalize('NFD', text) if unicodedata.category(c) != 'Mn')
-        text = text.replace('–', '-').replace(' ', '-')
-        return text
-
-    subregion_mapping = {
-        "bodensee": "Ostschweiz",
-        "ubrige-schweiz": "Andere"
-    }
+    regionen = verteilung(df[region_col], _coop_regionen_anzahl, data_version, land=land)
+    render_distribution_panel(
+        regionen, "Region", titel, f"{land.lower()}_regionen",
+        figur_parameter=dict(xaxis_title="Region", chart_height=chart_height),
+        hinweis="Nur 75 cl Flaschen berücksichtigt.", fusszeile=f"Total: {regionen.sum()} {land}-Weine",
+        data_version=data_version,
+    )
 
-    def categorize_region(subregion_normalized):
-        if subregion_normalized in subregion_mapping:
-            return subregion_mapping[subregion_normalized]
-        # Schreibweisen angleichen
-        if subregion_normalized == "wallis":
-            return "Wallis"
-        elif subregion_normalized == "waadt":
-            return "Waadt"
-        elif subregion_normalized == "tessin":
-            return "Tessin"
-        elif subregion_normalized == "drei-seen-region":
-            return "Drei-Seen-Region"
-        elif subregion_normalized == "genf":
-            return "Genf"
-        elif subregion_normalized == "basel/aargau":
-            return "Basel/Aargau"
-        elif subregion_normalized == "zurich":
-            return "Zürich"
-        elif subregion_normalized == "schaffhausen":
-            return "Schaffhausen"
-        elif subregion_normalized == "graubunden":
-            return "Graubünden"
-        elif subregion_normalized == "ostschweiz":
-            return "Ostschweiz"
-        elif subregion_normalized == "thurgau":
-            return "Thurgau"
-        elif subregion_normalized == "st.-gallen":
-            return "St. Gallen"
-        return subregion_normalized.capitalize()
-
-    df = df.copy()
-    df["Land"] = df[region_col].apply(lambda x: str(x).split(",")[0].strip() if "," in str(x) else str(x))
-    df["Subregion"] = df[region_col].apply(lambda x: str(x).split(",")[1].strip() if "," in str(x) else "Keine Subregion")
-    df_ch = df[df["Land"] == "Schweiz"].copy()
-    df_ch["Subregion_normalized"] = df_ch["Subregion"].apply(normalize_string)
-    df_ch["Region_plot"] = df_ch["Subregion_normalized"].apply(categorize_region)
-    regionen_ch = df_ch["Region_plot"].value_counts()
-    total_weine = regionen_ch.sum()
-    prozent = (regionen_ch / total_weine * 100).round(1)
 
-    st.subheader(titel)
-    st.caption("Nur 75 cl Flaschen berücksichtigt.")
+def plot_frankreich_regionen(df: pd.DataFrame, region_col: str = "Region", titel: str = "Weinregionen Frankreichs im Sortiment",
+                             chart_height: int = 450, data_version=None):
+    plot_coop_regionen(df, "Frankreich", titel, region_col=region_col, chart_height=chart_height, data_version=data_version)
 
-    col1, col2 = st.columns([1.5, 1])
 
-    with col1:
-        bar_color = "#2B4C7E"
-        fig = px.bar(
-            x=regionen_ch.index,
-            y=regionen_ch.values,
-            text=regionen_ch.values,
-            color_discrete_sequence=[bar_color]
-        )
-        fig.update_traces(textposition="outside", textfont_size=13)
-        fig.update_layout(
-            height=chart_height,
-            plot_bgcolor="#ffffff",
-            paper_bgcolor="#ffffff",
-            xaxis_title="Region",
-            yaxis_title="Anzahl Weine",
-            xaxis_tickangle=-35,
-            margin=dict(t=35, r=15, l=5, b=60)
-        )
-        st.plotly_chart(fig, use_container_width=True)
+def plot_italien_regionen(df: pd.DataFrame, region_col: str = "Region", titel: str = "Weinregionen Italiens im Sortiment",
+                          chart_height: int = 450, data_version=None):
+    plot_coop_regionen(df, "Italien", titel, region_col=region_col, chart_height=chart_height, data_version=data_version)
 
-    with col2:
-        table_df = pd.DataFrame({
-            "Region": regionen_ch.index,
-            "Anzahl": regionen_ch.values,
-            "Anteil %": prozent.values
-        })
-        total_row = pd.DataFrame({
-            "Region": ["Total"],
-            "Anzahl": [total_weine],
-            "Anteil %": [prozent.sum().round(1)]
-        })
-        table_df = pd.concat([table_df, total_row], ignore_index=True)
-        st.dataframe(
-            table_df,
-            use_container_width=True,
-            hide_index=True
-        )
-        st.download_button(
-            label="Tabelle als CSV herunterladen",
-            data=table_df.to_csv(index=False).encode("utf-8"),
-            file_name=f"schweiz_regionen_{pd.Timestamp.now().date()}.csv",
-            mime="text/csv"
-        )
-    st.caption(f"Total: {total_weine} Schweiz-Weine | Stand: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M')}")
 
+def plot_schweiz_regionen(df: pd.DataFrame, region_col: str = "Region", titel: str = "Weinregionen der Schweiz im Sortiment",
+                          chart_height: int = 450, data_version=None):
+    plot_coop_regionen(df, "Schweiz", titel, region_col=region_col, chart_height=chart_height, data_version=data_version)
 
-import streamlit as st
-import pandas as pd
-import plotly.express as px
-import unicodedata
-import re
 
-def plot_spanien_regionen(
-    df: pd.DataFrame,
-    region_col: str = "Region",
-    titel: str = "Weinregionen Spaniens im Sortiment",
-    chart_height: int = 450
-):
-    """
-    Zeigt die Regionen Spaniens als Balkendiagramm und Tabelle nebeneinander.
-    Inklusive Normalisierung/Mappings und Download, wie alle anderen Regionenanalysen.
-    """
-    def normalize_string(text):
-        text = str(text).lower()
-        text = ''.join(c for c in unicodedata.normalize('NFD', text) if unicodedata.category(c) != 'Mn')
-        text = text.replace('–', '-').replace(' ', '-')
-        text = re.sub(r'-+', '-', text)
-        text = re.sub(r'--+', '-', text)
-        return text
-
-    subregion_mapping = {
-        "priorat": "Katalonien",
-        "ribera-del-duero": "Castilla y León",
-        "rueda": "Castilla y León",
-        "toro": "Castilla y León",
-        "kastilien-leon": "Castilla y León",
-        "cigales": "Castilla y León",
-        "requena": "Valencia",
-        "yecla-do": "Murcia",
-        "kastilien-la-mancha": "Castilla-La Mancha",
-        "mentrida-do-(toledo)": "Castilla-La Mancha",
-        "dehesa-del-carrizal-do": "Castilla-La Mancha",
-        "kastilien-l-a-mancha": "Castilla-La Mancha",
-        "alava": "Rioja",
-        "mallorca": "Balearen",
-        "ubriges-spanien": "Andere",
-        "keine-subregion": "Andere"
-    }
-
-    def categorize_region(subregion_normalized):
-        if subregion_normalized in subregion_mapping:
-            return subregion_mapping[subregion_normalized]
-        if subregion_normalized == "teneriffa":
-            return "Teneriffa"
-        elif subregion_normalized == "navarra":
-            return "Navarra"
-        elif subregion_normalized == "galicien":
-            return "Galicien"
-        elif subregion_normalized == "somontano":
-            return "Somontano"
-        elif subregion_normalized == "jerez":
-            return "Jerez"
-        return subregion_normalized.capitalize()
-
-    df = df.copy()
-    df["Land"] = df[region_col].apply(lambda x: str(x).split(",")[0].strip() if "," in str(x) else str(x))
-    df["Subregion"] = df[region_col].apply(lambda x: str(x).split(",")[1].strip() if "," in str(x) else "Keine Subregion")
-    df_es = df[df["Land"] == "Spanien"].copy()
-    df_es["Subregion_normalized"] = df_es["Subregion"].apply(normalize_string)
-    df_es["Region_plot"] = df_es["Subregion_normalized"].apply(categorize_region)
-    regionen_es = df_es["Region_plot"].value_counts()
-    total_weine = regionen_es.sum()
-    prozent = (regionen_es / total_weine * 100).round(1)
-
-    st.subheader(titel)
-    st.caption("Nur 75 cl Flaschen berücksichtigt.")
-
-    col1, col2 = st.columns([1.5, 1])
-
-    with col1:
-        bar_color = "#2B4C7E"
-        fig = px.bar(
-            x=regionen_es.index,
-            y=regionen_es.values,
-            text=regionen_es.values,
-            color_discrete_sequence=[bar_color]
-        )
-        fig.update_traces(textposition="outside", textfont_size=13)
-        fig.update_layout(
-            height=chart_height,
-            plot_bgcolor="#ffffff",
-            paper_bgcolor="#ffffff",
-            xaxis_title="Region",
-            yaxis_title="Anzahl Weine",
-            xaxis_tickangle=-35,
-            margin=dict(t=35, r=15, l=5, b=60)
-        )
-        st.plotly_chart(fig, use_container_width=True)
-
-    with col2:
-        table_df = pd.DataFrame({
-            "Region": regionen_es.index,
-            "Anzahl": regionen_es.values,
-            "Anteil %": prozent.values
-        })
-        total_row = pd.DataFrame({
-            "Region": ["Total"],
-            "Anzahl": [total_weine],
-            "Anteil %": [prozent.sum().round(1)]
-        })
-        table_df = pd.concat([table_df, total_row], ignore_index=True)
-        st.dataframe(
-            table_df,
-            use_container_width=True,
-            hide_index=True
-        )
-        st.download_button(
-            label="Tabelle als CSV herunterladen",
-            data=table_df.to_csv(index=False).encode("utf-8"),
-            file_name=f"spanien_regionen_{pd.Timestamp.now().date()}.csv",
-            mime="text/csv"
-        )
-    st.caption(f"Total: {total_weine} Spanien-Weine | Stand: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M')}")
+def plot_spanien_regionen(df: pd.DataFrame, region_col: str = "Region", titel: str = "Weinregionen Spaniens im Sortiment",
+                          chart_height: int = 450, data_version=None):
+    plot_coop_regionen(df, "Spanien", titel, region_col=region_col, chart_height=chart_height, data_version=data_version)
 
 
 import streamlit as st
@@ -849,552 +418,157 @@ def plot_top_herkunftslaender_fp(
     df: pd.DataFrame,
     herkunft_col: str = "Herkunft",
     titel: str = "Top-10 Herkunftsländer im Flaschenpost-Sortiment",
-    chart_height: int = 450
+    chart_height: int = 450,
+    data_version=None,
 ):
     """
     Zeigt die Top-10 Herkunftsländer für Flaschenpost, Land aus 'Herkunft' vor ">", mit Tabelle & Download.
     """
-    # Land extrahieren (alles vor >)
-    df = df.copy()
-    df["Land"] = df[herkunft_col].apply(lambda x: str(x).split(">")[0].strip() if ">" in str(x) else str(x).strip())
-    top_laender = df["Land"].value_counts().head(10)
-    total_weine = top_laender.sum()
-    prozent = (top_laender / total_weine * 100).round(1)
-
-    st.subheader(titel)
-    col1, col2 = st.columns([1.5, 1])
-
-    with col1:
-        bar_color = "#2B4C7E" # CI-Konform, satter Blauton
-        fig = px.bar(
-            x=top_laender.index,
-            y=top_laender.values,
-            text=top_laender.values,
-            color_discrete_sequence=[bar_color]
-        )
-        fig.update_traces(textposition="outside", textfont_size=14)
-        fig.update_layout(
-            height=chart_height,
-            plot_bgcolor="#ffffff",
-            paper_bgcolor="#ffffff",
-            xaxis_title="Land",
-            yaxis_title="Anzahl Weine",
-            xaxis_tickangle=-45,
-            margin=dict(t=35, r=15, l=5, b=60)
-        )
-        st.plotly_chart(fig, use_container_width=True)
+    def top_laender_zaehlen(herkunft, top_n):
+        # Land extrahieren (alles vor >)
+        return fp_land(herkunft).value_counts().head(top_n)
+
+    top_laender = verteilung(df[herkunft_col], top_laender_zaehlen, data_version, top_n=10)
+    render_distribution_panel(
+        top_laender, "Land", titel, "top10_herkunft_flaschenpost",
+        figur_parameter=dict(xaxis_title="Land", chart_height=chart_height, xaxis_tickangle=-45, textfont_size=14),
+        fusszeile=f"Top 10 machen {100*top_laender.sum()/df.shape[0]:.1f}% des Sortiments aus", data_version=data_version,
+    )
 
-    with col2:
-        table_df = pd.DataFrame({
-            "Land": top_laender.index,
-            "Anzahl": top_laender.values,
-            "Anteil %": prozent.values
-        })
-        total_row = pd.DataFrame({
-            "Land": ["Total"],
-            "Anzahl": [total_weine],
-            "Anteil %": [prozent.sum().round(1)]
-        })
-        table_df = pd.concat([table_df, total_row], ignore_index=True)
-        st.dataframe(
-            table_df,
-            use_container_width=True,
-            hide_index=True
-        )
-        st.download_button(
-            label="Tabelle als CSV herunterladen",
-            data=table_df.to_csv(index=False).encode("utf-8"),
-            file_name=f"top10_herkunft_flaschenpost_{pd.Timestamp.now().date()}.csv",
-            mime="text/csv"
-        )
-    st.caption(f"Top 10 machen {100*total_weine/df.shape[0]:.1f}% des Sortiments aus | Stand: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M')}")
 
+# Regionen eines Landes im FP-Sortiment – Zuordnung Subregion -> Hauptregion aus regionen.FP_REGIONEN_MAPPING
+def _fp_regionen_anzahl(herkunft: pd.Series, land: str) -> pd.Series:
+    """Anzahl Weine je Hauptregion für die FP-Weine eines Landes (Spalte 'Herkunft')."""
+    zerlegt = split_herkunft(herkunft)
+    return zerlegt.loc[zerlegt["Land"] == land, "Hauptregion"].value_counts()
 
-import streamlit as st
-import pandas as pd
-import plotly.express as px
 
-def plot_italien_regionen_fp(
+def plot_fp_regionen(
     df: pd.DataFrame,
+    land: str,
+    titel: str,
     herkunft_col: str = "Herkunft",
-    titel: str = "Weinregionen Italiens im Flaschenpost-Sortiment",
-    chart_height: int = 450
+    chart_height: int = 450,
+    data_version=None,
 ):
     """
-    Italien-Regionen für Flaschenpost.
-    Subregion wird aus 'Herkunft' nach erster Ebene 'Italien > ...' extrahiert und gemappt.
+    Regionen eines Landes für Flaschenpost, Subregion aus 'Herkunft' nach 'Land > ...', Mapping wie geliefert.
     """
-    df = df.copy()
-    # 1. Land aus Herkunft holen
-    df["Land"] = df[herkunft_col].apply(lambda x: str(x).split(">")[0].strip())
-    # 2. Nur Italien
-    df_italien = df[df["Land"] == "Italien"].copy()
-    # 3. Subregion alles nach "Italien >"
-    df_italien["Subregion"] = df_italien[herkunft_col].apply(lambda x: ">".join(str(x).split(">")[1:]).strip() if ">" in str(x) else "Keine Subregion")
-    # 4. Mapping wie in deinem Skript
-    subregion_mapping = {
-        "Abruzzen > Chieti": "Abruzzen",
-        "Apulien > Gargano": "Apulien",
-        "Apulien > Manduria": "Apulien",
-        "Apulien > Salento": "Apulien",
-        "Emilia-Romagna > Forli-Cesena": "Emilia-Romagna",
-        "Friaul > Isonzo": "Friaul",
-        "Latium > Castelli Romani": "Latium",
-        "Latium > Frascati": "Latium",
-        "Ligurien > Portofino": "Ligurien",
-        "Lombardei > Bergamo": "Lombardei",
-        "Lombardei > Montello": "Lombardei",
-        "Lombardei > Pavia": "Lombardei",
-        "Lombardei > Veltlin": "Lombardei",
-        "Marche > Matelica": "Marche",
-        "Marche > Offida": "Marche",
-        "Piemont > Alba": "Piemont",
-        "Piemont > Alessandria": "Piemont",
-        "Piemont > Alta Langa": "Piemont",
-        "Piemont > Castelletto": "Piemont",
-        "Piemont > Colline": "Piemont",
-        "Piemont > Cuneo": "Piemont",
-        "Piemont > Langhe": "Piemont",
-        "Piemont > Monferrato": "Piemont",
-        "Piemont > Monforte d'Alba": "Piemont",
-        "Piemont > Vezza d’Alba": "Piemont",
-        "Sizilien > Caltanissetta": "Sizilien",
-        "Sizilien > Noto": "Sizilien",
-        "Sizilien > West-Sizilien": "Sizilien",
-        "Veneto > Asolo": "Venetien",
-        "Veneto > Colli Euganei": "Venetien",
-        "Veneto > Valdobbiadine": "Venetien",
-        "Keine Subregion": "Andere",
-    }
-    df_italien["Hauptregion"] = df_italien["Subregion"].apply(lambda x: subregion_mapping.get(x, x.split(">")[0].strip()))
-    regionen_italien = df_italien["Hauptregion"].value_counts()
-    total_weine = regionen_italien.sum()
-    prozent = (regionen_italien / total_weine * 100).round(1)
+    regionen = verteilung(df[herkunft_col], _fp_regionen_anzahl, data_version, land=land)
+    render_distribution_panel(
+        regionen, "Region", titel, f"{land.lower()}_regionen_fp",
+        figur_parameter=dict(xaxis_title="Region", chart_height=chart_height),
+        fusszeile=f"Total: {regionen.sum()} {land}-Weine", data_version=data_version,
+    )
 
-    st.subheader(titel)
-    col1, col2 = st.columns([1.5, 1])
 
-    with col1:
-        bar_color = "#2B4C7E"
-        fig = px.bar(
-            x=regionen_italien.index,
-            y=regionen_italien.values,
-            text=regionen_italien.values,
-            color_discrete_sequence=[bar_color]
-        )
-        fig.update_traces(textposition="outside", textfont_size=13)
-        fig.update_layout(
-            height=chart_height,
-            plot_bgcolor="#ffffff",
-            paper_bgcolor="#ffffff",
-            xaxis_title="Region",
-            yaxis_title="Anzahl Weine",
-            xaxis_tickangle=-35,
-            margin=dict(t=35, r=15, l=5, b=60)
-        )
-        st.plotly_chart(fig, use_container_width=True)
+def plot_italien_regionen_fp(df: pd.DataFrame, herkunft_col: str = "Herkunft",
+                             titel: str = "Weinregionen Italiens im Flaschenpost-Sortiment", chart_height: int = 450, data_version=None):
+    plot_fp_regionen(df, "Italien", titel, herkunft_col=herkunft_col, chart_height=chart_height, data_version=data_version)
 
-    with col2:
-        table_df = pd.DataFrame({
-            "Region": regionen_italien.index,
-            "Anzahl": regionen_italien.values,
-            "Anteil %": prozent.values
-        })
-        total_row = pd.DataFrame({
-            "Region": ["Total"],
-            "Anzahl": [total_weine],
-            "Anteil %": [prozent.sum().round(1)]
-        })
-        table_df = pd.concat([table_df, total_row], ignore_index=True)
-        st.dataframe(
-            table_df,
-            use_container_width=True,
-            hide_index=True
-        )
-        st.download_button(
-            label="Tabelle als CSV herunterladen",
-            data=table_df.to_csv(index=False).encode("utf-8"),
-            file_name=f"italien_regionen_fp_{pd.Timestamp.now().date()}.csv",
-            mime="text/csv"
-        )
-    st.caption(f"Total: {total_weine} Italien-Weine | Stand: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M')}")
 
+def plot_frankreich_regionen_fp(df: pd.DataFrame, herkunft_col: str = "Herkunft",
+                                titel: str = "Weinregionen Frankreichs im Flaschenpost-Sortiment", chart_height: int = 450, data_version=None):
+    plot_fp_regionen(df, "Frankreich", titel, herkunft_col=herkunft_col, chart_height=chart_height, data_version=data_version)
 
-import streamlit as st
-import pandas as pd
-import plotly.express as px
 
-def plot_frankreich_regionen_fp(
-    df: pd.DataFrame,
-    herkunft_col: str = "Herkunft",
-    titel: str = "Weinregionen Frankreichs im Flaschenpost-Sortiment",
-    chart_height: int = 450
-):
-    """
-    Regionen Frankreichs für Flaschenpost, Subregion aus 'Herkunft' nach 'Frankreich > ...', Mapping wie geliefert.
-    """
-    df = df.copy()
-    df["Land"] = df[herkunft_col].apply(lambda x: str(x).split(">")[0].strip())
-    df_frankreich = df[df["Land"] == "Frankreich"].copy()
-    df_frankreich["Subregion"] = df_frankreich[herkunft_col].apply(
-        lambda x: ">".join(str(x).split(">")[1:]).strip() if ">" in str(x) else "Keine Subregion"
-    )
-    subregion_mapping = {
-        # Bordeaux (alle Subregionen zusammenfassen)
-        "Bordeaux > Barsac": "Bordeaux",
-        "Bordeaux > Canon-Fronsac": "Bordeaux",
-        "Bordeaux > Côtes de Blaye": "Bordeaux",
-        "Bordeaux > Côtes de Bourg": "Bordeaux",
-        "Bordeaux > Côtes de Castillon": "Bordeaux",
-        "Bordeaux > Côtes de Francs": "Bordeaux",
-        "Bordeaux > Entre-Deux-Mers": "Bordeaux",
-        "Bordeaux > Fronsac": "Bordeaux",
-        "Bordeaux > Graves": "Bordeaux",
-        "Bordeaux > Haut-Médoc": "Bordeaux",
-        "Bordeaux > Lalande-de-Pomerol": "Bordeaux",
-        "Bordeaux > Margaux (Médoc)": "Bordeaux",
-        "Bordeaux > Moulis & Listrac (Médoc)": "Bordeaux",
-        "Bordeaux > Pauillac (Médoc)": "Bordeaux",
-        "Bordeaux > Pessac-Léognan": "Bordeaux",
-        "Bordeaux > Pomerol": "Bordeaux",
-        "Bordeaux > Premières Côtes de Bordeaux": "Bordeaux",
-        "Bordeaux > Sauternes": "Bordeaux",
-        "Bordeaux > St-Emilion": "Bordeaux",
-        "Bordeaux > St-Estèphe (Médoc)": "Bordeaux",
-        "Bordeaux > St-Julien (Médoc)": "Bordeaux",
-        "Bordeaux > Übriges Médoc": "Bordeaux",
-        # Burgund
-        "Burgund > Beaujolais": "Burgund",
-        "Burgund > Beaujolais > Saint-Amour": "Burgund",
-        "Burgund > Chablis": "Burgund",
-        "Burgund > Côte Chalonnaise (Côte d'Or)": "Burgund",
-        "Burgund > Côte de Beaune (Côte d'Or)": "Burgund",
-        "Burgund > Côte de Beaune (Côte d'Or) > Volnay": "Burgund",
-        "Burgund > Côte de Nuits (Côte d'Or)": "Burgund",
-        "Burgund > Mâcon": "Burgund",
-        # Rhône
-        "Côtes du Rhône": "Rhône",
-        "Côtes du Rhône > Châteauneuf-du-Pape (Südliche Rhône)": "Rhône",
-        "Côtes du Rhône > Côtes du Ventoux (Südliche Rhône)": "Rhône",
-        "Côtes du Rhône > Grignan-les-Adhémar": "Rhône",
-        "Côtes du Rhône > Nördliche Rhône": "Rhône",
-        "Côtes du Rhône > Übrige Südliche Rhône": "Rhône",
-        # Loire
-        "Loire > Anjou-Saumour": "Loire",
-        "Loire > Obere Loire": "Loire",
-        "Loire > Pays Nantais (Muscadet)": "Loire",
-        "Loire > Touraine": "Loire",
-        # Südfrankreich (Midi/Provence)
-        "Midi - Languedoc-Roussillon": "Südfrankreich",
-        "Midi - Languedoc-Roussillon > Corbières": "Südfrankreich",
-        "Midi - Languedoc-Roussillon > Coteaux du Languedoc": "Südfrankreich",
-        "Midi - Languedoc-Roussillon > Minervois": "Südfrankreich",
-        "Midi - Languedoc-Roussillon > Minervois-La-Livinière": "Südfrankreich",
-        "Midi - Languedoc-Roussillon > Roussillon": "Südfrankreich",
-        "Midi - Languedoc-Roussillon > Terrasses de Béziers": "Südfrankreich",
-        "Provence": "Südfrankreich",
-        "Provence > Côte d’Azur > L'Isle-sur-la-Sorgue": "Südfrankreich",
-        "Okzitanien": "Andere",
-        "Okzitanien > Hérault": "Andere",
-        "Okzitanien > Sud France": "Andere",
-        # Sonstige
-        "Champagne": "Champagne",
-        "Elsass": "Elsass",
-        "Jura": "Jura",
-        "Korsika": "Korsika",
-        "Savoyen": "Savoyen",
-        "Südwesten": "Südwesten",
-        "Südwesten > Bergerac": "Südwesten",
-        "Südwesten > Béarn & Pyrenäen": "Südwesten",
-        "Südwesten > Cahors": "Südwesten",
-        "Südwesten > Gaillac": "Südwesten",
-        "Keine Subregion": "Andere",
-        "Auvergne-Rhône-Alpes": "Andere",
-        "Normandie": "Andere"
-    }
-    df_frankreich["Hauptregion"] = df_frankreich["Subregion"].apply(
-        lambda x: subregion_mapping.get(x, x.split(">")[0].strip())
-    )
-    regionen_frankreich = df_frankreich["Hauptregion"].value_counts()
-    total_weine = regionen_frankreich.sum()
-    prozent = (regionen_frankreich / total_weine * 100).round(1)
+def plot_spanien_regionen_fp(df: pd.DataFrame, herkunft_col: str = "Herkunft",
+                             titel: str = "Weinregionen Spaniens im Flaschenpost-Sortiment", chart_height: int = 450, data_version=None):
+    plot_fp_regionen(df, "Spanien", titel, herkunft_col=herkunft_col, chart_height=chart_height, data_version=data_version)
 
-    st.subheader(titel)
-    col1, col2 = st.columns([1.5, 1])
 
-    with col1:
-        bar_color = "#2B4C7E"
-        fig = px.bar(
-            x=regionen_frankreich.index,
-            y=regionen_frankreich.values,
-            text=regionen_frankreich.values,
-            color_discrete_sequence=[bar_color]
-        )
-        fig.update_traces(textposition="outside", textfont_size=13)
-        fig.update_layout(
-            height=chart_height,
-            plot_bgcolor="#ffffff",
-            paper_bgcolor="#ffffff",
-            xaxis_title="Region",
-            yaxis_title="Anzahl Weine",
-            xaxis_tickangle=-35,
-            margin=dict(t=35, r=15, l=5, b=60)
-        )
-        st.plotly_chart(fig, use_container_width=True)
+def plot_schweiz_regionen_fp(df: pd.DataFrame, herkunft_col: str = "Herkunft",
+                             titel: str = "Weinregionen der Schweiz im Flaschenpost-Sortiment", chart_height: int = 450, data_version=None):
+    plot_fp_regionen(df, "Schweiz", titel, herkunft_col=herkunft_col, chart_height=chart_height, data_version=data_version)
 
-    with col2:
-        table_df = pd.DataFrame({
-            "Region": regionen_frankreich.index,
-            "Anzahl": regionen_frankreich.values,
-            "Anteil %": prozent.values
-        })
-        total_row = pd.DataFrame({
-            "Region": ["Total"],
-            "Anzahl": [total_weine],
-            "Anteil %": [prozent.sum().round(1)]
-        })
-        table_df = pd.concat([table_df, total_row], ignore_index=True)
-        st.dataframe(
-            table_df,
-            use_container_width=True,
-            hide_index=True
-        )
-        st.download_button(
-            label="Tabelle als CSV herunterladen",
-            data=table_df.to_csv(index=False).encode("utf-8"),
-            file_name=f"frankreich_regionen_fp_{pd.Timestamp.now().date()}.csv",
-            mime="text/csv"
-        )
-    st.caption(f"Total: {total_weine} Frankreich-Weine | Stand: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M')}")
 
+# === Kreuzfilter der Sortiment-Tabs: Diagramme filtern sich gegenseitig über den Zähl-Würfel (sortiment_cube) ===
+WEINTYP_FARBEN = {"Rotwein": "#8B0000", "Weisswein": "#FADA5E", "Roséwein": "#F6ADC6", "Schaumwein": "#E6E6FA"}
+KREUZFILTER_TOP_LAENDER = 10
 
-import streamlit as st
-import pandas as pd
-import plotly.express as px
 
-def plot_spanien_regionen_fp(
-    df: pd.DataFrame,
-    herkunft_col: str = "Herkunft",
-    titel: str = "Weinregionen Spaniens im Flaschenpost-Sortiment",
-    chart_height: int = 450
-):
-    """
-    Regionen Spanien für Flaschenpost, Subregion aus 'Herkunft' nach 'Spanien > ...', komplexes Mapping wie geliefert.
-    """
-    df = df.copy()
-    df["Land"] = df[herkunft_col].apply(lambda x: str(x).split(">")[0].strip())
-    df_spanien = df[df["Land"] == "Spanien"].copy()
-    df_spanien["Subregion"] = df_spanien[herkunft_col].apply(
-        lambda x: ">".join(str(x).split(">")[1:]).strip() if ">" in str(x) else "Keine Subregion"
+def _kreuzfilter_balken(anzahl: pd.Series, auswahl: tuple, xaxis_title: str, chart_height: int, farben: dict = None):
+    """Anklickbares Balkendiagramm des Kreuzfilters: ausgewählte Kategorien voll, übrige abgeschwächt."""
+    fig = _anzahl_balken(anzahl, xaxis_title=xaxis_title, chart_height=chart_height)
+    fig.update_traces(
+        marker_color=[(farben or {}).get(kategorie, BALKEN_FARBE) for kategorie in anzahl.index],
+        marker_opacity=[1.0 if not auswahl or kategorie in auswahl else 0.35 for kategorie in anzahl.index],
+        marker_line=dict(color="#555555", width=0.5),
     )
-    subregion_mapping = {
-        "Andalusien": "Andalusien",
-        "Balearen": "Balearen",
-        "Balearen > Mallorca": "Balearen",
-        "Baskenland": "Baskenland",
-        "Baskenland > Getariako Txakolina": "Baskenland",
-        "Duero-Tal (Castilla y Leon)": "Castilla y León",
-        "Duero-Tal (Castilla y Leon) > Bierzo": "Castilla y León",
-        "Duero-Tal (Castilla y Leon) > Cigales": "Castilla y León",
-        "Duero-Tal (Castilla y Leon) > Ribera del Duero": "Castilla y León",
-        "Duero-Tal (Castilla y Leon) > Rueda": "Castilla y León",
-        "Duero-Tal (Castilla y Leon) > Toro": "Castilla y León",
-        "Extremadura": "Extremadura",
-        "Galizien": "Galizien",
-        "Galizien > Monterrei": "Galizien",
-        "Galizien > Ribeira Sacra": "Galizien",
-        "Galizien > Ribeiro": "Galizien",
-        "Galizien > Rías Baixas": "Galizien",
-        "Galizien > Valdeorras": "Galizien",
-        "Kanarische Inseln": "Kanarische Inseln",
-        "Kanarische Inseln > Teneriffa": "Kanarische Inseln",
-        "Katalonien": "Katalonien",
-        "Katalonien > Ampurdán-Costa Brava": "Katalonien",
-        "Katalonien > Barcelona": "Katalonien",
-        "Katalonien > Castellet i la Gornal": "Katalonien",
-        "Katalonien > Cava": "Katalonien",
-        "Katalonien > Costers del Segre": "Katalonien",
-        "Katalonien > Cónca de Barberà": "Katalonien",
-        "Katalonien > Montsant": "Katalonien",
-        "Katalonien > Penedès": "Katalonien",
-        "Katalonien > Pla de Bages": "Katalonien",
-        "Katalonien > Tarragona": "Katalonien",
-        "Katalonien > Terra Alta": "Katalonien",
-        "Levante": "Levante",
-        "Levante > Alicante": "Levante",
-        "Levante > Murcia": "Levante",
-        "Levante > Valencia": "Levante",
-        "Meseta": "Meseta",
-        "Meseta > Castilla-La Mancha": "Meseta",
-        "Meseta > Madrid": "Meseta",
-        "Oberer Ebro": "Oberer Ebro",
-        "Oberer Ebro > Aragón": "Oberer Ebro",
-        "Oberer Ebro > La Rioja": "Oberer Ebro",
-        "Oberer Ebro > La Rioja > Rioja Alavesa": "Oberer Ebro",
-        "Oberer Ebro > La Rioja > Rioja Alta": "Oberer Ebro",
-        "Oberer Ebro > La Rioja > Rioja Baja": "Oberer Ebro",
-        "Oberer Ebro > Navarra": "Oberer Ebro",
-        "Somontano": "Somontano",
-        "Valtuille": "Castilla y León",
-        "Keine Subregion": "Andere"
-    }
-    df_spanien["Hauptregion"] = df_spanien["Subregion"].map(subregion_mapping).fillna("Andere")
-    regionen_spanien = df_spanien["Hauptregion"].value_counts()
-    total_weine = regionen_spanien.sum()
-    prozent = (regionen_spanien / total_weine * 100).round(1)
+    return fig
 
-    st.subheader(titel)
-    col1, col2 = st.columns([1.5, 1])
 
-    with col1:
-        bar_color = "#2B4C7E"
-        fig = px.bar(
-            x=regionen_spanien.index,
-            y=regionen_spanien.values,
-            text=regionen_spanien.values,
-            color_discrete_sequence=[bar_color]
-        )
-        fig.update_traces(textposition="outside", textfont_size=13)
-        fig.update_layout(
-            height=chart_height,
-            plot_bgcolor="#ffffff",
-            paper_bgcolor="#ffffff",
-            xaxis_title="Region",
-            yaxis_title="Anzahl Weine",
-            xaxis_tickangle=-35,
-            margin=dict(t=35, r=15, l=5, b=60)
-        )
-        st.plotly_chart(fig, use_container_width=True)
+def _kreuzfilter_klick(praefix: str, dimension: str):
+    """
+    on_select-Callback: übernimmt die angeklickten Kategorien eines Diagramms in die Auswahl (keine = Filter aufheben).
+    Die Auswahl liegt in st.session_state[f"{praefix}_kreuzfilter"], denn die Selection eines Diagramms geht verloren,
+    sobald sich seine Figur ändert.
+    """
+    ereignis = st.session_state.get(f"{praefix}_kf_{dimension}") or {}
+    punkte = ereignis.get("selection", {}).get("points", [])
+    werte = tuple(dict.fromkeys(punkt["x"] for punkt in punkte if punkt.get("x") is not None))
+    auswahl = dict(st.session_state.get(f"{praefix}_kreuzfilter", {}))
+    if werte:
+        auswahl[dimension] = werte
+    else:
+        auswahl.pop(dimension, None)
+    if dimension == DIM_LAND:
+        auswahl.pop(DIM_REGION, None)  # Regionen gehören zum bisher gewählten Land
+    st.session_state[f"{praefix}_kreuzfilter"] = auswahl
 
-    with col2:
-        table_df = pd.DataFrame({
-            "Region": regionen_spanien.index,
-            "Anzahl": regionen_spanien.values,
-            "Anteil %": prozent.values
-        })
-        total_row = pd.DataFrame({
-            "Region": ["Total"],
-            "Anzahl": [total_weine],
-            "Anteil %": [prozent.sum().round(1)]
-        })
-        table_df = pd.concat([table_df, total_row], ignore_index=True)
-        st.dataframe(
-            table_df,
-            use_container_width=True,
-            hide_index=True
-        )
-        st.download_button(
-            label="Tabelle als CSV herunterladen",
-            data=table_df.to_csv(index=False).encode("utf-8"),
-            file_name=f"spanien_regionen_fp_{pd.Timestamp.now().date()}.csv",
-            mime="text/csv"
-        )
-    st.caption(f"Total: {total_weine} Spanien-Weine | Stand: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M')}")
 
+def _kreuzfilter_zuruecksetzen(praefix: str):
+    st.session_state[f"{praefix}_kreuzfilter"] = {}
 
-import streamlit as st
-import pandas as pd
-import plotly.express as px
 
-def plot_schweiz_regionen_fp(
-    df: pd.DataFrame,
-    herkunft_col: str = "Herkunft",
-    titel: str = "Weinregionen der Schweiz im Flaschenpost-Sortiment",
-    chart_height: int = 450
-):
+@st.fragment
+def plot_sortiment_kreuzfilter(cube, praefix: str, chart_height: int = 360):
     """
-    Regionen Schweiz für Flaschenpost. Subregion nach 'Schweiz > ...', Mapping wie geliefert.
+    Kreuzfilter-Ansicht der Sortiment-Tabs: Weintyp, Preisklasse, Top-10 Länder und Regionen als Balkendiagramme.
+    Ein Klick auf Balken (Shift für Mehrfachauswahl) filtert die übrigen Diagramme, jedes Diagramm ignoriert seine
+    eigene Auswahl. Gezählt wird nur im vorberechneten Würfel (sortiment_cube.SortimentCube), die Figuren kommen
+    aus dem Figure-Cache; als Fragment rerunnt ein Klick nur diese Ansicht.
     """
-    df = df.copy()
-    df["Land"] = df[herkunft_col].apply(lambda x: str(x).split(">")[0].strip())
-    df_schweiz = df[df["Land"] == "Schweiz"].copy()
-    df_schweiz["Subregion"] = df_schweiz[herkunft_col].apply(
-        lambda x: ">".join(str(x).split(">")[1:]).strip() if ">" in str(x) else "Keine Subregion"
-    )
-    subregion_mapping = {
-        "Aargau": "Basel/Aargau",
-        "Basel": "Basel/Aargau",
-        "Basel > Basel-Landschaft": "Basel/Aargau",
-        "Freiburg": "Drei-Seen-Region",
-        "Neuenburg": "Drei-Seen-Region",
-        "Westschweiz": "Waadt",
-        "Waadt": "Waadt",
-        "Waadt > Aigle": "Waadt",
-        "Waadt > Aigle > Villeneuve": "Waadt",
-        "Waadt > Aigle > Yvorne": "Waadt",
-        "Waadt > Lavaux-Oron > Bourg-en-Lavaux > Epesses": "Waadt",
-        "Waadt > Lavaux-Oron > Bourg-en-Lavaux > Villette": "Waadt",
-        "Waadt > Morges > Aubonne": "Waadt",
-        "Waadt > Morges > Féchy": "Waadt",
-        "Waadt > Nyon > Dully": "Waadt",
-        "Waadt > Nyon > Gilly": "Waadt",
-        "Waadt > Nyon > Luins": "Waadt",
-        "Waadt > Nyon > Tartegnin": "Waadt",
-        "Waadt > Puidoux > Dézaley": "Waadt",
-        "Bern": "Bern",
-        "Bündner Herrschaft": "Graubünden",
-        "Genf": "Genf",
-        "Luzern": "Luzern",
-        "Schaffhausen": "Schaffhausen",
-        "Tessin": "Tessin",
-        "Wallis": "Wallis",
-        "Zürich": "Zürich",
-        "Ostschweiz": "Ostschweiz",
-        "Keine Subregion": "Andere"
-    }
-    df_schweiz["Hauptregion"] = df_schweiz["Subregion"].map(subregion_mapping).fillna("Andere")
-    regionen_schweiz = df_schweiz["Hauptregion"].value_counts()
-    total_weine = regionen_schweiz.sum()
-    prozent = (regionen_schweiz / total_weine * 100).round(1)
-
-    st.subheader(titel)
-    col1, col2 = st.columns([1.5, 1])
-
+    auswahl = st.session_state.get(f"{praefix}_kreuzfilter", {})
+    col_info, col_button = st.columns([4, 1])
+    with col_info:
+        filter_text = " · ".join(f"{dimension}: {', '.join(map(str, werte))}" for dimension, werte in auswahl.items())
+        st.caption(f"Auswahl: {cube.total(auswahl)} von {cube.n} Weinen | "
+                   + (filter_text or "Klick auf einen Balken filtert die übrigen Diagramme (Shift-Klick: mehrere)"))
+    with col_button:
+        st.button("Filter zurücksetzen", key=f"{praefix}_kreuzfilter_reset", disabled=not auswahl,
+                  on_click=_kreuzfilter_zuruecksetzen, args=(praefix,))
+
+    def diagramm(dimension, anzahl, titel, farben=None):
+        st.markdown(f"**{titel}**")
+        fig = gecachte_figur(_kreuzfilter_balken, anzahl, auswahl=tuple(auswahl.get(dimension, ())),
+                             xaxis_title=dimension, chart_height=chart_height, farben=farben)
+        st.plotly_chart(fig, width="stretch", key=f"{praefix}_kf_{dimension}", selection_mode="points",
+                        on_select=functools.partial(_kreuzfilter_klick, praefix, dimension))
+
+    col1, col2 = st.columns(2)
     with col1:
-        bar_color = "#2B4C7E"
-        fig = px.bar(
-            x=regionen_schweiz.index,
-            y=regionen_schweiz.values,
-            text=regionen_schweiz.values,
-            color_discrete_sequence=[bar_color]
-        )
-        fig.update_traces(textposition="outside", textfont_size=13)
-        fig.update_layout(
-            height=chart_height,
-            plot_bgcolor="#ffffff",
-            paper_bgcolor="#ffffff",
-            xaxis_title="Region",
-            yaxis_title="Anzahl Weine",
-            xaxis_tickangle=-35,
-            margin=dict(t=35, r=15, l=5, b=60)
-        )
-        st.plotly_chart(fig, use_container_width=True)
-
+        diagramm(DIM_WEINTYP, cube.anzahl(DIM_WEINTYP, auswahl), "Weintypen", farben=WEINTYP_FARBEN)
     with col2:
-        table_df = pd.DataFrame({
-            "Region": regionen_schweiz.index,
-            "Anzahl": regionen_schweiz.values,
-            "Anteil %": prozent.values
-        })
-        total_row = pd.DataFrame({
-            "Region": ["Total"],
-            "Anzahl": [total_weine],
-            "Anteil %": [prozent.sum().round(1)]
-        })
-        table_df = pd.concat([table_df, total_row], ignore_index=True)
-        st.dataframe(
-            table_df,
-            use_container_width=True,
-            hide_index=True
-        )
-        st.download_button(
-            label="Tabelle als CSV herunterladen",
-            data=table_df.to_csv(index=False).encode("utf-8"),
-            file_name=f"schweiz_regionen_fp_{pd.Timestamp.now().date()}.csv",
-            mime="text/csv"
-        )
-    st.caption(f"Total: {total_weine} Schweiz-Weine | Stand: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M')}")
-
+        diagramm(DIM_PREISKLASSE, cube.anzahl(DIM_PREISKLASSE, auswahl), "Preisklassen")
+
+    col3, col4 = st.columns(2)
+    with col3:
+        laender = cube.anzahl(DIM_LAND, auswahl)
+        laender = laender[laender > 0].sort_values(ascending=False, kind="stable")
+        # Gewählte Länder bleiben sichtbar (und abwählbar), auch wenn sie aus den Top 10 fallen
+        laender = laender[laender.index.isin(laender.index[:KREUZFILTER_TOP_LAENDER]) | laender.index.isin(auswahl.get(DIM_LAND, ()))]
+        diagramm(DIM_LAND, laender, f"Top-{KREUZFILTER_TOP_LAENDER} Herkunftsländer")
+    with col4:
+        gewaehlte_laender = auswahl.get(DIM_LAND, ())
+        regionen = cube.anzahl(DIM_REGION, auswahl) if len(gewaehlte_laender) == 1 else pd.Series(dtype=np.int64)
+        regionen = regionen[regionen > 0].sort_values(ascending=False, kind="stable")
+        if regionen.empty:
+            st.markdown("**Regionen**")
+            st.info("Ein Land mit Regionen-Zuordnung (Frankreich, Italien, Schweiz, Spanien) im Länder-Diagramm anklicken, "
+                    "um dessen Regionen zu sehen.")
+        else:
+            diagramm(DIM_REGION, regionen, f"Regionen {gewaehlte_laender[0]}")
 
 
 def plot_matching_overview_gemini(df: pd.DataFrame):
@@ -1447,18 +621,22 @@ def plot_matching_overview_gemini(df: pd.DataFrame):
 
         with col_hist:
             st.markdown("##### Verteilung der Fuzzy-Scores")
-            fig_hist = px.histogram(
-                df_auto, x="Fuzzy_Score", nbins=20,
-                color_discrete_sequence=["#0072B2"] # Ein anderer Blauton
-            )
-            fig_hist.update_layout(
-                xaxis_title="Fuzzy-Score (0-100)",
-                yaxis_title="Anzahl Matches",
-                plot_bgcolor="#F9F9F9", # Leichter Hintergrund für den Plot
-                bargap=0.1,
-                height=350 # Feste Höhe, kann angepasst werden
-            )
-            st.plotly_chart(fig_hist, use_container_width=True)
+
+            def score_histogramm(scores):
+                fig_hist = px.histogram(
+                    scores, x="Fuzzy_Score", nbins=20,
+                    color_discrete_sequence=["#0072B2"] # Ein anderer Blauton
+                )
+                fig_hist.update_layout(
+                    xaxis_title="Fuzzy-Score (0-100)",
+                    yaxis_title="Anzahl Matches",
+                    plot_bgcolor="#F9F9F9", # Leichter Hintergrund für den Plot
+                    bargap=0.1,
+                    height=350 # Feste Höhe, kann angepasst werden
+                )
+                return fig_hist
+
+            zeige_figur(score_histogramm, df_auto[["Fuzzy_Score"]])
 
         with col_score_table:
             st.markdown("##### Matches nach Score-Klasse")
@@ -1485,7 +663,7 @@ def plot_matching_overview_gemini(df: pd.DataFrame):
                 
                 st.dataframe(
                     score_tab_df.set_index("Score-Klasse"),
-                    use_container_width=True,
+                    width="stretch",
                     height=310 # Etwas weniger Höhe als Plot
                 )
                 st.caption("Zeigt, wie sich Matches auf Score-Bereiche verteilen. Höher = bessere Ähnlichkeit.")
@@ -1577,15 +755,19 @@ def plot_percent_price_comparison(df: pd.DataFrame):
     st.caption("*Preisdifferenz: (Coop − FP) / FP. Negativ = Coop günstiger, Positiv = Flaschenpost günstiger.*")
 
     st.write("### Histogramm der prozentualen Preisdifferenzen")
-    fig = px.histogram(
-        df_vgl, x="Perc_Diff", nbins=31,
-        color_discrete_sequence=["#2B4C7E"])
-    fig.update_layout(
-        xaxis_title="Preis-Differenz (% Coop minus FP)",
-        yaxis_title="Anzahl Weine",
-        plot_bgcolor="#ffffff"
-    )
-    st.plotly_chart(fig, use_container_width=True)
+
+    def differenz_histogramm(differenzen):
+        fig = px.histogram(
+            differenzen, x="Perc_Diff", nbins=31,
+            color_discrete_sequence=["#2B4C7E"])
+        fig.update_layout(
+            xaxis_title="Preis-Differenz (% Coop minus FP)",
+            yaxis_title="Anzahl Weine",
+            plot_bgcolor="#ffffff"
+        )
+        return fig
+
+    zeige_figur(differenz_histogramm, df_vgl[["Perc_Diff"]])
 
     st.write(f"**Ähnlich gepreist (±2 %)**: {n_fast_gleich} Weine ({n_fast_gleich/n_total:.1%})")
 
@@ -1698,11 +880,14 @@ def plot_percent_price_comparison_gemini1(df: pd.DataFrame): # Erwartet df mit "
     with col2:
         st.subheader("Verteilung der Preisdifferenzen")
         if "Diff_%" in df_vgl.columns and pd.api.types.is_numeric_dtype(df_vgl["Diff_%"]) and df_vgl["Diff_%"].notna().any() : # Zusätzliche Prüfung
-            fig = px.histogram(df_vgl, x="Diff_%", nbins=max(30,min(n_total//5 if n_total>0 else 30,100)), title="Histogramm der prozentualen Preisdifferenzen", labels={'Diff_%':'Preisdifferenz (%)'}, color_discrete_sequence=px.colors.qualitative.Pastel)
-            fig.add_vline(x=0, line_dash="solid",line_color="black",annotation_text="Gleicher Preis (0%)",annotation_position="top left")
-            if pd.notna(median_diff): fig.add_vline(x=median_diff,line_dash="dash",line_color="red",annotation_text=f"Median: {median_diff:.1f}%",annotation_position="top right")
-            fig.update_layout(yaxis_title="Anzahl Weinpaare",plot_bgcolor="#F9F9F9",bargap=0.1)
-            st.plotly_chart(fig,use_container_width=True)
+            def differenz_histogramm(differenzen, median_diff):
+                n_total = len(differenzen)
+                fig = px.histogram(differenzen, x="Diff_%", nbins=max(30,min(n_total//5 if n_total>0 else 30,100)), title="Histogramm der prozentualen Preisdifferenzen", labels={'Diff_%':'Preisdifferenz (%)'}, color_discrete_sequence=px.colors.qualitative.Pastel)
+                fig.add_vline(x=0, line_dash="solid",line_color="black",annotation_text="Gleicher Preis (0%)",annotation_position="top left")
+                if pd.notna(median_diff): fig.add_vline(x=median_diff,line_dash="dash",line_color="red",annotation_text=f"Median: {median_diff:.1f}%",annotation_position="top right")
+                fig.update_layout(yaxis_title="Anzahl Weinpaare",plot_bgcolor="#F9F9F9",bargap=0.1)
+                return fig
+            zeige_figur(differenz_histogramm, df_vgl[["Diff_%"]], median_diff=median_diff)
             st.caption("""Das Histogramm zeigt ...""")
         else: st.warning("Histogramm kann nicht erstellt werden (Diff_% nicht numerisch oder nur NaNs).")
 
@@ -1729,6 +914,23 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 
+# Schwellen der Preisdifferenz in % (negativ = Coop günstiger) und die zugehörigen Kategorien
+PREISLAGE_SCHWELLEN = (-10, -2, 2, 10)
+PREISLAGE_LABELS = ("🟢 Coop deutlich günstiger", "🟩 Coop günstiger", "⚪ Ähnlich", "🟥 FP günstiger", "🔴 FP deutlich günstiger")
+
+
+def preislage_kategorie(diff_pct: pd.Series) -> pd.Series:
+    """Ordnet Diff_% per np.select den Preislage-Kategorien zu (< -10, < -2, -2..2, > 2, > 10); fehlende Werte bleiben leer."""
+    werte = pd.to_numeric(diff_pct, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    unten_stark, unten, oben, oben_stark = PREISLAGE_SCHWELLEN
+    kategorie = np.select(
+        [werte < unten_stark, werte > oben_stark, werte < unten, werte > oben, ~np.isnan(werte)],
+        [PREISLAGE_LABELS[0], PREISLAGE_LABELS[4], PREISLAGE_LABELS[1], PREISLAGE_LABELS[3], PREISLAGE_LABELS[2]],
+        default=None,
+    )
+    return pd.Series(kategorie, index=diff_pct.index, dtype=object)
+
+@st.fragment
 def plot_price_outlier_table_enhanced(
     df: pd.DataFrame,
     fuzzy_col_internal: str = "Fuzzy_Score", 
@@ -1802,14 +1004,15 @@ def plot_price_outlier_table_enhanced(
     else: df_filtered["FP_URL_Link"] = None
     df_display = df_filtered.copy()
 
-    # --- Sidebar-Filter (Logik bleibt gleich, hier gekürzt) ---
-    st.sidebar.subheader("Filter & Tabellenoptionen")
+    # --- Filter (im Abschnitt statt in der Sidebar: das Fragment rendert nur seinen eigenen Bereich) ---
+    filter_bereich = st.container(border=True)
+    filter_bereich.subheader("Filter & Tabellenoptionen")
     filter_candidate_cols = (default_extra_columns or []) + [fp_lieferant_col, nps_fp_col]
     for col_name in filter_candidate_cols:
         if col_name in df_display.columns:
             if df_display[col_name].nunique() > 1 and df_display[col_name].nunique() < 50 and not pd.api.types.is_numeric_dtype(df_display[col_name]):
                 unique_values=sorted(df_display[col_name].dropna().unique()); default_sel=unique_values if unique_values else []
-                selected_values=st.sidebar.multiselect(f"{col_name.replace('_',' ')}",unique_values,default=default_sel,key=f"filter_{col_name}")
+                selected_values=filter_bereich.multiselect(f"{col_name.replace('_',' ')}",unique_values,default=default_sel,key=f"filter_{col_name}")
                 if selected_values:df_display=df_display[df_display[col_name].isin(selected_values)]
             elif pd.api.types.is_numeric_dtype(df_display[col_name]) and df_display[col_name].notna().any():
                 series_slider=df_display[col_name].dropna()
@@ -1819,30 +1022,30 @@ def plot_price_outlier_table_enhanced(
                         step_v=0.1 if pd.api.types.is_float_dtype(series_slider)and col_name not in [nps_fp_col,"Score"] else(0.1 if col_name=="Score" else 1.0)
                         if col_name==nps_fp_col and(max_v-min_v>100):step_v=10.0
                         if max_v-min_v>0 and max_v-min_v<step_v:step_v=max_v-min_v
-                        sel_range=st.sidebar.slider(f"{col_name.replace('_',' ')}",min_v,max_v,(min_v,max_v),step=float(step_v),key=f"slider_{col_name}")
+                        sel_range=filter_bereich.slider(f"{col_name.replace('_',' ')}",min_v,max_v,(min_v,max_v),step=float(step_v),key=f"slider_{col_name}")
                         df_display=df_display[df_display[col_name].between(sel_range[0],sel_range[1])]
-                    elif min_v==max_v:st.sidebar.caption(f"{col_name.replace('_',' ')}: Nur Wert {min_v}.")
+                    elif min_v==max_v:filter_bereich.caption(f"{col_name.replace('_',' ')}: Nur Wert {min_v}.")
     if "Score" in df_display.columns and pd.api.types.is_numeric_dtype(df_display["Score"])and df_display["Score"].notna().any():
         s_f=df_display["Score"].dropna();min_f,max_f=float(s_f.min()),float(s_f.max())
-        if min_f<max_f:sel_f_r=st.sidebar.slider("Score Bereich",min_f,max_f,(min_f,max_f),0.1,key="s_f_spec");df_display=df_display[df_display["Score"].between(sel_f_r[0],sel_f_r[1])]
-        elif min_f==max_f:st.sidebar.caption(f"Score: Nur {min_f}.")
+        if min_f<max_f:sel_f_r=filter_bereich.slider("Score Bereich",min_f,max_f,(min_f,max_f),0.1,key="s_f_spec");df_display=df_display[df_display["Score"].between(sel_f_r[0],sel_f_r[1])]
+        elif min_f==max_f:filter_bereich.caption(f"Score: Nur {min_f}.")
     if"Diff_%"in df_display.columns and pd.api.types.is_numeric_dtype(df_display["Diff_%"])and df_display["Diff_%"].notna().any():
         s_p=df_display["Diff_%"].dropna();min_p,max_p=float(s_p.min()),float(s_p.max())
-        if min_p<max_p:sel_p_r=st.sidebar.slider("Diff. (%)",min_p,max_p,(min_p,max_p),0.1,key="s_p_spec");df_display=df_display[df_display["Diff_%"].between(sel_p_r[0],sel_p_r[1])]
-        elif min_p==max_p:st.sidebar.caption(f"Diff.(%): Nur {min_p}.")
+        if min_p<max_p:sel_p_r=filter_bereich.slider("Diff. (%)",min_p,max_p,(min_p,max_p),0.1,key="s_p_spec");df_display=df_display[df_display["Diff_%"].between(sel_p_r[0],sel_p_r[1])]
+        elif min_p==max_p:filter_bereich.caption(f"Diff.(%): Nur {min_p}.")
 
 
-    st.sidebar.markdown("---"); st.sidebar.subheader("Spaltenauswahl für Tabelle")
+    filter_bereich.markdown("---"); filter_bereich.subheader("Spaltenauswahl für Tabelle")
     core_columns = [coop_name_col, coop_produzent_col, "Coop_URL_Link", fp_name_col, fp_produzent_col, fp_sku_col, "FP_URL_Link", coop_preis_col, fp_preis_col, "Diff_CHF", "Diff_%", "Score", fp_lieferant_col, nps_fp_col]
     actual_default_extra = [c for c in (default_extra_columns or []) if c in df.columns and c not in core_columns]
     pot_disp_cols = core_columns + actual_default_extra
     exist_opts_multi = sorted(list(set(c for c in pot_disp_cols if c in df_display.columns)), key=lambda x: pot_disp_cols.index(x) if x in pot_disp_cols else float('inf'))
     def_sel_cols = [c for c in core_columns if c in df_display.columns] + [c for c in actual_default_extra if c in df_display.columns]
     def_sel_cols = sorted(list(set(def_sel_cols)), key=lambda x: (core_columns + actual_default_extra).index(x) if x in (core_columns + actual_default_extra) else float('inf'))
-    selected_columns_for_table = st.sidebar.multiselect("Wähle Spalten:", options=exist_opts_multi, default=def_sel_cols, key="col_sel_sb")
+    selected_columns_for_table = filter_bereich.multiselect("Wähle Spalten:", options=exist_opts_multi, default=def_sel_cols, key="col_sel_sb")
 
     if df_display.empty: st.info("Nach Filtern: Keine Daten."); return
-    if not selected_columns_for_table: st.warning("Spalten auswählen (Sidebar)."); return
+    if not selected_columns_for_table: st.warning("Spalten auswählen (Filter & Tabellenoptionen)."); return
     df_to_show = df_display[selected_columns_for_table].copy()
 
     # --- Top N & Sortierung (Logik bleibt gleich) ---
@@ -1873,10 +1076,10 @@ def plot_price_outlier_table_enhanced(
         if max_n_main_s > 0:
             val_n,min_n=(min(25,max_n_main_s),min(10,max_n_main_s))if max_n_main_s>0 else(10,1)
             if val_n<min_n:val_n=min_n
-            n_show_main=st.slider("Anz.Resultate:",min_n,int(np.minimum(max_n_main_s,1000)),val_n,10,key="main_n_s")
+            n_show_main=st.slider("Anz.Resultate:",min_n,max_n_main_s,val_n,10,key="main_n_s")
             if n_show_main<len(df_to_show):df_to_show=df_to_show.head(n_show_main)
 
-    # --- 4. Tabelle anzeigen mit Styling und column_config ---
+    # --- 4. Tabelle anzeigen mit Preislage-Spalte und column_config ---
     st.markdown(f"**Angezeigte Matches: {len(df_to_show)}**")
 
     col_width_narrow = "80px"
@@ -1910,25 +1113,16 @@ def plot_price_outlier_table_enhanced(
             elif col not in column_config:
                  column_config[col] = st.column_config.TextColumn(display_name.replace("_", " "), width=width)
 
-    def highlight_price_diff_enhanced(row):
-        if "Diff_%" not in row.index: return [''] * len(row)
-        val = row["Diff_%"]; color = ''
-        if pd.isna(val) or not isinstance(val, (int, float)): return [''] * len(row)
-        if val < -10: color = 'background-color: #c3e6cb; color: #155724;'
-        elif val > 10: color = 'background-color: #f5c6cb; color: #721c24;'
-        elif val < -2: color = 'background-color: #e2f0d9;'
-        elif val > 2: color = 'background-color: #fce8e6;'
-        return [color if col_name == "Diff_%" else '' for col_name in row.index]
+    # Farbcodierung der Preisdifferenz als eigene Kategorie-Spalte (vektorisiert statt Styler pro Zeile)
+    df_tabelle = df_to_show
+    if "Diff_%" in df_to_show.columns:
+        df_tabelle = df_to_show.copy()
+        df_tabelle.insert(df_tabelle.columns.get_loc("Diff_%") + 1, "Preislage", preislage_kategorie(df_tabelle["Diff_%"]))
+        column_config["Preislage"] = st.column_config.TextColumn("Preislage", width="medium")
 
     if not df_to_show.empty:
-        st.dataframe(
-            df_to_show.style.apply(highlight_price_diff_enhanced, axis=1),
-            use_container_width=True, column_config=column_config, hide_index=True
-        )
-        @st.cache_data
-        def convert_df_to_csv(df_export): return df_export.to_csv(index=False).encode("utf-8")
-        csv_data = convert_df_to_csv(df_to_show)
-        st.download_button("Aktuelle Tabelle als CSV", csv_data, "preisausreisser.csv", "text/csv", key="dl_btn")
+        st.dataframe(df_tabelle, width="stretch", column_config=column_config, hide_index=True)
+        export_button("Aktuelle Tabelle als CSV", df_to_show, "preisausreisser.csv", key="dl_btn")
     else: st.info("Keine Daten für die aktuelle Auswahl.")
     st.caption("Negative Preisdifferenz (%) = Coop günstiger. Positive Preisdifferenz (%) = Flaschenpost günstiger.")
 
@@ -2015,12 +1209,12 @@ def plot_matched_performance_analysis(
                  column_config_wines["Preisdiff. (%)"] = st.column_config.NumberColumn(format="%.1f%%")
 
 
-            st.dataframe(top_wines_display, use_container_width=True, hide_index=True, column_config=column_config_wines)
+            st.dataframe(top_wines_display, width="stretch", hide_index=True, column_config=column_config_wines)
             st.caption(f"Zeigt die Top {top_n_wines} gematchten Weine, sortiert nach ihrem Nettoumsatz (Product Sales) bei Flaschenpost.")
 
             # Optional: Visualisierung als horizontales Balkendiagramm
             if fp_name_col in top_wines_by_nps.columns and nps_col in top_wines_by_nps.columns and len(top_wines_by_nps) > 1:
-                try:
+                def top_weine_balken(top_wines_by_nps, nps_col, fp_name_col, top_n_wines):
                     fig_top_wines = px.bar(
                         top_wines_by_nps.sort_values(by=nps_col, ascending=True), # Aufsteigend für horizontale Balken von unten nach oben
                         x=nps_col,
@@ -2031,7 +1225,11 @@ def plot_matched_performance_analysis(
                         height = max(400, top_n_wines * 35) # Dynamische Höhe
                     )
                     fig_top_wines.update_layout(yaxis={'categoryorder':'total ascending'})
-                    st.plotly_chart(fig_top_wines, use_container_width=True)
+                    return fig_top_wines
+
+                try:
+                    zeige_figur(top_weine_balken, top_wines_by_nps[[fp_name_col, nps_col]],
+                                nps_col=nps_col, fp_name_col=fp_name_col, top_n_wines=top_n_wines)
                 except Exception as e:
                     st.warning(f"Konnte Diagramm für Top-Weine nicht erstellen: {e}")
 
@@ -2043,6 +1241,17 @@ def plot_matched_performance_analysis(
     # --- 2. Lieferanten-Analyse der gematchten Weine ---
     st.markdown("#### Lieferanten-Analyse der gematchten Weine (Basis: Flaschenpost)")
 
+    def lieferanten_balken(werte, titel, y_label):
+        fig = px.bar(
+            werte,
+            x=werte.index,
+            y=werte.values,
+            title=titel,
+            labels={'x': 'Lieferant', 'y': y_label}
+        )
+        fig.update_layout(xaxis_tickangle=-45)
+        return fig
+
     if lieferant_col not in df_enriched_matches.columns or df_enriched_matches[lieferant_col].isna().all():
         st.info(f"Keine Lieferantendaten ('{lieferant_col}') in den gematchten Weinen gefunden oder alle Werte sind leer.")
     else:
@@ -2051,15 +1260,8 @@ def plot_matched_performance_analysis(
         if not lieferanten_by_match_count.empty:
             st.markdown("##### Top Lieferanten nach Anzahl gematchter Weine")
             try:
-                fig_lieferant_count = px.bar(
-                    lieferanten_by_match_count,
-                    x=lieferanten_by_match_count.index,
-                    y=lieferanten_by_match_count.values,
-                    title=f"Top {top_n_lieferanten} Lieferanten (Anzahl Matches)",
-                    labels={'x': 'Lieferant', 'y': 'Anzahl gematchter Weine'}
-                )
-                fig_lieferant_count.update_layout(xaxis_tickangle=-45)
-                st.plotly_chart(fig_lieferant_count, use_container_width=True)
+                zeige_figur(lieferanten_balken, lieferanten_by_match_count,
+                            titel=f"Top {top_n_lieferanten} Lieferanten (Anzahl Matches)", y_label='Anzahl gematchter Weine')
             except Exception as e:
                  st.warning(f"Konnte Diagramm für Lieferanten (Anzahl) nicht erstellen: {e}")
 
@@ -2079,15 +1281,8 @@ def plot_matched_performance_analysis(
                 if not lieferanten_by_nps_sum.empty:
                     st.markdown("##### Top Lieferanten nach summiertem Umsatz (NPS) der gematchten Weine")
                     try:
-                        fig_lieferant_nps = px.bar(
-                            lieferanten_by_nps_sum,
-                            x=lieferanten_by_nps_sum.index,
-                            y=lieferanten_by_nps_sum.values,
-                            title=f"Top {top_n_lieferanten} Lieferanten (Summe NPS gematchter Weine)",
-                            labels={'x': 'Lieferant', 'y': 'Summe NPS gematchter Weine'}
-                        )
-                        fig_lieferant_nps.update_layout(xaxis_tickangle=-45)
-                        st.plotly_chart(fig_lieferant_nps, use_container_width=True)
+                        zeige_figur(lieferanten_balken, lieferanten_by_nps_sum,
+                                    titel=f"Top {top_n_lieferanten} Lieferanten (Summe NPS gematchter Weine)", y_label='Summe NPS gematchter Weine')
                     except Exception as e:
                         st.warning(f"Konnte Diagramm für Lieferanten (NPS) nicht erstellen: {e}")
                 else:
@@ -2127,8 +1322,21 @@ if __name__ == '__main__':
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
 import numpy as np # Für den Beispielaufruf
 
+SWEET_SPOT_FARBEN = {'Sweet Spot (Coop teurer)': '#28a745', 'Pricing Opportunity (FP teurer)': '#ffc107', 'Andere': '#adb5bd'}
+SCATTER_MAX_PUNKTE = 2000  # Mehr 'Andere'-Punkte werden im verdichteten Modus zu Dichtefeldern zusammengefasst
+DICHTE_RASTER = (80, 50)  # Rasterzellen in x (Preisdifferenz) und y (NPS), begrenzt die Anzahl Dichtefelder
+
+
+def _dichte_felder(x: np.ndarray, y: np.ndarray, raster=DICHTE_RASTER) -> tuple:
+    """Verdichtet Punkte per np.histogram2d: Mittelpunkte und Anzahl Weine der nicht leeren Rasterzellen."""
+    anzahl, x_kanten, y_kanten = np.histogram2d(x, y, bins=raster)
+    ix, iy = np.nonzero(anzahl)
+    return (x_kanten[ix] + x_kanten[ix + 1]) / 2, (y_kanten[iy] + y_kanten[iy + 1]) / 2, anzahl[ix, iy]
+
+@st.fragment
 def plot_sweet_spot_analysis(
     df_enriched_matches: pd.DataFrame,
     nps_col: str = "NPS_FP",
@@ -2143,6 +1351,7 @@ def plot_sweet_spot_analysis(
     Identifiziert und visualisiert "Sweet Spots" (Coop teurer, FP hoher Umsatz)
     und "Pricing Opportunities" (FP teurer, FP hoher Umsatz).
     Erwartet, dass die Spalten 'Diff_%' und 'Score' im DataFrame vorhanden sind.
+    Als Fragment: die Schwellen-Slider rerunnen nur diesen Abschnitt.
     """
     st.subheader("Sweet Spot & Pricing Opportunity Analyse")
     st.markdown("""
@@ -2165,7 +1374,8 @@ def plot_sweet_spot_analysis(
     df_analysis = df_enriched_matches[df_enriched_matches[nps_col].notna() & df_enriched_matches[preis_diff_pct_col].notna()].copy()
     if df_analysis.empty: st.info("Keine Daten für Sweet-Spot-Analyse."); return # Kurze Meldung
 
-    st.sidebar.subheader("Sweet Spot Filter")
+    filter_bereich = st.container(border=True)  # Schwellen im Abschnitt statt in der Sidebar (Fragment)
+    filter_bereich.subheader("Sweet Spot Filter")
     # Slider-Logik (robustere Default- und Step-Berechnung)
     min_nps, max_nps = (float(df_analysis[nps_col].min()), float(df_analysis[nps_col].max())) if df_analysis[nps_col].notna().any() else (0.0, 1000.0)
     default_nps_val = float(df_analysis[nps_col].quantile(0.75)) if min_nps < max_nps and df_analysis[nps_col].notna().any() else min_nps
@@ -2175,9 +1385,9 @@ def plot_sweet_spot_analysis(
         max_nps = default_nps_val + step_nps * 10 if default_nps_val is not None else 100.0
         if max_nps <= min_nps: max_nps = min_nps + step_nps
 
-    nps_threshold = st.sidebar.slider("Mindestumsatz (NPS) FP:", min_nps, max_nps, default_nps_val, step_nps, key="nps_sw")
-    coop_teurer_threshold_pct = st.sidebar.slider("Coop mind. X% teurer:",0,100,10,1,"%d%%",key="coop_t_sw")
-    fp_teurer_threshold_pct = st.sidebar.slider("FP mind. Y% teurer:",0,100,10,1,"%d%%",key="fp_t_sw")
+    nps_threshold = filter_bereich.slider("Mindestumsatz (NPS) FP:", min_nps, max_nps, default_nps_val, step_nps, key="nps_sw")
+    coop_teurer_threshold_pct = filter_bereich.slider("Coop mind. X% teurer:",0,100,10,1,"%d%%",key="coop_t_sw")
+    fp_teurer_threshold_pct = filter_bereich.slider("FP mind. Y% teurer:",0,100,10,1,"%d%%",key="fp_t_sw")
 
     df_sweet_spots = df_analysis[(df_analysis[preis_diff_pct_col]<=-coop_teurer_threshold_pct)&(df_analysis[nps_col]>=nps_threshold)]
     df_pricing_opportunities = df_analysis[(df_analysis[preis_diff_pct_col]>=fp_teurer_threshold_pct)&(df_analysis[nps_col]>=nps_threshold)]
@@ -2190,16 +1400,51 @@ def plot_sweet_spot_analysis(
     hover_data_cols = [fp_name_col, coop_name_col, nps_col, preis_diff_pct_col, score_col]
     hover_data_cols = [c for c in hover_data_cols if c in df_analysis.columns]
 
-    fig_scatter = px.scatter(df_analysis,x=preis_diff_pct_col,y=nps_col,color='Analyse_Kategorie',size=nps_col,size_max=30,
-        hover_name=fp_name_col if fp_name_col in df_analysis.columns else None, hover_data={c:True for c in hover_data_cols},
-        color_discrete_map={'Sweet Spot (Coop teurer)':'#28a745','Pricing Opportunity (FP teurer)':'#ffc107','Andere':'#adb5bd'}, # Angepasste Farben
-        labels={preis_diff_pct_col:"Preisdifferenz Coop vs. FP (%) <br> (Negativ = Coop teurer)",nps_col:"Umsatz (NPS) bei Flaschenpost",'Analyse_Kategorie':"Kategorie"},
-        title="Preis-Performance Matrix")
-    fig_scatter.add_vline(x=-coop_teurer_threshold_pct,line_dash="dash",line_color="#28a745",annotation_text="Sweet Spot Grenze")
-    fig_scatter.add_vline(x=fp_teurer_threshold_pct,line_dash="dash",line_color="#ffc107",annotation_text="Opportunity Grenze")
-    fig_scatter.add_hline(y=nps_threshold,line_dash="dash",line_color="#007bff",annotation_text="Hoher Umsatz Grenze") # Blau für Umsatz
-    fig_scatter.update_layout(height=600, legend_title_text='Analysezonen') 
-    st.plotly_chart(fig_scatter,use_container_width=True)
+    def preis_performance_matrix(df_analysis, preis_diff_pct_col, nps_col, fp_name_col, hover_data_cols,
+                                 coop_teurer_threshold_pct, fp_teurer_threshold_pct, nps_threshold, verdichten):
+        # WebGL (Scattergl) statt SVG; Punktfläche proportional zum NPS wie bei px.scatter(size=..., size_max=30)
+        fig_scatter = go.Figure()
+        nps_max = max(float(df_analysis[nps_col].max()), 1.0)
+        mit_name = fp_name_col in df_analysis.columns
+        hover_spalten = [c for c in hover_data_cols if c != fp_name_col]
+        vorlage = ("<b>%{hovertext}</b><br>" if mit_name else "") + \
+                  "<br>".join(f"{c}=%{{customdata[{i}]}}" for i, c in enumerate(hover_spalten)) + "<extra></extra>"
+        for kategorie in ('Andere', 'Sweet Spot (Coop teurer)', 'Pricing Opportunity (FP teurer)'):
+            teil = df_analysis[df_analysis['Analyse_Kategorie'] == kategorie]
+            if teil.empty:
+                continue
+            if kategorie == 'Andere' and verdichten and len(teil) > SCATTER_MAX_PUNKTE:
+                x, y, anzahl = _dichte_felder(teil[preis_diff_pct_col].to_numpy(dtype=float), teil[nps_col].to_numpy(dtype=float))
+                fig_scatter.add_trace(go.Scattergl(
+                    x=x, y=y, mode="markers", name=f"Andere (verdichtet, {len(teil)} Weine)", customdata=anzahl,
+                    marker=dict(color=SWEET_SPOT_FARBEN['Andere'], opacity=0.7, size=np.clip(4 + 3 * np.log2(anzahl), 4, 24)),
+                    hovertemplate="%{customdata:.0f} Weine<br>Preisdifferenz ≈ %{x:.1f}%<br>NPS ≈ %{y:.0f}<extra>Andere</extra>"))
+                continue
+            fig_scatter.add_trace(go.Scattergl(
+                x=teil[preis_diff_pct_col], y=teil[nps_col], mode="markers", name=kategorie,
+                hovertext=teil[fp_name_col] if mit_name else None, customdata=teil[hover_spalten].to_numpy(), hovertemplate=vorlage,
+                marker=dict(color=SWEET_SPOT_FARBEN[kategorie], size=teil[nps_col].clip(lower=0), sizemode="area",
+                            sizeref=2.0 * nps_max / 30 ** 2, sizemin=2, opacity=0.8)))
+        fig_scatter.add_vline(x=-coop_teurer_threshold_pct,line_dash="dash",line_color="#28a745",annotation_text="Sweet Spot Grenze")
+        fig_scatter.add_vline(x=fp_teurer_threshold_pct,line_dash="dash",line_color="#ffc107",annotation_text="Opportunity Grenze")
+        fig_scatter.add_hline(y=nps_threshold,line_dash="dash",line_color="#007bff",annotation_text="Hoher Umsatz Grenze") # Blau für Umsatz
+        fig_scatter.update_layout(height=600, legend_title_text='Analysezonen', title="Preis-Performance Matrix",
+                                  xaxis_title="Preisdifferenz Coop vs. FP (%) <br> (Negativ = Coop teurer)",
+                                  yaxis_title="Umsatz (NPS) bei Flaschenpost")
+        return fig_scatter
+
+    n_andere = int((df_analysis['Analyse_Kategorie'] == 'Andere').sum())
+    verdichten = filter_bereich.toggle(
+        f"Andere Weine ab {SCATTER_MAX_PUNKTE} Punkten zu Dichtefeldern zusammenfassen", value=True, key="sw_verdichten",
+        help="Sweet Spots und Pricing Opportunities werden immer einzeln gezeigt; nur die grauen 'Andere'-Punkte "
+             "werden auf ein Raster verdichtet, damit das Diagramm auch bei sehr vielen Matches flüssig bleibt.")
+    plot_spalten = list(dict.fromkeys(hover_data_cols + [preis_diff_pct_col, nps_col, 'Analyse_Kategorie']))
+    zeige_figur(preis_performance_matrix, df_analysis[plot_spalten], preis_diff_pct_col=preis_diff_pct_col, nps_col=nps_col,
+                fp_name_col=fp_name_col, hover_data_cols=hover_data_cols, coop_teurer_threshold_pct=coop_teurer_threshold_pct,
+                fp_teurer_threshold_pct=fp_teurer_threshold_pct, nps_threshold=nps_threshold,
+                verdichten=verdichten and n_andere > SCATTER_MAX_PUNKTE)
+    if verdichten and n_andere > SCATTER_MAX_PUNKTE:
+        st.caption(f"{n_andere} 'Andere'-Weine sind zu Dichtefeldern zusammengefasst (Markergrösse ~ Anzahl Weine je Feld).")
 
     # --- HIER WIRD DIE ERKLÄRUNG EINGEFÜGT ---
     st.markdown("---") 
@@ -2213,7 +1458,7 @@ def plot_sweet_spot_analysis(
     *   **Größe der Punkte:** Die Fläche der Punkte ist ebenfalls proportional zum Flaschenpost-Umsatz (NPS) des Weins.
 
     **Strategische Zonen (definiert durch die gestrichelten Linien):**
-    Die farbigen Linien teilen das Diagramm in Sektoren, basierend auf den Schwellenwerten, die Sie in der Sidebar für "hohen Umsatz" und "signifikante Preisdifferenz" einstellen können:
+    Die farbigen Linien teilen das Diagramm in Sektoren, basierend auf den Schwellenwerten, die Sie oben im Abschnitt "Sweet Spot Filter" für "hohen Umsatz" und "signifikante Preisdifferenz" einstellen können:
 
     1.  🟢 **Sweet Spots (Grün – typischerweise oben links):**
         *   **Definition:** Weine, bei denen Coop *deutlich teurer* ist als Flaschenpost UND die bei Flaschenpost einen *hohen Umsatz* erzielen.
@@ -2231,7 +1476,7 @@ def plot_sweet_spot_analysis(
 
     **Interaktive Anwendung:**
     *   **Tooltips:** Fahren Sie mit der Maus über einzelne Punkte, um Detailinformationen zum jeweiligen Wein (Name, genaue Preisdifferenz, Umsatz, Score) zu erhalten.
-    *   **Sidebar-Filter:** Passen Sie die Schwellenwerte für Umsatz und Preisdifferenz an, um zu sehen, wie sich die Verteilung der Weine auf die strategischen Zonen verändert.
+    *   **Sweet Spot Filter:** Passen Sie die Schwellenwerte für Umsatz und Preisdifferenz an, um zu sehen, wie sich die Verteilung der Weine auf die strategischen Zonen verändert.
     *   **Detailtabellen:** Die Tabellen unterhalb dieses Diagramms listen die spezifischen Weine auf, die aktuell in die "Sweet Spot"- und "Pricing Opportunity"-Kategorien fallen.
     """)
     st.markdown("---")
@@ -2251,12 +1496,12 @@ def plot_sweet_spot_analysis(
     
     st.markdown(f"#### Sweet Spots (Coop mind. {coop_teurer_threshold_pct}% teurer, FP NPS ≥ {nps_threshold:.0f})")
     if not df_sweet_spots.empty and cols_to_show_table: 
-        st.dataframe(df_sweet_spots[cols_to_show_table].sort_values(by=nps_col,ascending=False),hide_index=True,use_container_width=True,column_config=column_config_table)
+        st.dataframe(df_sweet_spots[cols_to_show_table].sort_values(by=nps_col,ascending=False),hide_index=True,width="stretch",column_config=column_config_table)
     else: st.info("Keine Sweet Spots mit aktuellen Filtern.")
     
     st.markdown(f"#### Pricing Opportunities (FP mind. {fp_teurer_threshold_pct}% teurer, FP NPS ≥ {nps_threshold:.0f})")
     if not df_pricing_opportunities.empty and cols_to_show_table: 
-        st.dataframe(df_pricing_opportunities[cols_to_show_table].sort_values(by=nps_col,ascending=False),hide_index=True,use_container_width=True,column_config=column_config_table)
+        st.dataframe(df_pricing_opportunities[cols_to_show_table].sort_values(by=nps_col,ascending=False),hide_index=True,width="stretch",column_config=column_config_table)
     else: st.info("Keine Pricing Opportunities mit aktuellen Filtern.")
 
 # --- Beispielhafter Aufruf (bleibt gleich) ---
@@ -2272,17 +1517,99 @@ if __name__ == '__main__':
 
 
 
+# ==============================================================================
+# Review-Queue für Grenzfälle im Matching (Entscheidungen -> data/match_decisions.jsonl)
+# ==============================================================================
+import streamlit as st
+import pandas as pd
+from match_decisions import ENTSCHEIDUNG_BESTAETIGT, ENTSCHEIDUNG_ABGELEHNT
+
+@st.fragment
+def plot_match_review_queue(
+    df: pd.DataFrame,
+    store,
+    score_col: str = "Fuzzy_Score",
+    score_min: float = 40,
+    score_max: float = 60,
+    page_size: int = 10,
+    detail_columns: list = None
+):
+    """
+    Review-Queue über automatische Matches mit grenzwertigem Score (Standard 40–60).
+    Läuft als Fragment: Blättern und Bestätigen/Ablehnen rendern nur diesen Abschnitt neu,
+    die Entscheidungen landen sofort im Entscheidungs-Log (`store`, MatchDecisionStore).
+    """
+    st.subheader(f"Review-Queue: Grenzfälle (Score {score_min:.0f}–{score_max:.0f})")
+
+    if score_col not in df.columns or "Coop_URL" not in df.columns or "FP_Sku" not in df.columns:
+        st.warning(f"Spalten '{score_col}', 'Coop_URL' oder 'FP_Sku' fehlen. Review-Queue nicht verfügbar.")
+        return
+
+    scores = pd.to_numeric(df[score_col], errors="coerce")
+    df_queue = df[(scores >= score_min) & (scores <= score_max) & df["FP_Sku"].notna()]
+    # Bereits entschiedene Paare (auch aus dieser Sitzung) ausblenden – ein Dict-Lookup pro Paar
+    df_queue = df_queue[store.decision_series(df_queue["Coop_URL"], df_queue["FP_Sku"]).isna().to_numpy()]
+    df_queue = df_queue.sort_values(score_col, ascending=False)
+
+    n_offen = len(df_queue)
+    st.caption(f"{n_offen} offene Paare | {len(store)} Entscheidungen im Log")
+    if n_offen == 0:
+        st.success("Keine offenen Grenzfälle im gewählten Score-Bereich.")
+        return
+
+    n_seiten = (n_offen - 1) // page_size + 1
+    seite = min(st.session_state.get("review_queue_seite", 0), n_seiten - 1)
+    st.session_state["review_queue_seite"] = seite
+
+    def _blaettern(schritt):
+        st.session_state["review_queue_seite"] = seite + schritt
+
+    col_prev, col_info, col_next = st.columns([1, 2, 1])
+    col_prev.button("◀ Zurück", disabled=seite == 0, key="review_prev", on_click=_blaettern, args=(-1,))
+    col_next.button("Weiter ▶", disabled=seite >= n_seiten - 1, key="review_next", on_click=_blaettern, args=(1,))
+    col_info.markdown(f"Seite **{seite + 1}** von **{n_seiten}**")
+
+    if detail_columns is None:
+        detail_columns = ["Coop_Jahrgang", "Coop_Preis", "FP_Jahrgang", "FP_Preis"]
+    detail_columns = [c for c in detail_columns if c in df_queue.columns]
+
+    for idx, row in df_queue.iloc[seite * page_size:(seite + 1) * page_size].iterrows():
+        with st.container(border=True):
+            col_coop, col_fp, col_aktion = st.columns([3, 3, 1.2])
+            col_coop.markdown(f"**Coop:** {row.get('Coop_Name', '')}  \n{row.get('Coop_Produzent', '')}")
+            col_fp.markdown(f"**FP:** {row.get('FP_Name', '')}  \n{row.get('FP_Produzent', '')} (SKU {row['FP_Sku']})")
+            if detail_columns:
+                col_coop.caption(" | ".join(f"{c}: {row[c]}" for c in detail_columns if c.startswith("Coop_")))
+                col_fp.caption(" | ".join(f"{c}: {row[c]}" for c in detail_columns if c.startswith("FP_")))
+            col_aktion.metric("Score", f"{row[score_col]:.1f}")
+            # Callbacks schreiben die Entscheidung vor dem Fragment-Rerun -> Paar verschwindet sofort aus der Queue
+            col_aktion.button("✔ Bestätigen", key=f"review_ok_{idx}", on_click=store.record,
+                              args=(row["Coop_URL"], row["FP_Sku"], ENTSCHEIDUNG_BESTAETIGT))
+            col_aktion.button("✘ Ablehnen", key=f"review_nok_{idx}", on_click=store.record,
+                              args=(row["Coop_URL"], row["FP_Sku"], ENTSCHEIDUNG_ABGELEHNT))
+
+    st.caption("Entscheidungen wirken sofort auf Matching- und Gap-Analyse, sobald die Seite neu geladen wird.")
+    if st.button("Änderungen in allen Analysen übernehmen", key="review_apply"):
+        st.rerun()
+
+
+
 # plot_utils.py
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 import numpy as np # Kann für einige Plotly-Funktionen oder Berechnungen nützlich sein
+from gap_engine import GapIndex, compute_gap_index
+from gap_opportunity import OpportunityScores
+from fp_alternatives import ANZAHL_ALTERNATIVEN, FPAlternativen
+from gap_browser import GapBrowser, SEITENGROESSEN
 
 
 
 # ==============================================================================
 # Funktion für GAP-Analyse Tabelle (angepasst mit Match-Status und return df_gaps)
 # ==============================================================================
+@st.fragment
 def plot_gap_analysis_table(
     df_coop_full: pd.DataFrame,
     df_matching: pd.DataFrame,
@@ -2291,9 +1618,26 @@ def plot_gap_analysis_table(
     match_status_col_in_matching_df: str = "Match_Status",
     non_match_status_value: str = "Kein Match",
     valid_match_statuses: list = None, # Vorerst nicht verwendet, aber als Option behalten
-    gap_display_columns: list = None
+    gap_display_columns: list = None,
+    require_equal_keys: bool = True,
+    gap_index: GapIndex = None,
+    opportunity: OpportunityScores = None,
+    fp_alternativen: FPAlternativen = None,
+    browser: GapBrowser = None,
+    fehlt_bei: str = "Flaschenpost"
 ):
-    st.subheader("Identifizierte Sortimentslücken (Coop-Weine nicht bei Flaschenpost)")
+    """
+    Ermittelt und zeigt die Coop-Weine ohne Match bei Flaschenpost (bzw. den Händlern in fehlt_bei, Anzeigename).
+    Mit require_equal_keys zählt ein Match nur, wenn Jahrgang und Flaschengrösse übereinstimmen
+    (Spalten aus data_loading.add_matching_keys) – eine Coop-Magnum wird also nicht durch eine FP-75cl abgedeckt;
+    manuell bestätigte Paare zählen unabhängig davon.
+    Ein übergebener gap_index (gap_engine.get_gap_index) wird wiederverwendet, statt die Gaps bei jedem Rerun neu zu berechnen.
+    Mit opportunity (gap_opportunity.get_opportunity_scores) gibt es zusätzlich eine Top-N-Ansicht nach Opportunity-Score.
+    Mit fp_alternativen (fp_alternatives.get_fp_alternatives) werden die vorberechneten FP-Alternativen inline angezeigt.
+    Suche, Sortierung und Seitenaufteilung laufen serverseitig über browser (gap_browser.get_gap_browser), gerendert wird nur die sichtbare Seite.
+    Als Fragment (st.fragment) rerunnen Filter, Suche und Blättern nur diese Tabelle, nicht das ganze Dashboard.
+    """
+    st.subheader(f"Identifizierte Sortimentslücken (Coop-Weine nicht bei {fehlt_bei})")
 
     if coop_id_col_in_coop_df not in df_coop_full.columns:
         st.error(f"ID-Spalte '{coop_id_col_in_coop_df}' nicht in Coop-Daten. Verfügbar: {df_coop_full.columns.tolist()}")
@@ -2307,18 +1651,15 @@ def plot_gap_analysis_table(
 
     df_gaps = pd.DataFrame() # Initialisieren für den Fall, dass try fehlschlägt
     try:
-        if valid_match_statuses:
-            df_echte_matches = df_matching[df_matching[match_status_col_in_matching_df].isin(valid_match_statuses)]
-        else:
-            df_echte_matches = df_matching[df_matching[match_status_col_in_matching_df] != non_match_status_value]
-        
-        matched_coop_ids = df_echte_matches[coop_id_col_in_matching_df].astype(str).str.strip().dropna().unique()
-        
-        df_coop_full_temp = df_coop_full.copy()
-        df_coop_full_temp['temp_join_key_coop'] = df_coop_full_temp[coop_id_col_in_coop_df].astype(str).str.strip()
-        
-        df_gaps = df_coop_full_temp[~df_coop_full_temp['temp_join_key_coop'].isin(matched_coop_ids)].copy()
-        df_gaps.drop(columns=['temp_join_key_coop'], inplace=True, errors='ignore')
+        if gap_index is None:
+            gap_index = compute_gap_index(
+                df_coop_full, df_matching,
+                coop_id_col_in_coop_df=coop_id_col_in_coop_df, coop_id_col_in_matching_df=coop_id_col_in_matching_df,
+                match_status_col_in_matching_df=match_status_col_in_matching_df, non_match_status_value=non_match_status_value,
+                valid_match_statuses=valid_match_statuses, require_equal_keys=require_equal_keys
+            )
+        # Nur die Gap-Zeilen werden kopiert, nicht das ganze Coop-Sortiment
+        df_gaps = df_coop_full[gap_index.gap_mask]
 
     except Exception as e:
         st.error(f"Fehler bei der Identifizierung der Gaps: {e}")
@@ -2326,9 +1667,9 @@ def plot_gap_analysis_table(
         st.error(traceback.format_exc())
         return pd.DataFrame() # Wichtig: DataFrame zurückgeben im Fehlerfall
 
-    num_coop_total = len(df_coop_full)
-    num_distinct_echte_matches_coop_products = len(matched_coop_ids)
-    num_gaps = len(df_gaps)
+    num_coop_total = gap_index.n_total
+    num_distinct_echte_matches_coop_products = gap_index.n_matched
+    num_gaps = gap_index.n_gaps
     
     # Debug-Zeile kann hier bei Bedarf wieder aktiviert/entfernt werden
     # st.write(f"Debug: Coop Total={num_coop_total}, Coop-Produkte mit echtem Match bei FP={num_distinct_echte_matches_coop_products}, Berechnete Gaps={num_gaps}")
@@ -2336,8 +1677,8 @@ def plot_gap_analysis_table(
     st.markdown("#### Quantitative Übersicht der Lücken:")
     col1, col2, col3 = st.columns(3)
     col1.metric("Coop-Sortiment (Gesamt SKUs)", num_coop_total)
-    col2.metric("Davon bei FP gematcht (Coop SKUs)", num_distinct_echte_matches_coop_products)
-    col3.metric("Sortimentslücken (Coop-SKUs nicht bei FP)", num_gaps,
+    col2.metric(f"Davon bei {fehlt_bei} gematcht (Coop SKUs)", num_distinct_echte_matches_coop_products)
+    col3.metric(f"Sortimentslücken (Coop-SKUs nicht bei {fehlt_bei})", num_gaps,
                 delta=f"{-((num_gaps / num_coop_total) * 100 if num_coop_total > 0 else 0):.1f}% Abdeckungslücke",
                 delta_color="inverse" if num_gaps > 0 else "normal")
 
@@ -2348,14 +1689,18 @@ def plot_gap_analysis_table(
     st.markdown("---")
     st.markdown("#### Detailtabelle der Sortimentslücken:")
     
-    df_gaps_display = df_gaps.copy()
+    # Filter, Suche und Sortierung laufen als Masken/Positionen über die Gap-Zeilen (gap_browser.GapBrowser);
+    # an den Browser geht nur die aktuelle Seite.
+    if browser is None:
+        browser = GapBrowser(df_gaps)
+    auswahl = np.ones(len(df_gaps), dtype=bool)
 
     preis_col_name_coop = "Preis"
-    if preis_col_name_coop in df_gaps_display.columns and pd.api.types.is_numeric_dtype(df_gaps_display[preis_col_name_coop]):
+    if preis_col_name_coop in df_gaps.columns and pd.api.types.is_numeric_dtype(df_gaps[preis_col_name_coop]):
         try:
             # Sicherstellen, dass min und max unterschiedlich sind, um Fehler im Slider zu vermeiden
-            min_val = float(df_gaps_display[preis_col_name_coop].min())
-            max_val = float(df_gaps_display[preis_col_name_coop].max())
+            min_val = float(df_gaps[preis_col_name_coop].min())
+            max_val = float(df_gaps[preis_col_name_coop].max())
             if min_val < max_val:
                 selected_preis_range = st.slider(
                     "Filter nach Coop-Preis der Lücken:",
@@ -2364,7 +1709,7 @@ def plot_gap_analysis_table(
                     value=(min_val, max_val),
                     key="gap_preis_filter_slider"
                 )
-                df_gaps_display = df_gaps_display[df_gaps_display[preis_col_name_coop].between(selected_preis_range[0], selected_preis_range[1])]
+                auswahl &= df_gaps[preis_col_name_coop].between(selected_preis_range[0], selected_preis_range[1]).to_numpy()
             elif min_val == max_val: # Falls alle Preise gleich sind, keinen Slider anzeigen oder Hinweis geben
                  st.caption(f"Alle Lücken haben denselben Preis: {min_val:.2f} CHF.")
             else: # Sollte nicht passieren, wenn Daten vorhanden sind
@@ -2372,43 +1717,152 @@ def plot_gap_analysis_table(
         except Exception as e:
             st.warning(f"Konnte Preisfilter für Gaps nicht erstellen: {e}")
 
+    col_weintyp, col_flasche = st.columns(2)
     weintyp_col_name_coop = "Weintyp"
-    if weintyp_col_name_coop in df_gaps_display.columns:
-        unique_weintypen_gap = sorted(df_gaps_display[weintyp_col_name_coop].dropna().unique())
+    if weintyp_col_name_coop in df_gaps.columns:
+        unique_weintypen_gap = sorted(df_gaps[weintyp_col_name_coop].dropna().unique())
         if unique_weintypen_gap:
-            selected_weintyp_gap = st.multiselect(
+            selected_weintyp_gap = col_weintyp.multiselect(
                 "Filter nach Coop-Weintyp der Lücken:",
                 options=unique_weintypen_gap,
                 default=[],
                 key="gap_weintyp_filter_multiselect"
             )
             if selected_weintyp_gap:
-                df_gaps_display = df_gaps_display[df_gaps_display[weintyp_col_name_coop].isin(selected_weintyp_gap)]
+                auswahl &= df_gaps[weintyp_col_name_coop].isin(selected_weintyp_gap).to_numpy()
+
+    flasche_col_name_coop = "Flasche_cl"
+    if flasche_col_name_coop in df_gaps.columns:
+        unique_flaschen_gap = sorted(df_gaps[flasche_col_name_coop].dropna().unique())
+        if len(unique_flaschen_gap) > 1:
+            selected_flaschen_gap = col_flasche.multiselect(
+                "Filter nach Flaschengrösse (cl):",
+                options=unique_flaschen_gap,
+                default=[],
+                key="gap_flasche_filter_multiselect"
+            )
+            if selected_flaschen_gap:
+                auswahl &= df_gaps[flasche_col_name_coop].isin(selected_flaschen_gap).to_numpy()
+
+    suchbegriff = st.text_input("Suche in Name, Produzent und Region:", key="gap_suche_input",
+                                help="Mehrere Wörter werden UND-verknüpft, Wortanfänge genügen (z.B. 'chat marg').")
+    if suchbegriff:
+        auswahl &= browser.suche(suchbegriff)
 
     if gap_display_columns is None:
-        default_cols = ["Name", "Produzent", preis_col_name_coop, weintyp_col_name_coop, "Region", "URL"]
-        gap_display_columns_final = [col for col in default_cols if col in df_gaps_display.columns]
+        default_cols = ["Name", "Produzent", preis_col_name_coop, weintyp_col_name_coop, "Region", "Jahrgang_Key", flasche_col_name_coop, "URL"]
+        gap_display_columns_final = [col for col in default_cols if col in df_gaps.columns]
     else:
-        gap_display_columns_final = [col for col in gap_display_columns if col in df_gaps_display.columns]
+        gap_display_columns_final = [col for col in gap_display_columns if col in df_gaps.columns]
 
     if not gap_display_columns_final:
         st.warning("Keine Spalten für Gap-Tabelle definiert.")
         return df_gaps # Gib die ungefilterten Gaps zurück, wenn keine Anzeigespalten da sind
 
+    anzahl_gefiltert = int(auswahl.sum())
+    top_n_ansicht = False
+    mit_opportunity = opportunity is not None and len(opportunity) > 0
+    if mit_opportunity:
+        ansicht = st.radio(
+            "Ansicht:", ["Alle Lücken (gefiltert)", "Top-N nach Opportunity-Score"],
+            horizontal=True, key="gap_ansicht_radio",
+            help="Opportunity-Score (0-100): Preisband und Herkunftsland bei FP schwach besetzt, Produzent nicht bei FP, "
+                 "Coop-Preis im Kernbereich der FP-Preise desselben Weintyps."
+        )
+        top_n_ansicht = ansicht.startswith("Top-N")
+
+    # --- Reihenfolge der ausgewählten Positionen (Top-N bzw. Sortierung), danach Seite ausschneiden ---
+    if top_n_ansicht:
+        top_n = st.number_input("Anzahl (Top-N):", min_value=5, max_value=500, value=50, step=5, key="gap_top_n_input")
+        # Vorsortierte Reihenfolge aus dem Cache, hier nur noch auf die gefilterten Zeilen eingeschränkt
+        positionen = df_gaps.index.get_indexer(opportunity.top_n(df_gaps.index[auswahl], int(top_n)))
+    else:
+        sortier_optionen = ["Ursprüngliche Reihenfolge"] + (["Opportunity-Score"] if mit_opportunity else []) + \
+                           [spalte for spalte in browser.sortierungen if spalte in gap_display_columns_final]
+        col_sort, col_richtung = st.columns([2, 1])
+        sortierung = col_sort.selectbox("Sortieren nach:", sortier_optionen, key="gap_sortierung_select")
+        absteigend = col_richtung.radio("Richtung:", ["Absteigend", "Aufsteigend"], horizontal=True,
+                                        key="gap_sortierung_richtung") == "Absteigend"
+        if sortierung == "Opportunity-Score":
+            positionen = df_gaps.index.get_indexer(opportunity.reihenfolge)
+            positionen = positionen[auswahl[positionen]]
+            if not absteigend:
+                positionen = positionen[::-1]
+        else:
+            positionen = browser.sortiert(auswahl, sortierung, absteigend)
+
+    col_groesse, col_seite = st.columns(2)
+    seitengroesse = col_groesse.selectbox("Zeilen pro Seite:", SEITENGROESSEN, index=1, key="gap_seitengroesse_select")
+    anzahl_seiten = max(1, -(-len(positionen) // seitengroesse))
+    seite = col_seite.number_input(f"Seite (von {anzahl_seiten}):", min_value=1, max_value=anzahl_seiten, value=1, step=1,
+                                   key="gap_seite_input")
+    seite = min(int(seite), anzahl_seiten)
+    seiten_positionen = positionen[(seite - 1) * seitengroesse: seite * seitengroesse]
+    df_gaps_display = df_gaps.iloc[seiten_positionen]
+
+    if mit_opportunity:
+        score_spalten = ["Opportunity_Score", "Score_Produzent", "Score_Region", "Score_Preisband", "Score_Preisposition"]
+        df_gaps_display = df_gaps_display.join(opportunity.scores[score_spalten])
+        gap_display_columns_final = ["Opportunity_Score", *gap_display_columns_final]
+        if top_n_ansicht:
+            gap_display_columns_final += score_spalten[1:]
+
+    if fp_alternativen is not None and len(fp_alternativen) > 0 and coop_id_col_in_coop_df in df_gaps_display.columns:
+        # Nur Lookup über die Coop-URL, die Distanzen sind bereits im Cache berechnet
+        df_gaps_display = df_gaps_display.assign(FP_Alternativen=fp_alternativen.kurztext_fuer(df_gaps_display[coop_id_col_in_coop_df]))
+        gap_display_columns_final = [*gap_display_columns_final, "FP_Alternativen"]
+
     gap_column_config = {}
     if preis_col_name_coop in gap_display_columns_final:
         gap_column_config[preis_col_name_coop] = st.column_config.NumberColumn("Coop Preis", format="CHF %.2f")
     if "URL" in gap_display_columns_final:
         gap_column_config["URL"] = st.column_config.LinkColumn("Coop Link", display_text="Zum Wein", width="small")
+    if "Jahrgang_Key" in gap_display_columns_final:
+        gap_column_config["Jahrgang_Key"] = st.column_config.NumberColumn("Jahrgang", format="%d")
+    if flasche_col_name_coop in gap_display_columns_final:
+        gap_column_config[flasche_col_name_coop] = st.column_config.NumberColumn("Flasche (cl)", format="%d")
+    if "Opportunity_Score" in gap_display_columns_final:
+        gap_column_config["Opportunity_Score"] = st.column_config.ProgressColumn("Opportunity", format="%.1f", min_value=0, max_value=100)
+        for spalte, label in (("Score_Produzent", "Produzent fehlt"), ("Score_Region", "Land schwach"),
+                              ("Score_Preisband", "Preisband schwach"), ("Score_Preisposition", "Preisposition")):
+            gap_column_config[spalte] = st.column_config.NumberColumn(label, format="%.2f")
+    if "FP_Alternativen" in gap_display_columns_final:
+        gap_column_config["FP_Alternativen"] = st.column_config.TextColumn(
+            f"FP-Alternativen (Top {ANZAHL_ALTERNATIVEN})", width="large",
+            help="Ähnlichste Flaschenpost-Weine nach Weintyp, Flaschengrösse, Land, Region, Produzent und Preis."
+        )
 
     st.dataframe(
         df_gaps_display[gap_display_columns_final],
-        use_container_width=True,
+        width="stretch",
         hide_index=True,
         column_config=gap_column_config
     )
-    st.caption(f"Zeigt {len(df_gaps_display)} von {num_gaps} Sortimentslücken basierend auf den aktuellen Filtern.")
-    
+    von, bis = (seite - 1) * seitengroesse + 1, (seite - 1) * seitengroesse + len(df_gaps_display)
+    if top_n_ansicht:
+        st.caption(f"Zeigt {von}–{bis} der {len(positionen)} Lücken mit dem höchsten Opportunity-Score von {anzahl_gefiltert} gefilterten ({num_gaps} insgesamt).")
+    elif len(positionen) == 0:
+        st.caption(f"Keine Lücke passt zu den aktuellen Filtern ({num_gaps} insgesamt).")
+    else:
+        st.caption(f"Zeigt {von}–{bis} von {anzahl_gefiltert} gefilterten Sortimentslücken ({num_gaps} insgesamt), Seite {seite} von {anzahl_seiten}.")
+
+    if len(positionen) > 0:
+        # Export aller gefilterten Lücken in der aktuellen Reihenfolge (nicht nur der Seite), erzeugt erst beim Klick
+        export_spalten = [spalte for spalte in gap_display_columns_final if spalte in df_gaps.columns]
+
+        def df_export():
+            tabelle = df_gaps.iloc[positionen][export_spalten]
+            if mit_opportunity:
+                tabelle = tabelle.join(opportunity.scores[["Opportunity_Score"]])
+            return tabelle
+
+        dateiname = f"sortimentsluecken_{pd.Timestamp.now().date()}"
+        col_csv, col_xlsx, _ = st.columns([1, 1, 3])
+        with col_csv:
+            export_button("Lücken als CSV", df_export, f"{dateiname}.csv", sep=";", encoding="utf-8-sig", key="gap_export_csv")
+        with col_xlsx:
+            export_button("Lücken als Excel", df_export, f"{dateiname}.xlsx", format="xlsx", key="gap_export_xlsx")
+
     return df_gaps # <<< Gib das DataFrame mit den Gaps zurück
 
 # ==============================================================================
@@ -2442,21 +1896,119 @@ import plotly.express as px
 import plotly.graph_objects as go # Für Balkendiagramme
 import numpy as np
 
+from gap_comparison import (
+    comparison_slice,
+    SIGNIFIKANZ_NIVEAU,
+    DIM_PREIS_WEINTYP,
+    DIM_HAUPTREGION,
+    DIM_PRODUZENT,
+    DIM_LIEFERANT,
+)
+
+# Die Vergleichsfunktionen rendern nur noch vorberechnete Ergebnisse aus gap_comparison.compute_gap_comparison
+# (Long-Format: Dimension, Gruppe, Kategorie, Anteile, Differenz_pp, p-/q-Wert, Signifikant).
+_DIFF_SPALTE = "Differenz (Lücken - Coop) (%)"
+_Q_SPALTE = "p-Wert (korr.)"
+_SIGNIFIKANZ_HINWEIS = (
+    "Signifikanz: exakter hypergeometrischer Test je Kategorie (Lücken als Teilmenge des Coop-Sortiments), "
+    f"p-Werte je Analyse nach Benjamini-Hochberg korrigiert; signifikant bei korrigiertem p < {SIGNIFIKANZ_NIVEAU:.2f}. "
+    "Kleine Kategorien werden so erst bei deutlichen, grosse schon bei moderaten Abweichungen hervorgehoben."
+)
+
+
+def _gap_vergleich_tabelle(ausschnitt: pd.DataFrame, kategorie_label: str, luecken_label: str, coop_label: str) -> pd.DataFrame:
+    """Anzeige-Tabelle aus einem Ausschnitt des Vergleichs (Spaltennamen wie in den bisherigen Tabellen)."""
+    return pd.DataFrame({
+        kategorie_label: ausschnitt["Kategorie"].to_numpy(),
+        luecken_label: ausschnitt["Anteil_Luecken"].to_numpy(),
+        coop_label: ausschnitt["Anteil_Gesamt"].to_numpy(),
+        _DIFF_SPALTE: ausschnitt["Differenz_pp"].to_numpy(),
+        _Q_SPALTE: ausschnitt["q_Wert"].to_numpy(),
+        "Signifikant": ausschnitt["Signifikant"].to_numpy(),
+    })
+
+
+def _gap_vergleich_anzeige(tabelle: pd.DataFrame, *prozent_spalten):
+    """Zeigt eine Vergleichstabelle mit Prozent-, p-Wert- und Signifikanz-Spalten an."""
+    column_config = _prozent_column_config(*prozent_spalten)
+    column_config[_Q_SPALTE] = st.column_config.NumberColumn(format="%.4f", help="Benjamini-Hochberg-korrigierter p-Wert")
+    column_config["Signifikant"] = st.column_config.CheckboxColumn(help=f"Korrigierter p-Wert < {SIGNIFIKANZ_NIVEAU:.2f}")
+    st.dataframe(tabelle.round({spalte: 1 for spalte in prozent_spalten}), hide_index=True, width="stretch",
+                 column_config=column_config)
+    st.caption(_SIGNIFIKANZ_HINWEIS)
+
+
+def _prozent_column_config(*spalten):
+    return {spalte: st.column_config.NumberColumn(format="%.1f%%") for spalte in spalten}
+
+
+def _gap_diff_balken(plot_df: pd.DataFrame, x_col: str, xaxis_title: str, margin_b: int):
+    colors = np.where(plot_df[_DIFF_SPALTE].to_numpy() >= 0, 'mediumseagreen', 'crimson')
+    fig = px.bar(plot_df, x=x_col, y=_DIFF_SPALTE, text_auto='.1f')
+    fig.update_traces(marker_color=colors, texttemplate='%{y:.1f}%P', textposition='outside')
+    fig.update_layout(
+        yaxis_title="Differenz in Prozentpunkten", xaxis_title=xaxis_title, height=500,
+        xaxis_tickangle=-45, margin=dict(t=30, b=margin_b),
+        yaxis_zeroline=True, yaxis_zerolinewidth=2, yaxis_zerolinecolor='Black'
+    )
+    return fig
+
+
+def _plot_gap_diff_bars(plot_df: pd.DataFrame, x_col: str, xaxis_title: str, margin_b: int = 120):
+    """Balkendiagramm der Differenzen (grün = stärker bei Lücken, rot = schwächer)."""
+    zeige_figur(_gap_diff_balken, plot_df[[x_col, _DIFF_SPALTE]], x_col=x_col, xaxis_title=xaxis_title, margin_b=margin_b)
+
+
+def _gap_abweichung_balken(tabelle: pd.DataFrame, x_col: str, titel: str):
+    """Abweichung Lücken vs. Coop-Gesamt je Kategorie (rot = bei Lücken schwächer vertreten)."""
+    fig_diff = go.Figure()
+    fig_diff.add_trace(go.Bar(
+        x=tabelle[x_col], y=tabelle[_DIFF_SPALTE].round(1),
+        marker_color=np.where(tabelle[_DIFF_SPALTE].to_numpy() < 0, 'crimson', 'mediumseagreen'),
+        text=tabelle[_DIFF_SPALTE].map("{:.1f}%P".format),
+        textposition='auto'
+    ))
+    fig_diff.update_layout(title_text=titel, yaxis_title="Differenz in Prozentpunkten", height=380, margin=dict(t=30, b=10))
+    return fig_diff
+
+
+def _produzenten_balken(werte: pd.Series, labels: dict, yaxis_title: str, farbe: str, top_n: int):
+    """Anzahl Gap-Weine je Coop-Produzent (Top-N), Höhe und unterer Rand wachsen mit top_n."""
+    fig = px.bar(x=werte.index, y=werte.values, text=werte.values, labels=labels, color_discrete_sequence=[farbe])
+    fig.update_traces(textposition="outside", textfont_size=12)
+    fig.update_layout(height=max(400, top_n * 25), plot_bgcolor="#ffffff",
+                      xaxis_title="Coop Produzent", yaxis_title=yaxis_title,
+                      xaxis_tickangle=-45, margin=dict(t=30, r=15, l=5, b=170 if top_n > 15 else 120))
+    return fig
+
+
+def _render_kurzeinschaetzung(tabelle: pd.DataFrame, kategorie_label: str, vorlage: str, keine_text: str):
+    """Listet die signifikanten Kategorien; vorlage (ohne Schlusspunkt) erhält {kategorie}, {differenz} und {richtung}."""
+    signifikant = tabelle[tabelle["Signifikant"]]
+    if signifikant.empty:
+        st.markdown(keine_text)
+        return
+    differenzen = signifikant[_DIFF_SPALTE].to_numpy()
+    richtungen = np.where(differenzen > 0, "stärker", "schwächer")
+    st.markdown("\n".join(
+        f"- {vorlage.format(kategorie=k, differenz=abs(d), richtung=r)} (korr. p = {q:.2g})."
+        for k, d, r, q in zip(signifikant[kategorie_label], differenzen, richtungen, signifikant[_Q_SPALTE])
+    ))
+
+
 # ==============================================================================
 # Funktion für Weintyp-Vergleich Gaps vs. Coop-Gesamt (ANGEPASST mit Erklärung und Schwelle)
 # ==============================================================================
 def plot_gaps_weintyp_comparison(
-    df_gaps: pd.DataFrame,
-    df_coop_original: pd.DataFrame,
-    weintyp_col: str = "Weintyp",
+    vergleich: pd.DataFrame,
     titel: str = "Vergleich: Weintyp-Verteilung der Lücken vs. Coop-Gesamtsortiment"
 ):
     st.subheader(titel)
 
     # --- NEU: Erklärungstext ---
     st.markdown("""
-    Diese Analyse vergleicht die prozentuale Verteilung der Weintypen innerhalb der **Sortimentslücken** 
-    (Coop-Weine, die Flaschenpost nicht führt) mit der Verteilung im **Coop-Gesamtsortiment**. 
+    Diese Analyse vergleicht die prozentuale Verteilung der Weintypen innerhalb der **Sortimentslücken**
+    (Coop-Weine, die Flaschenpost nicht führt) mit der Verteilung im **Coop-Gesamtsortiment**.
     Ziel ist es aufzuzeigen, ob bestimmte Weintypen bei den Lücken über- oder unterrepräsentiert sind.
 
     *   Eine **positive Differenz** bedeutet, dass der betreffende Weintyp bei den Lücken einen höheren Anteil hat als im Coop-Gesamtsortiment (d.h., dieser Weintyp fehlt bei Flaschenpost im Verhältnis häufiger).
@@ -2466,65 +2018,42 @@ def plot_gaps_weintyp_comparison(
     """)
     st.markdown("---") # Trennlinie
 
-    order = ["Rotwein", "Weisswein", "Roséwein", "Schaumwein"]
-    if df_gaps.empty: st.info("Keine Sortimentslücken vorhanden, daher kein Vergleich möglich."); return
-        
-    gaps_counts = df_gaps[weintyp_col].value_counts().reindex(order, fill_value=0)
-    gaps_total = gaps_counts.sum(); gaps_percent = (gaps_counts / gaps_total * 100) if gaps_total > 0 else pd.Series([0.0]*len(order), index=order)
-    coop_counts = df_coop_original[weintyp_col].value_counts().reindex(order, fill_value=0)
-    coop_total = coop_counts.sum(); coop_percent = (coop_counts / coop_total * 100) if coop_total > 0 else pd.Series([0.0]*len(order), index=order)
-
-    comparison_df = pd.DataFrame({
-        "Weintyp": order, "Anteil Lücken (%)": gaps_percent.values.round(1),
-        "Anteil Coop-Gesamt (%)": coop_percent.values.round(1)
-    })
-    comparison_df["Differenz (Lücken - Coop) (%)"] = (comparison_df["Anteil Lücken (%)"] - comparison_df["Anteil Coop-Gesamt (%)"]).round(1)
+    comparison_df = _gap_vergleich_tabelle(comparison_slice(vergleich, DIM_WEINTYP), "Weintyp", "Anteil Lücken (%)", "Anteil Coop-Gesamt (%)")
+    if comparison_df.empty: st.info("Keine Sortimentslücken vorhanden, daher kein Vergleich möglich."); return
 
-    col_table, col_chart = st.columns([0.55, 0.45]) 
+    col_table, col_chart = st.columns([0.55, 0.45])
 
     with col_table:
         st.write("Vergleich der prozentualen Anteile:")
-        st.dataframe(comparison_df, hide_index=True, use_container_width=True,
-                       column_config={"Anteil Lücken (%)": st.column_config.NumberColumn(format="%.1f%%"),
-                                      "Anteil Coop-Gesamt (%)": st.column_config.NumberColumn(format="%.1f%%"),
-                                      "Differenz (Lücken - Coop) (%)": st.column_config.NumberColumn(format="%.1f%%")})
+        _gap_vergleich_anzeige(comparison_df, "Anteil Lücken (%)", "Anteil Coop-Gesamt (%)", _DIFF_SPALTE)
     with col_chart:
-        fig_diff = go.Figure()
-        fig_diff.add_trace(go.Bar(
-            x=comparison_df["Weintyp"], y=comparison_df["Differenz (Lücken - Coop) (%)"],
-            marker_color=['crimson' if x < 0 else 'mediumseagreen' for x in comparison_df["Differenz (Lücken - Coop) (%)"]],
-            text=comparison_df["Differenz (Lücken - Coop) (%)"].apply(lambda x: f"{x:.1f}%P"),
-            textposition='auto'
-        ))
-        fig_diff.update_layout(title_text="Abweichung Lücken vs. Coop-Gesamt", yaxis_title="Differenz in Prozentpunkten",
-                               height=380, margin=dict(t=30, b=10))
-        st.plotly_chart(fig_diff, use_container_width=True)
-
-    # --- ANGEPASSTE Interpretation mit Schwelle ---
-    interpretation_threshold = 3.0 # Prozentpunkte als Schwelle für "signifikant"
-    max_ueberrep = comparison_df.loc[comparison_df["Differenz (Lücken - Coop) (%)"].idxmax()]
-    max_unterrep = comparison_df.loc[comparison_df["Differenz (Lücken - Coop) (%)"].idxmin()]
-    
+        zeige_figur(_gap_abweichung_balken, comparison_df[["Weintyp", _DIFF_SPALTE]], x_col="Weintyp",
+                    titel="Abweichung Lücken vs. Coop-Gesamt")
+
+    # --- Interpretation: stärkste Über-/Unterrepräsentation, sofern statistisch signifikant ---
+    max_ueberrep = comparison_df.loc[comparison_df[_DIFF_SPALTE].idxmax()]
+    max_unterrep = comparison_df.loc[comparison_df[_DIFF_SPALTE].idxmin()]
+
     significant_findings = []
-    if max_ueberrep["Differenz (Lücken - Coop) (%)"] >= interpretation_threshold:
+    if max_ueberrep["Signifikant"] and max_ueberrep[_DIFF_SPALTE] > 0:
         significant_findings.append(
             f"**{max_ueberrep['Weintyp']}** sind bei den Sortimentslücken um "
-            f"**{max_ueberrep['Differenz (Lücken - Coop) (%)']:.1f} Prozentpunkte überrepräsentiert** "
-            f"im Vergleich zum Coop-Gesamtsortiment"
+            f"**{max_ueberrep[_DIFF_SPALTE]:.1f} Prozentpunkte überrepräsentiert** "
+            f"im Vergleich zum Coop-Gesamtsortiment (korr. p = {max_ueberrep[_Q_SPALTE]:.2g})"
         )
-    if max_unterrep["Differenz (Lücken - Coop) (%)"] <= -interpretation_threshold:
+    if max_unterrep["Signifikant"] and max_unterrep[_DIFF_SPALTE] < 0:
          significant_findings.append(
             f"**{max_unterrep['Weintyp']}** sind bei den Sortimentslücken um "
-            f"**{abs(max_unterrep['Differenz (Lücken - Coop) (%)']):.1f} Prozentpunkte unterrepräsentiert** "
-            f"im Vergleich zum Coop-Gesamtsortiment"
+            f"**{abs(max_unterrep[_DIFF_SPALTE]):.1f} Prozentpunkte unterrepräsentiert** "
+            f"im Vergleich zum Coop-Gesamtsortiment (korr. p = {max_unterrep[_Q_SPALTE]:.2g})"
         )
-    
+
     st.markdown("##### Kurzeinschätzung:")
     if significant_findings:
         for finding in significant_findings:
             st.markdown(f"- {finding}")
     else:
-        st.markdown("Die Weintyp-Verteilung der Sortimentslücken weicht nur geringfügig von der Verteilung im Coop-Gesamtsortiment ab (Abweichungen unter +/- " + str(interpretation_threshold) + " Prozentpunkten).")
+        st.markdown(f"Die Weintyp-Verteilung der Sortimentslücken weicht nicht signifikant von der Verteilung im Coop-Gesamtsortiment ab (korr. p ≥ {SIGNIFIKANZ_NIVEAU:.2f}).")
 
 
 
@@ -2532,18 +2061,14 @@ def plot_gaps_weintyp_comparison(
 # NEUE Funktion für Preisklassen-Vergleich Gaps vs. Coop-Gesamt
 # ==============================================================================
 def plot_gaps_preisklassen_comparison(
-    df_gaps: pd.DataFrame,
-    df_coop_original: pd.DataFrame,
-    preis_col: str = "Preis", # Name der Preisspalte in beiden DataFrames
-    bins = None, # Bins werden dynamisch oder von außen gesetzt
-    labels = None, # Labels müssen zu den Bins passen
+    vergleich: pd.DataFrame,
     titel: str = "Vergleich: Preisklassen-Verteilung der Lücken vs. Coop-Gesamtsortiment"
 ):
     st.subheader(titel)
 
     # --- Erklärungstext ---
     st.markdown("""
-    Diese Analyse vergleicht die prozentuale Verteilung der Preisklassen (basierend auf Coop-Preisen) 
+    Diese Analyse vergleicht die prozentuale Verteilung der Preisklassen (basierend auf Coop-Preisen)
     innerhalb der **Sortimentslücken** mit der Verteilung im **Coop-Gesamtsortiment**.
     Ziel ist es aufzuzeigen, ob Lücken in bestimmten Preissegmenten über- oder unterrepräsentiert sind.
 
@@ -2552,102 +2077,43 @@ def plot_gaps_preisklassen_comparison(
     """)
     st.markdown("---")
 
-    if df_gaps.empty:
+    comparison_df = _gap_vergleich_tabelle(comparison_slice(vergleich, DIM_PREISKLASSE), "Preisklasse", "Anteil Lücken (%)", "Anteil Coop-Gesamt (%)")
+    if comparison_df.empty:
         st.info("Keine Sortimentslücken vorhanden, daher kein Preisklassen-Vergleich möglich.")
         return
 
-    # Standard-Bins und Labels, falls nicht übergeben (ggf. anpassen)
-    if bins is None:
-        max_preis_gaps = df_gaps[preis_col].max() if not df_gaps.empty else 100 # Max-Preis aus Gaps für dynamische Bins
-        max_preis_coop = df_coop_original[preis_col].max() if not df_coop_original.empty else 100
-        overall_max_preis = max(max_preis_gaps, max_preis_coop, 101) # Sicherstellen, dass max > 100 ist für letztes Label
-
-        bins = [0, 20, 50, 100, overall_max_preis]
-    
-    if labels is None:
-        # Labels dynamisch an Bins anpassen (vereinfacht)
-        labels = []
-        for i in range(len(bins) -1):
-            if i == len(bins) - 2: # Letztes Label
-                labels.append(f"{int(bins[i])}+ CHF")
-            else:
-                labels.append(f"{int(bins[i])}–{int(bins[i+1])} CHF")
-
-    # Funktion zur Berechnung der Preisklassenverteilung
-    def get_preisklassen_verteilung(df_input, col_name, current_bins, current_labels):
-        df_temp = df_input.copy()
-        df_temp["Preisklasse"] = pd.cut(df_temp[col_name], bins=current_bins, labels=current_labels, include_lowest=True, right=False) # right=False für [0-20), [20-50) etc.
-        counts = df_temp["Preisklasse"].value_counts().reindex(current_labels, fill_value=0)
-        total = counts.sum()
-        percent = (counts / total * 100) if total > 0 else pd.Series([0.0]*len(current_labels), index=current_labels)
-        return counts, percent
-
-    # 1. Verteilung für Gaps
-    gaps_counts, gaps_percent = get_preisklassen_verteilung(df_gaps, preis_col, bins, labels)
-
-    # 2. Verteilung für Coop-Gesamtsortiment
-    coop_counts, coop_percent = get_preisklassen_verteilung(df_coop_original, preis_col, bins, labels)
-
-    # 3. DataFrame für Vergleichstabelle und Plot
-    comparison_df = pd.DataFrame({
-        "Preisklasse": labels,
-        "Anteil Lücken (%)": gaps_percent.values.round(1),
-        "Anteil Coop-Gesamt (%)": coop_percent.values.round(1)
-    })
-    comparison_df["Differenz (Lücken - Coop) (%)"] = (comparison_df["Anteil Lücken (%)"] - comparison_df["Anteil Coop-Gesamt (%)"]).round(1)
-
     # Layout mit Spalten
     col_table, col_chart = st.columns([0.55, 0.45])
 
     with col_table:
         st.write("Vergleich der prozentualen Anteile nach Preisklasse:")
-        st.dataframe(
-            comparison_df, hide_index=True, use_container_width=True,
-            column_config={
-                "Anteil Lücken (%)": st.column_config.NumberColumn(format="%.1f%%"),
-                "Anteil Coop-Gesamt (%)": st.column_config.NumberColumn(format="%.1f%%"),
-                "Differenz (Lücken - Coop) (%)": st.column_config.NumberColumn(format="%.1f%%")
-            }
-        )
+        _gap_vergleich_anzeige(comparison_df, "Anteil Lücken (%)", "Anteil Coop-Gesamt (%)", _DIFF_SPALTE)
     with col_chart:
-        fig_diff = go.Figure()
-        fig_diff.add_trace(go.Bar(
-            x=comparison_df["Preisklasse"],
-            y=comparison_df["Differenz (Lücken - Coop) (%)"],
-            marker_color=['crimson' if x < 0 else 'mediumseagreen' for x in comparison_df["Differenz (Lücken - Coop) (%)"]],
-            text=comparison_df["Differenz (Lücken - Coop) (%)"].apply(lambda x: f"{x:.1f}%P"),
-            textposition='auto'
-        ))
-        fig_diff.update_layout(
-            title_text="Abweichung Lücken vs. Coop-Gesamt (Anteil Preisklasse)",
-            yaxis_title="Differenz in Prozentpunkten",
-            height=380, margin=dict(t=30, b=10)
-        )
-        st.plotly_chart(fig_diff, use_container_width=True)
+        zeige_figur(_gap_abweichung_balken, comparison_df[["Preisklasse", _DIFF_SPALTE]], x_col="Preisklasse",
+                    titel="Abweichung Lücken vs. Coop-Gesamt (Anteil Preisklasse)")
+
+    # Interpretation: stärkste Über-/Unterrepräsentation, sofern statistisch signifikant
+    max_ueberrep = comparison_df.loc[comparison_df[_DIFF_SPALTE].idxmax()]
+    max_unterrep = comparison_df.loc[comparison_df[_DIFF_SPALTE].idxmin()]
 
-    # Interpretation
-    interpretation_threshold = 5.0 # Prozentpunkte, etwas höher für Preisklassen ggf. sinnvoll
-    max_ueberrep = comparison_df.loc[comparison_df["Differenz (Lücken - Coop) (%)"].idxmax()]
-    max_unterrep = comparison_df.loc[comparison_df["Differenz (Lücken - Coop) (%)"].idxmin()]
-    
     significant_findings = []
-    if max_ueberrep["Differenz (Lücken - Coop) (%)"] >= interpretation_threshold:
+    if max_ueberrep["Signifikant"] and max_ueberrep[_DIFF_SPALTE] > 0:
         significant_findings.append(
             f"Die Preisklasse **{max_ueberrep['Preisklasse']}** ist bei den Sortimentslücken um "
-            f"**{max_ueberrep['Differenz (Lücken - Coop) (%)']:.1f} Prozentpunkte überrepräsentiert**"
+            f"**{max_ueberrep[_DIFF_SPALTE]:.1f} Prozentpunkte überrepräsentiert** (korr. p = {max_ueberrep[_Q_SPALTE]:.2g})"
         )
-    if max_unterrep["Differenz (Lücken - Coop) (%)"] <= -interpretation_threshold:
+    if max_unterrep["Signifikant"] and max_unterrep[_DIFF_SPALTE] < 0:
          significant_findings.append(
             f"Die Preisklasse **{max_unterrep['Preisklasse']}** ist bei den Sortimentslücken um "
-            f"**{abs(max_unterrep['Differenz (Lücken - Coop) (%)']):.1f} Prozentpunkte unterrepräsentiert**"
+            f"**{abs(max_unterrep[_DIFF_SPALTE]):.1f} Prozentpunkte unterrepräsentiert** (korr. p = {max_unterrep[_Q_SPALTE]:.2g})"
         )
-    
+
     st.markdown("##### Kurzeinschätzung:")
     if significant_findings:
         for finding in significant_findings:
             st.markdown(f"- {finding}")
     else:
-        st.markdown("Die Preisklassen-Verteilung der Sortimentslücken weicht nur geringfügig von der Verteilung im Coop-Gesamtsortiment ab (Abweichungen unter +/- " + str(interpretation_threshold) + " Prozentpunkten).")
+        st.markdown(f"Die Preisklassen-Verteilung der Sortimentslücken weicht nicht signifikant von der Verteilung im Coop-Gesamtsortiment ab (korr. p ≥ {SIGNIFIKANZ_NIVEAU:.2f}).")
 
 
 # ==============================================================================
@@ -2655,14 +2121,8 @@ def plot_gaps_preisklassen_comparison(
 # KORREKTUR: Erklärungstext und Hervorhebung Nulllinie, Farben bleiben nach Weintyp
 # ==============================================================================
 def plot_gaps_preis_nach_weintyp_comparison(
-    df_gaps: pd.DataFrame,
-    df_coop_original: pd.DataFrame,
-    preis_col: str = "Preis",
-    weintyp_col: str = "Weintyp",
-    bins = None, 
-    labels = None, 
-    titel: str = "Vergleich: Preisverteilung nach Weintyp (Lücken vs. Coop-Gesamt)",
-    interpretation_threshold_pp: float = 2.0
+    vergleich: pd.DataFrame,
+    titel: str = "Vergleich: Preisverteilung nach Weintyp (Lücken vs. Coop-Gesamt)"
 ):
     st.subheader(titel)
     # --- ANGEPASSTER Erklärungstext ---
@@ -2680,98 +2140,70 @@ def plot_gaps_preis_nach_weintyp_comparison(
     """)
     st.markdown("---")
 
-    if df_gaps.empty: # Restliche Logik zur Datenaufbereitung bleibt gleich
+    ausschnitt = comparison_slice(vergleich, DIM_PREIS_WEINTYP)
+    if ausschnitt.empty:
         st.info("Keine Sortimentslücken vorhanden, daher kein detaillierter Preis-/Weintyp-Vergleich möglich.")
         return
-    if bins is None:
-        max_preis_gaps = df_gaps[preis_col].max() if not df_gaps.empty and preis_col in df_gaps else 100
-        max_preis_coop = df_coop_original[preis_col].max() if not df_coop_original.empty and preis_col in df_coop_original else 100
-        overall_max_preis = max(max_preis_gaps, max_preis_coop, 101.0); bins = [0, 20, 50, 100, overall_max_preis]
-    if labels is None:
-        labels = [];
-        for i in range(len(bins) - 1):
-            if i == len(bins) - 2: labels.append(f"{int(bins[i])}+ CHF")
-            else: labels.append(f"{int(bins[i])}–{int(bins[i+1])} CHF")
-    def create_pivot(df_input, current_bins, current_labels):
-        order = ["Rotwein", "Weisswein", "Roséwein", "Schaumwein"]; df_temp = df_input.copy()
-        df_temp["Preisklasse"] = pd.cut(df_temp[preis_col], bins=current_bins, labels=current_labels, include_lowest=True, right=False)
-        pivot = df_temp.pivot_table(index="Preisklasse", columns=weintyp_col, aggfunc="size", fill_value=0)
-        for typ in order:
-            if typ not in pivot.columns: pivot[typ] = 0
-        return pivot[order].reindex(current_labels, fill_value=0)
-    pivot_gaps = create_pivot(df_gaps, bins, labels); pivot_coop = create_pivot(df_coop_original, bins, labels)
-    comparison_data = []
-    for preisklasse in labels:
-        row = {"Preisklasse": preisklasse}; total_gaps_in_pk = pivot_gaps.loc[preisklasse].sum() if preisklasse in pivot_gaps.index else 0
-        total_coop_in_pk = pivot_coop.loc[preisklasse].sum() if preisklasse in pivot_coop.index else 0
-        for weintyp in ["Rotwein", "Weisswein", "Roséwein", "Schaumwein"]:
-            val_gaps = pivot_gaps.loc[preisklasse, weintyp] if preisklasse in pivot_gaps.index and weintyp in pivot_gaps.columns else 0
-            pct_gaps = (val_gaps / total_gaps_in_pk * 100) if total_gaps_in_pk > 0 else 0; row[f"{weintyp} Lücken (%)"] = pct_gaps
-            val_coop = pivot_coop.loc[preisklasse, weintyp] if preisklasse in pivot_coop.index and weintyp in pivot_coop.columns else 0
-            pct_coop = (val_coop / total_coop_in_pk * 100) if total_coop_in_pk > 0 else 0; row[f"{weintyp} Coop (%)"] = pct_coop
-            row[f"Diff. {weintyp} (%)"] = pct_gaps - pct_coop
-        comparison_data.append(row)
-    comparison_table_df = pd.DataFrame(comparison_data)
+    klassen = ausschnitt["Gruppe"].unique() # Reihenfolge aus 'Sortierung' (Preisklasse, dann Weintyp)
+
+    # Breite Tabelle: eine Zeile pro Preisklasse, je Weintyp Lücken/Coop/Differenz
+    werte = {"Anteil_Luecken": "{} Lücken (%)", "Anteil_Gesamt": "{} Coop (%)", "Differenz_pp": "Diff. {} (%)"}
+    spalten = pd.MultiIndex.from_product([WEINTYP_REIHENFOLGE, list(werte)]).swaplevel()  # (Wert, Weintyp), je Weintyp gruppiert
+    breit = ausschnitt.pivot_table(index="Gruppe", columns="Kategorie", values=list(werte), aggfunc="first", fill_value=0.0)
+    breit = breit.reindex(index=klassen, columns=spalten, fill_value=0.0)
+    comparison_table_df = pd.DataFrame(breit.to_numpy(), columns=[werte[wert].format(weintyp) for wert, weintyp in spalten])
+    comparison_table_df.insert(0, "Preisklasse", klassen)
+    column_config_compare = {"Preisklasse": st.column_config.TextColumn(width="medium"),
+                             **{label: st.column_config.NumberColumn(format="%.1f%%") for label in comparison_table_df.columns[1:]}}
     st.write("Vergleich der **prozentualen Anteile (%) jedes Weintyps innerhalb der jeweiligen Preisklasse**:")
-    display_cols = ["Preisklasse"]
-    column_config_compare = {"Preisklasse": st.column_config.TextColumn(width="medium")}
-    for weintyp in ["Rotwein", "Weisswein", "Roséwein", "Schaumwein"]:
-        display_cols.extend([f"{weintyp} Lücken (%)", f"{weintyp} Coop (%)", f"Diff. {weintyp} (%)"])
-        column_config_compare[f"{weintyp} Lücken (%)"] = st.column_config.NumberColumn(format="%.1f%%")
-        column_config_compare[f"{weintyp} Coop (%)"] = st.column_config.NumberColumn(format="%.1f%%")
-        column_config_compare[f"Diff. {weintyp} (%)"] = st.column_config.NumberColumn(format="%.1f%%")
-    st.dataframe(comparison_table_df[display_cols], hide_index=True, use_container_width=True, column_config=column_config_compare)
+    st.dataframe(comparison_table_df.round(1), hide_index=True, width="stretch", column_config=column_config_compare)
+    st.caption(_SIGNIFIKANZ_HINWEIS)
     st.markdown("---")
     st.write("Visualisierung der **Abweichungen (in Prozentpunkten)** der Lücken vom Coop-Gesamtsortiment pro Preisklasse:")
-    plot_data_list = []
-    for preisklasse_label in labels:
-        for weintyp_label in ["Rotwein", "Weisswein", "Roséwein", "Schaumwein"]:
-            diff_col_name = f"Diff. {weintyp_label} (%)"; preisklasse_row = comparison_table_df[comparison_table_df["Preisklasse"] == preisklasse_label]
-            if not preisklasse_row.empty and diff_col_name in preisklasse_row.columns:
-                 diff_value = preisklasse_row[diff_col_name].iloc[0]
-                 plot_data_list.append({"Preisklasse": preisklasse_label, "Weintyp": weintyp_label, "Differenz (%)": diff_value})
-    if not plot_data_list: st.warning("Keine Daten für Differenzvisualisierung."); return
-    plot_df_long = pd.DataFrame(plot_data_list)
+    plot_df_long = pd.DataFrame({
+        "Preisklasse": ausschnitt["Gruppe"].to_numpy(),
+        "Weintyp": ausschnitt["Kategorie"].to_numpy(),
+        "Differenz (%)": ausschnitt["Differenz_pp"].to_numpy(),
+    })
 
     # --- Ursprüngliche Plotly Express Logik für Farben (nach Weintyp) ---
-    fig_diff_grouped = px.bar(
-        plot_df_long,
-        x="Preisklasse",
-        y="Differenz (%)",
-        color="Weintyp",  # Färbung nach Weintyp für Legende und Gruppierung
-        barmode="group",
-        text_auto='.1f',
-        color_discrete_map={"Rotwein": "#8B0000", "Weisswein": "#FADA5E", "Roséwein": "#F6ADC6", "Schaumwein": "#E6E6FA"}
-    )
-    fig_diff_grouped.update_traces(texttemplate='%{y:.1f}%P', textposition='outside')
-    fig_diff_grouped.update_layout(
-        yaxis_title="Differenz in Prozentpunkten (Lücken - Coop)",
-        xaxis_title="Preisklasse",
-        height=500,
-        legend_title_text='Weintyp',
-        margin=dict(t=30, b=20),
-        yaxis_zeroline=True, # Nulllinie anzeigen
-        yaxis_zerolinewidth=2, # Breite der Nulllinie
-        yaxis_zerolinecolor='Black' # Farbe der Nulllinie
-    )
-    st.plotly_chart(fig_diff_grouped, use_container_width=True)
-
-    # Dynamische Kurzeinschätzung (bleibt gleich)
-    st.markdown("##### Kurzeinschätzung der Abweichungen:") # ... Rest der Interpretationslogik
-    bemerkenswerte_abweichungen = []
-    for index, row in comparison_table_df.iterrows():
-        preisklasse = row["Preisklasse"]
-        for weintyp in ["Rotwein", "Weisswein", "Roséwein", "Schaumwein"]:
-            differenz = row[f"Diff. {weintyp} (%)"]
-            if abs(differenz) >= interpretation_threshold_pp:
-                richtung = "stärker" if differenz > 0 else "schwächer"
-                bemerkenswerte_abweichungen.append(
-                    f"In der Preisklasse **{preisklasse}** ist **{weintyp}** bei den Lücken um **{abs(differenz):.1f} Prozentpunkte {richtung}** vertreten als im Coop-Gesamtsortiment."
-                )
-    if bemerkenswerte_abweichungen:
-        for abweichung in bemerkenswerte_abweichungen: st.markdown(f"- {abweichung}")
+    def abweichung_gruppiert(plot_df_long, klassen):
+        fig_diff_grouped = px.bar(
+            plot_df_long,
+            x="Preisklasse",
+            y="Differenz (%)",
+            color="Weintyp",  # Färbung nach Weintyp für Legende und Gruppierung
+            barmode="group",
+            text_auto='.1f',
+            category_orders={"Preisklasse": klassen, "Weintyp": WEINTYP_REIHENFOLGE},
+            color_discrete_map={"Rotwein": "#8B0000", "Weisswein": "#FADA5E", "Roséwein": "#F6ADC6", "Schaumwein": "#E6E6FA"}
+        )
+        fig_diff_grouped.update_traces(texttemplate='%{y:.1f}%P', textposition='outside')
+        fig_diff_grouped.update_layout(
+            yaxis_title="Differenz in Prozentpunkten (Lücken - Coop)",
+            xaxis_title="Preisklasse",
+            height=500,
+            legend_title_text='Weintyp',
+            margin=dict(t=30, b=20),
+            yaxis_zeroline=True, # Nulllinie anzeigen
+            yaxis_zerolinewidth=2, # Breite der Nulllinie
+            yaxis_zerolinecolor='Black' # Farbe der Nulllinie
+        )
+        return fig_diff_grouped
+
+    zeige_figur(abweichung_gruppiert, plot_df_long, klassen=list(klassen))
+
+    # Dynamische Kurzeinschätzung aus den vorberechneten Signifikanz-Flags
+    st.markdown("##### Kurzeinschätzung der Abweichungen:")
+    signifikant = ausschnitt[ausschnitt["Signifikant"]]
+    if not signifikant.empty:
+        richtungen = np.where(signifikant["Differenz_pp"].to_numpy() > 0, "stärker", "schwächer")
+        st.markdown("\n".join(
+            f"- In der Preisklasse **{preisklasse}** ist **{weintyp}** bei den Lücken um **{abs(differenz):.1f} Prozentpunkte {richtung}** vertreten als im Coop-Gesamtsortiment (korr. p = {q:.2g})."
+            for preisklasse, weintyp, differenz, richtung, q in zip(signifikant["Gruppe"], signifikant["Kategorie"], signifikant["Differenz_pp"], richtungen, signifikant["q_Wert"])
+        ))
     else:
-        st.markdown(f"Keine Abweichungen von +/- {interpretation_threshold_pp:.1f} Prozentpunkten oder mehr in der Preis-/Weintyp-Verteilung der Lücken im Vergleich zum Coop-Gesamtsortiment festgestellt.")
+        st.markdown(f"Keine statistisch signifikanten Abweichungen (korr. p < {SIGNIFIKANZ_NIVEAU:.2f}) in der Preis-/Weintyp-Verteilung der Lücken im Vergleich zum Coop-Gesamtsortiment festgestellt.")
 
 
 # ==============================================================================
@@ -2779,18 +2211,16 @@ def plot_gaps_preis_nach_weintyp_comparison(
 # KORREKTUR: Farbskala für das Balkendiagramm (Grün für Positiv, Rot für Negativ)
 # ==============================================================================
 def plot_gaps_herkunftslaender_comparison(
-    df_gaps: pd.DataFrame,
-    df_coop_original: pd.DataFrame,
+    vergleich: pd.DataFrame,
     region_col_coop: str = "Region",
     top_n: int = 10,
-    titel: str = "Vergleich: Top Herkunftsländer (Lücken vs. Coop-Gesamt)",
-    interpretation_threshold_pp: float = 1.5 # Schwelle bleibt
+    titel: str = "Vergleich: Top Herkunftsländer (Lücken vs. Coop-Gesamt)"
 ):
     st.subheader(titel)
     # Erklärungstext (bleibt so, da wir die Farben jetzt anpassen)
     st.markdown(f"""
     Diese Analyse vergleicht die Verteilung der Top {top_n} Herkunftsländer der **Sortimentslücken**
-    mit der Verteilung im **Coop-Gesamtsortiment**. 
+    mit der Verteilung im **Coop-Gesamtsortiment**.
     Das Land wird aus der Spalte '{region_col_coop}' extrahiert (erster Teil vor einem Komma, falls vorhanden).
 
     Die Tabelle zeigt die prozentualen Anteile der Top-Länder für die Lücken und das Coop-Gesamtsortiment
@@ -2800,545 +2230,124 @@ def plot_gaps_herkunftslaender_comparison(
     """)
     st.markdown("---")
 
-    if df_gaps.empty: # Restliche Datenaufbereitung bleibt gleich
+    ausschnitt = comparison_slice(vergleich, DIM_LAND)
+    if ausschnitt.empty or ausschnitt["Anzahl_Luecken"].sum() == 0:
         st.info("Keine Sortimentslücken vorhanden, daher kein Herkunftsländer-Vergleich möglich.")
         return
-    def get_laender_verteilung(df_input, region_col, num_top):
-        df_temp = df_input.copy()
-        df_temp["Land_extracted"] = df_temp[region_col].apply(lambda x: str(x).split(",")[0].strip() if pd.notna(x) and "," in str(x) else str(x).strip() if pd.notna(x) else "Unbekannt")
-        counts = df_temp["Land_extracted"].value_counts(); total_in_scope = counts.sum()
-        top_counts = counts.head(num_top)
-        percent_overall = (counts / len(df_input) * 100) if len(df_input) > 0 else pd.Series(dtype='float64')
-        laender_df = pd.DataFrame({'Land': top_counts.index, 'Anzahl': top_counts.values})
-        laender_df['Anteil am Gesamt (%)'] = laender_df['Land'].map(percent_overall).fillna(0)
-        return counts, percent_overall, laender_df
-    _, gaps_percent_overall, top_gaps_df = get_laender_verteilung(df_gaps, region_col_coop, top_n)
-    _, coop_percent_overall, top_coop_df = get_laender_verteilung(df_coop_original, region_col_coop, top_n)
-    all_top_laender = pd.concat([top_gaps_df['Land'], top_coop_df['Land']]).unique()
-    comparison_data = []
-    for land in all_top_laender:
-        anteil_gaps = gaps_percent_overall.get(land, 0); anteil_coop = coop_percent_overall.get(land, 0)
-        comparison_data.append({"Land": land, "Anteil Lücken am Gesamt (%)": anteil_gaps, "Anteil Coop am Gesamt (%)": anteil_coop, "Differenz (Lücken - Coop) (%)": anteil_gaps - anteil_coop})
-    comparison_table_df = pd.DataFrame(comparison_data).sort_values(by="Differenz (Lücken - Coop) (%)", ascending=False)
-    comparison_table_df_display = comparison_table_df.head(top_n * 2)
+    # Top-Länder bei den Lücken und im Coop-Gesamt zusammenführen
+    top_laender = pd.concat([ausschnitt.nlargest(top_n, "Anzahl_Luecken"), ausschnitt.nlargest(top_n, "Anzahl_Gesamt")]).drop_duplicates(subset="Kategorie")
+    comparison_table_df = _gap_vergleich_tabelle(top_laender, "Land", "Anteil Lücken am Gesamt (%)", "Anteil Coop am Gesamt (%)")
+    comparison_table_df_display = comparison_table_df.sort_values(by=_DIFF_SPALTE, ascending=False).head(top_n * 2)
     st.write(f"Vergleich der prozentualen Anteile der Top {top_n} Herkunftsländer (Anteil am jeweiligen Gesamtsortiment):")
-    st.dataframe(comparison_table_df_display.round(1), hide_index=True, use_container_width=True,
-        column_config={"Anteil Lücken am Gesamt (%)": st.column_config.NumberColumn(format="%.1f%%"),
-                       "Anteil Coop am Gesamt (%)": st.column_config.NumberColumn(format="%.1f%%"),
-                       "Differenz (Lücken - Coop) (%)": st.column_config.NumberColumn(format="%.1f%%")})
+    _gap_vergleich_anzeige(comparison_table_df_display, "Anteil Lücken am Gesamt (%)", "Anteil Coop am Gesamt (%)", _DIFF_SPALTE)
     st.markdown("---")
     st.write(f"Visualisierung der **Abweichungen (in Prozentpunkten)** der Lücken vom Coop-Gesamtsortiment (Anteil des Landes am jeweiligen Gesamtsortiment):")
-    plot_df = comparison_table_df_display[(comparison_table_df_display['Anteil Lücken am Gesamt (%)'] > 0.1) | (comparison_table_df_display['Anteil Coop am Gesamt (%)'] > 0.1) | (abs(comparison_table_df_display['Differenz (Lücken - Coop) (%)']) > 0.1)].sort_values(by="Differenz (Lücken - Coop) (%)", ascending=False).head(top_n + 5)
+    plot_df = comparison_table_df_display[(comparison_table_df_display['Anteil Lücken am Gesamt (%)'] > 0.1) | (comparison_table_df_display['Anteil Coop am Gesamt (%)'] > 0.1) | (comparison_table_df_display[_DIFF_SPALTE].abs() > 0.1)].head(top_n + 5)
 
     if not plot_df.empty:
-        # --- KORRIGIERTE Farblogik ---
-        # Erstelle eine Liste von Farben basierend auf dem Wert der Differenz
-        colors = ['mediumseagreen' if val >= 0 else 'crimson' for val in plot_df["Differenz (Lücken - Coop) (%)"]]
-
-        fig_diff_laender = px.bar(
-            plot_df,
-            x="Land",
-            y="Differenz (Lücken - Coop) (%)",
-            text_auto='.1f',
-            # color="Differenz (Lücken - Coop) (%)", # Nicht mehr so, da wir Farben manuell setzen
-            # color_continuous_scale=..., # Nicht mehr so
-            # color_continuous_midpoint=0
-        )
-        # Setze die Farben manuell für den Trace
-        fig_diff_laender.update_traces(marker_color=colors, texttemplate='%{y:.1f}%P', textposition='outside')
-        
-        fig_diff_laender.update_layout(
-            yaxis_title="Differenz in Prozentpunkten",
-            xaxis_title="Herkunftsland",
-            height=500,
-            xaxis_tickangle=-45,
-            margin=dict(t=30, b=100),
-            yaxis_zeroline=True, 
-            yaxis_zerolinewidth=2, 
-            yaxis_zerolinecolor='Black'
-        )
-        st.plotly_chart(fig_diff_laender, use_container_width=True)
+        _plot_gap_diff_bars(plot_df, "Land", "Herkunftsland", margin_b=100)
     else:
         st.info("Keine ausreichenden Daten für die Visualisierung der Länderdifferenzen vorhanden.")
 
-    # Dynamische Kurzeinschätzung (bleibt gleich)
-    st.markdown("##### Kurzeinschätzung der Abweichungen:") # ... Rest der Interpretationslogik
-    significant_findings = []
-    for index, row in comparison_table_df_display.iterrows():
-        land = row["Land"]; differenz = row["Differenz (Lücken - Coop) (%)"]
-        if abs(differenz) >= interpretation_threshold_pp:
-            richtung = "stärker" if differenz > 0 else "schwächer"
-            significant_findings.append(f"Das Land **{land}** ist bei den Lücken um **{abs(differenz):.1f} Prozentpunkte {richtung}** vertreten als im Coop-Gesamtsortiment (bezogen auf den Anteil des Landes am jeweiligen Gesamtsortiment).")
-    if significant_findings:
-        for abweichung in significant_findings: st.markdown(f"- {abweichung}")
-    else:
-        st.markdown(f"Keine Abweichungen von +/- {interpretation_threshold_pp:.1f} Prozentpunkten oder mehr bei den Top-Herkunftsländern festgestellt.")
-
-
-
-# In plot_utils.py (diese Funktion unten anfügen)
-
-# =======================================================================================
-# NEUE Funktion für Vergleich Frankreich-Regionen (Lücken vs. Coop-Gesamt)
-# =======================================================================================
-def plot_gaps_frankreich_regionen_comparison(
-    df_gaps: pd.DataFrame,
-    df_coop_original: pd.DataFrame,
-    region_col: str = "Region", # Spalte mit der Roh-Regioneninfo
-    titel: str = "Vergleich: Regionen Frankreichs (Lücken vs. Coop-Gesamt)",
-    interpretation_threshold_pp: float = 5.0
-):
-    st.subheader(titel)
-    st.markdown(f"""
-    Diese Analyse vergleicht die Verteilung der Weinregionen innerhalb Frankreichs für die **Sortimentslücken**
-    mit der Verteilung im **Coop-Gesamtsortiment (Frankreich)**.
-    Die Regionen werden basierend auf der Spalte '{region_col}' aggregiert.
-
-    Die Tabelle zeigt die prozentualen Anteile der Regionen für die Lücken und das Coop-Gesamtsortiment
-    (bezogen auf die jeweiligen Frankreich-Weine) sowie die Differenz. Das Diagramm visualisiert diese Differenzen:
-    *   **Positive Balken (grün):** Die Region ist bei den französischen Lücken **stärker vertreten**.
-    *   **Negative Balken (rot):** Die Region ist bei den französischen Lücken **schwächer vertreten**.
-    """)
-    st.markdown("---")
-
-    # Interne Helferfunktion, die deine Logik aus plot_frankreich_regionen kapselt
-    def get_frankreich_regionen_verteilung(df_input_all_countries, input_region_col):
-        df = df_input_all_countries.copy()
-        # Normalisierungs- und Mapping-Logik aus deiner Funktion
-        def normalize_string(text):
-            text = str(text).lower(); text = ''.join(c for c in unicodedata.normalize('NFD', text) if unicodedata.category(c) != 'Mn')
-            return text.replace('–', '-').replace(' ', '-')
-        subregion_mapping = { "maconnais": "Burgund", "chablis": "Burgund", "beaujolais": "Burgund", "cote-de-beaune": "Burgund", "cote-de-nuits": "Burgund", "cote-chalon": "Burgund", "coteaux-du-lyonnais": "Burgund", "bouzeron": "Burgund", "givry": "Burgund", "mercurey": "Burgund", "montagny": "Burgund", "rully": "Burgund", "cote-d-or": "Burgund", "irancy": "Burgund", "pouilly-fuisse": "Burgund", "saint-veran": "Burgund", "vire-clesse": "Burgund", "saint-bris": "Burgund", "fronsac": "Bordeaux", "saint-emilion": "Bordeaux", "pomerol": "Bordeaux", "margaux": "Bordeaux", "pauillac": "Bordeaux", "saint-julien": "Bordeaux", "saint-estephe": "Bordeaux", "graves": "Bordeaux", "medoc": "Bordeaux", "castillon": "Bordeaux", "listrac": "Bordeaux", "moulis": "Bordeaux", "entre-deux-mers": "Bordeaux", "sauternes": "Bordeaux", "barsac": "Bordeaux", "canon-fronsac": "Bordeaux", "hermitage": "Rhône", "chateauneuf-du-pape": "Rhône", "cornas": "Rhône", "saint-joseph": "Rhône", "gigondas": "Rhône", "cote-rotie": "Rhône", "vacqueyras": "Rhône", "crozes-hermitage": "Rhône", "rasteau": "Rhône", "lirac": "Rhône", "condrieu": "Rhône", "luberon": "Rhône", "cote-du-luberon": "Rhône", "keine-subregion": "Andere", "ubrige-regionen-eu": "Andere"}
-        def categorize_region(subregion_normalized):
-            if "burgund" in subregion_normalized: return "Burgund"
-            elif "bordeaux" in subregion_normalized: return "Bordeaux"
-            elif "rhone" in subregion_normalized: return "Rhône"
-            return subregion_mapping.get(subregion_normalized, subregion_normalized.capitalize())
-        
-        df["Land_extracted"] = df[input_region_col].apply(lambda x: str(x).split(",")[0].strip() if pd.notna(x) and "," in str(x) else str(x).strip() if pd.notna(x) else "Unbekannt")
-        df["Subregion_raw"] = df[input_region_col].apply(lambda x: str(x).split(",")[1].strip() if pd.notna(x) and "," in str(x) and len(str(x).split(",")) > 1 else "Keine Subregion")
-        
-        df_fr_only = df[df["Land_extracted"] == "Frankreich"].copy()
-        if df_fr_only.empty: return pd.Series(dtype='int64'), pd.Series(dtype='float64') # Leere Series zurückgeben
-
-        df_fr_only["Subregion_normalized"] = df_fr_only["Subregion_raw"].apply(normalize_string)
-        df_fr_only["Region_plot"] = df_fr_only["Subregion_normalized"].apply(categorize_region)
-        
-        region_counts = df_fr_only["Region_plot"].value_counts()
-        total_country_wines = region_counts.sum()
-        region_percent = (region_counts / total_country_wines * 100) if total_country_wines > 0 else pd.Series(dtype='float64')
-        return region_counts, region_percent
-
-    # 1. Verteilung für Gaps (Frankreich)
-    gaps_fr_counts, gaps_fr_percent = get_frankreich_regionen_verteilung(df_gaps, region_col)
-
-    # 2. Verteilung für Coop-Gesamtsortiment (Frankreich)
-    coop_fr_counts, coop_fr_percent = get_frankreich_regionen_verteilung(df_coop_original, region_col)
-
-    if gaps_fr_counts.empty and coop_fr_counts.empty:
-        st.info("Keine Frankreich-Daten in Lücken oder im Coop-Gesamtsortiment gefunden.")
-        return
-
-    # 3. Kombiniere die Regionen für die Vergleichstabelle
-    all_fr_regions = pd.Index(gaps_fr_counts.index.tolist() + coop_fr_counts.index.tolist()).unique()
-    
-    comparison_data = []
-    for region_name in all_fr_regions:
-        anteil_gaps = gaps_fr_percent.get(region_name, 0)
-        anteil_coop = coop_fr_percent.get(region_name, 0)
-        comparison_data.append({
-            "Region Frankreich": region_name,
-            "Anteil Lücken (FR) (%)": anteil_gaps,
-            "Anteil Coop (FR) (%)": anteil_coop,
-            "Differenz (Lücken - Coop) (%)": anteil_gaps - anteil_coop
-        })
-    
-    comparison_table_df = pd.DataFrame(comparison_data).sort_values(by="Differenz (Lücken - Coop) (%)", ascending=False)
-
-    st.write("Vergleich der prozentualen Anteile der Regionen innerhalb Frankreichs:")
-    st.dataframe(
-        comparison_table_df.round(1), hide_index=True, use_container_width=True,
-        column_config={
-            "Anteil Lücken (FR) (%)": st.column_config.NumberColumn(format="%.1f%%"),
-            "Anteil Coop (FR) (%)": st.column_config.NumberColumn(format="%.1f%%"),
-            "Differenz (Lücken - Coop) (%)": st.column_config.NumberColumn(format="%.1f%%")
-        }
+    st.markdown("##### Kurzeinschätzung der Abweichungen:")
+    _render_kurzeinschaetzung(
+        comparison_table_df_display, "Land",
+        "Das Land **{kategorie}** ist bei den Lücken um **{differenz:.1f} Prozentpunkte {richtung}** vertreten als im Coop-Gesamtsortiment (bezogen auf den Anteil des Landes am jeweiligen Gesamtsortiment)",
+        f"Keine statistisch signifikanten Abweichungen (korr. p < {SIGNIFIKANZ_NIVEAU:.2f}) bei den Top-Herkunftsländern festgestellt."
     )
-    st.markdown("---")
-
-    st.write(f"Visualisierung der **Abweichungen (in Prozentpunkten)** der Lücken vom Coop-Gesamtsortiment (Frankreich-Regionen):")
-    plot_df = comparison_table_df[abs(comparison_table_df["Differenz (Lücken - Coop) (%)"]) > 0.01].copy() # Nur plotten, wenn Differenz vorhanden
-    
-    if not plot_df.empty:
-        colors = ['mediumseagreen' if val >= 0 else 'crimson' for val in plot_df["Differenz (Lücken - Coop) (%)"]]
-        fig_diff_fr_regionen = px.bar(
-            plot_df, x="Region Frankreich", y="Differenz (Lücken - Coop) (%)", text_auto='.1f'
-        )
-        fig_diff_fr_regionen.update_traces(marker_color=colors, texttemplate='%{y:.1f}%P', textposition='outside')
-        fig_diff_fr_regionen.update_layout(
-            yaxis_title="Differenz in Prozentpunkten", xaxis_title="Region in Frankreich", height=500,
-            xaxis_tickangle=-45, margin=dict(t=30, b=120), # Mehr Platz für Labels
-            yaxis_zeroline=True, yaxis_zerolinewidth=2, yaxis_zerolinecolor='Black'
-        )
-        st.plotly_chart(fig_diff_fr_regionen, use_container_width=True)
-    else:
-        st.info("Keine nennenswerten Differenzen bei den Frankreich-Regionen für Visualisierung gefunden.")
-
-    st.markdown("##### Kurzeinschätzung der Abweichungen (Frankreich-Regionen):")
-    significant_findings = []
-    for index, row in comparison_table_df.iterrows():
-        region_name = row["Region Frankreich"]; differenz = row["Differenz (Lücken - Coop) (%)"]
-        if abs(differenz) >= interpretation_threshold_pp:
-            richtung = "stärker" if differenz > 0 else "schwächer"
-            significant_findings.append(f"Die Region **{region_name}** ist bei den französischen Lücken um **{abs(differenz):.1f} Prozentpunkte {richtung}** vertreten als im französischen Coop-Gesamtsortiment.")
-    if significant_findings:
-        for abweichung in significant_findings: st.markdown(f"- {abweichung}")
-    else:
-        st.markdown(f"Keine Abweichungen von +/- {interpretation_threshold_pp:.1f} Prozentpunkten oder mehr bei den Frankreich-Regionen festgestellt.")
 
 
-# In plot_utils.py (diese Funktion unten anfügen)
-
 # =======================================================================================
-# NEUE Funktion für Vergleich Italien-Regionen (Lücken vs. Coop-Gesamt)
+# Vergleich Regionen eines Landes (Lücken vs. Coop-Gesamt) – Frankreich, Italien, Schweiz, Spanien
+# Die Zuordnung Subregion -> Hauptregion liegt in regionen.REGIONEN_REGELN
 # =======================================================================================
-def plot_gaps_italien_regionen_comparison(
-    df_gaps: pd.DataFrame,
-    df_coop_original: pd.DataFrame,
+_LAND_TEXTE = {
+    # Land: (Kürzel, Genitiv, Adjektiv, "in ...")
+    "Frankreich": ("FR", "Frankreichs", "französischen", "in Frankreich"),
+    "Italien": ("IT", "Italiens", "italienischen", "in Italien"),
+    "Schweiz": ("CH", "der Schweiz", "Schweizer", "in der Schweiz"),
+    "Spanien": ("ES", "Spaniens", "spanischen", "in Spanien"),
+}
+
+
+def plot_gaps_regionen_comparison(
+    vergleich: pd.DataFrame,
+    land: str,
     region_col: str = "Region", # Spalte mit der Roh-Regioneninfo
-    titel: str = "Vergleich: Regionen Italiens (Lücken vs. Coop-Gesamt)",
-    interpretation_threshold_pp: float = 5.0
+    titel: str = None
 ):
-    st.subheader(titel)
+    kuerzel, genitiv, adjektiv, in_land = _LAND_TEXTE[land]
+    st.subheader(titel or f"Vergleich: Regionen {genitiv} (Lücken vs. Coop-Gesamt)")
     st.markdown(f"""
-    Diese Analyse vergleicht die Verteilung der Weinregionen innerhalb Italiens für die **Sortimentslücken**
-    mit der Verteilung im **Coop-Gesamtsortiment (Italien)**.
+    Diese Analyse vergleicht die Verteilung der Weinregionen innerhalb {genitiv} für die **Sortimentslücken**
+    mit der Verteilung im **Coop-Gesamtsortiment ({land})**.
     Die Regionen werden basierend auf der Spalte '{region_col}' aggregiert.
 
     Die Tabelle zeigt die prozentualen Anteile der Regionen für die Lücken und das Coop-Gesamtsortiment
-    (bezogen auf die jeweiligen Italien-Weine) sowie die Differenz. Das Diagramm visualisiert diese Differenzen:
-    *   **Positive Balken (grün):** Die Region ist bei den italienischen Lücken **stärker vertreten**.
-    *   **Negative Balken (rot):** Die Region ist bei den italienischen Lücken **schwächer vertreten**.
+    (bezogen auf die jeweiligen {land}-Weine) sowie die Differenz. Das Diagramm visualisiert diese Differenzen:
+    *   **Positive Balken (grün):** Die Region ist bei den {adjektiv} Lücken **stärker vertreten**.
+    *   **Negative Balken (rot):** Die Region ist bei den {adjektiv} Lücken **schwächer vertreten**.
     """)
     st.markdown("---")
 
-    # Interne Helferfunktion, die deine Logik aus plot_italien_regionen kapselt
-    def get_italien_regionen_verteilung(df_input_all_countries, input_region_col):
-        df = df_input_all_countries.copy()
-        # Normalisierungs- und Mapping-Logik aus deiner Funktion
-        def normalize_string(text):
-            text = str(text).lower(); text = ''.join(c for c in unicodedata.normalize('NFD', text) if unicodedata.category(c) != 'Mn')
-            return text.replace('–', '-').replace(' ', '-')
-        subregion_mapping = {"lombardei/veltlin": "Lombardei", "keine-subregion": "Andere", "ubrige-regionen-eu": "Andere", "brda": "Andere", "abruzzen-und-apulien": "Andere"} # Dein Mapping
-        def categorize_region(subregion_normalized):
-            if subregion_normalized in subregion_mapping: return subregion_mapping[subregion_normalized]
-            return subregion_normalized.capitalize()
-        
-        df["Land_extracted"] = df[input_region_col].apply(lambda x: str(x).split(",")[0].strip() if pd.notna(x) and "," in str(x) else str(x).strip() if pd.notna(x) else "Unbekannt")
-        df["Subregion_raw"] = df[input_region_col].apply(lambda x: str(x).split(",")[1].strip() if pd.notna(x) and "," in str(x) and len(str(x).split(",")) > 1 else "Keine Subregion")
-        
-        df_it_only = df[df["Land_extracted"] == "Italien"].copy()
-        if df_it_only.empty: return pd.Series(dtype='int64'), pd.Series(dtype='float64')
-
-        df_it_only["Subregion_normalized"] = df_it_only["Subregion_raw"].apply(normalize_string)
-        df_it_only["Region_plot"] = df_it_only["Subregion_normalized"].apply(categorize_region)
-        
-        region_counts = df_it_only["Region_plot"].value_counts()
-        total_country_wines = region_counts.sum()
-        region_percent = (region_counts / total_country_wines * 100) if total_country_wines > 0 else pd.Series(dtype='float64')
-        return region_counts, region_percent
-
-    # 1. Verteilung für Gaps (Italien)
-    gaps_it_counts, gaps_it_percent = get_italien_regionen_verteilung(df_gaps, region_col)
-
-    # 2. Verteilung für Coop-Gesamtsortiment (Italien)
-    coop_it_counts, coop_it_percent = get_italien_regionen_verteilung(df_coop_original, region_col)
-
-    if gaps_it_counts.empty and coop_it_counts.empty:
-        st.info("Keine Italien-Daten in Lücken oder im Coop-Gesamtsortiment gefunden.")
+    ausschnitt = comparison_slice(vergleich, DIM_HAUPTREGION, gruppe=land)
+    if ausschnitt.empty:
+        st.info(f"Keine {land}-Daten in Lücken oder im Coop-Gesamtsortiment gefunden.")
         return
 
-    all_it_regions = pd.Index(gaps_it_counts.index.tolist() + coop_it_counts.index.tolist()).unique()
-    
-    comparison_data = []
-    for region_name in all_it_regions:
-        anteil_gaps = gaps_it_percent.get(region_name, 0)
-        anteil_coop = coop_it_percent.get(region_name, 0)
-        comparison_data.append({
-            "Region Italien": region_name,
-            "Anteil Lücken (IT) (%)": anteil_gaps,
-            "Anteil Coop (IT) (%)": anteil_coop,
-            "Differenz (Lücken - Coop) (%)": anteil_gaps - anteil_coop
-        })
-    
-    comparison_table_df = pd.DataFrame(comparison_data).sort_values(by="Differenz (Lücken - Coop) (%)", ascending=False)
+    region_label = f"Region {land}"
+    comparison_table_df = _gap_vergleich_tabelle(
+        ausschnitt, region_label, f"Anteil Lücken ({kuerzel}) (%)", f"Anteil Coop ({kuerzel}) (%)"
+    ).sort_values(by=_DIFF_SPALTE, ascending=False)
 
-    st.write("Vergleich der prozentualen Anteile der Regionen innerhalb Italiens:")
-    st.dataframe(
-        comparison_table_df.round(1), hide_index=True, use_container_width=True,
-        column_config={
-            "Anteil Lücken (IT) (%)": st.column_config.NumberColumn(format="%.1f%%"),
-            "Anteil Coop (IT) (%)": st.column_config.NumberColumn(format="%.1f%%"),
-            "Differenz (Lücken - Coop) (%)": st.column_config.NumberColumn(format="%.1f%%")
-        })
+    st.write(f"Vergleich der prozentualen Anteile der Regionen innerhalb {genitiv}:")
+    _gap_vergleich_anzeige(comparison_table_df, f"Anteil Lücken ({kuerzel}) (%)", f"Anteil Coop ({kuerzel}) (%)", _DIFF_SPALTE)
     st.markdown("---")
 
-    st.write(f"Visualisierung der **Abweichungen (in Prozentpunkten)** der Lücken vom Coop-Gesamtsortiment (Italien-Regionen):")
-    plot_df = comparison_table_df[abs(comparison_table_df["Differenz (Lücken - Coop) (%)"]) > 0.01].copy()
-    
+    st.write(f"Visualisierung der **Abweichungen (in Prozentpunkten)** der Lücken vom Coop-Gesamtsortiment ({land}-Regionen):")
+    plot_df = comparison_table_df[comparison_table_df[_DIFF_SPALTE].abs() > 0.01] # Nur plotten, wenn Differenz vorhanden
     if not plot_df.empty:
-        colors = ['mediumseagreen' if val >= 0 else 'crimson' for val in plot_df["Differenz (Lücken - Coop) (%)"]]
-        fig_diff_it_regionen = px.bar(
-            plot_df, x="Region Italien", y="Differenz (Lücken - Coop) (%)", text_auto='.1f'
-        )
-        fig_diff_it_regionen.update_traces(marker_color=colors, texttemplate='%{y:.1f}%P', textposition='outside')
-        fig_diff_it_regionen.update_layout(
-            yaxis_title="Differenz in Prozentpunkten", xaxis_title="Region in Italien", height=500,
-            xaxis_tickangle=-45, margin=dict(t=30, b=120),
-            yaxis_zeroline=True, yaxis_zerolinewidth=2, yaxis_zerolinecolor='Black'
-        )
-        st.plotly_chart(fig_diff_it_regionen, use_container_width=True)
-    else:
-        st.info("Keine nennenswerten Differenzen bei den Italien-Regionen für Visualisierung gefunden.")
-
-    st.markdown("##### Kurzeinschätzung der Abweichungen (Italien-Regionen):")
-    significant_findings = []
-    for index, row in comparison_table_df.iterrows():
-        region_name = row["Region Italien"]; differenz = row["Differenz (Lücken - Coop) (%)"]
-        if abs(differenz) >= interpretation_threshold_pp:
-            richtung = "stärker" if differenz > 0 else "schwächer"
-            significant_findings.append(f"Die Region **{region_name}** ist bei den italienischen Lücken um **{abs(differenz):.1f} Prozentpunkte {richtung}** vertreten als im italienischen Coop-Gesamtsortiment.")
-    if significant_findings:
-        for abweichung in significant_findings: st.markdown(f"- {abweichung}")
+        _plot_gap_diff_bars(plot_df, region_label, f"Region {in_land}")
     else:
-        st.markdown(f"Keine Abweichungen von +/- {interpretation_threshold_pp:.1f} Prozentpunkten oder mehr bei den Italien-Regionen festgestellt.")
-
-
-# In plot_utils.py (diese Funktion unten anfügen)
-
-# =======================================================================================
-# NEUE Funktion für Vergleich Schweiz-Regionen (Lücken vs. Coop-Gesamt)
-# =======================================================================================
-def plot_gaps_schweiz_regionen_comparison(
-    df_gaps: pd.DataFrame,
-    df_coop_original: pd.DataFrame,
-    region_col: str = "Region", # Spalte mit der Roh-Regioneninfo
-    titel: str = "Vergleich: Regionen der Schweiz (Lücken vs. Coop-Gesamt)",
-    interpretation_threshold_pp: float = 5.0
-):
-    st.subheader(titel)
-    st.markdown(f"""
-    Diese Analyse vergleicht die Verteilung der Weinregionen innerhalb der Schweiz für die **Sortimentslücken**
-    mit der Verteilung im **Coop-Gesamtsortiment (Schweiz)**.
-    Die Regionen werden basierend auf der Spalte '{region_col}' aggregiert.
-
-    Die Tabelle zeigt die prozentualen Anteile der Regionen für die Lücken und das Coop-Gesamtsortiment
-    (bezogen auf die jeweiligen Schweiz-Weine) sowie die Differenz. Das Diagramm visualisiert diese Differenzen:
-    *   **Positive Balken (grün):** Die Region ist bei den Schweizer Lücken **stärker vertreten**.
-    *   **Negative Balken (rot):** Die Region ist bei den Schweizer Lücken **schwächer vertreten**.
-    """)
-    st.markdown("---")
-
-    # Interne Helferfunktion, die deine Logik aus plot_schweiz_regionen kapselt
-    def get_schweiz_regionen_verteilung(df_input_all_countries, input_region_col):
-        df = df_input_all_countries.copy()
-        # Normalisierungs- und Mapping-Logik aus deiner Funktion
-        def normalize_string(text):
-            text = str(text).lower(); text = ''.join(c for c in unicodedata.normalize('NFD', text) if unicodedata.category(c) != 'Mn')
-            return text.replace('–', '-').replace(' ', '-')
-        subregion_mapping = {"bodensee": "Ostschweiz", "ubrige-schweiz": "Andere"}
-        def categorize_region(subregion_normalized):
-            if subregion_normalized in subregion_mapping: return subregion_mapping[subregion_normalized]
-            # Schreibweisen angleichen (aus deiner Funktion übernommen)
-            map_dict = {"wallis": "Wallis", "waadt": "Waadt", "tessin": "Tessin", "drei-seen-region": "Drei-Seen-Region",
-                        "genf": "Genf", "basel/aargau": "Basel/Aargau", "zurich": "Zürich", "schaffhausen": "Schaffhausen",
-                        "graubunden": "Graubünden", "ostschweiz": "Ostschweiz", "thurgau": "Thurgau", "st.-gallen": "St. Gallen"}
-            return map_dict.get(subregion_normalized, subregion_normalized.capitalize())
-
-        df["Land_extracted"] = df[input_region_col].apply(lambda x: str(x).split(",")[0].strip() if pd.notna(x) and "," in str(x) else str(x).strip() if pd.notna(x) else "Unbekannt")
-        df["Subregion_raw"] = df[input_region_col].apply(lambda x: str(x).split(",")[1].strip() if pd.notna(x) and "," in str(x) and len(str(x).split(",")) > 1 else "Keine Subregion")
-        
-        df_ch_only = df[df["Land_extracted"] == "Schweiz"].copy()
-        if df_ch_only.empty: return pd.Series(dtype='int64'), pd.Series(dtype='float64')
-
-        df_ch_only["Subregion_normalized"] = df_ch_only["Subregion_raw"].apply(normalize_string)
-        df_ch_only["Region_plot"] = df_ch_only["Subregion_normalized"].apply(categorize_region)
-        
-        region_counts = df_ch_only["Region_plot"].value_counts()
-        total_country_wines = region_counts.sum()
-        region_percent = (region_counts / total_country_wines * 100) if total_country_wines > 0 else pd.Series(dtype='float64')
-        return region_counts, region_percent
-
-    gaps_ch_counts, gaps_ch_percent = get_schweiz_regionen_verteilung(df_gaps, region_col)
-    coop_ch_counts, coop_ch_percent = get_schweiz_regionen_verteilung(df_coop_original, region_col)
-
-    if gaps_ch_counts.empty and coop_ch_counts.empty:
-        st.info("Keine Schweiz-Daten in Lücken oder im Coop-Gesamtsortiment gefunden.")
-        return
-
-    all_ch_regions = pd.Index(gaps_ch_counts.index.tolist() + coop_ch_counts.index.tolist()).unique()
-    
-    comparison_data = []
-    for region_name in all_ch_regions:
-        anteil_gaps = gaps_ch_percent.get(region_name, 0)
-        anteil_coop = coop_ch_percent.get(region_name, 0)
-        comparison_data.append({
-            "Region Schweiz": region_name, "Anteil Lücken (CH) (%)": anteil_gaps,
-            "Anteil Coop (CH) (%)": anteil_coop, "Differenz (Lücken - Coop) (%)": anteil_gaps - anteil_coop
-        })
-    comparison_table_df = pd.DataFrame(comparison_data).sort_values(by="Differenz (Lücken - Coop) (%)", ascending=False)
-
-    st.write("Vergleich der prozentualen Anteile der Regionen innerhalb der Schweiz:")
-    st.dataframe(comparison_table_df.round(1), hide_index=True, use_container_width=True,
-        column_config={
-            "Anteil Lücken (CH) (%)": st.column_config.NumberColumn(format="%.1f%%"),
-            "Anteil Coop (CH) (%)": st.column_config.NumberColumn(format="%.1f%%"),
-            "Differenz (Lücken - Coop) (%)": st.column_config.NumberColumn(format="%.1f%%")
-        })
-    st.markdown("---")
-    st.write(f"Visualisierung der **Abweichungen (in Prozentpunkten)** der Lücken vom Coop-Gesamtsortiment (Schweiz-Regionen):")
-    plot_df = comparison_table_df[abs(comparison_table_df["Differenz (Lücken - Coop) (%)"]) > 0.01].copy()
-    
-    if not plot_df.empty:
-        colors = ['mediumseagreen' if val >= 0 else 'crimson' for val in plot_df["Differenz (Lücken - Coop) (%)"]]
-        fig = px.bar(plot_df, x="Region Schweiz", y="Differenz (Lücken - Coop) (%)", text_auto='.1f')
-        fig.update_traces(marker_color=colors, texttemplate='%{y:.1f}%P', textposition='outside')
-        fig.update_layout(yaxis_title="Differenz in Prozentpunkten", xaxis_title="Region in der Schweiz", height=500,
-                          xaxis_tickangle=-45, margin=dict(t=30, b=120), # Mehr Platz für Labels
-                          yaxis_zeroline=True, yaxis_zerolinewidth=2, yaxis_zerolinecolor='Black')
-        st.plotly_chart(fig, use_container_width=True)
-    else: st.info("Keine nennenswerten Differenzen bei den Schweiz-Regionen für Visualisierung gefunden.")
-
-    st.markdown("##### Kurzeinschätzung der Abweichungen (Schweiz-Regionen):")
-    significant_findings = []
-    for index, row in comparison_table_df.iterrows():
-        region_name = row["Region Schweiz"]; differenz = row["Differenz (Lücken - Coop) (%)"]
-        if abs(differenz) >= interpretation_threshold_pp:
-            richtung = "stärker" if differenz > 0 else "schwächer"
-            significant_findings.append(f"Die Region **{region_name}** ist bei den Schweizer Lücken um **{abs(differenz):.1f} Prozentpunkte {richtung}** vertreten als im Schweizer Coop-Gesamtsortiment.")
-    if significant_findings:
-        for abweichung in significant_findings: st.markdown(f"- {abweichung}")
-    else: st.markdown(f"Keine Abweichungen von +/- {interpretation_threshold_pp:.1f} Prozentpunkten oder mehr bei den Schweiz-Regionen festgestellt.")
-
+        st.info(f"Keine nennenswerten Differenzen bei den {land}-Regionen für Visualisierung gefunden.")
 
+    st.markdown(f"##### Kurzeinschätzung der Abweichungen ({land}-Regionen):")
+    _render_kurzeinschaetzung(
+        comparison_table_df, region_label,
+        f"Die Region **{{kategorie}}** ist bei den {adjektiv} Lücken um **{{differenz:.1f}} Prozentpunkte {{richtung}}** vertreten als im {adjektiv} Coop-Gesamtsortiment",
+        f"Keine statistisch signifikanten Abweichungen (korr. p < {SIGNIFIKANZ_NIVEAU:.2f}) bei den {land}-Regionen festgestellt."
+    )
 
-# In plot_utils.py (diese Funktion unten anfügen)
-
-# =======================================================================================
-# NEUE Funktion für Vergleich Spanien-Regionen (Lücken vs. Coop-Gesamt)
-# =======================================================================================
-def plot_gaps_spanien_regionen_comparison(
-    df_gaps: pd.DataFrame,
-    df_coop_original: pd.DataFrame,
-    region_col: str = "Region", # Spalte mit der Roh-Regioneninfo
-    titel: str = "Vergleich: Regionen Spaniens (Lücken vs. Coop-Gesamt)",
-    interpretation_threshold_pp: float = 5.0
-):
-    st.subheader(titel)
-    st.markdown(f"""
-    Diese Analyse vergleicht die Verteilung der Weinregionen innerhalb Spaniens für die **Sortimentslücken**
-    mit der Verteilung im **Coop-Gesamtsortiment (Spanien)**.
-    Die Regionen werden basierend auf der Spalte '{region_col}' aggregiert.
 
-    Die Tabelle zeigt die prozentualen Anteile der Regionen für die Lücken und das Coop-Gesamtsortiment
-    (bezogen auf die jeweiligen Spanien-Weine) sowie die Differenz. Das Diagramm visualisiert diese Differenzen:
-    *   **Positive Balken (grün):** Die Region ist bei den spanischen Lücken **stärker vertreten**.
-    *   **Negative Balken (rot):** Die Region ist bei den spanischen Lücken **schwächer vertreten**.
-    """)
-    st.markdown("---")
+def plot_gaps_frankreich_regionen_comparison(vergleich: pd.DataFrame, region_col: str = "Region",
+                                             titel: str = "Vergleich: Regionen Frankreichs (Lücken vs. Coop-Gesamt)"):
+    plot_gaps_regionen_comparison(vergleich, "Frankreich", region_col=region_col, titel=titel)
 
-    # Interne Helferfunktion, die deine Logik aus plot_spanien_regionen kapselt
-    def get_spanien_regionen_verteilung(df_input_all_countries, input_region_col):
-        df = df_input_all_countries.copy()
-        # Normalisierungs- und Mapping-Logik aus deiner Funktion
-        def normalize_string(text): # Deine Normalisierungsfunktion
-            text = str(text).lower(); text = ''.join(c for c in unicodedata.normalize('NFD', text) if unicodedata.category(c) != 'Mn')
-            text = text.replace('–', '-').replace(' ', '-'); text = re.sub(r'-+', '-', text); text = re.sub(r'--+', '-', text)
-            return text
-        # Dein subregion_mapping für Spanien
-        subregion_mapping = {"priorat": "Katalonien", "ribera-del-duero": "Castilla y León", "rueda": "Castilla y León", "toro": "Castilla y León", "kastilien-leon": "Castilla y León", "cigales": "Castilla y León", "requena": "Valencia", "yecla-do": "Murcia", "kastilien-la-mancha": "Castilla-La Mancha", "mentrida-do-(toledo)": "Castilla-La Mancha", "dehesa-del-carrizal-do": "Castilla-La Mancha", "kastilien-l-a-mancha": "Castilla-La Mancha", "alava": "Rioja", "mallorca": "Balearen", "ubriges-spanien": "Andere", "keine-subregion": "Andere"}
-        def categorize_region(subregion_normalized): # Deine Kategorisierungsfunktion für Spanien
-            if subregion_normalized in subregion_mapping: return subregion_mapping[subregion_normalized]
-            map_dict = {"teneriffa": "Teneriffa", "navarra": "Navarra", "galicien": "Galicien", "somontano": "Somontano", "jerez": "Jerez"}
-            return map_dict.get(subregion_normalized, subregion_normalized.capitalize())
-
-        df["Land_extracted"] = df[input_region_col].apply(lambda x: str(x).split(",")[0].strip() if pd.notna(x) and "," in str(x) else str(x).strip() if pd.notna(x) else "Unbekannt")
-        df["Subregion_raw"] = df[input_region_col].apply(lambda x: str(x).split(",")[1].strip() if pd.notna(x) and "," in str(x) and len(str(x).split(",")) > 1 else "Keine Subregion")
-        
-        df_es_only = df[df["Land_extracted"] == "Spanien"].copy()
-        if df_es_only.empty: return pd.Series(dtype='int64'), pd.Series(dtype='float64')
 
-        df_es_only["Subregion_normalized"] = df_es_only["Subregion_raw"].apply(normalize_string)
-        df_es_only["Region_plot"] = df_es_only["Subregion_normalized"].apply(categorize_region)
-        
-        region_counts = df_es_only["Region_plot"].value_counts()
-        total_country_wines = region_counts.sum()
-        region_percent = (region_counts / total_country_wines * 100) if total_country_wines > 0 else pd.Series(dtype='float64')
-        return region_counts, region_percent
+def plot_gaps_italien_regionen_comparison(vergleich: pd.DataFrame, region_col: str = "Region",
+                                          titel: str = "Vergleich: Regionen Italiens (Lücken vs. Coop-Gesamt)"):
+    plot_gaps_regionen_comparison(vergleich, "Italien", region_col=region_col, titel=titel)
 
-    gaps_es_counts, gaps_es_percent = get_spanien_regionen_verteilung(df_gaps, region_col)
-    coop_es_counts, coop_es_percent = get_spanien_regionen_verteilung(df_coop_original, region_col)
 
-    if gaps_es_counts.empty and coop_es_counts.empty:
-        st.info("Keine Spanien-Daten in Lücken oder im Coop-Gesamtsortiment gefunden.")
-        return
+def plot_gaps_schweiz_regionen_comparison(vergleich: pd.DataFrame, region_col: str = "Region",
+                                          titel: str = "Vergleich: Regionen der Schweiz (Lücken vs. Coop-Gesamt)"):
+    plot_gaps_regionen_comparison(vergleich, "Schweiz", region_col=region_col, titel=titel)
 
-    all_es_regions = pd.Index(gaps_es_counts.index.tolist() + coop_es_counts.index.tolist()).unique()
-    
-    comparison_data = []
-    for region_name in all_es_regions:
-        anteil_gaps = gaps_es_percent.get(region_name, 0); anteil_coop = coop_es_percent.get(region_name, 0)
-        comparison_data.append({
-            "Region Spanien": region_name, "Anteil Lücken (ES) (%)": anteil_gaps,
-            "Anteil Coop (ES) (%)": anteil_coop, "Differenz (Lücken - Coop) (%)": anteil_gaps - anteil_coop})
-    comparison_table_df = pd.DataFrame(comparison_data).sort_values(by="Differenz (Lücken - Coop) (%)", ascending=False)
-
-    st.write("Vergleich der prozentualen Anteile der Regionen innerhalb Spaniens:")
-    st.dataframe(comparison_table_df.round(1), hide_index=True, use_container_width=True,
-        column_config={
-            "Anteil Lücken (ES) (%)": st.column_config.NumberColumn(format="%.1f%%"),
-            "Anteil Coop (ES) (%)": st.column_config.NumberColumn(format="%.1f%%"),
-            "Differenz (Lücken - Coop) (%)": st.column_config.NumberColumn(format="%.1f%%")})
-    st.markdown("---")
-    st.write(f"Visualisierung der **Abweichungen (in Prozentpunkten)** der Lücken vom Coop-Gesamtsortiment (Spanien-Regionen):")
-    plot_df = comparison_table_df[abs(comparison_table_df["Differenz (Lücken - Coop) (%)"]) > 0.01].copy()
-    
-    if not plot_df.empty:
-        colors = ['mediumseagreen' if val >= 0 else 'crimson' for val in plot_df["Differenz (Lücken - Coop) (%)"]]
-        fig = px.bar(plot_df, x="Region Spanien", y="Differenz (Lücken - Coop) (%)", text_auto='.1f')
-        fig.update_traces(marker_color=colors, texttemplate='%{y:.1f}%P', textposition='outside')
-        fig.update_layout(yaxis_title="Differenz in Prozentpunkten", xaxis_title="Region in Spanien", height=500,
-                          xaxis_tickangle=-45, margin=dict(t=30, b=120), # Mehr Platz für Labels
-                          yaxis_zeroline=True, yaxis_zerolinewidth=2, yaxis_zerolinecolor='Black')
-        st.plotly_chart(fig, use_container_width=True)
-    else: st.info("Keine nennenswerten Differenzen bei den Spanien-Regionen für Visualisierung gefunden.")
-
-    st.markdown("##### Kurzeinschätzung der Abweichungen (Spanien-Regionen):")
-    significant_findings = []
-    for index, row in comparison_table_df.iterrows():
-        region_name = row["Region Spanien"]; differenz = row["Differenz (Lücken - Coop) (%)"]
-        if abs(differenz) >= interpretation_threshold_pp:
-            richtung = "stärker" if differenz > 0 else "schwächer"
-            significant_findings.append(f"Die Region **{region_name}** ist bei den spanischen Lücken um **{abs(differenz):.1f} Prozentpunkte {richtung}** vertreten als im spanischen Coop-Gesamtsortiment.")
-    if significant_findings:
-        for abweichung in significant_findings: st.markdown(f"- {abweichung}")
-    else: st.markdown(f"Keine Abweichungen von +/- {interpretation_threshold_pp:.1f} Prozentpunkten oder mehr bei den Spanien-Regionen festgestellt.")
 
+def plot_gaps_spanien_regionen_comparison(vergleich: pd.DataFrame, region_col: str = "Region",
+                                          titel: str = "Vergleich: Regionen Spaniens (Lücken vs. Coop-Gesamt)"):
+    plot_gaps_regionen_comparison(vergleich, "Spanien", region_col=region_col, titel=titel)
 
-# In plot_utils.py (diese Funktion unten anfügen)
 
 # ==============================================================================
-# NEUE Funktion für Produzenten-Vergleich Gaps vs. Coop-Gesamt
-# Verwendet df_matching_enriched als Basis
+# Produzenten-Vergleich Gaps vs. Coop-Gesamt
+# Basis: Coop-Zeilen der Matching-Datei (Dimension 'Produzent' im Vergleich)
 # ==============================================================================
 def plot_gaps_produzenten_comparison(
-    df_matching_all_coop: pd.DataFrame, # Dies ist dein angereichertes manuelle_matches_final2.xlsx
-    coop_produzent_col: str = "Coop_Produzent",
-    match_status_col: str = "Match_Status",
+    vergleich: pd.DataFrame,
     non_match_status_value: str = "Kein Match",
     top_n: int = 10, # Anzahl der Top-Produzenten, die detaillierter betrachtet werden
-    titel: str = "Vergleich: Top Produzenten (Lücken vs. Coop-Gesamt)",
-    interpretation_threshold_pp: float = 3.0 # Schwelle für "bemerkenswerte" Abweichung
+    titel: str = "Vergleich: Top Produzenten (Lücken vs. Coop-Gesamt)"
 ):
     st.subheader(titel)
     st.markdown(f"""
@@ -3354,98 +2363,41 @@ def plot_gaps_produzenten_comparison(
     """)
     st.markdown("---")
 
-    # 1. Erstelle df_gaps direkt aus df_matching_all_coop
-    df_gaps = df_matching_all_coop[df_matching_all_coop[match_status_col] == non_match_status_value].copy()
-
-    if df_gaps.empty:
+    ausschnitt = comparison_slice(vergleich, DIM_PRODUZENT)
+    if ausschnitt.empty or ausschnitt["Anzahl_Luecken"].sum() == 0:
         st.info("Keine Sortimentslücken vorhanden (basierend auf Match-Status), daher kein Produzenten-Vergleich möglich.")
         return
-    if coop_produzent_col not in df_matching_all_coop.columns:
-        st.error(f"Spalte '{coop_produzent_col}' nicht in der Matching-Datei gefunden.")
-        return
-
-    # Helferfunktion zur Zählung und Prozentberechnung
-    def get_produzenten_verteilung(df_input, produzent_col_name, num_top, df_basis_fuer_prozent):
-        counts = df_input[produzent_col_name].value_counts()
-        # Prozentanteile bezogen auf die Gesamtzahl der Weine im jeweiligen Basis-DataFrame
-        percent_overall = (counts / len(df_basis_fuer_prozent) * 100) if len(df_basis_fuer_prozent) > 0 else pd.Series(dtype='float64')
-        
-        top_produzenten_namen = counts.head(num_top).index
-        return counts, percent_overall, top_produzenten_namen
-
-    # Verteilung für Gaps (Basis für Prozent: alle Gaps)
-    _, gaps_percent_overall, top_gaps_produzenten = get_produzenten_verteilung(df_gaps, coop_produzent_col, top_n, df_gaps)
 
-    # Verteilung für Coop-Gesamtsortiment (Basis für Prozent: alle Coop-Produkte in der Matching-Datei)
-    _, coop_percent_overall, top_coop_produzenten = get_produzenten_verteilung(df_matching_all_coop, coop_produzent_col, top_n, df_matching_all_coop)
-    
-    # Kombiniere die Top-Produzenten aus beiden Listen für den Vergleich
-    all_top_produzenten = pd.Index(top_gaps_produzenten.tolist() + top_coop_produzenten.tolist()).unique()
-    
-    comparison_data = []
-    for produzent in all_top_produzenten:
-        anteil_gaps = gaps_percent_overall.get(produzent, 0)
-        anteil_coop = coop_percent_overall.get(produzent, 0)
-        comparison_data.append({
-            "Coop Produzent": produzent,
-            "Anteil bei Lücken (%)": anteil_gaps,
-            "Anteil im Coop-Gesamt (%)": anteil_coop,
-            "Differenz (Lücken - Coop) (%)": anteil_gaps - anteil_coop
-        })
-    
-    comparison_table_df = pd.DataFrame(comparison_data).sort_values(by="Differenz (Lücken - Coop) (%)", ascending=False)
+    # Kombiniere die Top-Produzenten der Lücken und des Coop-Gesamtsortiments für den Vergleich
+    top_produzenten = pd.concat([ausschnitt.nlargest(top_n, "Anzahl_Luecken"), ausschnitt.nlargest(top_n, "Anzahl_Gesamt")]).drop_duplicates(subset="Kategorie")
+    comparison_table_df = _gap_vergleich_tabelle(top_produzenten, "Coop Produzent", "Anteil bei Lücken (%)", "Anteil im Coop-Gesamt (%)")
     # Limitiere die Anzeige in der Tabelle auf eine sinnvolle Anzahl
-    comparison_table_df_display = comparison_table_df.head(min(len(comparison_table_df), top_n + 5))
-
+    comparison_table_df_display = comparison_table_df.sort_values(by=_DIFF_SPALTE, ascending=False).head(top_n + 5)
 
     st.write(f"Vergleich der prozentualen Anteile der Top-Coop-Produzenten (Anteil am jeweiligen Gesamtsortiment):")
-    st.dataframe(
-        comparison_table_df_display.round(1), hide_index=True, use_container_width=True,
-        column_config={
-            "Anteil bei Lücken (%)": st.column_config.NumberColumn(format="%.1f%%"),
-            "Anteil im Coop-Gesamt (%)": st.column_config.NumberColumn(format="%.1f%%"),
-            "Differenz (Lücken - Coop) (%)": st.column_config.NumberColumn(format="%.1f%%")
-        }
-    )
+    _gap_vergleich_anzeige(comparison_table_df_display, "Anteil bei Lücken (%)", "Anteil im Coop-Gesamt (%)", _DIFF_SPALTE)
     st.markdown("---")
 
     st.write(f"Visualisierung der **Abweichungen (in Prozentpunkten)** der Lücken vom Coop-Gesamtsortiment:")
-    
+
     # Nur Produzenten mit nennenswerter Differenz oder Präsenz für den Plot nehmen
     plot_df = comparison_table_df_display[
-        (abs(comparison_table_df_display["Differenz (Lücken - Coop) (%)"]) > 0.1) |
+        (comparison_table_df_display[_DIFF_SPALTE].abs() > 0.1) |
         (comparison_table_df_display["Anteil bei Lücken (%)"] > 0.5) | # Produzenten, die zumindest bei Lücken etwas prominent sind
         (comparison_table_df_display["Anteil im Coop-Gesamt (%)"] > 0.5) # oder im Coop-Gesamt
-    ].sort_values(by="Differenz (Lücken - Coop) (%)", ascending=False).head(top_n + 5)
-
+    ]
 
     if not plot_df.empty:
-        colors = ['mediumseagreen' if val >= 0 else 'crimson' for val in plot_df["Differenz (Lücken - Coop) (%)"]]
-        fig = px.bar(
-            plot_df, x="Coop Produzent", y="Differenz (Lücken - Coop) (%)", text_auto='.1f'
-        )
-        fig.update_traces(marker_color=colors, texttemplate='%{y:.1f}%P', textposition='outside')
-        fig.update_layout(
-            yaxis_title="Differenz in Prozentpunkten", xaxis_title="Coop Produzent", height=500,
-            xaxis_tickangle=-45, margin=dict(t=30, b=150), # Mehr Platz unten für lange Produzentennamen
-            yaxis_zeroline=True, yaxis_zerolinewidth=2, yaxis_zerolinecolor='Black'
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        _plot_gap_diff_bars(plot_df, "Coop Produzent", "Coop Produzent", margin_b=150) # Mehr Platz unten für lange Produzentennamen
     else:
         st.info("Keine ausreichenden Daten für die Visualisierung der Produzenten-Differenzen vorhanden.")
 
     st.markdown("##### Kurzeinschätzung der Abweichungen:")
-    significant_findings = []
-    for index, row in comparison_table_df_display.iterrows():
-        produzent = row["Coop Produzent"]; differenz = row["Differenz (Lücken - Coop) (%)"]
-        if abs(differenz) >= interpretation_threshold_pp:
-            richtung = "stärker" if differenz > 0 else "schwächer"
-            significant_findings.append(f"Der Produzent **{produzent}** ist bei den Lücken um **{abs(differenz):.1f} Prozentpunkte {richtung}** vertreten als im Coop-Gesamtsortiment.")
-    if significant_findings:
-        for abweichung in significant_findings: st.markdown(f"- {abweichung}")
-    else:
-        st.markdown(f"Keine Produzenten mit Abweichungen von +/- {interpretation_threshold_pp:.1f} Prozentpunkten oder mehr bei den Lücken im Vergleich zum Coop-Gesamtsortiment festgestellt.")
-
+    _render_kurzeinschaetzung(
+        comparison_table_df_display, "Coop Produzent",
+        "Der Produzent **{kategorie}** ist bei den Lücken um **{differenz:.1f} Prozentpunkte {richtung}** vertreten als im Coop-Gesamtsortiment",
+        f"Keine Produzenten mit statistisch signifikanten Abweichungen (korr. p < {SIGNIFIKANZ_NIVEAU:.2f}) bei den Lücken im Vergleich zum Coop-Gesamtsortiment festgestellt."
+    )
 
 # In plot_utils.py (NUR diese Funktion ersetzen)
 
@@ -3460,17 +2412,19 @@ def plot_top_produzenten_in_gaps(
     match_status_col: str = "Match_Status",
     non_match_status_value: str = "Kein Match",
     top_n: int = 30, 
-    titel: str = "Top Coop-Produzenten in den Sortimentslücken (absolute Anzahl fehlender Weine)"
+    titel: str = "Top Coop-Produzenten in den Sortimentslücken (absolute Anzahl fehlender Weine)",
+    gap_mask=None,
+    fehlt_bei: str = "Flaschenpost"
 ):
     st.subheader(titel)
     # ... (Markdown Text bleibt gleich) ...
     st.markdown(f"""
     Diese Analyse zeigt, welche Coop-Produzenten am häufigsten mit ihren Weinen in den **Sortimentslücken** vertreten sind 
-    (d.h. Coop-Weine mit dem Status '{non_match_status_value}', die Flaschenpost nicht führt). 
+    (d.h. Coop-Weine ohne echten Match, die {fehlt_bei} nicht führt). 
     Es wird die **absolute Anzahl** der "fehlenden" Weine pro Produzent für die Top {top_n} Produzenten dargestellt.
 
     **Wie diese Analyse genutzt werden kann:**
-    *   **Identifikation von Schlüssel-Produzenten:** Gibt es bestimmte Produzenten, von denen Flaschenpost im Vergleich zu Coop besonders viele Weine nicht listet? Dies könnte auf strategische Entscheidungen, unterschiedliche Lieferantenbeziehungen oder potenzielle Bereiche für Sortimentserweiterungen hindeuten.
+    *   **Identifikation von Schlüssel-Produzenten:** Gibt es bestimmte Produzenten, von denen {fehlt_bei} im Vergleich zu Coop besonders viele Weine nicht listet? Dies könnte auf strategische Entscheidungen, unterschiedliche Lieferantenbeziehungen oder potenzielle Bereiche für Sortimentserweiterungen hindeuten.
     *   **Fokus für weitere Recherche:** Bei Produzenten, die hier häufig erscheinen, könnte eine genauere qualitative Prüfung der spezifisch fehlenden Weine sinnvoll sein (z.B. über die Detailtabelle der Sortimentslücken).
     *   **Verständnis der Lücken-Zusammensetzung:** Hilft zu verstehen, ob die Lücken eher von vielen verschiedenen kleinen Produzenten oder von wenigen großen Produzenten dominiert werden.
 
@@ -3478,7 +2432,10 @@ def plot_top_produzenten_in_gaps(
     """)
     st.markdown("---")
 
-    df_gaps = df_matching_all_coop[df_matching_all_coop[match_status_col] == non_match_status_value].copy()
+    if gap_mask is not None: # Gap-Zeilen aus dem gecachten Gap-Index (gap_engine) statt erneuter Status-Filterung
+        df_gaps = df_matching_all_coop[gap_mask].copy()
+    else:
+        df_gaps = df_matching_all_coop[df_matching_all_coop[match_status_col] == non_match_status_value].copy()
 
     if df_gaps.empty:
         st.info("Keine Sortimentslücken vorhanden, daher keine Top-Produzenten-Analyse der Lücken möglich.")
@@ -3497,21 +2454,8 @@ def plot_top_produzenten_in_gaps(
     col_chart, col_table = st.columns([1.5, 1])
 
     with col_chart:
-        fig = px.bar(
-            x=produzenten_counts_gaps.index, 
-            y=produzenten_counts_gaps.values, 
-            text=produzenten_counts_gaps.values, 
-            labels={'x': 'Coop Produzent', 'y': 'Anzahl fehlender Weine (Lücken)'},
-            color_discrete_sequence=['#4A708B'] 
-        )
-        fig.update_traces(textposition="outside", textfont_size=12)
-        fig.update_layout(
-            height=max(400, top_n * 25), 
-            plot_bgcolor="#ffffff",
-            xaxis_title="Coop Produzent", yaxis_title="Anzahl fehlender Weine",
-            xaxis_tickangle=-45, margin=dict(t=30, r=15, l=5, b=170 if top_n > 15 else 120) 
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        zeige_figur(_produzenten_balken, produzenten_counts_gaps, labels={'x': 'Coop Produzent', 'y': 'Anzahl fehlender Weine (Lücken)'},
+                    yaxis_title="Anzahl fehlender Weine", farbe='#4A708B', top_n=top_n)
 
     with col_table:
         # HIER WAR DER FEHLER (VERMUTLICH): `producenten_counts_gaps` STATT `produzenten_counts_gaps`
@@ -3522,15 +2466,14 @@ def plot_top_produzenten_in_gaps(
         total_gaps_count = len(df_gaps)
         table_df["Anteil an allen Lücken (%)"] = (table_df["Anzahl fehlender Weine"] / total_gaps_count * 100).round(1)
         
-        st.dataframe(table_df, use_container_width=True, hide_index=True,
+        st.dataframe(table_df, width="stretch", hide_index=True,
             column_config={"Anzahl fehlender Weine": st.column_config.NumberColumn(format="%d"),
                            "Anteil an allen Lücken (%)": st.column_config.NumberColumn(format="%.1f%%")})
         timestamp_str = pd.Timestamp.now().strftime("%Y%m%d_%H%M%S")
         file_name_csv = f"top_produzenten_in_gaps_{timestamp_str}.csv"
-        st.download_button(label="Tabelle als CSV", data=table_df.to_csv(index=False, sep=';').encode("utf-8-sig"),
-                           file_name=file_name_csv, mime="text/csv", key=f"dl_csv_top_prod_gaps_{timestamp_str}") 
+        export_button("Tabelle als CSV", table_df, file_name_csv, sep=";", encoding="utf-8-sig", key="dl_csv_top_prod_gaps")
     
-    st.caption(f"Angezeigt werden die Top {min(top_n, len(produzenten_counts_gaps))} Produzenten, von denen Weine im Coop-Sortiment sind, aber nicht bei Flaschenpost (basierend auf '{non_match_status_value}').") # Korrigiert zu "z"
+    st.caption(f"Angezeigt werden die Top {min(top_n, len(produzenten_counts_gaps))} Produzenten, von denen Weine im Coop-Sortiment sind, aber nicht bei {fehlt_bei}.") # Korrigiert zu "z"
 
 
 
@@ -3543,33 +2486,7 @@ def plot_top_produzenten_in_gaps(
 # import plotly.express as px # Wird innerhalb der Funktion verwendet
 
 
-# === Normalisierungs-Konstanten und Funktion für Produzentennamen ===
-# Diese sollten idealerweise einmal global am Anfang von plot_utils.py stehen,
-# wenn sie von mehreren Funktionen verwendet werden.
-# Wenn sie nur hier gebraucht werden, ist es okay, sie direkt davor zu definieren.
-
-_SORTED_AUSSCHLUSS_BEGRIFFE_PROD = sorted([ # DEINE AKTUALISIERTE LISTE
-    "azienda agricola", "marchesi de", "barons de", "baron philippe", "feudi di", "feudi", "ac", "a.c.", "aoc", "aop", "do", "doc", "igt", "docg", "igp", "doca", "vinhos",
-    "appellation", "controlee", "maison", "fratelli", "tenuta", "cantina", "famille", "marchesi", "raventos", "tenimenti",
-    "azienda", "agricola", "cantine", "bodega", "estate", "winery", "bodegas", "domaine", "domaines", "weingut"
-], key=len, reverse=True)
-
-_EXCLUSION_PATTERN_PROD = re.compile(
-    r'\b(?:' + '|'.join(map(re.escape, _SORTED_AUSSCHLUSS_BEGRIFFE_PROD)) + r')\b',
-    flags=re.IGNORECASE
-)
-_NORMALIZE_PATTERN_PROD = re.compile(r"[-/,;.:\"'’()`*&]")
-_MULTI_SPACE_PATTERN_PROD = re.compile(r"\s+")
-
-def normalize_produzent_name(text):
-    if pd.isna(text) or text == "": return ""
-    text = str(text); text = unicodedata.normalize("NFKD", text)
-    text = "".join([c for c in text if not unicodedata.combining(c)])
-    text = text.lower(); text = _NORMALIZE_PATTERN_PROD.sub(" ", text)
-    text = text.replace(" e figli", "").replace(" et fils", "").replace(" & fils", "").replace(" y hijos", "")
-    text = text.replace(" vigneron", "").replace(" vignerons", "")
-    text = _EXCLUSION_PATTERN_PROD.sub("", text) 
-    text = _MULTI_SPACE_PATTERN_PROD.sub(" ", text); return text.strip()
+from producer_index import ProduzentenIndex, DEFAULT_AEHNLICHKEIT_SCHWELLE
 
 # ==============================================================================
 # Funktion: Coop-Produzenten der Gaps, die NICHT bei Flaschenpost sind
@@ -3583,13 +2500,17 @@ def plot_coop_produzenten_nicht_in_fp(
     match_status_col: str = "Match_Status",
     non_match_status_value: str = "Kein Match",
     top_n: int = 30, # <<< ANGEPASST AUF 30
-    titel: str = "Coop-Produzenten (von Lücken), die nicht im Flaschenpost-Sortiment gelistet sind"
+    titel: str = "Coop-Produzenten (von Lücken), die nicht im Flaschenpost-Sortiment gelistet sind",
+    produzenten_index: ProduzentenIndex = None,
+    aehnlichkeit_schwelle: float = DEFAULT_AEHNLICHKEIT_SCHWELLE,
+    gap_mask=None
 ):
     st.subheader(titel)
     st.markdown(f"""
     Diese Analyse identifiziert Coop-Produzenten, von denen Weine im Coop-Sortiment als Lücke zu Flaschenpost klassifiziert wurden 
     (Status '{non_match_status_value}'), und die als Produzentenname **nicht** im gesamten Flaschenpost-Sortiment gefunden werden konnten.
-    Die Produzentennamen werden vor dem Abgleich normalisiert (Kleinschreibung, Entfernung von Sonderzeichen und typischen Weinbau-Zusätzen).
+    Die Produzentennamen werden vor dem Abgleich normalisiert (Kleinschreibung, Entfernung von Sonderzeichen und typischen Weinbau-Zusätzen)
+    und unscharf abgeglichen: Ab der eingestellten Ähnlichkeit gilt ein Produzent als bei FP vorhanden (z.B. "Château X" ≈ "Chateau X SA").
     Angezeigt werden die Top {top_n} dieser Produzenten, sortiert nach der Anzahl der von ihnen stammenden "Gap"-Weine bei Coop.
 
     **Wie diese Analyse genutzt werden kann:**
@@ -3598,17 +2519,28 @@ def plot_coop_produzenten_nicht_in_fp(
     """)
     st.markdown("---")
 
-    df_gaps = df_matching_all_coop[df_matching_all_coop[match_status_col] == non_match_status_value].copy()
+    if gap_mask is not None: # Gap-Zeilen aus dem gecachten Gap-Index (gap_engine) statt erneuter Status-Filterung
+        df_gaps = df_matching_all_coop[gap_mask].copy()
+    else:
+        df_gaps = df_matching_all_coop[df_matching_all_coop[match_status_col] == non_match_status_value].copy()
     if df_gaps.empty: st.info("Keine Lücken, Analyse nicht möglich."); return
     if coop_produzent_col_matching not in df_gaps.columns: st.error(f"Spalte '{coop_produzent_col_matching}' nicht in Gap-Daten."); return
     
-    df_gaps["Coop_Produzent_Normalized"] = df_gaps[coop_produzent_col_matching].apply(normalize_produzent_name)
-    df_gaps = df_gaps[df_gaps["Coop_Produzent_Normalized"] != ""]
-
     if fp_produzent_col_original not in df_fp_original.columns: st.error(f"Spalte '{fp_produzent_col_original}' nicht in Flaschenpost-Datei."); return
-    fp_produzenten_normalized_set = set(df_fp_original[fp_produzent_col_original].astype(str).apply(normalize_produzent_name).unique()); fp_produzenten_normalized_set.discard("")
-    
-    df_gaps["Ist_Produzent_bei_FP"] = df_gaps["Coop_Produzent_Normalized"].isin(fp_produzenten_normalized_set)
+    if produzenten_index is None:
+        # Fallback ohne vorgebauten Index (z.B. Einzelaufruf): einmalig aus den FP-Daten aufbauen
+        produzenten_index = ProduzentenIndex(df_fp_original[fp_produzent_col_original])
+
+    aehnlichkeit_schwelle = st.slider("Mindest-Ähnlichkeit für 'Produzent bei FP vorhanden':", 70, 100, int(aehnlichkeit_schwelle), 1,
+                                      key="prod_nicht_fp_schwelle", help="100 = nur exakt gleicher normalisierter Name.")
+
+    # Batch-Lookup: jeder Gap-Produzent wird nur einmal gegen den FP-Index geprüft
+    gap_produzenten = df_gaps[coop_produzent_col_matching].dropna().unique()
+    df_lookup = produzenten_index.lookup_batch(gap_produzenten, schwelle=aehnlichkeit_schwelle)
+    df_lookup = df_lookup[df_lookup["Produzent_Normalized"] != ""].set_index("Produzent")
+    df_gaps = df_gaps[df_gaps[coop_produzent_col_matching].isin(df_lookup.index)]
+
+    df_gaps["Ist_Produzent_bei_FP"] = df_gaps[coop_produzent_col_matching].map(df_lookup["Bei_FP"]).astype(bool)
     df_produzenten_nur_coop_gaps = df_gaps[~df_gaps["Ist_Produzent_bei_FP"]]
 
     if df_produzenten_nur_coop_gaps.empty: st.info("Alle Produzenten der Lücken scheinen auch bei FP vertreten zu sein."); return
@@ -3618,17 +2550,257 @@ def plot_coop_produzenten_nicht_in_fp(
 
     col_chart, col_table = st.columns([1.5, 1])
     with col_chart:
-        fig = px.bar(x=top_produzenten_nur_coop.index, y=top_produzenten_nur_coop.values, text=top_produzenten_nur_coop.values,
-                     labels={'x': 'Coop Produzent (nicht bei FP)', 'y': 'Anzahl Gap-Weine bei Coop'}, color_discrete_sequence=['#8B4513'])
-        fig.update_traces(textposition="outside", textfont_size=12)
-        fig.update_layout(height=max(400, top_n * 25), plot_bgcolor="#ffffff", # Höhe angepasst
-                          xaxis_title="Coop Produzent", yaxis_title="Anzahl Gap-Weine",
-                          xaxis_tickangle=-45, margin=dict(t=30, r=15, l=5, b=170 if top_n > 15 else 120)) # Mehr Platz unten
-        st.plotly_chart(fig, use_container_width=True)
+        zeige_figur(_produzenten_balken, top_produzenten_nur_coop, labels={'x': 'Coop Produzent (nicht bei FP)', 'y': 'Anzahl Gap-Weine bei Coop'},
+                    yaxis_title="Anzahl Gap-Weine", farbe='#8B4513', top_n=top_n)
     with col_table:
-        table_df = pd.DataFrame({"Coop Produzent (nicht bei FP)": top_produzenten_nur_coop.index, "Anzahl Gap-Weine bei Coop": top_produzenten_nur_coop.values})
-        st.dataframe(table_df, use_container_width=True, hide_index=True, column_config={"Anzahl Gap-Weine bei Coop": st.column_config.NumberColumn(format="%d")})
+        table_df = pd.DataFrame({"Coop Produzent (nicht bei FP)": top_produzenten_nur_coop.index, "Anzahl Gap-Weine bei Coop": top_produzenten_nur_coop.values,
+                                 "Ähnlichster FP-Produzent": df_lookup.loc[top_produzenten_nur_coop.index, "FP_Produzent"].values,
+                                 "Ähnlichkeit": df_lookup.loc[top_produzenten_nur_coop.index, "Ähnlichkeit"].values})
+        st.dataframe(table_df, width="stretch", hide_index=True, column_config={"Anzahl Gap-Weine bei Coop": st.column_config.NumberColumn(format="%d"),
+                                                                                        "Ähnlichkeit": st.column_config.NumberColumn(format="%.1f")})
         timestamp_str = pd.Timestamp.now().strftime("%Y%m%d_%H%M%S"); file_name_csv = f"produzenten_nur_coop_gaps_{timestamp_str}.csv"
-        st.download_button(label="Tabelle als CSV", data=table_df.to_csv(index=False, sep=';').encode("utf-8-sig"),
-                           file_name=file_name_csv, mime="text/csv", key=f"dl_csv_prod_nur_coop_{timestamp_str}")
-    st.caption(f"Angezeigt: Top {min(top_n, len(top_produzenten_nur_coop))} Produzenten (Lücken, nicht bei FP).")
\ No newline at end of file
+        export_button("Tabelle als CSV", table_df, file_name_csv, sep=";", encoding="utf-8-sig", key="dl_csv_prod_nur_coop")
+    st.caption(f"Angezeigt: Top {min(top_n, len(top_produzenten_nur_coop))} Produzenten (Lücken, nicht bei FP).")
+
+# ==============================================================================
+# Umgekehrte GAP-Analyse: FP-Weine, die Coop nicht führt
+# Rendert nur vorberechnete Aggregate (gap_comparison.compute_reverse_gap_comparison)
+# und die Maske aus gap_engine.compute_reverse_gap_index – keine Kopie des FP-Katalogs pro Rerun.
+# ==============================================================================
+_REVERSE_DIMENSIONEN_ANZEIGE = {
+    "Herkunftsland": DIM_LAND,
+    "Region": DIM_REGION,
+    "Preisklasse": DIM_PREISKLASSE,
+    "Lieferant": DIM_LIEFERANT,
+    "Weintyp": DIM_WEINTYP,
+}
+
+
+def plot_reverse_gap_analysis(
+    df_fp: pd.DataFrame,
+    reverse_index: GapIndex,
+    vergleich: pd.DataFrame,
+    top_n: int = 20,
+    detail_limit: int = 500,
+    titel: str = "FP-exklusive Weine (Flaschenpost-Weine ohne Gegenstück bei Coop)"
+):
+    st.subheader(titel)
+    st.markdown("""
+    Umgekehrte Richtung der GAP-Analyse: Welche Flaschenpost-Weine haben im Matching **kein Gegenstück bei Coop**?
+    Grundlage ist dieselbe Matching-Datei und dieselbe Status-Regel wie bei den Coop-Lücken.
+    Da Flaschenpost ein Vielfaches des Coop-Sortiments führt, ist diese Menge gross – die Auswertung zeigt daher
+    vor allem, **wo** sich die FP-exklusiven Weine ballen (Region, Preisklasse, Lieferant).
+    """)
+
+    n_total, n_exklusiv = reverse_index.n_total, reverse_index.n_gaps
+    col1, col2, col3 = st.columns(3)
+    col1.metric("FP-Sortiment (Gesamt SKUs)", n_total)
+    col2.metric("Davon bei Coop gematcht (FP SKUs)", reverse_index.n_matched)
+    col3.metric("FP-exklusiv (nicht bei Coop)", n_exklusiv,
+                delta=f"{(n_exklusiv / n_total * 100 if n_total > 0 else 0):.1f}% des FP-Sortiments", delta_color="off")
+    if n_exklusiv == 0 or vergleich.empty:
+        st.info("Keine FP-exklusiven Weine identifiziert.")
+        return
+
+    st.markdown("---")
+    auswahl = st.radio("Aggregation nach:", list(_REVERSE_DIMENSIONEN_ANZEIGE), horizontal=True, key="reverse_gap_dimension_radio")
+    dimension = _REVERSE_DIMENSIONEN_ANZEIGE[auswahl]
+    ausschnitt = comparison_slice(vergleich, dimension)
+    if dimension in (DIM_LAND, DIM_REGION, DIM_LIEFERANT):
+        ausschnitt = ausschnitt.nlargest(top_n, "Anzahl_Luecken")
+
+    kategorie_label = auswahl if dimension != DIM_REGION else "Region"
+    tabelle = pd.DataFrame({
+        kategorie_label: ausschnitt["Kategorie"].to_numpy(),
+        "Land": ausschnitt["Gruppe"].to_numpy(),
+        "FP-exklusiv": ausschnitt["Anzahl_Luecken"].to_numpy(),
+        "FP-Gesamt": ausschnitt["Anzahl_Gesamt"].to_numpy(),
+        "Quote exklusiv (%)": np.where(ausschnitt["Anzahl_Gesamt"] > 0, ausschnitt["Anzahl_Luecken"] / ausschnitt["Anzahl_Gesamt"] * 100, 0.0),
+        "Anteil FP-exklusiv (%)": ausschnitt["Anteil_Luecken"].to_numpy(),
+        "Anteil FP-Gesamt (%)": ausschnitt["Anteil_Gesamt"].to_numpy(),
+        "Differenz (pp)": ausschnitt["Differenz_pp"].to_numpy(),
+        _Q_SPALTE: ausschnitt["q_Wert"].to_numpy(),
+        "Signifikant": ausschnitt["Signifikant"].to_numpy(),
+    })
+    if dimension != DIM_REGION:
+        tabelle = tabelle.drop(columns="Land")
+
+    def exklusiv_balken(tabelle, kategorie_label, xaxis_title):
+        fig = px.bar(tabelle, x=kategorie_label, y="FP-exklusiv", text="FP-exklusiv",
+                     hover_data={"Quote exklusiv (%)": ":.1f", "FP-Gesamt": True},
+                     color_discrete_sequence=['#4682B4'])
+        fig.update_traces(textposition="outside")
+        fig.update_layout(height=450, xaxis_title=xaxis_title, yaxis_title="Anzahl FP-exklusive Weine",
+                          xaxis_tickangle=-45, margin=dict(t=30, b=140))
+        return fig
+
+    zeige_figur(exklusiv_balken, tabelle[[kategorie_label, "FP-exklusiv", "Quote exklusiv (%)", "FP-Gesamt"]],
+                kategorie_label=kategorie_label, xaxis_title=auswahl)
+
+    column_config = _prozent_column_config("Quote exklusiv (%)", "Anteil FP-exklusiv (%)", "Anteil FP-Gesamt (%)")
+    column_config["Differenz (pp)"] = st.column_config.NumberColumn(format="%.1f")
+    column_config[_Q_SPALTE] = st.column_config.NumberColumn(format="%.4f", help="Benjamini-Hochberg-korrigierter p-Wert")
+    column_config["Signifikant"] = st.column_config.CheckboxColumn(help=f"Korrigierter p-Wert < {SIGNIFIKANZ_NIVEAU:.2f}")
+    st.dataframe(tabelle, hide_index=True, width="stretch", column_config=column_config)
+    st.caption("Quote exklusiv = Anteil der FP-Weine der Kategorie ohne Coop-Gegenstück. "
+               "Differenz = Anteil an den FP-exklusiven Weinen minus Anteil am FP-Gesamtsortiment; "
+               "Signifikanz wie bei den Coop-Lücken (hypergeometrischer Test, Benjamini-Hochberg je Dimension).")
+
+    # --- Detailtabelle: Filter als Masken über den ganzen Katalog, kopiert werden nur die angezeigten Zeilen ---
+    st.markdown("---")
+    st.markdown("#### Detailtabelle der FP-exklusiven Weine")
+    maske = np.asarray(reverse_index.gap_mask, dtype=bool)
+    col_land, col_lieferant = st.columns(2)
+    laender = comparison_slice(vergleich, DIM_LAND).nlargest(top_n * 2, "Anzahl_Luecken")["Kategorie"].tolist()
+    lieferanten = comparison_slice(vergleich, DIM_LIEFERANT).nlargest(top_n * 5, "Anzahl_Luecken")["Kategorie"].tolist()
+    gewaehlte_laender = col_land.multiselect("Herkunftsland:", laender, key="reverse_gap_land_filter")
+    gewaehlte_lieferanten = col_lieferant.multiselect("Lieferant:", lieferanten, key="reverse_gap_lieferant_filter")
+    if gewaehlte_laender and "Herkunft" in df_fp.columns:
+        maske = maske & fp_land(df_fp["Herkunft"]).isin(gewaehlte_laender).to_numpy()
+    if gewaehlte_lieferanten and "Lieferant" in df_fp.columns:
+        maske = maske & df_fp["Lieferant"].isin(gewaehlte_lieferanten).to_numpy()
+
+    positionen = np.flatnonzero(maske)
+    spalten = [c for c in ["Sku", "Name", "Produzent", "Herkunft", "Weintyp", "Jahrgang_Key", "Flasche_cl", "Preis", "Lieferant"] if c in df_fp.columns]
+    df_detail = df_fp.iloc[positionen[:detail_limit]][spalten]
+    st.dataframe(df_detail, hide_index=True, width="stretch", column_config={
+        "Sku": st.column_config.TextColumn("SKU"),
+        "Preis": st.column_config.NumberColumn("FP Preis", format="CHF %.2f"),
+        "Jahrgang_Key": st.column_config.NumberColumn("Jahrgang", format="%d"),
+        "Flasche_cl": st.column_config.NumberColumn("Flasche (cl)", format="%d"),
+    })
+    st.caption(f"Zeigt {len(df_detail)} von {len(positionen)} FP-exklusiven Weinen (Filter) – insgesamt {n_exklusiv}.")
+
+
+# ==============================================================================
+# Entwicklung der Lücken über gespeicherte Snapshots (gap_snapshots)
+# Trend und Diff kommen aus den gespeicherten Gap-Bitsets, historische Gap-Mengen werden nicht neu berechnet.
+# ==============================================================================
+from gap_snapshots import GapSnapshot, diff_gap_snapshots, gap_trend, ist_gespeichert, save_gap_snapshot
+
+
+def plot_gap_trend(
+    snapshots: list,
+    aktuell: GapSnapshot,
+    df_coop: pd.DataFrame,
+    coop_id_col: str = "URL",
+    titel: str = "Entwicklung der Sortimentslücken (Snapshots)"
+):
+    st.subheader(titel)
+    st.markdown("""
+    Jeder Snapshot speichert die Lücken eines Datenstands (Coop-, FP- und Matching-Daten) als Bitset über die Coop-URLs.
+    Der Vergleich zweier Stände zeigt, welche Lücken **neu** hinzugekommen, **geschlossen** (jetzt bei FP gematcht),
+    **entfallen** (Wein nicht mehr bei Coop) oder **bestehend** sind.
+    """)
+
+    gespeichert = ist_gespeichert(aktuell, snapshots)
+    if not gespeichert:
+        if st.button("Aktuellen Stand als Snapshot speichern", key="gap_snapshot_speichern"):
+            try:
+                save_gap_snapshot(aktuell)
+                st.success("Snapshot gespeichert.")
+                snapshots = [*snapshots, aktuell]
+                gespeichert = True
+            except OSError as e:
+                st.error(f"Snapshot konnte nicht gespeichert werden: {e}")
+    verlauf = snapshots if gespeichert else [*snapshots, aktuell]
+    if len(verlauf) < 2:
+        st.info("Noch kein früherer Snapshot vorhanden. Speichern Sie den aktuellen Stand (oder per CLI: "
+                "`python gap_snapshots.py speichern`), um Veränderungen verfolgen zu können.")
+        return
+
+    trend = gap_trend(verlauf)
+
+    def trend_diagramm(trend):
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(x=trend["Stichtag"], y=trend["Lücken"], name="Lücken gesamt", mode="lines+markers",
+                                 line=dict(color="#4682B4", width=3)))
+        for spalte, farbe in (("Neu", "crimson"), ("Geschlossen", "mediumseagreen"), ("Entfallen", "#999999")):
+            fig.add_trace(go.Bar(x=trend["Stichtag"], y=trend[spalte], name=spalte, marker_color=farbe, yaxis="y2"))
+        fig.update_layout(
+            height=450, barmode="group", margin=dict(t=30),
+            yaxis=dict(title="Anzahl Lücken"), yaxis2=dict(title="Veränderung zum Vorstand", overlaying="y", side="right"),
+            legend=dict(orientation="h", y=1.1),
+        )
+        return fig
+
+    zeige_figur(trend_diagramm, trend)
+    st.dataframe(trend, hide_index=True, width="stretch",
+                 column_config={"Stichtag": st.column_config.DatetimeColumn(format="YYYY-MM-DD HH:mm")})
+
+    # --- Diff: aktueller Stand gegen einen wählbaren früheren Snapshot ---
+    frueher = verlauf[:-1]
+    auswahl = st.selectbox("Vergleichen mit Snapshot vom:", range(len(frueher)), index=len(frueher) - 1,
+                           format_func=lambda i: f"{frueher[i].stichtag:%Y-%m-%d %H:%M} ({frueher[i].n_luecken} Lücken)",
+                           key="gap_snapshot_vergleich")
+    diff = diff_gap_snapshots(frueher[auswahl], verlauf[-1])
+    zaehler = diff["Status"].value_counts()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Neue Lücken", int(zaehler.get("Neu", 0)))
+    col2.metric("Geschlossen", int(zaehler.get("Geschlossen", 0)))
+    col3.metric("Entfallen", int(zaehler.get("Entfallen", 0)))
+    col4.metric("Bestehend", int(zaehler.get("Bestehend", 0)))
+
+    status_filter = st.multiselect("Status anzeigen:", ["Neu", "Geschlossen", "Entfallen", "Bestehend"],
+                                   default=["Neu", "Geschlossen"], key="gap_snapshot_status_filter")
+    diff = diff[diff["Status"].isin(status_filter)]
+    details = df_coop.drop_duplicates(subset=coop_id_col).assign(_url=lambda d: d[coop_id_col].astype(str).str.strip()).set_index("_url")
+    detail_spalten = [c for c in ["Name", "Produzent", "Preis", "Weintyp", "Region"] if c in details.columns]
+    diff = diff.join(details[detail_spalten], on="Coop_URL")
+    st.dataframe(diff[["Status", *detail_spalten, "Coop_URL"]], hide_index=True, width="stretch", column_config={
+        "Coop_URL": st.column_config.LinkColumn("Coop Link", display_text="Zum Wein", width="small"),
+        "Preis": st.column_config.NumberColumn("Coop Preis", format="CHF %.2f"),
+    })
+    st.caption("Entfallene Weine sind nicht mehr im aktuellen Coop-Sortiment, daher ohne Detailangaben.")
+
+
+# ==============================================================================
+# Produzenten-Rollup: Abdeckung je Coop-Produzent (alle Produzenten, sortier- und filterbar)
+# ==============================================================================
+def plot_produzenten_rollup(
+    rollup: pd.DataFrame,
+    titel: str = "Abdeckung je Coop-Produzent (alle Produzenten)"
+):
+    st.subheader(titel)
+    st.markdown("""
+    Pro Coop-Produzent: Anzahl Coop-Weine, davon bei Flaschenpost gematcht, Lücken und die **Abdeckung in %**.
+    *Bei FP* zeigt, ob der Produzent bei Flaschenpost überhaupt geführt wird (unscharfer Namensabgleich oder mindestens ein gematchter Wein).
+    Produzenten mit vielen Lücken, die FP bereits führt, sind Sortimentsergänzungen bei bestehenden Lieferanten;
+    Produzenten, die FP gar nicht führt, wären neue Beziehungen. Die Tabelle lässt sich per Klick auf die Spaltenköpfe sortieren.
+    """)
+    if rollup.empty:
+        st.info("Keine Produzenten-Angaben im Matching vorhanden.")
+        return
+
+    col_suche, col_fp, col_min = st.columns([2, 1, 1])
+    suche = col_suche.text_input("Produzent suchen:", key="rollup_suche")
+    fp_auswahl = col_fp.selectbox("Bei FP:", ["Alle", "Nur bei FP", "Nur nicht bei FP"], key="rollup_bei_fp")
+    min_skus = col_min.number_input("Min. Coop-SKUs:", min_value=1, max_value=int(rollup["SKUs_Coop"].max()), value=1, key="rollup_min_skus")
+    abdeckung = st.slider("Abdeckung (%):", 0, 100, (0, 100), key="rollup_abdeckung")
+
+    maske = (rollup["SKUs_Coop"] >= min_skus) & rollup["Abdeckung_Prozent"].between(*abdeckung)
+    if suche:
+        maske &= rollup["Produzent"].str.contains(suche, case=False, regex=False)
+    if fp_auswahl == "Nur bei FP":
+        maske &= rollup["Bei_FP"]
+    elif fp_auswahl == "Nur nicht bei FP":
+        maske &= ~rollup["Bei_FP"]
+    gefiltert = rollup[maske]
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Produzenten (gefiltert)", len(gefiltert))
+    col2.metric("Lücken dieser Produzenten", int(gefiltert["SKUs_Luecken"].sum()))
+    col3.metric("Davon Produzent nicht bei FP", int(gefiltert.loc[~gefiltert["Bei_FP"], "SKUs_Luecken"].sum()))
+
+    st.dataframe(gefiltert, hide_index=True, width="stretch", column_config={
+        "SKUs_Coop": st.column_config.NumberColumn("Coop-SKUs", format="%d"),
+        "SKUs_Gematcht": st.column_config.NumberColumn("Bei FP gematcht", format="%d"),
+        "SKUs_Luecken": st.column_config.NumberColumn("Lücken", format="%d"),
+        "Abdeckung_Prozent": st.column_config.ProgressColumn("Abdeckung", format="%.0f%%", min_value=0, max_value=100),
+        "Bei_FP": st.column_config.CheckboxColumn("Bei FP"),
+        "FP_Produzent": st.column_config.TextColumn("FP-Produzent"),
+        "Ähnlichkeit": st.column_config.NumberColumn(format="%.1f"),
+        "FP_Weine": st.column_config.NumberColumn("FP-Weine", format="%d"),
+    })
+    export_button("Tabelle als CSV", gefiltert, "produzenten_abdeckung.csv", sep=";", encoding="utf-8-sig", key="rollup_csv")
+    st.caption(f"{len(gefiltert)} von {len(rollup)} Produzenten. Weine ohne Produzentenangabe sind nicht enthalten.")
\ No newline at end of file
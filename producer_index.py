@@ -0,0 +1,169 @@
+# producer_index.py
+import hashlib
+import os
+import pickle
+from difflib import SequenceMatcher
+
+import numpy as np
+import pandas as pd
+
+from normalization import normalize_produzent_name
+
+# Definiere Dateipfade (relativ zum Skript)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, "data", ".cache")
+
+INDEX_FORMAT_VERSION = 2           # erhöhen, wenn sich Normalisierung oder Index-Aufbau ändern
+DEFAULT_AEHNLICHKEIT_SCHWELLE = 90  # Score 0-100 (difflib), ab dem ein FP-Produzent als "vorhanden" gilt
+MAX_KANDIDATEN = 20                 # Kandidaten mit den meisten gemeinsamen Trigrammen, die exakt verifiziert werden
+
+
+# Generische Namensbestandteile, die beim unscharfen Vergleich ignoriert werden: sonst wirken
+# "Château La Cardonne" und "Château La Baronne" allein durch das gemeinsame Präfix ähnlich.
+_GENERISCHE_TOKENS = {
+    "chateau", "ch", "dom", "clos", "cave", "caves", "de", "du", "des", "la", "le", "les", "l", "d",
+    "di", "del", "della", "dei", "da", "y", "e", "et", "fils", "figli", "hijos", "sa", "ag", "gmbh", "srl", "spa", "sl", "sas", "sarl",
+}
+# Rechtsformen zählen auch bei der Bewertung eines Treffers nicht: "Chateau X SA" ist derselbe Produzent wie "Château X"
+_RECHTSFORMEN = {"sa", "ag", "gmbh", "srl", "spa", "sl", "sas", "sarl"}
+
+
+def _fuzzy_key(key: str) -> str:
+    tokens = [t for t in key.split() if t not in _GENERISCHE_TOKENS]
+    return " ".join(tokens) if tokens else key
+
+
+def _ohne_rechtsform(key: str) -> str:
+    tokens = [t for t in key.split() if t not in _RECHTSFORMEN]
+    return " ".join(tokens) if tokens else key
+
+
+def _trigramme(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ProduzentenIndex:
+    """
+    Entity-Index über die Flaschenpost-Produzenten: normalisierte Schlüssel (normalize_produzent_name)
+    plus invertierter Zeichen-Trigramm-Index für die unscharfe Suche auf dem Schlüssel ohne generische
+    Bestandteile (Château, de, Fils, SA …). Kandidaten werden über gemeinsame Trigramme vorausgewählt
+    und mit difflib (0-100) verifiziert.
+    """
+
+    def __init__(self, produzenten):
+        roh = pd.Series(list(produzenten), dtype=object).dropna().astype(str)
+        normalisiert = roh.map(normalize_produzent_name)
+        roh, normalisiert = roh[normalisiert != ""], normalisiert[normalisiert != ""]
+
+        # Pro Schlüssel den häufigsten Originalnamen als Anzeige-Namen merken
+        anzeige = (pd.DataFrame({"key": normalisiert, "roh": roh})
+                   .groupby("key")["roh"].agg(lambda s: s.value_counts().index[0]))
+        self.keys = anzeige.index.to_numpy(dtype=object)
+        self.anzeige_namen = anzeige.to_numpy(dtype=object)
+        self.fuzzy_keys = np.array([_fuzzy_key(k) for k in self.keys], dtype=object)
+        self._key_pos = {k: i for i, k in enumerate(self.keys)}
+        self._fuzzy_pos = {}  # unscharfer Schlüssel -> alle Positionen (z.B. "Château du Paradis" und "Domaine du Paradis")
+        for i, k in enumerate(self.fuzzy_keys):
+            self._fuzzy_pos.setdefault(k, []).append(i)
+
+        postings = {}
+        for i, key in enumerate(self.fuzzy_keys):
+            for tri in _trigramme(key):
+                postings.setdefault(tri, []).append(i)
+        self._postings = {tri: np.asarray(ids, dtype=np.int32) for tri, ids in postings.items()}
+        self._anzahl_trigramme = np.array([len(_trigramme(k)) for k in self.fuzzy_keys], dtype=np.int32)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup(self, name):
+        """
+        Ähnlichster FP-Produzent zu einem (Coop-)Produzentennamen: (FP-Anzeigename, Score 0-100); (None, 0) ohne Kandidaten.
+        Score 100 nur bei gleichem normalisiertem Schlüssel (Rechtsformen wie SA/AG ausgenommen). Treffer über den
+        unscharfen Schlüssel (ohne Château, de, …) werden auf dem Schlüssel ohne Rechtsform bewertet, damit
+        "Château du Paradis" nicht als "Domaine du Paradis" zählt; unter mehreren Treffern gewinnt der ähnlichste volle Schlüssel.
+        """
+        key = name if name in self._key_pos else normalize_produzent_name(name)
+        if not key:
+            return None, 0.0
+        if key in self._key_pos:
+            return self.anzeige_namen[self._key_pos[key]], 100.0
+        voller_key, key = key, _fuzzy_key(key)
+        if key in self._fuzzy_pos:
+            matcher = SequenceMatcher(autojunk=False)
+            matcher.set_seq2(voller_key)
+            bester_pos, bester_ratio = None, -1.0
+            for pos in self._fuzzy_pos[key]:
+                matcher.set_seq1(self.keys[pos])
+                if matcher.ratio() > bester_ratio:
+                    bester_pos, bester_ratio = pos, matcher.ratio()
+            score = SequenceMatcher(None, _ohne_rechtsform(self.keys[bester_pos]), _ohne_rechtsform(voller_key), autojunk=False).ratio()
+            return self.anzeige_namen[bester_pos], round(score * 100, 1)
+
+        tris = _trigramme(key)
+        listen = [self._postings[t] for t in tris if t in self._postings]
+        if not listen:
+            return None, 0.0
+        gemeinsam = np.bincount(np.concatenate(listen), minlength=len(self.keys))
+        # Dice-Koeffizient der Trigramm-Mengen als günstige Vorauswahl
+        dice = 2 * gemeinsam / (self._anzahl_trigramme + len(tris))
+        n = min(MAX_KANDIDATEN, int((gemeinsam > 0).sum()))
+        kandidaten = np.argpartition(-dice, n - 1)[:n]
+
+        matcher = SequenceMatcher(autojunk=False)
+        matcher.set_seq2(key)
+        bester_pos, bester_score = None, 0.0
+        for pos in kandidaten[np.argsort(-dice[kandidaten])]:
+            matcher.set_seq1(self.fuzzy_keys[pos])
+            if matcher.real_quick_ratio() * 100 <= bester_score or matcher.quick_ratio() * 100 <= bester_score:
+                continue
+            score = matcher.ratio() * 100
+            if score > bester_score:
+                bester_pos, bester_score = pos, score
+        if bester_pos is None:
+            return None, 0.0
+        return self.anzeige_namen[bester_pos], round(bester_score, 1)
+
+    def lookup_batch(self, namen, schwelle=DEFAULT_AEHNLICHKEIT_SCHWELLE) -> pd.DataFrame:
+        """
+        Batch-Abfrage (jeder normalisierte Name nur einmal): DataFrame mit Spalten 'Produzent', 'Produzent_Normalized',
+        'FP_Produzent' (ähnlichster FP-Produzent), 'Ähnlichkeit' und 'Bei_FP' (Ähnlichkeit >= Schwelle).
+        """
+        namen = pd.Series(list(namen), dtype=object)
+        normalisiert = namen.map(normalize_produzent_name)
+        ergebnisse = {key: self.lookup(key) for key in normalisiert.unique()}
+        aehnlichkeit = normalisiert.map(lambda k: ergebnisse[k][1]).astype(float)
+        return pd.DataFrame({
+            "Produzent": namen,
+            "Produzent_Normalized": normalisiert,
+            "FP_Produzent": normalisiert.map(lambda k: ergebnisse[k][0]),
+            "Ähnlichkeit": aehnlichkeit,
+            "Bei_FP": aehnlichkeit >= schwelle,
+        })
+
+
+def _cache_path(data_version) -> str:
+    digest = hashlib.sha1(f"{INDEX_FORMAT_VERSION}|{data_version}".encode("utf-8")).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f"produzenten_index_{digest}.pkl")
+
+
+def load_or_build_produzenten_index(df_fp: pd.DataFrame, data_version, produzent_col: str = "Produzent") -> ProduzentenIndex:
+    """Lädt den Index für diese FP-Datenversion aus data/.cache/ oder baut und speichert ihn einmalig."""
+    pfad = _cache_path(data_version)
+    if os.path.exists(pfad):
+        try:
+            with open(pfad, "rb") as f:
+                return pickle.load(f)
+        except Exception:
+            pass  # Defekter/inkompatibler Cache -> neu bauen
+    index = ProduzentenIndex(df_fp[produzent_col] if produzent_col in df_fp.columns else [])
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = pfad + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, pfad)
+    except OSError:
+        pass  # Schreibgeschützte Umgebung: Index bleibt nur im Speicher
+    return index
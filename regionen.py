@@ -0,0 +1,341 @@
+# regionen.py
+import re
+import unicodedata
+
+import pandas as pd
+
+LAND_UNBEKANNT = "Unbekannt"
+KEINE_SUBREGION = "Keine Subregion"
+
+# Regeln je Land für die Zuordnung Subregion -> Hauptregion (aus den bisherigen plot_gaps_*_regionen_comparison übernommen)
+# - mapping: normalisierte Subregion -> Hauptregion
+# - schreibweisen: normalisierte Subregion -> Anzeigename (sonst capitalize())
+# - enthaelt: (Teilstring, Hauptregion), wird vor dem Mapping geprüft
+# - bindestriche_zusammenfassen: Mehrfach-Bindestriche nach der Normalisierung zu einem zusammenfassen
+REGIONEN_REGELN = {
+    "Frankreich": {
+        "mapping": {
+            "maconnais": "Burgund", "chablis": "Burgund", "beaujolais": "Burgund", "cote-de-beaune": "Burgund",
+            "cote-de-nuits": "Burgund", "cote-chalon": "Burgund", "coteaux-du-lyonnais": "Burgund", "bouzeron": "Burgund",
+            "givry": "Burgund", "mercurey": "Burgund", "montagny": "Burgund", "rully": "Burgund", "cote-d-or": "Burgund",
+            "irancy": "Burgund", "pouilly-fuisse": "Burgund", "saint-veran": "Burgund", "vire-clesse": "Burgund",
+            "saint-bris": "Burgund", "fronsac": "Bordeaux", "saint-emilion": "Bordeaux", "pomerol": "Bordeaux",
+            "margaux": "Bordeaux", "pauillac": "Bordeaux", "saint-julien": "Bordeaux", "saint-estephe": "Bordeaux",
+            "graves": "Bordeaux", "medoc": "Bordeaux", "castillon": "Bordeaux", "listrac": "Bordeaux", "moulis": "Bordeaux",
+            "entre-deux-mers": "Bordeaux", "sauternes": "Bordeaux", "barsac": "Bordeaux", "canon-fronsac": "Bordeaux",
+            "hermitage": "Rhône", "chateauneuf-du-pape": "Rhône", "cornas": "Rhône", "saint-joseph": "Rhône",
+            "gigondas": "Rhône", "cote-rotie": "Rhône", "vacqueyras": "Rhône", "crozes-hermitage": "Rhône",
+            "rasteau": "Rhône", "lirac": "Rhône", "condrieu": "Rhône", "luberon": "Rhône", "cote-du-luberon": "Rhône",
+            "keine-subregion": "Andere", "ubrige-regionen-eu": "Andere",
+        },
+        "schreibweisen": {},
+        "enthaelt": [("burgund", "Burgund"), ("bordeaux", "Bordeaux"), ("rhone", "Rhône")],
+        "bindestriche_zusammenfassen": False,
+    },
+    "Italien": {
+        "mapping": {"lombardei/veltlin": "Lombardei", "keine-subregion": "Andere", "ubrige-regionen-eu": "Andere",
+                    "brda": "Andere", "abruzzen-und-apulien": "Andere"},
+        "schreibweisen": {},
+        "enthaelt": [],
+        "bindestriche_zusammenfassen": False,
+    },
+    "Schweiz": {
+        "mapping": {"bodensee": "Ostschweiz", "ubrige-schweiz": "Andere"},
+        "schreibweisen": {"wallis": "Wallis", "waadt": "Waadt", "tessin": "Tessin", "drei-seen-region": "Drei-Seen-Region",
+                          "genf": "Genf", "basel/aargau": "Basel/Aargau", "zurich": "Zürich", "schaffhausen": "Schaffhausen",
+                          "graubunden": "Graubünden", "ostschweiz": "Ostschweiz", "thurgau": "Thurgau", "st.-gallen": "St. Gallen"},
+        "enthaelt": [],
+        "bindestriche_zusammenfassen": False,
+    },
+    "Spanien": {
+        "mapping": {"priorat": "Katalonien", "ribera-del-duero": "Castilla y León", "rueda": "Castilla y León",
+                    "toro": "Castilla y León", "kastilien-leon": "Castilla y León", "cigales": "Castilla y León",
+                    "requena": "Valencia", "yecla-do": "Murcia", "kastilien-la-mancha": "Castilla-La Mancha",
+                    "mentrida-do-(toledo)": "Castilla-La Mancha", "dehesa-del-carrizal-do": "Castilla-La Mancha",
+                    "kastilien-l-a-mancha": "Castilla-La Mancha", "alava": "Rioja", "mallorca": "Balearen",
+                    "ubriges-spanien": "Andere", "keine-subregion": "Andere"},
+        "schreibweisen": {"teneriffa": "Teneriffa", "navarra": "Navarra", "galicien": "Galicien",
+                          "somontano": "Somontano", "jerez": "Jerez"},
+        "enthaelt": [],
+        "bindestriche_zusammenfassen": True,
+    },
+}
+
+
+# Zuordnung Subregion -> Hauptregion für die FP-Spalte 'Herkunft' ('Land > Subregion > ...', aus den bisherigen
+# plot_*_regionen_fp übernommen). Schlüssel: alles nach 'Land >', ohne weitere Ebene KEINE_SUBREGION.
+# Nicht gemappte Subregionen -> FP_REGIONEN_SONST[land], bei None die erste Ebene der Subregion.
+FP_REGIONEN_MAPPING = {
+    "Italien": {
+        "Abruzzen > Chieti": "Abruzzen",
+        "Apulien > Gargano": "Apulien",
+        "Apulien > Manduria": "Apulien",
+        "Apulien > Salento": "Apulien",
+        "Emilia-Romagna > Forli-Cesena": "Emilia-Romagna",
+        "Friaul > Isonzo": "Friaul",
+        "Latium > Castelli Romani": "Latium",
+        "Latium > Frascati": "Latium",
+        "Ligurien > Portofino": "Ligurien",
+        "Lombardei > Bergamo": "Lombardei",
+        "Lombardei > Montello": "Lombardei",
+        "Lombardei > Pavia": "Lombardei",
+        "Lombardei > Veltlin": "Lombardei",
+        "Marche > Matelica": "Marche",
+        "Marche > Offida": "Marche",
+        "Piemont > Alba": "Piemont",
+        "Piemont > Alessandria": "Piemont",
+        "Piemont > Alta Langa": "Piemont",
+        "Piemont > Castelletto": "Piemont",
+        "Piemont > Colline": "Piemont",
+        "Piemont > Cuneo": "Piemont",
+        "Piemont > Langhe": "Piemont",
+        "Piemont > Monferrato": "Piemont",
+        "Piemont > Monforte d'Alba": "Piemont",
+        "Piemont > Vezza d’Alba": "Piemont",
+        "Sizilien > Caltanissetta": "Sizilien",
+        "Sizilien > Noto": "Sizilien",
+        "Sizilien > West-Sizilien": "Sizilien",
+        "Veneto > Asolo": "Venetien",
+        "Veneto > Colli Euganei": "Venetien",
+        "Veneto > Valdobbiadine": "Venetien",
+        "Keine Subregion": "Andere",
+    },
+    "Frankreich": {
+        # Bordeaux (alle Subregionen zusammenfassen)
+        "Bordeaux > Barsac": "Bordeaux",
+        "Bordeaux > Canon-Fronsac": "Bordeaux",
+        "Bordeaux > Côtes de Blaye": "Bordeaux",
+        "Bordeaux > Côtes de Bourg": "Bordeaux",
+        "Bordeaux > Côtes de Castillon": "Bordeaux",
+        "Bordeaux > Côtes de Francs": "Bordeaux",
+        "Bordeaux > Entre-Deux-Mers": "Bordeaux",
+        "Bordeaux > Fronsac": "Bordeaux",
+        "Bordeaux > Graves": "Bordeaux",
+        "Bordeaux > Haut-Médoc": "Bordeaux",
+        "Bordeaux > Lalande-de-Pomerol": "Bordeaux",
+        "Bordeaux > Margaux (Médoc)": "Bordeaux",
+        "Bordeaux > Moulis & Listrac (Médoc)": "Bordeaux",
+        "Bordeaux > Pauillac (Médoc)": "Bordeaux",
+        "Bordeaux > Pessac-Léognan": "Bordeaux",
+        "Bordeaux > Pomerol": "Bordeaux",
+        "Bordeaux > Premières Côtes de Bordeaux": "Bordeaux",
+        "Bordeaux > Sauternes": "Bordeaux",
+        "Bordeaux > St-Emilion": "Bordeaux",
+        "Bordeaux > St-Estèphe (Médoc)": "Bordeaux",
+        "Bordeaux > St-Julien (Médoc)": "Bordeaux",
+        "Bordeaux > Übriges Médoc": "Bordeaux",
+        # Burgund
+        "Burgund > Beaujolais": "Burgund",
+        "Burgund > Beaujolais > Saint-Amour": "Burgund",
+        "Burgund > Chablis": "Burgund",
+        "Burgund > Côte Chalonnaise (Côte d'Or)": "Burgund",
+        "Burgund > Côte de Beaune (Côte d'Or)": "Burgund",
+        "Burgund > Côte de Beaune (Côte d'Or) > Volnay": "Burgund",
+        "Burgund > Côte de Nuits (Côte d'Or)": "Burgund",
+        "Burgund > Mâcon": "Burgund",
+        # Rhône
+        "Côtes du Rhône": "Rhône",
+        "Côtes du Rhône > Châteauneuf-du-Pape (Südliche Rhône)": "Rhône",
+        "Côtes du Rhône > Côtes du Ventoux (Südliche Rhône)": "Rhône",
+        "Côtes du Rhône > Grignan-les-Adhémar": "Rhône",
+        "Côtes du Rhône > Nördliche Rhône": "Rhône",
+        "Côtes du Rhône > Übrige Südliche Rhône": "Rhône",
+        # Loire
+        "Loire > Anjou-Saumour": "Loire",
+        "Loire > Obere Loire": "Loire",
+        "Loire > Pays Nantais (Muscadet)": "Loire",
+        "Loire > Touraine": "Loire",
+        # Südfrankreich (Midi/Provence)
+        "Midi - Languedoc-Roussillon": "Südfrankreich",
+        "Midi - Languedoc-Roussillon > Corbières": "Südfrankreich",
+        "Midi - Languedoc-Roussillon > Coteaux du Languedoc": "Südfrankreich",
+        "Midi - Languedoc-Roussillon > Minervois": "Südfrankreich",
+        "Midi - Languedoc-Roussillon > Minervois-La-Livinière": "Südfrankreich",
+        "Midi - Languedoc-Roussillon > Roussillon": "Südfrankreich",
+        "Midi - Languedoc-Roussillon > Terrasses de Béziers": "Südfrankreich",
+        "Provence": "Südfrankreich",
+        "Provence > Côte d’Azur > L'Isle-sur-la-Sorgue": "Südfrankreich",
+        "Okzitanien": "Andere",
+        "Okzitanien > Hérault": "Andere",
+        "Okzitanien > Sud France": "Andere",
+        # Sonstige
+        "Champagne": "Champagne",
+        "Elsass": "Elsass",
+        "Jura": "Jura",
+        "Korsika": "Korsika",
+        "Savoyen": "Savoyen",
+        "Südwesten": "Südwesten",
+        "Südwesten > Bergerac": "Südwesten",
+        "Südwesten > Béarn & Pyrenäen": "Südwesten",
+        "Südwesten > Cahors": "Südwesten",
+        "Südwesten > Gaillac": "Südwesten",
+        "Keine Subregion": "Andere",
+        "Auvergne-Rhône-Alpes": "Andere",
+        "Normandie": "Andere",
+    },
+    "Spanien": {
+        "Andalusien": "Andalusien",
+        "Balearen": "Balearen",
+        "Balearen > Mallorca": "Balearen",
+        "Baskenland": "Baskenland",
+        "Baskenland > Getariako Txakolina": "Baskenland",
+        "Duero-Tal (Castilla y Leon)": "Castilla y León",
+        "Duero-Tal (Castilla y Leon) > Bierzo": "Castilla y León",
+        "Duero-Tal (Castilla y Leon) > Cigales": "Castilla y León",
+        "Duero-Tal (Castilla y Leon) > Ribera del Duero": "Castilla y León",
+        "Duero-Tal (Castilla y Leon) > Rueda": "Castilla y León",
+        "Duero-Tal (Castilla y Leon) > Toro": "Castilla y León",
+        "Extremadura": "Extremadura",
+        "Galizien": "Galizien",
+        "Galizien > Monterrei": "Galizien",
+        "Galizien > Ribeira Sacra": "Galizien",
+        "Galizien > Ribeiro": "Galizien",
+        "Galizien > Rías Baixas": "Galizien",
+        "Galizien > Valdeorras": "Galizien",
+        "Kanarische Inseln": "Kanarische Inseln",
+        "Kanarische Inseln > Teneriffa": "Kanarische Inseln",
+        "Katalonien": "Katalonien",
+        "Katalonien > Ampurdán-Costa Brava": "Katalonien",
+        "Katalonien > Barcelona": "Katalonien",
+        "Katalonien > Castellet i la Gornal": "Katalonien",
+        "Katalonien > Cava": "Katalonien",
+        "Katalonien > Costers del Segre": "Katalonien",
+        "Katalonien > Cónca de Barberà": "Katalonien",
+        "Katalonien > Montsant": "Katalonien",
+        "Katalonien > Penedès": "Katalonien",
+        "Katalonien > Pla de Bages": "Katalonien",
+        "Katalonien > Tarragona": "Katalonien",
+        "Katalonien > Terra Alta": "Katalonien",
+        "Levante": "Levante",
+        "Levante > Alicante": "Levante",
+        "Levante > Murcia": "Levante",
+        "Levante > Valencia": "Levante",
+        "Meseta": "Meseta",
+        "Meseta > Castilla-La Mancha": "Meseta",
+        "Meseta > Madrid": "Meseta",
+        "Oberer Ebro": "Oberer Ebro",
+        "Oberer Ebro > Aragón": "Oberer Ebro",
+        "Oberer Ebro > La Rioja": "Oberer Ebro",
+        "Oberer Ebro > La Rioja > Rioja Alavesa": "Oberer Ebro",
+        "Oberer Ebro > La Rioja > Rioja Alta": "Oberer Ebro",
+        "Oberer Ebro > La Rioja > Rioja Baja": "Oberer Ebro",
+        "Oberer Ebro > Navarra": "Oberer Ebro",
+        "Somontano": "Somontano",
+        "Valtuille": "Castilla y León",
+        "Keine Subregion": "Andere",
+    },
+    "Schweiz": {
+        "Aargau": "Basel/Aargau",
+        "Basel": "Basel/Aargau",
+        "Basel > Basel-Landschaft": "Basel/Aargau",
+        "Freiburg": "Drei-Seen-Region",
+        "Neuenburg": "Drei-Seen-Region",
+        "Westschweiz": "Waadt",
+        "Waadt": "Waadt",
+        "Waadt > Aigle": "Waadt",
+        "Waadt > Aigle > Villeneuve": "Waadt",
+        "Waadt > Aigle > Yvorne": "Waadt",
+        "Waadt > Lavaux-Oron > Bourg-en-Lavaux > Epesses": "Waadt",
+        "Waadt > Lavaux-Oron > Bourg-en-Lavaux > Villette": "Waadt",
+        "Waadt > Morges > Aubonne": "Waadt",
+        "Waadt > Morges > Féchy": "Waadt",
+        "Waadt > Nyon > Dully": "Waadt",
+        "Waadt > Nyon > Gilly": "Waadt",
+        "Waadt > Nyon > Luins": "Waadt",
+        "Waadt > Nyon > Tartegnin": "Waadt",
+        "Waadt > Puidoux > Dézaley": "Waadt",
+        "Bern": "Bern",
+        "Bündner Herrschaft": "Graubünden",
+        "Genf": "Genf",
+        "Luzern": "Luzern",
+        "Schaffhausen": "Schaffhausen",
+        "Tessin": "Tessin",
+        "Wallis": "Wallis",
+        "Zürich": "Zürich",
+        "Ostschweiz": "Ostschweiz",
+        "Keine Subregion": "Andere",
+    },
+}
+FP_REGIONEN_SONST = {"Italien": None, "Frankreich": None, "Spanien": "Andere", "Schweiz": "Andere"}
+
+def normalize_region_string(text, bindestriche_zusammenfassen: bool = False) -> str:
+    """Kleinschreibung, Akzente entfernen, Leerzeichen/Gedankenstriche zu Bindestrichen."""
+    text = str(text).lower()
+    text = ''.join(c for c in unicodedata.normalize('NFD', text) if unicodedata.category(c) != 'Mn')
+    text = text.replace('–', '-').replace(' ', '-')
+    if bindestriche_zusammenfassen:
+        text = re.sub(r'-+', '-', text)
+    return text
+
+
+def _land_und_subregion(wert):
+    if pd.isna(wert):
+        return LAND_UNBEKANNT, KEINE_SUBREGION
+    teile = str(wert).split(",")
+    land = teile[0].strip()
+    subregion = teile[1].strip() if len(teile) > 1 else KEINE_SUBREGION
+    return land, subregion
+
+
+def _hauptregion(land, subregion):
+    regeln = REGIONEN_REGELN.get(land)
+    if regeln is None:
+        return None
+    normalisiert = normalize_region_string(subregion, regeln["bindestriche_zusammenfassen"])
+    for teilstring, hauptregion in regeln["enthaelt"]:
+        if teilstring in normalisiert:
+            return hauptregion
+    if normalisiert in regeln["mapping"]:
+        return regeln["mapping"][normalisiert]
+    return regeln["schreibweisen"].get(normalisiert, normalisiert.capitalize())
+
+
+def fp_land(herkunft: pd.Series) -> pd.Series:
+    """Land aus der FP-Spalte 'Herkunft' ('Land > Region > ...')."""
+    return herkunft.astype("string").str.split(">", n=1).str[0].str.strip().fillna(LAND_UNBEKANNT).astype(object)
+
+
+def split_region(region: pd.Series) -> pd.DataFrame:
+    """
+    Zerlegt die Roh-Regionsspalte ('Land, Subregion, ...') in 'Land' und 'Hauptregion'.
+    Die Zuordnung läuft einmal pro eindeutigem Wert und wird dann per map() übertragen.
+    'Hauptregion' ist nur für Länder mit Regeln in REGIONEN_REGELN gesetzt, sonst None.
+    """
+    eindeutig = pd.unique(region.to_numpy(dtype=object))
+    land, hauptregion = {}, {}
+    for wert in eindeutig:
+        l, s = _land_und_subregion(wert)
+        land[wert], hauptregion[wert] = l, _hauptregion(l, s)
+    # NaN-Schlüssel werden von map() nicht gefunden -> separat auffüllen
+    return pd.DataFrame({
+        "Land": region.map(land).fillna(LAND_UNBEKANNT),
+        "Hauptregion": region.map(hauptregion),
+    }, index=region.index)
+
+
+def _fp_land_und_hauptregion(wert):
+    if pd.isna(wert):
+        return LAND_UNBEKANNT, None
+    teile = str(wert).split(">")
+    land = teile[0].strip()
+    mapping = FP_REGIONEN_MAPPING.get(land)
+    if mapping is None:
+        return land, None
+    subregion = ">".join(teile[1:]).strip() if len(teile) > 1 else KEINE_SUBREGION
+    sonst = FP_REGIONEN_SONST[land]
+    return land, mapping.get(subregion, subregion.split(">")[0].strip() if sonst is None else sonst)
+
+
+def split_herkunft(herkunft: pd.Series) -> pd.DataFrame:
+    """
+    Gegenstück zu split_region für die FP-Spalte 'Herkunft' ('Land > Subregion > ...'): 'Land' und 'Hauptregion'
+    (nur für Länder in FP_REGIONEN_MAPPING, sonst None), einmal pro eindeutigem Wert berechnet.
+    """
+    eindeutig = pd.unique(herkunft.to_numpy(dtype=object))
+    land, hauptregion = {}, {}
+    for wert in eindeutig:
+        land[wert], hauptregion[wert] = _fp_land_und_hauptregion(wert)
+    return pd.DataFrame({
+        "Land": herkunft.map(land).fillna(LAND_UNBEKANNT),
+        "Hauptregion": herkunft.map(hauptregion),
+    }, index=herkunft.index)
@@ -0,0 +1,136 @@
+# render_cache.py
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+import streamlit as st
+
+MAX_FIGUREN = 256
+MAX_BYTES = 64 * 1024 * 1024  # Summe der serialisierten Figure-Specs (JSON-Länge)
+
+
+def daten_hash(*daten) -> str:
+    """
+    Inhalts-Hash der Plot-Eingaben (die bereits aggregierten Daten einer Figur).
+    DataFrames/Series über pd.util.hash_pandas_object inkl. Index, Spaltennamen und dtypes,
+    numpy-Arrays über ihre Bytes, alles andere über repr().
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for obj in daten:
+        if isinstance(obj, (pd.DataFrame, pd.Series)):
+            h.update(repr((type(obj).__name__, obj.shape, getattr(obj, "name", None))).encode())
+            if isinstance(obj, pd.DataFrame):
+                h.update(repr((list(obj.columns), [str(t) for t in obj.dtypes])).encode())
+            else:
+                h.update(str(obj.dtype).encode())
+            try:
+                werte = pd.util.hash_pandas_object(obj, index=True)
+            except TypeError:  # nicht hashbare Zellen (z.B. Listen) -> Textdarstellung
+                werte = pd.util.hash_pandas_object(obj.astype(str), index=True)
+            h.update(werte.to_numpy().tobytes())
+        elif isinstance(obj, np.ndarray):
+            h.update(repr((obj.shape, str(obj.dtype))).encode())
+            h.update(np.ascontiguousarray(obj).tobytes() if obj.dtype != object else repr(obj.tolist()).encode())
+        else:
+            h.update(repr(obj).encode())
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
+class FigureCache:
+    """
+    LRU-Cache für fertige Plotly-Figuren, Schlüssel: (Funktionsname, Datenhash, Parameter).
+    Begrenzt über die Anzahl Einträge und die Gesamtgrösse der serialisierten Specs;
+    beim Überschreiten werden die am längsten nicht genutzten Figuren verworfen.
+    Gespeichert wird die Figure selbst (ein Treffer spart den Aufbau und die Validierung),
+    die Grösse wird einmalig über den JSON-Spec bestimmt.
+    """
+
+    def __init__(self, max_eintraege: int = MAX_FIGUREN, max_bytes: int = MAX_BYTES):
+        self.max_eintraege = max_eintraege
+        self.max_bytes = max_bytes
+        self._eintraege = OrderedDict()  # Schlüssel -> (Figure, Grösse in Bytes)
+        self._lock = threading.Lock()  # Streamlit-Sessions laufen in eigenen Threads
+        self.bytes = 0
+        self.treffer = 0
+        self.fehlschlaege = 0
+
+    def __len__(self):
+        return len(self._eintraege)
+
+    def get(self, schluessel):
+        with self._lock:
+            eintrag = self._eintraege.get(schluessel)
+            if eintrag is None:
+                self.fehlschlaege += 1
+                return None
+            self._eintraege.move_to_end(schluessel)
+            self.treffer += 1
+            return eintrag[0]
+
+    def put(self, schluessel, figur):
+        groesse = len(pio.to_json(figur, validate=False))
+        if groesse > self.max_bytes:
+            return
+        with self._lock:
+            if schluessel in self._eintraege:
+                self.bytes -= self._eintraege.pop(schluessel)[1]
+            self._eintraege[schluessel] = (figur, groesse)
+            self.bytes += groesse
+            while self._eintraege and (len(self._eintraege) > self.max_eintraege or self.bytes > self.max_bytes):
+                _, (_, alt) = self._eintraege.popitem(last=False)
+                self.bytes -= alt
+
+    def clear(self):
+        with self._lock:
+            self._eintraege.clear()
+            self.bytes = 0
+
+    def statistik(self) -> dict:
+        return {"Einträge": len(self._eintraege), "Bytes": self.bytes, "Treffer": self.treffer, "Fehlschläge": self.fehlschlaege}
+
+
+@st.cache_resource(show_spinner=False)
+def get_figure_cache() -> FigureCache:
+    """Ein Figure-Cache pro Serverprozess (über alle Sessions geteilt)."""
+    return FigureCache()
+
+
+def gecachte_figur(erzeugen, *daten, **parameter):
+    """
+    Liefert erzeugen(*daten, **parameter) aus dem Figure-Cache bzw. baut und speichert die Figur.
+    erzeugen muss eine reine Funktion ihrer Argumente sein: der Schlüssel besteht aus dem
+    qualifizierten Funktionsnamen, dem Inhalts-Hash der Daten und den Parametern.
+    """
+    cache = get_figure_cache()
+    schluessel = (f"{erzeugen.__module__}.{erzeugen.__qualname__}", daten_hash(*daten), repr(sorted(parameter.items())))
+    figur = cache.get(schluessel)
+    if figur is None:
+        figur = erzeugen(*daten, **parameter)
+        cache.put(schluessel, figur)
+    return figur
+
+
+def zeige_figur(erzeugen, *daten, **parameter):
+    """gecachte_figur + st.plotly_chart über die volle Breite."""
+    st.plotly_chart(gecachte_figur(erzeugen, *daten, **parameter), width="stretch")
+
+
+@contextmanager
+def lazy_expander(label: str, key: str, expanded: bool = False):
+    """
+    st.expander mit Zustands-Tracking (on_change="rerun"): liefert True, solange der Abschnitt geöffnet ist.
+    Der Aufrufer rechnet und rendert nur dann; zugeklappte Abschnitte kosten pro Rerun nichts.
+    Die Ergebnisse selbst liegen in den gecachten get_*-Funktionen und im Figure-Cache und bleiben beim Zuklappen erhalten.
+
+        with lazy_expander("2. Verteilung der Preisklassen", key="coop_abschnitt_2") as offen:
+            if offen:
+                plot_preisklassen_pie_and_table(df)
+    """
+    container = st.expander(label, expanded=expanded, key=key, on_change="rerun")
+    with container:
+        yield bool(container.open)
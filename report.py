@@ -0,0 +1,195 @@
+# report.py
+import argparse
+import concurrent.futures
+import html
+import multiprocessing
+import os
+import sys
+import time
+
+import pandas as pd
+
+# Definiere Dateipfade (relativ zum Skript)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_FILE = os.path.join(BASE_DIR, "app.py")
+REPORT_DIR = os.path.join(BASE_DIR, "reports")
+
+# Radiobutton-Werte der Tabs in app.py, in Reihenfolge des Reports
+TABS = ["Coop-Sortiment", "Flaschenpost-Sortiment", "Matching-Analyse", "Gap-Analyse"]
+MAX_ZEILEN = 200  # Zeilen pro Tabelle im Report
+TIMEOUT = 900  # Sekunden pro Skriptlauf (erster Lauf lädt die Excel-Dateien)
+
+# Bedienelemente erscheinen nicht im Report
+_WIDGETS = {
+    "button", "download_button", "checkbox", "toggle", "radio", "selectbox", "multiselect", "slider",
+    "select_slider", "text_input", "text_area", "number_input", "date_input", "time_input", "color_picker",
+    "form_submit_button", "button_group", "pills", "segmented_control",
+}
+
+
+def _app_test():
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_FILE, default_timeout=TIMEOUT)
+    at.session_state["password_entered"] = True  # headless: Login-Formular überspringen
+    return at
+
+
+def _alle_abschnitte_oeffnen(at) -> None:
+    """Öffnet alle lazy_expander-Abschnitte (über ihre Keys) und rerunnt, bis keine neuen mehr auftauchen."""
+    geoeffnet = set()
+    while True:
+        neu = [ex.key for ex in at.expander if ex.key and ex.key not in geoeffnet]
+        if not neu:
+            return
+        for key in neu:
+            at.session_state[key] = True
+        geoeffnet.update(neu)
+        at.run()
+
+
+def _element_html(element, max_zeilen: int, figuren: list) -> str:
+    """HTML eines Elements aus dem AppTest-Elementbaum (Blöcke rekursiv); Plotly-Specs landen in figuren."""
+    typ = element.type
+    if typ in _WIDGETS:
+        return ""
+    if typ in ("title", "header", "subheader"):
+        ebene = {"title": 1, "header": 2, "subheader": 3}[typ]
+        return f"<h{ebene}>{html.escape(element.value)}</h{ebene}>"
+    if typ == "markdown":
+        return f'<div class="md">{html.escape(element.value)}</div>'
+    if typ == "caption":
+        return f'<p class="caption">{html.escape(element.value)}</p>'
+    if typ in ("info", "warning", "success", "error"):
+        return f'<div class="hinweis {typ}">{html.escape(element.value)}</div>'
+    if typ == "exception":
+        return f'<div class="hinweis error"><pre>{html.escape(element.value)}</pre></div>'
+    if typ == "metric":
+        return (f'<div class="metric"><span>{html.escape(element.label)}</span><b>{html.escape(str(element.value))}</b>'
+                f'<i>{html.escape(str(element.delta or ""))}</i></div>')
+    if typ in ("dataframe", "table"):
+        df = element.value
+        hinweis = f'<p class="caption">Erste {max_zeilen} von {len(df)} Zeilen.</p>' if len(df) > max_zeilen else ""
+        return df.head(max_zeilen).to_html(index=False, na_rep="", classes="tabelle", border=0) + hinweis
+    if typ == "plotly_chart":
+        figuren.append(element.proto.spec)
+        return f'<div class="figur" id="figur-{{nr}}-{len(figuren) - 1}"></div>'
+    if typ == "expander":
+        inhalt = "".join(_element_html(kind, max_zeilen, figuren) for kind in element.children.values())
+        return f"<details open><summary>{html.escape(element.label)}</summary>{inhalt}</details>"
+    if hasattr(element, "children"):
+        inhalt = "".join(_element_html(kind, max_zeilen, figuren) for kind in element.children.values())
+        if not inhalt:
+            return ""
+        return f'<div class="zeile">{inhalt}</div>' if typ == "flex_container" else f"<div>{inhalt}</div>"
+    return ""
+
+
+def render_tab(tab: str, max_zeilen: int = MAX_ZEILEN) -> dict:
+    """
+    Rendert einen Tab headless (streamlit.testing AppTest) mit allen Abschnitten geöffnet.
+    Ergebnis: HTML-Fragment, Plotly-Specs (JSON) und Laufzeit; Fehler des Tabs stehen im Fragment.
+    """
+    start = time.perf_counter()
+    at = _app_test()
+    at.run()
+    at.sidebar.radio[0].set_value(tab).run()
+    _alle_abschnitte_oeffnen(at)
+    figuren = []
+    inhalt = "".join(_element_html(element, max_zeilen, figuren) for element in at.main.children.values())
+    return {"tab": tab, "html": inhalt, "figuren": figuren, "sekunden": time.perf_counter() - start,
+            "fehler": len(at.exception) + len(at.error)}
+
+
+def _script_json(spec: str) -> str:
+    """JSON für einen Inline-<script>: '</' maskieren, damit Texte in der Figur das Skript nicht beenden."""
+    return spec.replace("</", "<\\/")
+
+
+def _cache_vorwaermen() -> None:
+    """Ein Lauf im Hauptprozess füllt die Daten- und Aggregat-Caches; per fork erben die Worker sie."""
+    hauptmodul = sys.modules["__main__"]
+    try:
+        _app_test().run()
+    finally:
+        sys.modules["__main__"] = hauptmodul  # AppTest führt app.py als __main__ aus; der Pool braucht report.py
+
+
+def build_report(tabs=TABS, max_zeilen: int = MAX_ZEILEN, worker: int = None, bilder_dir: str = None) -> str:
+    """
+    Rendert alle Tabs parallel in einem Prozess-Pool und setzt einen eigenständigen HTML-Report zusammen
+    (plotly.js eingebettet, keine externen Dateien). Mit bilder_dir werden die Figuren zusätzlich als PNG abgelegt.
+    """
+    import plotly.io as pio
+    from plotly.offline import get_plotlyjs
+
+    kontext = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+    if kontext is not None:
+        _cache_vorwaermen()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=worker or len(tabs), mp_context=kontext) as pool:
+        ergebnisse = list(pool.map(render_tab, tabs, [max_zeilen] * len(tabs)))
+
+    abschnitte, skripte = [], []
+    for nr, ergebnis in enumerate(ergebnisse):
+        abschnitte.append(f'<section><h1>{html.escape(ergebnis["tab"])}</h1>{ergebnis["html"].replace("{nr}", str(nr))}</section>')
+        for i, spec in enumerate(ergebnis["figuren"]):
+            skripte.append(f'zeichne("figur-{nr}-{i}", {_script_json(spec)});')
+            if bilder_dir:
+                os.makedirs(bilder_dir, exist_ok=True)
+                pio.write_image(pio.from_json(spec), os.path.join(bilder_dir, f"figur_{nr}_{i}.png"))
+        print(f"{ergebnis['tab']}: {len(ergebnis['figuren'])} Figuren, {ergebnis['fehler']} Fehler, {ergebnis['sekunden']:.1f}s")
+
+    stand = pd.Timestamp.now().strftime("%Y-%m-%d %H:%M")
+    return f"""<!DOCTYPE html>
+<html lang="de"><head><meta charset="utf-8"><title>Wein Dashboard – Report {stand}</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em auto; max-width: 1400px; color: #262730; }}
+section {{ page-break-before: always; }}
+details {{ border: 1px solid #ddd; border-radius: 6px; padding: 0.5em 1em; margin: 1em 0; }}
+summary {{ font-weight: bold; cursor: pointer; }}
+.md {{ white-space: pre-line; }}
+.caption {{ color: #808495; font-size: 0.85em; }}
+.hinweis {{ padding: 0.6em 1em; border-radius: 6px; margin: 0.5em 0; background: #e8f0fe; }}
+.hinweis.warning {{ background: #fff8e1; }} .hinweis.success {{ background: #e6f4ea; }} .hinweis.error {{ background: #fdecea; }}
+.zeile {{ display: flex; gap: 1.5em; align-items: flex-start; }} .zeile > div {{ flex: 1; min-width: 0; }}
+.metric {{ display: inline-block; margin-right: 2em; }} .metric span, .metric i {{ display: block; font-size: 0.85em; }}
+.tabelle {{ border-collapse: collapse; font-size: 0.85em; margin: 0.5em 0; }}
+.tabelle th, .tabelle td {{ border-bottom: 1px solid #eee; padding: 2px 8px; text-align: left; }}
+</style>
+<script>{get_plotlyjs()}</script>
+<script>function zeichne(id, f) {{ Plotly.newPlot(id, f.data, f.layout, {{responsive: true, displaylogo: false}}); }}</script>
+</head><body>
+<p class="caption">Wein Dashboard – statischer Report, erstellt {stand}</p>
+{"".join(abschnitte)}
+<script>{"".join(skripte)}</script>
+</body></html>"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Statischer HTML-Report aller Dashboard-Tabs (headless, ohne Browser)")
+    parser.add_argument("--ausgabe", default=None, help="Pfad der HTML-Datei, Standard: reports/wein_report_<Datum>.html")
+    parser.add_argument("--tabs", nargs="+", choices=TABS, default=TABS, help="Nur diese Tabs rendern")
+    parser.add_argument("--worker", type=int, default=None, help="Anzahl Prozesse, Standard: ein Prozess pro Tab")
+    parser.add_argument("--max-zeilen", type=int, default=MAX_ZEILEN, help="Zeilen pro Tabelle im Report")
+    parser.add_argument("--bilder", action="store_true", help="Figuren zusätzlich als PNG ablegen (benötigt kaleido)")
+    args = parser.parse_args()
+
+    ausgabe = args.ausgabe or os.path.join(REPORT_DIR, f"wein_report_{pd.Timestamp.now():%Y-%m-%d}.html")
+    bilder_dir = None
+    if args.bilder:
+        try:
+            import kaleido  # noqa: F401
+            bilder_dir = os.path.splitext(ausgabe)[0] + "_bilder"
+        except ImportError:
+            print("WARNUNG: kaleido ist nicht installiert, der Report wird ohne PNG-Bilder erstellt.")
+
+    start = time.perf_counter()
+    inhalt = build_report(args.tabs, max_zeilen=args.max_zeilen, worker=args.worker, bilder_dir=bilder_dir)
+    os.makedirs(os.path.dirname(os.path.abspath(ausgabe)), exist_ok=True)
+    with open(ausgabe, "w", encoding="utf-8") as f:
+        f.write(inhalt)
+    print(f"Report gespeichert: {ausgabe} ({len(inhalt) / 1e6:.1f} MB, {time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# sortiment_cube.py
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from regionen import split_herkunft, split_region
+
+DIM_WEINTYP = "Weintyp"
+DIM_PREISKLASSE = "Preisklasse"
+DIM_LAND = "Land"
+DIM_REGION = "Region"
+DIMENSIONEN = (DIM_WEINTYP, DIM_PREISKLASSE, DIM_LAND, DIM_REGION)
+
+WEINTYP_REIHENFOLGE = ["Rotwein", "Weisswein", "Roséwein", "Schaumwein"]
+
+
+def preisklassen(preise: pd.Series, bins, labels) -> pd.Series:
+    """
+    Preisklasse je Preis als geordnete Kategorie (Reihenfolge = labels), gemeinsam für Sortiment-Panels, Gap-Vergleich
+    und Opportunity-Score: Klassen [von, bis), die letzte schliesst die obere Grenze (meist den Höchstpreis) ein.
+    Ein Wein zu 20 CHF liegt damit überall in '20–50 CHF'; Preise ausserhalb der Grenzen und NaN bleiben ohne Klasse.
+    """
+    kanten = np.asarray(bins, dtype=float)
+    if len(kanten) != len(labels) + 1 or np.any(np.diff(kanten) <= 0):
+        raise ValueError(f"Preisklassen-Grenzen müssen streng steigen und eine mehr als Labels sein: {list(bins)}")
+    werte = pd.to_numeric(preise, errors="coerce").to_numpy(dtype=float)
+    codes = np.searchsorted(kanten, werte, side="right") - 1
+    codes[werte == kanten[-1]] = len(labels) - 1
+    codes[~((werte >= kanten[0]) & (werte <= kanten[-1]))] = -1  # ausserhalb der Grenzen oder NaN
+    return pd.Series(pd.Categorical.from_codes(codes, categories=list(labels), ordered=True), index=preise.index)
+
+
+def sortiment_merkmale(df: pd.DataFrame, quelle: str, bins, labels, weintyp_col: str = "Weintyp",
+                       preis_col: str = "Preis", region_col: str = "Region", herkunft_col: str = "Herkunft") -> pd.DataFrame:
+    """
+    Dimensionen der Sortiment-Panels je Zeile: Weintyp, Preisklasse (preisklassen, wie im Gap-Vergleich),
+    Land und Region (Hauptregion; Coop über regionen.split_region, Flaschenpost über regionen.split_herkunft).
+    """
+    regionen = split_region(df[region_col]) if quelle == "coop" else split_herkunft(df[herkunft_col])
+    preisklasse = preisklassen(df[preis_col], bins, labels)
+    return pd.DataFrame({
+        DIM_WEINTYP: df[weintyp_col].astype(object),
+        DIM_PREISKLASSE: preisklasse.astype(object).where(preisklasse.notna()),
+        DIM_LAND: regionen["Land"],
+        DIM_REGION: regionen["Hauptregion"],
+    }, index=df.index)
+
+
+class SortimentCube:
+    """
+    Zähl-Würfel eines Sortiments: Anzahl Weine je belegter Kombination der DIMENSIONEN, einmal pro Datenversion gebaut.
+    - codes: je Dimension die Kategorie-Codes der Zellen (-1 = ohne Kategorie)
+    - kategorien: je Dimension die Kategorien in Anzeige-Reihenfolge (feste Reihenfolge bzw. nach Anzahl absteigend)
+    - anzahl_zellen: Anzahl Weine je Zelle
+    Abfragen (anzahl, total) filtern nur die Zellen (einige Tausend statt aller Zeilen), nie die Rohdaten.
+    """
+
+    def __init__(self, merkmale: pd.DataFrame, reihenfolgen: dict = None):
+        reihenfolgen = reihenfolgen or {}
+        zellen = merkmale.groupby(list(merkmale.columns), dropna=False, sort=False).size().reset_index(name="Anzahl")
+        self.anzahl_zellen = zellen["Anzahl"].to_numpy(dtype=np.int64)
+        self.n = int(self.anzahl_zellen.sum())
+        self.codes, self.kategorien = {}, {}
+        for dimension in merkmale.columns:
+            werte = zellen[dimension]
+            if dimension in reihenfolgen:
+                kategorien = pd.Index(list(reihenfolgen[dimension]), dtype=object)
+            else:
+                summen = self.anzahl_zellen.astype(float)
+                reihenfolge = pd.Series(summen, index=werte).groupby(level=0, sort=False).sum()
+                kategorien = reihenfolge.sort_values(ascending=False, kind="stable").index.astype(object)
+            self.kategorien[dimension] = kategorien
+            self.codes[dimension] = kategorien.get_indexer(werte)
+
+    def __len__(self):
+        return len(self.anzahl_zellen)
+
+    def maske(self, auswahl: dict = None, ohne: str = None) -> np.ndarray:
+        """bool-Maske über die Zellen: alle Dimensionen (ausser ohne) liegen in ihrer Auswahl; leere Auswahl = alles."""
+        maske = np.ones(len(self.anzahl_zellen), dtype=bool)
+        for dimension, werte in (auswahl or {}).items():
+            if dimension == ohne or not werte:
+                continue
+            erlaubt = np.append(self.kategorien[dimension].isin(list(werte)), False)  # Code -1 -> letzter Eintrag, False
+            maske &= erlaubt[self.codes[dimension]]
+        return maske
+
+    def anzahl(self, dimension: str, auswahl: dict = None) -> pd.Series:
+        """
+        Anzahl Weine je Kategorie einer Dimension unter der Auswahl der übrigen Dimensionen
+        (die eigene Auswahl wird ignoriert, damit das gefilterte Diagramm alle Kategorien zeigt).
+        """
+        codes = self.codes[dimension]
+        treffer = self.maske(auswahl, ohne=dimension) & (codes >= 0)
+        summen = np.bincount(codes[treffer], weights=self.anzahl_zellen[treffer], minlength=len(self.kategorien[dimension]))
+        return pd.Series(summen.astype(np.int64), index=self.kategorien[dimension].rename(dimension), name="Anzahl")
+
+    def total(self, auswahl: dict = None) -> int:
+        """Anzahl Weine, die die gesamte Auswahl erfüllen."""
+        return int(self.anzahl_zellen[self.maske(auswahl)].sum())
+
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def get_sortiment_cube(_df, quelle: str, version, bins: tuple, labels: tuple) -> SortimentCube:
+    """Gecachter Zähl-Würfel, Schlüssel: Quelle ('coop'/'fp'), Datenversion und Preisklassen."""
+    merkmale = sortiment_merkmale(_df, quelle, bins, labels)
+    return SortimentCube(merkmale, reihenfolgen={DIM_WEINTYP: WEINTYP_REIHENFOLGE, DIM_PREISKLASSE: labels})
@@ -0,0 +1,59 @@
+# table_export.py
+import io
+
+import pandas as pd
+import streamlit as st
+
+from render_cache import daten_hash
+
+CHUNK_ZEILEN = 5000  # Zeilen pro Schreibblock beim CSV-Export
+FORMATE = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def schreibe_export(df: pd.DataFrame, ziel, format: str = "csv", sep: str = ",", encoding: str = "utf-8",
+                    chunk_zeilen: int = CHUNK_ZEILEN) -> None:
+    """
+    Schreibt df in das Binär-Objekt ziel. CSV wird blockweise (chunk_zeilen Zeilen) formatiert und geschrieben,
+    es entsteht also nie der komplette Text als str im Speicher; xlsx über openpyxl.
+    """
+    if format == "csv":
+        df.to_csv(ziel, index=False, sep=sep, encoding=encoding, chunksize=chunk_zeilen)
+    elif format == "xlsx":
+        df.to_excel(ziel, index=False, engine="openpyxl")
+    else:
+        raise ValueError(f"Unbekanntes Exportformat: {format}")
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _export_bytes(_df: pd.DataFrame, inhalt_hash: str, format: str, sep: str, encoding: str) -> bytes:
+    """Gecachte Export-Datei, Schlüssel: Inhalts-Hash der Tabelle und Exportoptionen."""
+    puffer = io.BytesIO()
+    schreibe_export(_df, puffer, format=format, sep=sep, encoding=encoding)
+    return puffer.getvalue()
+
+
+def export_bytes(df: pd.DataFrame, format: str = "csv", sep: str = ",", encoding: str = "utf-8") -> bytes:
+    return _export_bytes(df, daten_hash(df), format, sep, encoding)
+
+
+def export_button(label: str, df, file_name: str, format: str = "csv", sep: str = ",",
+                  encoding: str = "utf-8", key: str = None, **kwargs):
+    """
+    st.download_button mit verzögerter Erzeugung: beim Rendern wird nur ein Callable registriert,
+    Hash und Datei entstehen erst beim Klick (danach aus dem Cache). Der Klick löst keinen Rerun aus.
+    df ist ein DataFrame oder ein Callable ohne Argumente, das die Tabelle erst beim Klick zusammenstellt.
+
+        export_button("Tabelle als CSV", table_df, "weintypen.csv")
+    """
+    return st.download_button(
+        label,
+        data=lambda: export_bytes(df() if callable(df) else df, format=format, sep=sep, encoding=encoding),
+        file_name=file_name,
+        mime=FORMATE[format],
+        key=key,
+        on_click="ignore",
+        **kwargs,
+    )
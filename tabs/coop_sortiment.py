@@ -1,8 +1,12 @@
 # tabs/coop_sortiment.py
 
 import streamlit as st
+from gap_engine import frame_version
+from render_cache import lazy_expander
+from sortiment_cube import get_sortiment_cube
 # … bisherige Importe oben …
 from plot_utils import (
+    plot_sortiment_kreuzfilter,
     plot_weintypen_pie_and_table,
     plot_preisklassen_pie_and_table,
     plot_preisverteilung_nach_weintyp,
@@ -13,26 +17,41 @@ from plot_utils import (
     plot_spanien_regionen         # <--- NEU!
 )
 
-def show_coop_sortiment_tab(df):
+def show_coop_sortiment_tab(df, data_version=None):
     st.header("Coop-Sortimentsanalyse")
 
-    with st.expander("1. Verteilung der Weintypen", expanded=True):
-        plot_weintypen_pie_and_table(df, weintyp_col="Weintyp", titel="Verteilung der Weintypen im coop.ch-Sortiment")
-    with st.expander("2. Verteilung der Preisklassen"):
-        plot_preisklassen_pie_and_table(df, preis_col="Preis", bins=[0, 20, 50, 100, df["Preis"].max()],
-                                        labels=["0–20 CHF", "20–50 CHF", "50–100 CHF", "100+ CHF"],
-                                        titel="Verteilung der Preisklassen im coop.ch-Sortiment")
-    with st.expander("3. Preisverteilung nach Weintyp"):
-        plot_preisverteilung_nach_weintyp(df, preis_col="Preis", weintyp_col="Weintyp", bins=[0, 20, 50, 100, df["Preis"].max()],
-                                          labels=["0–20 CHF", "20–50 CHF", "50–100 CHF", "100+ CHF"],
-                                          titel="Preisverteilung nach Weintyp im coop.ch-Sortiment")
-    with st.expander("4. Top-10 Herkunftsländer"):
-        plot_top_herkunftslaender(df, region_col="Region", titel="Top-10 Herkunftsländer im coop.ch-Sortiment")
-    with st.expander("5. Regionen Frankreichs"):
-        plot_frankreich_regionen(df, region_col="Region", titel="Weinregionen Frankreichs im coop.ch-Sortiment")
-    with st.expander("6. Regionen Italiens"):
-        plot_italien_regionen(df, region_col="Region", titel="Weinregionen Italiens im coop.ch-Sortiment")
-    with st.expander("7. Regionen Schweiz"):
-        plot_schweiz_regionen(df, region_col="Region", titel="Weinregionen der Schweiz im coop.ch-Sortiment")
-    with st.expander("8. Regionen Spanien"):
-        plot_spanien_regionen(df, region_col="Region", titel="Weinregionen Spaniens im coop.ch-Sortiment")
\ No newline at end of file
+    # Kreuzfilter: Klicks in den Diagrammen filtern einen vorberechneten Zähl-Würfel statt der Rohdaten
+    if st.toggle("Kreuzfilter: Diagramme per Klick gegenseitig filtern", key="coop_kreuzfilter_modus"):
+        cube = get_sortiment_cube(df, "coop", frame_version(df, data_version), (0, 20, 50, 100, df["Preis"].max()),
+                                  ("0–20 CHF", "20–50 CHF", "50–100 CHF", "100+ CHF"))
+        plot_sortiment_kreuzfilter(cube, "coop")
+        return
+
+    with lazy_expander("1. Verteilung der Weintypen", key="coop_abschnitt_1", expanded=True) as offen:
+        if offen:
+            plot_weintypen_pie_and_table(df, weintyp_col="Weintyp", titel="Verteilung der Weintypen im coop.ch-Sortiment", data_version=data_version)
+    with lazy_expander("2. Verteilung der Preisklassen", key="coop_abschnitt_2") as offen:
+        if offen:
+            plot_preisklassen_pie_and_table(df, preis_col="Preis", bins=[0, 20, 50, 100, df["Preis"].max()],
+                                            labels=["0–20 CHF", "20–50 CHF", "50–100 CHF", "100+ CHF"],
+                                            titel="Verteilung der Preisklassen im coop.ch-Sortiment", data_version=data_version)
+    with lazy_expander("3. Preisverteilung nach Weintyp", key="coop_abschnitt_3") as offen:
+        if offen:
+            plot_preisverteilung_nach_weintyp(df, preis_col="Preis", weintyp_col="Weintyp", bins=[0, 20, 50, 100, df["Preis"].max()],
+                                              labels=["0–20 CHF", "20–50 CHF", "50–100 CHF", "100+ CHF"],
+                                              titel="Preisverteilung nach Weintyp im coop.ch-Sortiment", data_version=data_version)
+    with lazy_expander("4. Top-10 Herkunftsländer", key="coop_abschnitt_4") as offen:
+        if offen:
+            plot_top_herkunftslaender(df, region_col="Region", titel="Top-10 Herkunftsländer im coop.ch-Sortiment", data_version=data_version)
+    with lazy_expander("5. Regionen Frankreichs", key="coop_abschnitt_5") as offen:
+        if offen:
+            plot_frankreich_regionen(df, region_col="Region", titel="Weinregionen Frankreichs im coop.ch-Sortiment", data_version=data_version)
+    with lazy_expander("6. Regionen Italiens", key="coop_abschnitt_6") as offen:
+        if offen:
+            plot_italien_regionen(df, region_col="Region", titel="Weinregionen Italiens im coop.ch-Sortiment", data_version=data_version)
+    with lazy_expander("7. Regionen Schweiz", key="coop_abschnitt_7") as offen:
+        if offen:
+            plot_schweiz_regionen(df, region_col="Region", titel="Weinregionen der Schweiz im coop.ch-Sortiment", data_version=data_version)
+    with lazy_expander("8. Regionen Spanien", key="coop_abschnitt_8") as offen:
+        if offen:
+            plot_spanien_regionen(df, region_col="Region", titel="Weinregionen Spaniens im coop.ch-Sortiment", data_version=data_version)
\ No newline at end of file
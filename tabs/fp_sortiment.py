@@ -1,7 +1,11 @@
 # tabs/fp_sortiment.py
 
 import streamlit as st
+from gap_engine import frame_version
+from render_cache import lazy_expander
+from sortiment_cube import get_sortiment_cube
 from plot_utils import (
+    plot_sortiment_kreuzfilter,
     plot_weintypen_pie_and_table,
     plot_preisklassen_pie_and_table,
     plot_preisverteilung_nach_weintyp,
@@ -17,61 +21,84 @@ from plot_utils import (
     # plot_spanien_regionen_fp
 )
 
-def show_fp_sortiment_tab(df):
+def show_fp_sortiment_tab(df, data_version=None):
     st.header("Flaschenpost-Sortimentsanalyse")
 
-    with st.expander("1. Verteilung der Weintypen", expanded=True):
-        plot_weintypen_pie_and_table(
-            df, 
-            weintyp_col="Weintyp", 
-            titel="Verteilung der Weintypen im Flaschenpost-Sortiment"
-        )
+    # Kreuzfilter: Klicks in den Diagrammen filtern einen vorberechneten Zähl-Würfel statt der Rohdaten
+    if st.toggle("Kreuzfilter: Diagramme per Klick gegenseitig filtern", key="fp_kreuzfilter_modus"):
+        cube = get_sortiment_cube(df, "fp", frame_version(df, data_version), (0, 20, 50, 100, df["Preis"].max()),
+                                  ("0–20 CHF", "20–50 CHF", "50–100 CHF", "100+ CHF"))
+        plot_sortiment_kreuzfilter(cube, "fp")
+        return
 
-    with st.expander("2. Verteilung der Preisklassen"):
-        plot_preisklassen_pie_and_table(
-            df, 
-            preis_col="Preis", 
-            bins=[0, 20, 50, 100, df["Preis"].max()],
-            labels=["0–20 CHF", "20–50 CHF", "50–100 CHF", "100+ CHF"],
-            titel="Verteilung der Preisklassen im Flaschenpost-Sortiment"
-        )
+    with lazy_expander("1. Verteilung der Weintypen", key="fp_abschnitt_1", expanded=True) as offen:
+        if offen:
+            plot_weintypen_pie_and_table(
+                df, 
+                weintyp_col="Weintyp", 
+                titel="Verteilung der Weintypen im Flaschenpost-Sortiment",
+                data_version=data_version
+            )
 
-    with st.expander("3. Preisverteilung nach Weintyp"):
-        plot_preisverteilung_nach_weintyp(
-            df,
-            preis_col="Preis",
-            weintyp_col="Weintyp",
-            bins=[0, 20, 50, 100, df["Preis"].max()],
-            labels=["0–20 CHF", "20–50 CHF", "50–100 CHF", "100+ CHF"],
-            titel="Preisverteilung nach Weintyp im Flaschenpost-Sortiment"
-        )
+    with lazy_expander("2. Verteilung der Preisklassen", key="fp_abschnitt_2") as offen:
+        if offen:
+            plot_preisklassen_pie_and_table(
+                df, 
+                preis_col="Preis", 
+                bins=[0, 20, 50, 100, df["Preis"].max()],
+                labels=["0–20 CHF", "20–50 CHF", "50–100 CHF", "100+ CHF"],
+                titel="Verteilung der Preisklassen im Flaschenpost-Sortiment",
+                data_version=data_version
+            )
 
-    with st.expander("4. Top-10 Herkunftsländer"):
-        plot_top_herkunftslaender_fp(
-            df, 
-            herkunft_col="Herkunft", 
-            titel="Top-10 Herkunftsländer im Flaschenpost-Sortiment"
-        )
+    with lazy_expander("3. Preisverteilung nach Weintyp", key="fp_abschnitt_3") as offen:
+        if offen:
+            plot_preisverteilung_nach_weintyp(
+                df,
+                preis_col="Preis",
+                weintyp_col="Weintyp",
+                bins=[0, 20, 50, 100, df["Preis"].max()],
+                labels=["0–20 CHF", "20–50 CHF", "50–100 CHF", "100+ CHF"],
+                titel="Preisverteilung nach Weintyp im Flaschenpost-Sortiment",
+                data_version=data_version
+            )
 
-    with st.expander("6. Regionen Italiens"):
-        plot_italien_regionen_fp(
-            df, herkunft_col="Herkunft", titel="Weinregionen Italiens im Flaschenpost-Sortiment"
-        )
+    with lazy_expander("4. Top-10 Herkunftsländer", key="fp_abschnitt_4") as offen:
+        if offen:
+            plot_top_herkunftslaender_fp(
+                df, 
+                herkunft_col="Herkunft", 
+                titel="Top-10 Herkunftsländer im Flaschenpost-Sortiment",
+                data_version=data_version
+            )
 
-    with st.expander("5. Regionen Frankreichs"):
-        plot_frankreich_regionen_fp(
-            df, herkunft_col="Herkunft", titel="Weinregionen Frankreichs im Flaschenpost-Sortiment"
-        )
+    with lazy_expander("6. Regionen Italiens", key="fp_abschnitt_6") as offen:
+        if offen:
+            plot_italien_regionen_fp(
+                df, herkunft_col="Herkunft", titel="Weinregionen Italiens im Flaschenpost-Sortiment",
+                data_version=data_version
+            )
 
-    with st.expander("8. Regionen Spanien"):
-        plot_spanien_regionen_fp(
-            df, herkunft_col="Herkunft", titel="Weinregionen Spaniens im Flaschenpost-Sortiment"
-        )
+    with lazy_expander("5. Regionen Frankreichs", key="fp_abschnitt_5") as offen:
+        if offen:
+            plot_frankreich_regionen_fp(
+                df, herkunft_col="Herkunft", titel="Weinregionen Frankreichs im Flaschenpost-Sortiment",
+                data_version=data_version
+            )
 
-    with st.expander("7. Regionen Schweiz"):
-        plot_schweiz_regionen_fp(
-            df, herkunft_col="Herkunft", titel="Weinregionen der Schweiz im Flaschenpost-Sortiment"
-        )
+    with lazy_expander("8. Regionen Spanien", key="fp_abschnitt_8") as offen:
+        if offen:
+            plot_spanien_regionen_fp(
+                df, herkunft_col="Herkunft", titel="Weinregionen Spaniens im Flaschenpost-Sortiment",
+                data_version=data_version
+            )
+
+    with lazy_expander("7. Regionen Schweiz", key="fp_abschnitt_7") as offen:
+        if offen:
+            plot_schweiz_regionen_fp(
+                df, herkunft_col="Herkunft", titel="Weinregionen der Schweiz im Flaschenpost-Sortiment",
+                data_version=data_version
+            )
 
 
     # Jetzt hier analog, sobald spezialisierte Mapping/Regions-Funktionen für Flaschenpost bereitstehen:
@@ -12,150 +12,228 @@ from plot_utils import (
     plot_gaps_spanien_regionen_comparison,
     plot_gaps_produzenten_comparison, 
     plot_top_produzenten_in_gaps,
-    plot_coop_produzenten_nicht_in_fp
+    plot_coop_produzenten_nicht_in_fp,
+    plot_reverse_gap_analysis,
+    plot_gap_trend,
+    plot_produzenten_rollup
 )
 import pandas as pd
-import re 
-import unicodedata 
+from gap_engine import HAENDLER_COOP, HAENDLER_FP, frame_version, get_gap_index, get_retailer_coverage
+from gap_comparison import get_gap_comparison, get_reverse_gap_comparison, get_produzenten_rollup
+from gap_opportunity import get_opportunity_scores
+from fp_alternatives import get_fp_alternatives
+from gap_browser import get_gap_browser
+from gap_snapshots import get_gap_snapshots, snapshot_dir_version, snapshot_from_gap_index, SNAPSHOT_DIR
+from render_cache import lazy_expander
 
-def show_gap_analysis_tab(df_coop_original: pd.DataFrame, df_matching_enriched: pd.DataFrame, df_fp_weine: pd.DataFrame):
+def show_gap_analysis_tab(df_coop_original: pd.DataFrame, df_matching_enriched: pd.DataFrame, df_fp_weine: pd.DataFrame,
+                          produzenten_index=None, data_versions: dict = None, weitere_haendler: dict = None):
     st.header("GAP-Analyse: Coop-Sortiment vs. Flaschenpost")
 
-    with st.expander("Übersicht und Detailtabelle der Sortimentslücken (Coop-Weine nicht bei FP)", expanded=True):
-        st.markdown("""
-        Diese Tabelle identifiziert Weine aus dem Coop-Sortiment, für die kein passendes Gegenstück 
-        im Flaschenpost-Sortiment gefunden wurde (basierend auf dem `Match_Status` 'Kein Match' 
-        in der Datei `manuelle_matches_final2.xlsx`).
-        """)
-        columns_to_display_in_gap_table = ["Name", "Produzent", "Preis", "Weintyp", "Region", "URL"]
-        status_value_indicating_no_match = "Kein Match"
-        df_gaps_result = pd.DataFrame() 
+    # --- Gap-Index einmal pro (Coop-Version, Matching-Version inkl. Entscheidungen, Status-Regel) ---
+    # Tabelle, Expander 1-11 und Fazit nutzen dieselbe Gap-Maske, Filter-Reruns rechnen nichts neu.
+    data_versions = data_versions or {}
+    matching_version = (data_versions.get("matching"), data_versions.get("decisions")) if data_versions.get("matching") else None
+    status_value_indicating_no_match = "Kein Match"
+    status_rule = (status_value_indicating_no_match, None, True)
+    coop_version = frame_version(df_coop_original, data_versions.get("coop"))
+    matching_version_key = frame_version(df_matching_enriched, matching_version)
+    fp_version = frame_version(df_fp_weine, data_versions.get("fp"))
+    weitere_haendler = weitere_haendler or {}
+    weitere_versionen = tuple((name, frame_version(df, data_versions.get("weitere_haendler", {}).get(name)))
+                              for name, df in weitere_haendler.items())
+
+    # --- Händler-Abdeckung als Bitset: jede Kombination (Basis, fehlt bei, vorhanden bei) ist eine Maske darüber ---
+    coverage_version = (coop_version, fp_version, matching_version_key, status_rule, weitere_versionen)
+    coverage = get_retailer_coverage(df_coop_original, df_fp_weine, df_matching_enriched,
+                                     coop_version, fp_version, matching_version_key, status_rule,
+                                     weitere_haendler, weitere_versionen)
+    col_basis, col_fehlt, col_vorhanden = st.columns(3)
+    basis = col_basis.selectbox("Sortiment (Basis):", coverage.haendler, key="gap_basis_select",
+                                help="Coop → FP: Coop-Weine, die FP nicht führt. Flaschenpost → Coop: FP-exklusive Weine.")
+    andere = [h for h in coverage.haendler if h != basis]
+    fehlt_bei = col_fehlt.multiselect("Fehlt bei:", andere, default=andere[:1], key=f"gap_fehlt_bei_{basis}")
+    optionen_vorhanden = [h for h in andere if h not in fehlt_bei]
+    vorhanden_bei = col_vorhanden.multiselect("Und geführt bei:", optionen_vorhanden, key=f"gap_vorhanden_bei_{basis}",
+                                              disabled=not optionen_vorhanden)
+    if not fehlt_bei:
+        st.info("Bitte mindestens einen Händler unter 'Fehlt bei' wählen.")
+        return
+    # Cache-Schlüssel der abgeleiteten Ergebnisse: Status-Regel plus Händler-Kombination
+    gap_regel = (status_rule, basis, tuple(fehlt_bei), tuple(vorhanden_bei))
+    # Gap-Index je Kombination gecacht: Filter-Reruns holen die Maske, statt sie aus dem Bitset neu zu bilden
+    gap_index = get_gap_index(coverage, df_matching_enriched, coverage_version, gap_regel)
+
+    if basis == HAENDLER_FP:
+        # Umgekehrte Richtung: Maske über den FP-Katalog, Aggregate gecacht pro (FP-, Matching-Version, Regel)
+        reverse_index = gap_index
+        reverse_vergleich = get_reverse_gap_comparison(df_fp_weine, reverse_index, fp_version, matching_version_key, gap_regel)
         try:
-            df_gaps_result = plot_gap_analysis_table(
-                df_coop_full=df_coop_original, df_matching=df_matching_enriched,
-                coop_id_col_in_coop_df="URL", coop_id_col_in_matching_df="Coop_URL",
-                match_status_col_in_matching_df="Match_Status", non_match_status_value=status_value_indicating_no_match,
-                gap_display_columns=columns_to_display_in_gap_table
-            )
-        except Exception as e: 
-            st.error(f"Fehler bei Erstellung der GAP-Analyse Tabelle: {e}")
-            # import traceback # Für Details
-            # st.error(traceback.format_exc())
-
-
-    # --- Analysen der Gaps (Expander 1-11) ---
-    if df_gaps_result is not None and not df_gaps_result.empty:
-        with st.expander("1. Vergleich: Weintyp-Verteilung (Lücken vs. Coop-Gesamt)", expanded=True):
-            try: plot_gaps_weintyp_comparison(df_gaps=df_gaps_result, df_coop_original=df_coop_original, weintyp_col="Weintyp")
-            except Exception as e: st.error(f"Fehler bei Weintyp-Vergleichsanalyse der Gaps: {e}")
-        
-        with st.expander("2. Vergleich: Preisklassen-Verteilung (Lücken vs. Coop-Gesamt)", expanded=False):
-            try:
-                max_preis_gaps = df_gaps_result["Preis"].max() if not df_gaps_result.empty and "Preis" in df_gaps_result else 200
-                max_preis_coop = df_coop_original["Preis"].max() if not df_coop_original.empty and "Preis" in df_coop_original else 200
-                overall_max_preis = max(max_preis_gaps, max_preis_coop, 101.0)
-                bins_definition = [0, 20, 50, 100, overall_max_preis]
-                labels_definition = ["0–20 CHF", "20–50 CHF", "50–100 CHF"]
-                if overall_max_preis <= 100: 
-                    labels_definition = labels_definition[:3] # Nur bis 50-100 CHF
-                    bins_definition = bins_definition[:4]     # Entsprechend die Bins kürzen
-                else: 
-                    labels_definition.append(f"100–{int(round(overall_max_preis))} CHF")
-                plot_gaps_preisklassen_comparison(df_gaps=df_gaps_result, df_coop_original=df_coop_original, preis_col="Preis", bins=bins_definition, labels=labels_definition)
-            except Exception as e: st.error(f"Fehler bei Preisklassen-Vergleichsanalyse der Gaps: {e}")
-
-        with st.expander("3. Vergleich: Preisverteilung nach Weintyp (Lücken vs. Coop-Gesamt)", expanded=False):
+            plot_reverse_gap_analysis(df_fp_weine, reverse_index, reverse_vergleich)
+        except Exception as e:
+            st.error(f"Fehler bei der Analyse der FP-exklusiven Weine: {e}")
+        return
+    if basis != HAENDLER_COOP:
+        st.info(f"Für '{basis}' als Basis gibt es noch keine Detailanalysen: {coverage.anzahl([basis, *vorhanden_bei], fehlt_bei)} Weine.")
+        return
+
+    # Texte nennen die gewählten Händler statt fest "Flaschenpost"
+    fehlt_bei_text = " und ".join(fehlt_bei)
+    luecken_text = f"Coop-Weine nicht bei {fehlt_bei_text}" + (f", aber bei {' und '.join(vorhanden_bei)}" if vorhanden_bei else "")
+
+    # Abschnitte werden nur gerechnet, solange sie geöffnet sind (lazy_expander); Scores, FP-Alternativen und
+    # Vergleich holen die Abschnitte selbst aus den gecachten get_*-Funktionen.
+    with lazy_expander(f"Übersicht und Detailtabelle der Sortimentslücken ({luecken_text})", key="gap_abschnitt_tabelle",
+                       expanded=True) as offen:
+        if offen:
+            st.markdown(f"""
+            Diese Tabelle identifiziert Weine aus dem Coop-Sortiment, für die bei {fehlt_bei_text} kein passendes Gegenstück 
+            gefunden wurde (Flaschenpost: `Match_Status` 'Kein Match' in der Datei `manuelle_matches_final2.xlsx`;
+            weitere Händler: Coop_URL-Zuordnung in ihrer Datei unter `data/weitere_haendler/`). Ein Match zählt nur bei gleichem Jahrgang und
+            gleicher Flaschengrösse – Magnums und halbe Flaschen sind eigene SKUs.
+            Die Ansicht "Top-N nach Opportunity-Score" sortiert die (gefilterten) Lücken nach ihrem Ergänzungspotenzial für Flaschenpost.
+            Die Spalte "FP-Alternativen" nennt je Lücke die ähnlichsten Weine, die Flaschenpost bereits führt.
+            """)
+            columns_to_display_in_gap_table = ["Name", "Produzent", "Preis", "Weintyp", "Region", "Jahrgang_Key", "Flasche_cl", "URL"]
             try:
-                max_preis_gaps = df_gaps_result["Preis"].max() if not df_gaps_result.empty and "Preis" in df_gaps_result else 200
-                max_preis_coop = df_coop_original["Preis"].max() if not df_coop_original.empty and "Preis" in df_coop_original else 200
-                overall_max_preis = max(max_preis_gaps, max_preis_coop, 101.0)
-                bins_definition = [0, 20, 50, 100, overall_max_preis]
-                labels_definition = ["0–20 CHF", "20–50 CHF", "50–100 CHF"]
-                if overall_max_preis <= 100: 
-                    if len(labels_definition) > 3 : labels_definition = labels_definition[:3]
-                    if len(bins_definition) > 4: bins_definition = bins_definition[:4]
-                else: 
-                    labels_definition.append(f"100–{int(round(overall_max_preis))} CHF")
-                plot_gaps_preis_nach_weintyp_comparison(df_gaps=df_gaps_result, df_coop_original=df_coop_original, preis_col="Preis", weintyp_col="Weintyp", bins=bins_definition, labels=labels_definition)
-            except Exception as e: st.error(f"Fehler bei Preisverteilung nach Weintyp (Gaps Vergleich): {e}")
-
-        with st.expander("4. Vergleich: Top Herkunftsländer (Lücken vs. Coop-Gesamt)", expanded=False):
-            try: plot_gaps_herkunftslaender_comparison(df_gaps=df_gaps_result, df_coop_original=df_coop_original, region_col_coop="Region", top_n=10)
-            except Exception as e: st.error(f"Fehler bei Herkunftsländer-Vergleichsanalyse der Gaps: {e}")
-
-        with st.expander("5. Vergleich: Regionen Frankreichs (Lücken vs. Coop-Gesamt)", expanded=False):
-            try: plot_gaps_frankreich_regionen_comparison(df_gaps=df_gaps_result, df_coop_original=df_coop_original, region_col="Region")
-            except Exception as e: st.error(f"Fehler bei Frankreich-Regionen-Vergleichsanalyse der Gaps: {e}")
-
-        with st.expander("6. Vergleich: Regionen Italiens (Lücken vs. Coop-Gesamt)", expanded=False):
-            try: plot_gaps_italien_regionen_comparison(df_gaps=df_gaps_result, df_coop_original=df_coop_original, region_col="Region")
-            except Exception as e: st.error(f"Fehler bei Italien-Regionen-Vergleichsanalyse der Gaps: {e}")
-
-        with st.expander("7. Vergleich: Regionen der Schweiz (Lücken vs. Coop-Gesamt)", expanded=False):
-            try: plot_gaps_schweiz_regionen_comparison(df_gaps=df_gaps_result, df_coop_original=df_coop_original, region_col="Region")
-            except Exception as e: st.error(f"Fehler bei Schweiz-Regionen-Vergleichsanalyse der Gaps: {e}")
-
-        with st.expander("8. Vergleich: Regionen Spaniens (Lücken vs. Coop-Gesamt)", expanded=False):
-            try: plot_gaps_spanien_regionen_comparison(df_gaps=df_gaps_result, df_coop_original=df_coop_original, region_col="Region")
-            except Exception as e: st.error(f"Fehler bei Spanien-Regionen-Vergleichsanalyse der Gaps: {e}")
+                plot_gap_analysis_table(
+                    df_coop_full=df_coop_original, df_matching=df_matching_enriched,
+                    coop_id_col_in_coop_df="URL", coop_id_col_in_matching_df="Coop_URL",
+                    match_status_col_in_matching_df="Match_Status", non_match_status_value=status_value_indicating_no_match,
+                    gap_display_columns=columns_to_display_in_gap_table, gap_index=gap_index, fehlt_bei=fehlt_bei_text,
+                    opportunity=get_opportunity_scores(df_coop_original, df_fp_weine, gap_index, produzenten_index,
+                                                       coop_version, matching_version_key, fp_version, gap_regel),
+                    fp_alternativen=get_fp_alternatives(df_coop_original, df_fp_weine, gap_index,
+                                                        coop_version, matching_version_key, fp_version, gap_regel),
+                    browser=get_gap_browser(df_coop_original, gap_index, coop_version, matching_version_key, gap_regel)
+                )
+            except Exception as e: 
+                st.error(f"Fehler bei Erstellung der GAP-Analyse Tabelle: {e}")
+                # import traceback # Für Details
+                # st.error(traceback.format_exc())
+
+
+    # --- Analysen der Gaps (Expander 1-13), nur wenn der Gap-Index Lücken enthält ---
+    if gap_index.n_gaps > 0:
+        # Vergleich Lücken vs. Coop-Gesamt für alle Dimensionen in einem Durchlauf (gecacht wie der Gap-Index);
+        # Expander 1-9 rendern nur Ausschnitte daraus und rufen ihn erst beim Öffnen ab.
+        def vergleich():
+            return get_gap_comparison(df_coop_original, df_matching_enriched, gap_index,
+                                      coop_version, matching_version_key, gap_regel)
+
+        with lazy_expander("1. Vergleich: Weintyp-Verteilung (Lücken vs. Coop-Gesamt)", key="gap_abschnitt_1", expanded=True) as offen:
+            if offen:
+                try: plot_gaps_weintyp_comparison(vergleich())
+                except Exception as e: st.error(f"Fehler bei Weintyp-Vergleichsanalyse der Gaps: {e}")
+        
+        with lazy_expander("2. Vergleich: Preisklassen-Verteilung (Lücken vs. Coop-Gesamt)", key="gap_abschnitt_2") as offen:
+            if offen:
+                try: plot_gaps_preisklassen_comparison(vergleich())
+                except Exception as e: st.error(f"Fehler bei Preisklassen-Vergleichsanalyse der Gaps: {e}")
+
+        with lazy_expander("3. Vergleich: Preisverteilung nach Weintyp (Lücken vs. Coop-Gesamt)", key="gap_abschnitt_3") as offen:
+            if offen:
+                try: plot_gaps_preis_nach_weintyp_comparison(vergleich())
+                except Exception as e: st.error(f"Fehler bei Preisverteilung nach Weintyp (Gaps Vergleich): {e}")
+
+        with lazy_expander("4. Vergleich: Top Herkunftsländer (Lücken vs. Coop-Gesamt)", key="gap_abschnitt_4") as offen:
+            if offen:
+                try: plot_gaps_herkunftslaender_comparison(vergleich(), region_col_coop="Region", top_n=10)
+                except Exception as e: st.error(f"Fehler bei Herkunftsländer-Vergleichsanalyse der Gaps: {e}")
+
+        with lazy_expander("5. Vergleich: Regionen Frankreichs (Lücken vs. Coop-Gesamt)", key="gap_abschnitt_5") as offen:
+            if offen:
+                try: plot_gaps_frankreich_regionen_comparison(vergleich(), region_col="Region")
+                except Exception as e: st.error(f"Fehler bei Frankreich-Regionen-Vergleichsanalyse der Gaps: {e}")
+
+        with lazy_expander("6. Vergleich: Regionen Italiens (Lücken vs. Coop-Gesamt)", key="gap_abschnitt_6") as offen:
+            if offen:
+                try: plot_gaps_italien_regionen_comparison(vergleich(), region_col="Region")
+                except Exception as e: st.error(f"Fehler bei Italien-Regionen-Vergleichsanalyse der Gaps: {e}")
+
+        with lazy_expander("7. Vergleich: Regionen der Schweiz (Lücken vs. Coop-Gesamt)", key="gap_abschnitt_7") as offen:
+            if offen:
+                try: plot_gaps_schweiz_regionen_comparison(vergleich(), region_col="Region")
+                except Exception as e: st.error(f"Fehler bei Schweiz-Regionen-Vergleichsanalyse der Gaps: {e}")
+
+        with lazy_expander("8. Vergleich: Regionen Spaniens (Lücken vs. Coop-Gesamt)", key="gap_abschnitt_8") as offen:
+            if offen:
+                try: plot_gaps_spanien_regionen_comparison(vergleich(), region_col="Region")
+                except Exception as e: st.error(f"Fehler bei Spanien-Regionen-Vergleichsanalyse der Gaps: {e}")
         
         # Expander 9 (relative Produzentenanalyse)
-        with st.expander("9. Vergleich: Top Coop-Produzenten (Lücken vs. Coop-Gesamt)", expanded=False):
-            try:
-                plot_gaps_produzenten_comparison(
-                    df_matching_all_coop=df_matching_enriched, coop_produzent_col="Coop_Produzent",
-                    match_status_col="Match_Status", non_match_status_value="Kein Match", top_n=15) # top_n=30 war in plot_utils, hier 15 für Konsistenz
-            except Exception as e: st.error(f"Fehler bei relativer Produzenten-Analyse der Gaps: {e}")
+        with lazy_expander("9. Vergleich: Top Coop-Produzenten (Lücken vs. Coop-Gesamt)", key="gap_abschnitt_9") as offen:
+            if offen:
+                try:
+                    plot_gaps_produzenten_comparison(vergleich(), non_match_status_value="Kein Match", top_n=15)
+                except Exception as e: st.error(f"Fehler bei relativer Produzenten-Analyse der Gaps: {e}")
 
         # Expander 10 (absolute Produzentenanalyse der Gaps)
-        with st.expander("10. Top Coop-Produzenten in den Sortimentslücken (absolute Anzahl)", expanded=False):
-            try:
-                plot_top_produzenten_in_gaps(
-                    df_matching_all_coop=df_matching_enriched, coop_produzent_col="Coop_Produzent",
-                    match_status_col="Match_Status", non_match_status_value="Kein Match", top_n=30)
-            except Exception as e: st.error(f"Fehler bei Top-Produzenten-Analyse der Gaps (absolut): {e}")
+        with lazy_expander(f"10. Top Coop-Produzenten in den Sortimentslücken (absolute Anzahl, nicht bei {fehlt_bei_text})",
+                           key="gap_abschnitt_10") as offen:
+            if offen:
+                try:
+                    plot_top_produzenten_in_gaps(
+                        df_matching_all_coop=df_matching_enriched, coop_produzent_col="Coop_Produzent",
+                        match_status_col="Match_Status", non_match_status_value="Kein Match", top_n=30,
+                        gap_mask=gap_index.matching_gap_mask, fehlt_bei=fehlt_bei_text)
+                except Exception as e: st.error(f"Fehler bei Top-Produzenten-Analyse der Gaps (absolut): {e}")
         
-        with st.expander("11. Coop-Produzenten von Lücken, die NICHT bei Flaschenpost gelistet sind", expanded=False):
-            try:
-                plot_coop_produzenten_nicht_in_fp(
-                    df_matching_all_coop=df_matching_enriched, df_fp_original=df_fp_weine,
-                    coop_produzent_col_matching="Coop_Produzent", fp_produzent_col_original="Produzent",
-                    match_status_col="Match_Status", non_match_status_value="Kein Match", top_n=30)
-            except Exception as e: st.error(f"Fehler bei Analyse 'Coop-Produzenten nicht bei FP': {e}")
+        # Der Produzenten-Abgleich läuft gegen den FP-Produzentenindex, daher nur wenn die Lücken FP betreffen
+        with lazy_expander(f"11. Coop-Produzenten von Lücken ({luecken_text}), die NICHT bei Flaschenpost gelistet sind",
+                           key="gap_abschnitt_11") as offen:
+            if offen and HAENDLER_FP not in fehlt_bei:
+                st.info(f"Den Produzenten-Abgleich gibt es nur gegen Flaschenpost; für Lücken bei {fehlt_bei_text} bitte 'Flaschenpost' unter 'Fehlt bei' mitwählen.")
+            elif offen:
+                try:
+                    plot_coop_produzenten_nicht_in_fp(
+                        df_matching_all_coop=df_matching_enriched, df_fp_original=df_fp_weine,
+                        coop_produzent_col_matching="Coop_Produzent", fp_produzent_col_original="Produzent",
+                        match_status_col="Match_Status", non_match_status_value="Kein Match", top_n=30,
+                        produzenten_index=produzenten_index, gap_mask=gap_index.matching_gap_mask)
+                except Exception as e: st.error(f"Fehler bei Analyse 'Coop-Produzenten nicht bei FP': {e}")
+
+        with lazy_expander("12. Abdeckung je Coop-Produzent: SKUs, Matches, Lücken (alle Produzenten)", key="gap_abschnitt_12") as offen:
+            if offen:
+                try:
+                    rollup = get_produzenten_rollup(df_matching_enriched, gap_index, produzenten_index, df_fp_weine,
+                                                    matching_version_key, fp_version, gap_regel)
+                    plot_produzenten_rollup(rollup)
+                except Exception as e: st.error(f"Fehler beim Produzenten-Rollup: {e}")
+
+        # Snapshots speichern die Standard-Regel (Coop-Weine ohne Match bei FP), daher nur für diese Kombination
+        if fehlt_bei == [HAENDLER_FP] and not vorhanden_bei:
+            with lazy_expander("13. Entwicklung der Lücken: neue, geschlossene und bestehende Lücken (Snapshots)",
+                               key="gap_abschnitt_13") as offen:
+                if offen:
+                    try:
+                        aktuell = snapshot_from_gap_index(df_coop_original, gap_index, data_versions)
+                        snapshots = get_gap_snapshots(SNAPSHOT_DIR, snapshot_dir_version(SNAPSHOT_DIR))
+                        plot_gap_trend(snapshots, aktuell, df_coop_original)
+                    except Exception as e: st.error(f"Fehler bei der Entwicklung der Lücken (Snapshots): {e}")
     
-    # Dieser Block wird ausgeführt, wenn es KEINE Gaps gibt ODER wenn df_gaps_result None ist (z.B. Fehler oben)
-    # Der Syntaxfehler war wahrscheinlich hier, weil der elif-Block nicht korrekt auf den if-Block folgte.
-    elif df_gaps_result is not None and df_gaps_result.empty:
+    else:
         st.info("Keine Sortimentslücken identifiziert, daher können keine Detailanalysen der Lücken angezeigt werden.")
-    # Kein expliziter else-Block für df_gaps_result is None nötig, da Fehler schon oben behandelt werden sollten.
 
     # --- FAZIT / ZUSAMMENFASSUNG ---
-    # Dieser Block sollte NACH der if/elif Struktur für df_gaps_result stehen.
+    # Dieser Block steht NACH der if/else-Struktur der Detailanalysen.
     st.markdown("---")
     st.header("Zusammenfassende Einordnung der GAP-Analyse")
 
-    # Stelle sicher, dass df_gaps_result hier definitiv initialisiert ist (sollte es sein)
-    # aber eine zusätzliche Prüfung schadet nicht, um Fehler im Fazittext zu vermeiden.
-    if 'df_gaps_result' in locals() and df_gaps_result is not None:
-        num_gaps_value = len(df_gaps_result)
-    else:
-        # Fallback, falls df_gaps_result aus irgendeinem Grund nicht definiert oder None ist
-        # Dies könnte passieren, wenn plot_gap_analysis_table frühzeitig abbricht und kein DF zurückgibt
-        # (obwohl es das jetzt tun sollte).
-        st.warning("Basisdaten für die Anzahl der Lücken konnten nicht ermittelt werden für das Fazit.")
-        num_gaps_value = "[Anzahl nicht verfügbar]"
+    # Anzahl direkt aus dem Gap-Index (unabhängig von den Tabellenfiltern)
+    num_gaps_value = gap_index.n_gaps
 
 
     fazit_text = f"""
     Diese umfassende GAP-Analyse hat die Weine beleuchtet, die im Coop-Online-Sortiment geführt werden, 
-    jedoch aktuell kein direktes Äquivalent im Flaschenpost-Sortiment haben (basierend auf dem aktuellen Matching).
+    jedoch aktuell kein direktes Äquivalent bei {fehlt_bei_text} haben (basierend auf dem aktuellen Matching).
     Insgesamt wurden **{num_gaps_value} solcher Sortimentslücken** identifiziert.
 
     **Kernaussagen aus den Strukturanalysen:**
     Die Vergleiche der Lücken mit dem Coop-Gesamtsortiment (nach Weintyp, Preisklasse, Herkunft, etc.) zeigen mehrheitlich,
     dass die *Struktur* dieser Lücken der allgemeinen Zusammensetzung des Coop-Sortiments ähnelt. 
     Dies deutet darauf hin, dass die Lücken sich breit über verschiedene Kategorien verteilen, 
-    anstatt dass Flaschenpost ganze Hauptsegmente, die Coop stark besetzt, systematisch fehlen. 
+    anstatt dass {fehlt_bei_text} ganze Hauptsegmente, die Coop stark besetzt, systematisch fehlen. 
     Starke prozentuale Abweichungen in der Struktur der Lücken waren selten, was auf eine granulare Natur vieler dieser Lücken hindeutet.
 
     **Strategischer Nutzen für Flaschenpost:**
@@ -164,13 +242,14 @@ def show_gap_analysis_tab(df_coop_original: pd.DataFrame, df_matching_enriched:
     1.  **Die Detailtabelle der {num_gaps_value} Lücken:**
         *   Diese Tabelle ist das zentrale Werkzeug, um gezielt nach **spezifischen Weinen, Marken oder Attributen** zu suchen, die für Flaschenpost strategisch relevant sein könnten. 
         *   Nutzen Sie die Filterfunktionen, um beispielsweise Lücken in hochpreisigen Segmenten, Nischenregionen oder von bestimmten Produzenten zu identifizieren. Hier könnten sich gezielte Ergänzungspotenziale für das Flaschenpost-Sortiment verbergen.
+        *   Die Top-N-Ansicht nach Opportunity-Score nimmt die erste Sichtung ab: Sie reiht die Lücken danach, ob Produzent, Herkunftsland und Preisband bei Flaschenpost fehlen bzw. schwach besetzt sind.
 
     2.  **Potenzielle neue Produzentenbeziehungen:**
         *   Die Analyse der "Coop-Produzenten von Lücken, die NICHT bei Flaschenpost gelistet sind" (siehe entsprechender Analysebereich oben) liefert konkrete Hinweise auf Marken, die das Flaschenpost-Angebot möglicherweise einzigartig ergänzen könnten und zu denen eventuell noch keine Lieferantenbeziehung besteht.
 
     **Wichtiger Kontext – Unterschiedliche Sortimentsgrößen:**
     Es ist entscheidend zu berücksichtigen, dass Flaschenpost mit über 24.000 SKUs ein Vielfaches des Coop-Sortiments (ca. 3.500 SKUs) anbietet. 
-    Diese GAP-Analyse fokussiert darauf, *welche spezifischen Akzente Coop setzt*, die bei Flaschenpost aktuell fehlen. 
+    Diese GAP-Analyse fokussiert darauf, *welche spezifischen Akzente Coop setzt*, die bei {fehlt_bei_text} aktuell fehlen. 
     Die identifizierten Lücken sind somit primär als **Impulsgeber für gezielte strategische Überlegungen** zu verstehen und nicht als Indikator für eine generelle Unterversorgung.
 
     **Empfohlene nächste Schritte für den Nutzer:**
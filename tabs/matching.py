@@ -1,15 +1,17 @@
 # tabs/matching.py
 import streamlit as st
 import pandas as pd # Wichtig für pd.to_numeric und pd.NA
+from render_cache import lazy_expander
 from plot_utils import (
     plot_matching_overview_gemini,
     plot_percent_price_comparison_gemini1,
     plot_price_outlier_table_enhanced,
     plot_matched_performance_analysis,
-    plot_sweet_spot_analysis
+    plot_sweet_spot_analysis,
+    plot_match_review_queue
 )
 
-def show_matching_tab(df_input): # df_input ist dein angereichertes matching_df
+def show_matching_tab(df_input, decision_store=None): # df_input ist dein angereichertes matching_df
     st.header("Matching-/Preisvergleich Coop ⇆ Flaschenpost")
 
     # --- Zentrale Spaltenerstellung / -umbenennung ---
@@ -62,43 +64,53 @@ def show_matching_tab(df_input): # df_input ist dein angereichertes matching_df
     # Ab hier verwenden alle Plot-Funktionen das modifizierte `df`
     # mit den Spalten "Diff_CHF", "Diff_%", "Score"
 
-    with st.expander("1. Matching-Score & Status-Überblick", expanded=True):
-        plot_matching_overview_gemini(df) # Übergib das modifizierte df
+    with lazy_expander("1. Matching-Score & Status-Überblick", key="matching_abschnitt_1", expanded=True) as offen:
+        if offen:
+            plot_matching_overview_gemini(df) # Übergib das modifizierte df
 
-    with st.expander("2. Prozentuale Preisdifferenz – Ausreisser, Verteilung, Insights"):
-        # Diese Funktion muss angepasst werden, um "Diff_%" und "Score" zu verwenden
-        plot_percent_price_comparison_gemini1(df) 
+    with lazy_expander("2. Prozentuale Preisdifferenz – Ausreisser, Verteilung, Insights", key="matching_abschnitt_2") as offen:
+        if offen:
+            # Diese Funktion muss angepasst werden, um "Diff_%" und "Score" zu verwenden
+            plot_percent_price_comparison_gemini1(df) 
 
-    with st.expander("3. Outlier-Tabelle / Sortierbare Preisdifferenzen"):
-        plot_price_outlier_table_enhanced(
-            df=df, # Übergib das modifizierte df
-            fuzzy_col_internal="Fuzzy_Score", # Interner Name bleibt, aber "Score" wird von der Funktion verwendet
-            # Die Parameter für Preisdifferenz- und Score-Spalten in plot_price_outlier_table_enhanced
-            # müssen jetzt auf "Diff_CHF", "Diff_%", "Score" angepasst werden, falls sie dort anders heißen.
-            # Oder, wenn die Funktion die Spalten selbst erstellt, kann diese Logik dort bleiben.
-            # Der Einfachheit halber gehen wir davon aus, dass plot_price_outlier_table_enhanced
-            # jetzt die Spalten "Diff_CHF", "Diff_%" und "Score" aus dem übergebenen df erwartet.
-            default_extra_columns=["Coop_Produzent", "FP_Produzent"]
-        )
+    with lazy_expander("3. Outlier-Tabelle / Sortierbare Preisdifferenzen", key="matching_abschnitt_3") as offen:
+        if offen:
+            plot_price_outlier_table_enhanced(
+                df=df, # Übergib das modifizierte df
+                fuzzy_col_internal="Fuzzy_Score", # Interner Name bleibt, aber "Score" wird von der Funktion verwendet
+                # Die Parameter für Preisdifferenz- und Score-Spalten in plot_price_outlier_table_enhanced
+                # müssen jetzt auf "Diff_CHF", "Diff_%", "Score" angepasst werden, falls sie dort anders heißen.
+                # Oder, wenn die Funktion die Spalten selbst erstellt, kann diese Logik dort bleiben.
+                # Der Einfachheit halber gehen wir davon aus, dass plot_price_outlier_table_enhanced
+                # jetzt die Spalten "Diff_CHF", "Diff_%" und "Score" aus dem übergebenen df erwartet.
+                default_extra_columns=["Coop_Produzent", "FP_Produzent"]
+            )
 
-    with st.expander("4. Performance-Analyse gematchter Weine (Umsatz & Lieferanten)"):
-        plot_matched_performance_analysis(
-            df_enriched_matches=df, # Übergib das modifizierte df
-            nps_col="NPS_FP",
-            lieferant_col="FP_Lieferant",
-            fp_name_col="FP_Name",
-            coop_name_col="Coop_Name",
-            preis_diff_pct_col="Diff_%" # Erwartet jetzt "Diff_%"
-        )
+    with lazy_expander("4. Performance-Analyse gematchter Weine (Umsatz & Lieferanten)", key="matching_abschnitt_4") as offen:
+        if offen:
+            plot_matched_performance_analysis(
+                df_enriched_matches=df, # Übergib das modifizierte df
+                nps_col="NPS_FP",
+                lieferant_col="FP_Lieferant",
+                fp_name_col="FP_Name",
+                coop_name_col="Coop_Name",
+                preis_diff_pct_col="Diff_%" # Erwartet jetzt "Diff_%"
+            )
     
-    with st.expander("5. Sweet Spot & Pricing Opportunity Analyse"):
-        plot_sweet_spot_analysis(
-            df_enriched_matches=df, # Übergib das modifizierte df
-            nps_col="NPS_FP",
-            preis_diff_pct_col="Diff_%", # Erwartet jetzt "Diff_%"
-            fp_name_col="FP_Name",
-            coop_name_col="Coop_Name",
-            fp_preis_col="FP_Preis",
-            coop_preis_col="Coop_Preis",
-            score_col="Score" # Erwartet jetzt "Score"
-        )
\ No newline at end of file
+    with lazy_expander("5. Sweet Spot & Pricing Opportunity Analyse", key="matching_abschnitt_5") as offen:
+        if offen:
+            plot_sweet_spot_analysis(
+                df_enriched_matches=df, # Übergib das modifizierte df
+                nps_col="NPS_FP",
+                preis_diff_pct_col="Diff_%", # Erwartet jetzt "Diff_%"
+                fp_name_col="FP_Name",
+                coop_name_col="Coop_Name",
+                fp_preis_col="FP_Preis",
+                coop_preis_col="Coop_Preis",
+                score_col="Score" # Erwartet jetzt "Score"
+            )
+
+    if decision_store is not None:
+        with lazy_expander("6. Review-Queue: Grenzfälle bestätigen/ablehnen", key="matching_abschnitt_6") as offen:
+            if offen:
+                plot_match_review_queue(df, decision_store, score_col="Fuzzy_Score", score_min=40, score_max=60)
\ No newline at end of file
@@ -0,0 +1,6 @@
+# tests/conftest.py
+import os
+import sys
+
+# Module liegen flach im Projektverzeichnis (wie beim Start mit `streamlit run app.py`)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
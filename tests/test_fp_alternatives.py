@@ -0,0 +1,89 @@
+# tests/test_fp_alternatives.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from fp_alternatives import DISTANZ_GEWICHTE, FPAlternativen, compute_fp_alternatives
+
+
+@pytest.fixture
+def df_fp():
+    return pd.DataFrame({
+        "Sku": ["zwilling", "anderer_produzent", "weisswein", "magnum", "teuer", "frankreich"],
+        "Name": ["Barolo", "Barolo Riserva", "Gavi", "Barolo Magnum", "Barolo Cannubi", "Bordeaux"],
+        "Produzent": ["Gaja", "Conterno", "Gaja", "Gaja", "Conterno", "Château X"],
+        "Preis": [50.0, 55.0, 50.0, 50.0, 180.0, 50.0],
+        "Weintyp": ["Rotwein", "Rotwein", "Weisswein", "Rotwein", "Rotwein", "Rotwein"],
+        "Flasche_cl": [75, 75, 75, 150, 75, 75],
+        "Herkunft": ["Italien > Piemont", "Italien > Piemont", "Italien > Piemont", "Italien > Piemont",
+                     "Italien > Piemont", "Frankreich > Bordeaux"],
+    })
+
+
+def test_reihenfolge_nach_distanz(df_fp):
+    df_gaps = pd.DataFrame({"URL": [" c1 "], "Name": ["Barolo"], "Produzent": ["Gaja"], "Preis": [50.0],
+                            "Weintyp": ["Rotwein"], "Flasche_cl": [75], "Region": ["Italien, Piemont"]})
+
+    alternativen = compute_fp_alternatives(df_gaps, df_fp, k=6)
+
+    g = DISTANZ_GEWICHTE
+    bonus = g["Region"] + g["Produzent"]
+
+    def preis(fp_preis):  # quadrierte Differenz der log1p-Preise, Distanz auf 3 Stellen gerundet
+        return g["Preis"] * (np.log1p(fp_preis) - np.log1p(50.0)) ** 2
+
+    erwartet = {
+        "zwilling": -bonus,
+        "anderer_produzent": preis(55.0) - g["Region"],
+        "magnum": g["Flasche_cl"] - bonus,
+        "weisswein": g["Weintyp"] - bonus,
+        "frankreich": g["Land"],
+        "teuer": preis(180.0) + g["Preisband"] - g["Region"],
+    }
+    assert alternativen["Coop_URL"].unique().tolist() == ["c1"]
+    assert alternativen["Rang"].tolist() == [1, 2, 3, 4, 5, 6]
+    assert alternativen["FP_Sku"].tolist() == list(erwartet)
+    np.testing.assert_allclose(alternativen["Distanz"], list(erwartet.values()), atol=2e-3)
+
+
+def test_bloecke_aendern_nichts():
+    rng = np.random.default_rng(4)
+    n_fp, n_gaps = 300, 37
+    df_fp = pd.DataFrame({
+        "Sku": np.arange(n_fp), "Name": [f"FP {i}" for i in range(n_fp)],
+        "Produzent": rng.choice(["Gaja", "Antinori", "Torres", None], n_fp),
+        "Preis": rng.uniform(5, 200, n_fp).round(2),
+        "Weintyp": rng.choice(["Rotwein", "Weisswein", "Schaumwein"], n_fp),
+        "Herkunft": rng.choice(["Italien > Piemont", "Italien > Toskana", "Spanien > Rioja", None], n_fp),
+    })
+    df_gaps = pd.DataFrame({
+        "URL": [f"c{i}" for i in range(n_gaps)], "Produzent": rng.choice(["Gaja", "Unbekannt"], n_gaps),
+        "Preis": np.append(rng.uniform(5, 200, n_gaps - 1), np.nan),
+        "Weintyp": rng.choice(["Rotwein", "Weisswein"], n_gaps),
+        "Region": rng.choice(["Italien, Toskana", "Spanien", None], n_gaps),
+    })
+
+    ganz = compute_fp_alternatives(df_gaps, df_fp, chunk_groesse=512)
+    gestueckelt = compute_fp_alternatives(df_gaps, df_fp, chunk_groesse=5)
+
+    assert len(ganz) == n_gaps * 5
+    pd.testing.assert_frame_equal(ganz, gestueckelt)
+
+
+def test_leere_eingaben(df_fp):
+    leer = compute_fp_alternatives(pd.DataFrame(columns=["URL", "Preis", "Region"]), df_fp)
+
+    assert leer.empty and "Distanz" in leer.columns
+
+
+def test_kurztext_je_coop_url():
+    alternativen = FPAlternativen(pd.DataFrame({
+        "Coop_URL": ["c1", "c1", "c2"], "Rang": [1, 2, 1], "FP_Sku": ["a", "b", "c"],
+        "FP_Name": ["Barolo", "Gavi", "Rioja"], "FP_Produzent": [None] * 3, "FP_Preis": [49.9, None, 12.0],
+        "FP_Herkunft": [None] * 3, "Distanz": [0.1, 0.2, 0.3],
+    }))
+
+    assert len(alternativen) == 2
+    assert alternativen.kurztext_fuer(pd.Series([" c1", "c3"])).tolist()[0] == "Barolo (CHF 49.90) | Gavi"
+    assert pd.isna(alternativen.kurztext_fuer(pd.Series(["c3"])).iat[0])
+    assert alternativen.fuer("c2 ")["FP_Sku"].tolist() == ["c"]
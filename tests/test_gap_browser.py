@@ -0,0 +1,39 @@
+# tests/test_gap_browser.py
+import numpy as np
+import pandas as pd
+
+from gap_browser import GapBrowser
+from normalization import normalize_wein_text
+
+
+def _gaps():
+    return pd.DataFrame({
+        "Name": ["Barolo Riserva", "Barbera d'Alba", "Château Margaux", "Rioja Reserva", None],
+        "Produzent": ["Fontanafredda", "Pio Cesare", "Château Margaux", "Marqués de Riscal", "Riscal"],
+        "Region": ["Piemont", "Piemont", "Bordeaux", "Rioja", None],
+        "Preis": [45.0, 19.5, None, 22.0, 9.9],
+    })
+
+
+def _erwartet(df, suchbegriff):
+    """Referenz ohne Index: jedes Suchwort ist Präfix eines Tokens aus Name/Produzent/Region."""
+    texte = df[["Name", "Produzent", "Region"]].astype("string").fillna("").agg(" ".join, axis=1)
+    tokens = [normalize_wein_text(t).split() for t in texte]
+    terme = normalize_wein_text(suchbegriff).split()
+    return np.array([all(any(tok.startswith(term) for tok in zeile) for term in terme) for zeile in tokens])
+
+
+def test_praefixsuche_entspricht_referenz():
+    df = _gaps()
+    browser = GapBrowser(df)
+    for suchbegriff in ["bar", "Barolo", "pie", "chateau", "CHÂTEAU marg", "ris", "riscal reserva", "xyz", "", "b p"]:
+        np.testing.assert_array_equal(browser.suche(suchbegriff), _erwartet(df, suchbegriff), err_msg=suchbegriff)
+
+
+def test_sortierung_fehlende_werte_zuletzt():
+    browser = GapBrowser(_gaps())
+    alle = np.ones(5, dtype=bool)
+
+    assert browser.sortiert(alle, "Preis").tolist() == [4, 1, 3, 0, 2]
+    assert browser.sortiert(alle, "Preis", absteigend=True).tolist() == [0, 3, 1, 4, 2]
+    assert browser.sortiert(browser.suche("piemont"), "Preis").tolist() == [1, 0]
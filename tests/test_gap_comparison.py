@@ -0,0 +1,153 @@
+# tests/test_gap_comparison.py
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import hypergeom
+
+from gap_comparison import (
+    SIGNIFIKANZ_NIVEAU,
+    DIM_HAUPTREGION,
+    DIM_LAND,
+    DIM_PREIS_WEINTYP,
+    DIM_PREISKLASSE,
+    DIM_PRODUZENT,
+    DIM_WEINTYP,
+    benjamini_hochberg,
+    comparison_slice,
+    compute_gap_comparison,
+    hypergeom_p_values,
+)
+from gap_engine import GapIndex
+
+
+@pytest.fixture(scope="module")
+def sortiment():
+    rng = np.random.default_rng(5)
+    n = 300
+    df_coop = pd.DataFrame({
+        "Weintyp": rng.choice(["Rotwein", "Weisswein", "Roséwein", "Schaumwein", "Süsswein"], n),
+        "Preis": np.append(rng.uniform(3, 180, n - 1).round(2), np.nan),
+        "Region": rng.choice(["Italien", "Italien > Toskana", "Frankreich > Bordeaux", "Schweiz > Wallis", None], n),
+    })
+    df_matching = pd.DataFrame({"Coop_Produzent": rng.choice(["Antinori", "Gaja", "Torres", None], n)})
+    gap_mask = rng.random(n) < 0.3
+    return df_coop, df_matching, GapIndex(gap_mask, gap_mask, frozenset())
+
+
+@pytest.fixture(scope="module")
+def vergleich(sortiment):
+    df_coop, df_matching, gap_index = sortiment
+    return compute_gap_comparison(df_coop, df_matching, gap_index)
+
+
+def _erwartet(kategorie: pd.Series, gap_mask, basis_alle_zeilen: bool = False) -> pd.DataFrame:
+    """Referenz je Dimension: value_counts auf Lücken und Gesamt, Anteile an den Zeilen mit Kategorie (bzw. an allen)."""
+    gesamt = kategorie.value_counts()
+    luecken = kategorie[gap_mask].value_counts().reindex(gesamt.index, fill_value=0)
+    basis_luecken, basis_gesamt = (int(np.sum(gap_mask)), len(kategorie)) if basis_alle_zeilen else (luecken.sum(), gesamt.sum())
+    return pd.DataFrame({
+        "Anzahl_Luecken": luecken, "Anzahl_Gesamt": gesamt,
+        "Anteil_Luecken": luecken / basis_luecken * 100, "Anteil_Gesamt": gesamt / basis_gesamt * 100,
+    })
+
+
+def test_weintyp_entspricht_value_counts(sortiment, vergleich):
+    df_coop, _, gap_index = sortiment
+    weintyp = df_coop["Weintyp"].where(df_coop["Weintyp"] != "Süsswein")  # nur die vier Standard-Weintypen
+
+    ausschnitt = comparison_slice(vergleich, DIM_WEINTYP).set_index("Kategorie")
+    erwartet = _erwartet(weintyp, gap_index.gap_mask)
+
+    assert ausschnitt.index.tolist() == ["Rotwein", "Weisswein", "Roséwein", "Schaumwein"]  # feste Reihenfolge
+    pd.testing.assert_frame_equal(ausschnitt.loc[erwartet.index, erwartet.columns], erwartet,
+                                  check_dtype=False, check_names=False)
+
+
+def test_produzent_ueber_matching_maske(sortiment, vergleich):
+    _, df_matching, gap_index = sortiment
+
+    ausschnitt = comparison_slice(vergleich, DIM_PRODUZENT).set_index("Kategorie")
+    # Produzenten-Anteile beziehen sich auf alle Matching-Zeilen, auch ohne Produzent
+    erwartet = _erwartet(df_matching["Coop_Produzent"], gap_index.matching_gap_mask, basis_alle_zeilen=True)
+
+    pd.testing.assert_frame_equal(ausschnitt.loc[erwartet.index, erwartet.columns], erwartet,
+                                  check_dtype=False, check_names=False)
+
+
+def test_anteile_je_gruppe(vergleich):
+    # Anteile summieren je (Dimension, Gruppe) auf 100 % (ausser Produzent), Differenz = Anteil Lücken - Anteil Gesamt
+    ohne_produzent = vergleich[vergleich["Dimension"] != DIM_PRODUZENT]
+    summen = ohne_produzent.groupby(["Dimension", "Gruppe"])[["Anteil_Luecken", "Anteil_Gesamt"]].sum()
+    summen = summen[(summen > 0).all(axis=1)]  # Gruppen ohne Lücken haben Anteil 0
+
+    np.testing.assert_allclose(summen.to_numpy(), 100.0)
+    np.testing.assert_allclose(vergleich["Differenz_pp"], vergleich["Anteil_Luecken"] - vergleich["Anteil_Gesamt"])
+    assert set(vergleich["Dimension"]) == {DIM_WEINTYP, DIM_PREISKLASSE, DIM_PREIS_WEINTYP, DIM_LAND, DIM_HAUPTREGION,
+                                           DIM_PRODUZENT}
+
+
+def test_preisklassen_ohne_luecke_im_hoechstpreis(sortiment, vergleich):
+    df_coop, _, _ = sortiment
+
+    preisklassen = comparison_slice(vergleich, DIM_PREISKLASSE)
+
+    # jeder Wein mit Preis (auch der teuerste) landet in genau einer Preisklasse
+    assert preisklassen["Anzahl_Gesamt"].sum() == df_coop["Preis"].notna().sum()
+    assert preisklassen["Kategorie"].tolist()[:3] == ["0–20 CHF", "20–50 CHF", "50–100 CHF"]
+    assert preisklassen["Kategorie"].iloc[-1].startswith("100–")
+
+
+def test_preis_x_weintyp_gruppiert_nach_preisklasse(sortiment, vergleich):
+    df_coop, _, gap_index = sortiment
+    teuer = df_coop["Preis"].between(50, 100, inclusive="left")
+    weintyp = df_coop["Weintyp"].where(df_coop["Weintyp"] != "Süsswein")
+
+    ausschnitt = comparison_slice(vergleich, DIM_PREIS_WEINTYP, gruppe="50–100 CHF").set_index("Kategorie")
+    erwartet = _erwartet(weintyp[teuer], gap_index.gap_mask[teuer.to_numpy()])
+
+    pd.testing.assert_frame_equal(ausschnitt.loc[erwartet.index, erwartet.columns], erwartet,
+                                  check_dtype=False, check_names=False)
+
+
+
+def test_hypergeom_p_werte_entsprechen_einzeltests():
+    # (Lücken der Kategorie, Lücken gesamt, Kategorie gesamt, Sortiment gesamt)
+    faelle = [(5, 20, 50, 200), (0, 20, 50, 200), (20, 20, 50, 200), (12, 20, 50, 200), (3, 10, 3, 40), (0, 0, 0, 0)]
+    k, n, K, M = map(np.array, zip(*faelle))
+
+    p = hypergeom_p_values(k, n, K, M)
+
+    erwartet = [min(1.0, 2 * min(hypergeom.cdf(ki, Mi, Ki, ni), hypergeom.sf(ki - 1, Mi, Ki, ni))) if Mi > 0 else 1.0
+                for ki, ni, Ki, Mi in faelle]
+    np.testing.assert_allclose(p, erwartet)
+    assert p[0] == pytest.approx(1.0) and p[2] < 1e-6  # erwartet 5 von 20 -> unauffällig; alle 20 -> hoch signifikant
+
+
+def _bh_referenz(p: np.ndarray) -> np.ndarray:
+    """Lehrbuch-Variante: q_(i) = min_{j >= i} p_(j) * m / j über die aufsteigend sortierten p-Werte."""
+    m = len(p)
+    reihenfolge = np.argsort(p, kind="stable")
+    q_sortiert = np.minimum.accumulate((p[reihenfolge] * m / np.arange(1, m + 1))[::-1])[::-1]
+    q = np.empty(m)
+    q[reihenfolge] = np.minimum(q_sortiert, 1.0)
+    return q
+
+
+def test_benjamini_hochberg_je_familie():
+    rng = np.random.default_rng(2)
+    p = pd.Series(np.append(rng.uniform(0, 0.1, 15), rng.uniform(0, 1, 25)), index=rng.permutation(40) + 100)
+    familien = pd.Series(rng.choice(["Weintyp", "Land", "Produzent"], 40), index=p.index)
+
+    q = benjamini_hochberg(p, familien)
+
+    assert q.index.equals(p.index)
+    for familie in familien.unique():
+        maske = (familien == familie).to_numpy()
+        np.testing.assert_allclose(q[maske].to_numpy(), _bh_referenz(p[maske].to_numpy()))
+    assert (q >= p - 1e-12).all()
+
+
+def test_signifikanz_im_vergleich(vergleich):
+    assert vergleich["p_Wert"].between(0, 1).all() and vergleich["q_Wert"].between(0, 1).all()
+    assert (vergleich["q_Wert"] >= vergleich["p_Wert"] - 1e-12).all()
+    np.testing.assert_array_equal(vergleich["Signifikant"], vergleich["q_Wert"] < SIGNIFIKANZ_NIVEAU)
@@ -0,0 +1,135 @@
+# tests/test_gap_engine.py
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_loading import add_match_keys, add_matching_keys
+from gap_engine import (
+    HAENDLER_COOP,
+    HAENDLER_FP,
+    build_retailer_coverage,
+    compute_gap_index,
+    compute_reverse_gap_index,
+    coop_schluessel,
+)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+
+@pytest.fixture
+def sortimente():
+    """Kleines Coop/FP/Matching-Set mit doppelter URL, SKU als float, 'Kein Match' und ungleichem Jahrgang."""
+    df_coop = pd.DataFrame({"URL": ["c1", "c2", "c3", "c4", "c4", " c5 ", "c6"]})
+    df_fp = pd.DataFrame({"Sku": [101, 102, 103, 104, 105]})
+    df_matching = pd.DataFrame({
+        "Coop_URL": ["c1", "c2", "c3", "c4", "c5", "c6", None],
+        "FP_Sku": [101.0, 102.0, None, 103.0, 104.0, 105.0, 101.0],
+        "Match_Status": ["Match", "Match", "Kein Match", "Match", "Kein Match", "Match", "Match"],
+        "Coop_Jahrgang_Key": pd.array([2020, 2019, None, 2021, 2018, 2017, None], dtype="Int64"),
+        "FP_Jahrgang_Key": pd.array([2020, 2020, None, None, 2018, 2017, None], dtype="Int64"),
+        "Coop_Flasche_cl": pd.array([75, 75, 75, 75, 75, 150, 75], dtype="Int64"),
+        "FP_Flasche_cl": pd.array([75, 75, 75, 75, 75, 75, 75], dtype="Int64"),
+    })
+    return df_coop, df_fp, df_matching
+
+
+def test_gap_maske_ausgerichtet_auf_coop_zeilen(sortimente):
+    df_coop, _, df_matching = sortimente
+
+    gap_index = compute_gap_index(df_coop, df_matching, require_equal_keys=False)
+
+    # c4 ist doppelt im Coop-Frame, beide Zeilen sind gedeckt; " c5 " wird getrimmt, hat aber nur 'Kein Match'
+    assert gap_index.gap_mask.tolist() == [False, False, True, False, False, True, False]
+    assert gap_index.matched_ids == frozenset({"c1", "c2", "c4", "c6"})
+    assert (gap_index.n_total, gap_index.n_gaps, gap_index.n_matched) == (7, 2, 4)
+    assert gap_index.matching_gap_mask.tolist() == [False, False, True, False, True, False, True]
+
+
+def test_gleiche_schluessel_verlangt(sortimente):
+    df_coop, _, df_matching = sortimente
+
+    gap_index = compute_gap_index(df_coop, df_matching)
+
+    # c2 (2019 vs 2020) und c6 (150 cl vs 75 cl) zählen nicht als Match; fehlender FP-Jahrgang (c4) ist kompatibel
+    assert gap_index.matched_ids == frozenset({"c1", "c4"})
+    assert df_coop["URL"][gap_index.gap_mask].str.strip().tolist() == ["c2", "c3", "c5", "c6"]
+
+
+@pytest.mark.parametrize("markierung", [{"Match_Status": "Match (Manuelle SKU)"}, {"Fuzzy_Score": -1}])
+def test_manuell_bestaetigt_trotz_anderem_jahrgang(sortimente, markierung):
+    df_coop, _, df_matching = sortimente
+    df_matching = df_matching.assign(Fuzzy_Score=[80.0] * len(df_matching))
+    for spalte, wert in markierung.items():
+        df_matching.loc[1, spalte] = wert  # c2: Coop 2019 vs FP 2020
+
+    gap_index = compute_gap_index(df_coop, df_matching)
+
+    assert gap_index.matched_ids == frozenset({"c1", "c2", "c4"})
+
+
+def test_status_regel_gueltige_status(sortimente):
+    df_coop, _, df_matching = sortimente
+    df_matching = df_matching.assign(Match_Status=["Match", "Match (Manuelle SKU)", "Kein Match", "Unsicher", "Kein Match", "Match", "Match"])
+
+    nur_sichere = compute_gap_index(df_coop, df_matching, valid_match_statuses=("Match", "Match (Manuelle SKU)"),
+                                    require_equal_keys=False)
+    alles_ausser_kein_match = compute_gap_index(df_coop, df_matching, require_equal_keys=False)
+
+    assert nur_sichere.matched_ids == frozenset({"c1", "c2", "c6"})
+    assert alles_ausser_kein_match.matched_ids == frozenset({"c1", "c2", "c4", "c6"})
+    np.testing.assert_array_equal(nur_sichere.gap_mask, df_coop["URL"].isin(["c3", "c4", " c5 "]).to_numpy())
+
+
+@pytest.mark.parametrize("require_equal_keys", [True, False])
+def test_coverage_coop_maske_entspricht_gap_index(sortimente, require_equal_keys):
+    df_coop, df_fp, df_matching = sortimente
+    coverage = build_retailer_coverage(df_coop, df_fp, df_matching, require_equal_keys=require_equal_keys)
+    erwartet = compute_gap_index(df_coop, df_matching, require_equal_keys=require_equal_keys)
+
+    ergebnis = coverage.gap_index(HAENDLER_COOP, [HAENDLER_FP], matching_schluessel=coop_schluessel(df_matching["Coop_URL"]))
+
+    np.testing.assert_array_equal(ergebnis.gap_mask, erwartet.gap_mask)
+    # Matching-Zeilen ohne Coop-URL gehören nicht zum Universum, beide Varianten werten sie als Lücke
+    np.testing.assert_array_equal(ergebnis.matching_gap_mask, erwartet.matching_gap_mask)
+    assert ergebnis.n_gaps == erwartet.n_gaps
+
+
+@pytest.mark.parametrize("require_equal_keys", [True, False])
+def test_coverage_fp_maske_entspricht_reverse_gap_index(sortimente, require_equal_keys):
+    df_coop, df_fp, df_matching = sortimente
+    coverage = build_retailer_coverage(df_coop, df_fp, df_matching, require_equal_keys=require_equal_keys)
+    erwartet = compute_reverse_gap_index(df_fp, df_matching, require_equal_keys=require_equal_keys)
+
+    ergebnis = coverage.gap_index(HAENDLER_FP, [HAENDLER_COOP])
+
+    np.testing.assert_array_equal(ergebnis.gap_mask, erwartet.gap_mask)
+
+
+def test_coverage_weitere_haendler(sortimente):
+    df_coop, df_fp, df_matching = sortimente
+    df_b = pd.DataFrame({"ID": ["b1", "b2", "b3"], "Coop_URL": ["c3", None, None], "FP_Sku": [None, "105", None]})
+    coverage = build_retailer_coverage(df_coop, df_fp, df_matching, require_equal_keys=False, weitere_haendler={"B": df_b})
+
+    # c3 ist bei Coop und B, nicht bei FP; SKU 105 ist über das Match-Paar mit c6 verknüpft
+    coop_lueckenmaske = coverage.row_mask(HAENDLER_COOP, vorhanden_bei=["B"], fehlt_bei=[HAENDLER_FP])
+    assert df_coop["URL"][coop_lueckenmaske].tolist() == ["c3"]
+    assert coverage.anzahl(vorhanden_bei=[HAENDLER_COOP, HAENDLER_FP, "B"]) == 1
+    assert coverage.anzahl(vorhanden_bei=["B"], fehlt_bei=[HAENDLER_COOP, HAENDLER_FP]) == 1
+
+
+@pytest.mark.skipif(not os.path.exists(os.path.join(DATA_DIR, "manuelle_matches_final2.xlsx")), reason="Quelldaten fehlen")
+def test_coverage_entspricht_gap_index_auf_quelldaten():
+    df_coop = add_match_keys(pd.read_excel(os.path.join(DATA_DIR, "coop_weine_kombiniert.xlsx")))
+    df_fp = add_match_keys(pd.read_excel(os.path.join(DATA_DIR, "flaschenpost_weine.xlsx")))
+    df_matching = add_matching_keys(pd.read_excel(os.path.join(DATA_DIR, "manuelle_matches_final2.xlsx")))
+    coverage = build_retailer_coverage(df_coop, df_fp, df_matching)
+
+    coop = coverage.gap_index(HAENDLER_COOP, [HAENDLER_FP], matching_schluessel=coop_schluessel(df_matching["Coop_URL"]))
+    erwartet = compute_gap_index(df_coop, df_matching)
+    np.testing.assert_array_equal(coop.gap_mask, erwartet.gap_mask)
+    np.testing.assert_array_equal(coop.matching_gap_mask, erwartet.matching_gap_mask)
+
+    fp = coverage.gap_index(HAENDLER_FP, [HAENDLER_COOP])
+    np.testing.assert_array_equal(fp.gap_mask, compute_reverse_gap_index(df_fp, df_matching).gap_mask)
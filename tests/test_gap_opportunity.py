@@ -0,0 +1,61 @@
+# tests/test_gap_opportunity.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from gap_engine import GapIndex
+from gap_opportunity import NEUTRAL, OPPORTUNITY_GEWICHTE, compute_opportunity_scores
+from producer_index import ProduzentenIndex
+
+
+@pytest.fixture
+def sortimente():
+    df_coop = pd.DataFrame({
+        "Name": ["a", "b", "c", "d", "e"],
+        "Produzent": ["Antinori", "Unbekannt Winzer", None, "  ", "Gaja"],
+        "Preis": [15.0, 30.0, 30.0, 70.0, 250.0],
+        "Weintyp": ["Rotwein"] * 5,
+        "Region": ["Italien", "Italien", "Frankreich > Bordeaux", "Spanien", "Italien"],
+    })
+    df_fp = pd.DataFrame({
+        "Produzent": ["Antinori", "Gaja", "Torres"],
+        "Preis": [10.0, 30.0, 60.0],
+        "Weintyp": ["Rotwein"] * 3,
+        "Herkunft": ["Italien > Toskana", "Italien > Piemont", "Spanien > Penedès"],
+    })
+    gap_mask = np.array([True, True, True, True, False])
+    return df_coop, df_fp, GapIndex(gap_mask, gap_mask, frozenset({"e"}))
+
+
+def test_produzent_ohne_namen_ist_neutral(sortimente):
+    df_coop, df_fp, gap_index = sortimente
+
+    scores = compute_opportunity_scores(df_coop, df_fp, gap_index, ProduzentenIndex(df_fp["Produzent"])).scores
+
+    assert scores.index.tolist() == [0, 1, 2, 3]
+    assert scores["Score_Produzent"].tolist() == [0.0, 1.0, NEUTRAL, NEUTRAL]
+
+
+def test_ohne_produzentenindex_neutral(sortimente):
+    df_coop, df_fp, gap_index = sortimente
+
+    scores = compute_opportunity_scores(df_coop, df_fp, gap_index).scores
+
+    assert (scores["Score_Produzent"] == NEUTRAL).all()
+
+
+def test_gesamtscore_und_rang(sortimente):
+    df_coop, df_fp, gap_index = sortimente
+
+    opportunity = compute_opportunity_scores(df_coop, df_fp, gap_index, ProduzentenIndex(df_fp["Produzent"]))
+    scores = opportunity.scores
+
+    teil_scores = scores[list(OPPORTUNITY_GEWICHTE)]
+    assert teil_scores.apply(lambda s: s.between(0, 1)).all().all()
+    erwartet = (sum(scores[spalte] * gewicht for spalte, gewicht in OPPORTUNITY_GEWICHTE.items()) * 100).round(1)
+    pd.testing.assert_series_equal(scores["Opportunity_Score"], erwartet, check_names=False)
+    # Frankreich führt FP gar nicht: Land voll untervertreten
+    assert scores.at[2, "Score_Region"] == 1.0
+    assert sorted(scores["Rang"]) == [1, 2, 3, 4]
+    assert opportunity.reihenfolge[0] == scores["Opportunity_Score"].idxmax()
+    assert opportunity.top_n(pd.Index([0, 3]), 1).tolist() == [scores.loc[[0, 3], "Opportunity_Score"].idxmax()]
@@ -0,0 +1,73 @@
+# tests/test_gap_snapshots.py
+import numpy as np
+import pandas as pd
+
+from gap_engine import GapIndex
+from gap_snapshots import (
+    GapSnapshot,
+    diff_gap_snapshots,
+    gap_trend,
+    ist_gespeichert,
+    load_gap_snapshot,
+    load_gap_snapshots,
+    save_gap_snapshot,
+    snapshot_from_gap_index,
+)
+
+
+def _snapshot(stichtag, luecken: dict, version="v1"):
+    return GapSnapshot(stichtag, list(luecken), list(luecken.values()), versionen={"coop": version})
+
+
+def test_snapshot_from_gap_index_eindeutige_urls():
+    df_coop = pd.DataFrame({"URL": ["a", "b", "a", None, " c "]})
+    gap_index = GapIndex(np.array([True, False, True, True, False]), None, frozenset({"b", "c"}))
+
+    snapshot = snapshot_from_gap_index(df_coop, gap_index, stichtag="2026-01-01")
+
+    assert snapshot.schluessel.tolist() == ["a", "b", "c"]
+    assert snapshot.luecken.tolist() == [True, False, False]
+
+
+def test_speichern_und_laden_roundtrip(tmp_path):
+    # 11 Schlüssel: packbits füllt auf 16 Bit auf, unpackbits muss exakt 11 zurückgeben
+    luecken = {f"url{i}": i % 3 == 0 for i in range(11)}
+    snapshot = _snapshot("2026-03-01 08:30:00", luecken)
+
+    pfad = save_gap_snapshot(snapshot, verzeichnis=str(tmp_path))
+    geladen = load_gap_snapshot(pfad)
+
+    assert geladen.stichtag == snapshot.stichtag
+    np.testing.assert_array_equal(geladen.schluessel, snapshot.schluessel)
+    np.testing.assert_array_equal(geladen.luecken, snapshot.luecken)
+    assert geladen.versionen == {"coop": "v1"}
+    assert geladen.n_luecken == 4
+    # Derselbe Datenstand wird nur einmal gespeichert
+    assert save_gap_snapshot(_snapshot("2026-03-02", luecken), verzeichnis=str(tmp_path)) is None
+    assert len(load_gap_snapshots(str(tmp_path))) == 1
+
+
+def test_diff_und_trend():
+    alt = _snapshot("2026-01-01", {"bleibt": True, "schliesst": True, "entfaellt": True, "gedeckt": False})
+    neu = _snapshot("2026-02-01", {"bleibt": True, "schliesst": False, "gedeckt": True, "neu": True}, version="v2")
+
+    diff = diff_gap_snapshots(alt, neu).set_index("Coop_URL")["Status"].to_dict()
+
+    assert diff == {"bleibt": "Bestehend", "schliesst": "Geschlossen", "entfaellt": "Entfallen", "gedeckt": "Neu", "neu": "Neu"}
+    trend = gap_trend([alt, neu])
+    assert trend["Lücken"].tolist() == [3, 3]
+    assert trend.iloc[1][["Neu", "Geschlossen", "Entfallen", "Bestehend"]].tolist() == [2, 1, 1, 1]
+
+
+def test_gleicher_datenstand_aus_app_und_cli(tmp_path):
+    cli = {"coop": "1-10", "fp": "2-20", "matching": "3-30", "decisions": None}
+    app = {**cli, "weitere_haendler": {"B": "4-40"}}
+    gap_index = GapIndex(np.array([True, False]), None, frozenset({"b"}))
+    df_coop = pd.DataFrame({"URL": ["a", "b"]})
+
+    save_gap_snapshot(snapshot_from_gap_index(df_coop, gap_index, cli, stichtag="2026-01-01"), verzeichnis=str(tmp_path))
+    aus_app = snapshot_from_gap_index(df_coop, gap_index, app)
+
+    assert aus_app.versionen == cli
+    assert ist_gespeichert(aus_app, load_gap_snapshots(str(tmp_path)))
+    assert save_gap_snapshot(aus_app, verzeichnis=str(tmp_path)) is None
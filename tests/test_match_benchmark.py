@@ -0,0 +1,57 @@
+# tests/test_match_benchmark.py
+import pandas as pd
+import pytest
+
+from match_benchmark import evaluate_thresholds, load_ground_truth, prefilter_recall, run_benchmark
+from matcher import PreisBlockIndex
+
+
+@pytest.fixture
+def ground_truth():
+    df_matching = pd.DataFrame({
+        "Coop_URL": ["c1", "c2", "c3", "c4", "c4", "c5"],
+        "FP_Sku": [101.0, "102", 103, 104, 999, 105],
+        "Fuzzy_Score": [-1, -1, -1, -1, -1, 80],
+    })
+    return load_ground_truth(df_matching)
+
+
+def test_ground_truth_nur_bestaetigte_paare(ground_truth):
+    # Score -1 zählt, je Coop-Wein das erste Paar; SKUs normalisiert
+    assert ground_truth.values.tolist() == [["c1", "101"], ["c2", "102"], ["c3", "103"], ["c4", "104"]]
+
+
+def test_precision_recall_je_schwelle(ground_truth):
+    ergebnis = pd.DataFrame({
+        "Coop_URL": ["c1", "c2", "c3", "c5"],
+        "Bester_FP_Sku": [101, 102, 777, 105],
+        "Bester_Score": [95.0, 55.0, 70.0, 99.0],
+    })
+
+    qualitaet = evaluate_thresholds(ergebnis, ground_truth, schwellen=[50, 60, 90]).set_index("Schwelle")
+
+    # c4 fehlt im Ergebnis (Score 0), c5 gehört nicht zur Ground Truth
+    assert qualitaet.loc[50, ["Vorhergesagt", "Korrekt"]].tolist() == [3, 2]
+    assert qualitaet.loc[50, ["Precision", "Recall"]].tolist() == [0.667, 0.5]
+    assert qualitaet.loc[60, ["Vorhergesagt", "Korrekt", "Precision", "Recall"]].tolist() == [2, 1, 0.5, 0.25]
+    assert qualitaet.loc[90, ["Precision", "Recall", "F1"]].tolist() == [1.0, 0.25, 0.4]
+
+
+def test_vorfilter_recall_und_benchmark(ground_truth):
+    df_fp = pd.DataFrame({
+        "Sku": ["101", "102", "103", "104"], "Name": ["Barolo", "Chianti", "Rioja", "Merlot"],
+        "Produzent": ["Gaja", "Antinori", "Torres", "Ticino"], "Preis": [50.0, 20.0, 15.0, 30.0],
+        "Weintyp": ["Rotwein"] * 4, "Jahrgang_Key": pd.array([2019, 2020, 2020, None], dtype="Int64"),
+        "Flasche_cl": pd.array([75] * 4, dtype="Int64"),
+    })
+    df_coop = df_fp.drop(columns="Sku").assign(URL=["c1", "c2", "c3", "c4"])
+    df_coop.loc[2, "Preis"] = 30.0  # Rioja: Preis ausserhalb des ±25%-Fensters
+    df_coop.loc[3, "Jahrgang_Key"] = 2018  # Merlot ohne FP-Jahrgang: Platzhalter passt
+
+    vorfilter = prefilter_recall(df_coop, df_fp, ground_truth, PreisBlockIndex(df_fp))
+    qualitaet, status, speed = run_benchmark(df_coop, df_fp, ground_truth, schwellen=[50])
+
+    assert vorfilter["Im_Vorfilter"].tolist() == [True, True, False, True]
+    assert speed["vorfilter_recall"] == 0.75
+    assert status.sum() == 4 and speed["coop_weine"] == 4
+    assert qualitaet.loc[0, ["Korrekt", "Recall"]].tolist() == [3, 0.75]
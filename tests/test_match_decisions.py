@@ -0,0 +1,88 @@
+# tests/test_match_decisions.py
+import json
+
+import pandas as pd
+import pytest
+
+from match_decisions import (
+    BESTER_SCORE_BESTAETIGT,
+    ENTSCHEIDUNG_ABGELEHNT,
+    ENTSCHEIDUNG_BESTAETIGT,
+    SCORE_MANUELL,
+    STATUS_KEIN_MATCH,
+    STATUS_MANUELL,
+    MatchDecisionStore,
+    apply_decisions,
+    apply_decisions_to_matcher_result,
+)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return MatchDecisionStore(str(tmp_path / "decisions.jsonl"))
+
+
+def test_replay_letzte_entscheidung_gewinnt(store):
+    store.record("c1", 101.0, ENTSCHEIDUNG_BESTAETIGT)
+    store.record("c1", "101", ENTSCHEIDUNG_ABGELEHNT)
+    store.record(" c2 ", 202, ENTSCHEIDUNG_BESTAETIGT, user="pm")
+    with open(store.path, "a", encoding="utf-8") as f:
+        f.write('{"coop_url": "c3", "fp_sku"\n\n')  # abgebrochener Schreibvorgang
+
+    geladen = MatchDecisionStore(store.path)
+
+    assert len(geladen) == 2
+    assert geladen.get("c1", "101") == ENTSCHEIDUNG_ABGELEHNT
+    assert geladen.bestaetigte_sku("c1") is None
+    assert geladen.bestaetigte_sku("c2") == "202"
+    assert json.loads(open(store.path, encoding="utf-8").readline())["fp_sku"] == "101"
+
+
+def test_ablehnen_faellt_auf_fruehere_bestaetigung_zurueck(store):
+    store.record("c1", 101, ENTSCHEIDUNG_BESTAETIGT)
+    store.record("c1", 102, ENTSCHEIDUNG_BESTAETIGT)
+    store.record("c1", 102, ENTSCHEIDUNG_ABGELEHNT)
+
+    assert store.bestaetigte_sku("c1") == "101"
+    assert MatchDecisionStore(store.path).bestaetigte_sku("c1") == "101"
+
+    store.record("c1", 101, ENTSCHEIDUNG_ABGELEHNT)
+    assert store.bestaetigte_sku("c1") is None
+
+
+def test_unbekannte_entscheidung(store):
+    with pytest.raises(ValueError):
+        store.record("c1", 101, "vielleicht")
+
+
+def test_apply_decisions(store):
+    store.record("c1", 101, ENTSCHEIDUNG_BESTAETIGT)
+    store.record("c2", 102, ENTSCHEIDUNG_ABGELEHNT)
+    df = pd.DataFrame({"Coop_URL": ["c1", "c2", "c3"], "FP_Sku": [101.0, 102.0, 103.0],
+                       "Match_Status": ["Match", "Match", "Match"], "Fuzzy_Score": [60.0, 70.0, 80.0]})
+
+    ergebnis = apply_decisions(df, store)
+
+    assert ergebnis["Match_Status"].tolist() == [STATUS_MANUELL, STATUS_KEIN_MATCH, "Match"]
+    assert ergebnis["Fuzzy_Score"].tolist() == [SCORE_MANUELL, 0, 80.0]
+    assert df["Match_Status"].tolist() == ["Match", "Match", "Match"]
+
+
+def test_matcher_ergebnis_bester_kandidat_folgt_entscheidungen(store):
+    df_fp = pd.DataFrame({"Sku": [101, 102, 103], "Name": ["A", "B", "C"]})
+    ergebnis = pd.DataFrame({
+        "Coop_URL": ["c1", "c2", "c3"], "FP_Sku": [101.0, 102.0, None], "FP_Name": ["A", "B", None],
+        "Match_Status": ["Match", "Match", "Kein Match"], "Fuzzy_Score": [90.0, 70.0, 0.0],
+        "Bester_Score": [90.0, 70.0, 40.0], "Bester_FP_Sku": [101.0, 102.0, 101.0],
+    })
+    store.record("c1", 101, ENTSCHEIDUNG_ABGELEHNT)
+    store.record("c2", 103, ENTSCHEIDUNG_BESTAETIGT)
+
+    df = apply_decisions_to_matcher_result(ergebnis, df_fp, store)
+
+    assert df["Match_Status"].tolist() == [STATUS_KEIN_MATCH, STATUS_MANUELL, "Kein Match"]
+    assert pd.isna(df.at[0, "FP_Sku"]) and pd.isna(df.at[0, "Bester_FP_Sku"])
+    assert df.at[0, "Bester_Score"] == 0.0
+    assert (df.at[1, "FP_Sku"], df.at[1, "FP_Name"], df.at[1, "Bester_FP_Sku"]) == ("103", "C", "103")
+    assert df.at[1, "Bester_Score"] == BESTER_SCORE_BESTAETIGT
+    assert (df.at[2, "Bester_FP_Sku"], df.at[2, "Bester_Score"]) == (101.0, 40.0)
@@ -0,0 +1,95 @@
+# tests/test_matcher.py
+from difflib import SequenceMatcher
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from matcher import OHNE_JAHRGANG, STATUS_KEIN_MATCH, STATUS_MATCH, PreisBlockIndex, match_sortimente, sequence_ratio_scores
+
+WEINTYPEN = ["Rotwein", "Weisswein"]
+
+
+@pytest.fixture(scope="module")
+def df_fp():
+    rng = np.random.default_rng(11)
+    n = 400
+    preise = rng.uniform(5, 80, n).round(2)
+    preise[:5] = np.nan
+    return pd.DataFrame({
+        "Sku": np.arange(1000, 1000 + n),
+        "Name": [f"Wein {i}" for i in range(n)],
+        "Produzent": rng.choice(["Antinori", "Gaja", "Torres"], n),
+        "Preis": preise,
+        "Weintyp": rng.choice(WEINTYPEN, n),
+        "Jahrgang_Key": pd.array(rng.choice([2019, 2020, 2021, None], n), dtype="Int64"),
+        "Flasche_cl": pd.array(rng.choice([75, 150], n, p=[0.8, 0.2]), dtype="Int64"),
+    })
+
+
+def _brute_force(df_fp, jahrgang, flasche, weintyp, preis, tol_pct):
+    """Referenz ohne Index: gleicher Block (FP ohne Jahrgang passt zu jedem Jahrgang) und Preis im Fenster."""
+    jahrgaenge = df_fp["Jahrgang_Key"].fillna(OHNE_JAHRGANG)
+    gleicher_block = (df_fp["Flasche_cl"] == flasche) & (df_fp["Weintyp"] == weintyp)
+    if (gleicher_block & (jahrgaenge == jahrgang)).any() or jahrgang == OHNE_JAHRGANG:
+        passt_jahrgang = jahrgaenge.isin([jahrgang, OHNE_JAHRGANG])
+    else:
+        passt_jahrgang = jahrgaenge == OHNE_JAHRGANG  # Jahrgang ohne eigenen Block: nur die Platzhalter
+    breite = abs(preis) * tol_pct
+    im_fenster = df_fp["Preis"].between(preis - breite, preis + breite)
+    return set(np.flatnonzero((gleicher_block & passt_jahrgang & im_fenster).to_numpy()))
+
+
+@pytest.mark.parametrize("key", [(2019, 75, "Rotwein"), (2021, 150, "Weisswein"), (OHNE_JAHRGANG, 75, "Weisswein"),
+                                 (2016, 75, "Rotwein")])
+@pytest.mark.parametrize("preis", [5.0, 19.9, 42.0, 79.0])
+def test_kandidaten_entsprechen_brute_force(df_fp, key, preis):
+    index = PreisBlockIndex(df_fp)
+
+    kandidaten = index.kandidaten(key, preis, tol_pct=0.25)
+
+    assert set(kandidaten) == _brute_force(df_fp, *key, preis, tol_pct=0.25)
+    assert np.all(np.diff(df_fp["Preis"].to_numpy()[kandidaten]) >= 0)  # zusammenhängende, preis-sortierte Scheibe
+
+
+def test_platzhalter_ohne_jahrgang():
+    df_fp = pd.DataFrame({
+        "Name": ["Ohne Jahrgang", "Jahrgang 2020", "Magnum ohne Jahrgang"], "Preis": [20.0, 21.0, 40.0],
+        "Weintyp": ["Rotwein"] * 3, "Jahrgang_Key": pd.array([None, 2020, None], dtype="Int64"),
+        "Flasche_cl": pd.array([75, 75, 150], dtype="Int64"),
+    })
+    index = PreisBlockIndex(df_fp)
+
+    assert sorted(index.kandidaten((2020, 75, "Rotwein"), 20.0)) == [0, 1]
+    assert list(index.kandidaten((2018, 75, "Rotwein"), 20.0)) == [0]  # kein eigener Block -> Platzhalter
+    assert list(index.kandidaten((2018, 150, "Rotwein"), 20.0)) == []  # Preis ausserhalb des Fensters
+    assert list(index.kandidaten((2020, 75, "Weisswein"), 20.0)) == []
+
+
+def test_preisfenster_breiteres_gilt():
+    untere, obere = PreisBlockIndex.preisfenster([10.0, 100.0], tol_pct=0.2, tol_chf=5.0)
+
+    np.testing.assert_allclose(untere, [5.0, 80.0])
+    np.testing.assert_allclose(obere, [15.0, 120.0])
+
+
+def test_sequence_ratio_scores_maximum_exakt():
+    texte = np.array(["chateau margaux", "chateau margot", "antinori tignanello", "margaux chateau", ""], dtype=object)
+
+    scores = sequence_ratio_scores("chateau margaux 2015", texte)
+    erwartet = [SequenceMatcher(None, t, "chateau margaux 2015", autojunk=False).ratio() * 100 for t in texte]
+
+    assert scores.max() == pytest.approx(max(erwartet))
+    assert int(np.argmax(scores)) == int(np.argmax(erwartet))
+
+
+def test_match_sortimente(df_fp):
+    df_coop = df_fp.iloc[[10, 20, 30]].rename(columns={"Sku": "URL"}).assign(URL=["c1", "c2", "c3"])
+    df_coop.loc[df_coop.index[2], "Weintyp"] = "Schaumwein"  # kein FP-Block
+
+    ergebnis = match_sortimente(df_coop, df_fp)
+
+    assert ergebnis["Match_Status"].tolist() == [STATUS_MATCH, STATUS_MATCH, STATUS_KEIN_MATCH]
+    assert ergebnis["FP_Sku"].tolist()[:2] == [1010, 1020] and pd.isna(ergebnis["FP_Sku"].iloc[2])
+    assert ergebnis["Bester_Score"].tolist() == [100.0, 100.0, 0.0]
+    assert ergebnis["Anzahl_Kandidaten"].iloc[2] == 0
@@ -0,0 +1,52 @@
+# tests/test_plot_utils.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from plot_utils import format_crosstab, verteilung
+
+
+def _format_crosstab_fstrings(tabelle: pd.DataFrame, index_name: str) -> pd.DataFrame:
+    """Referenz: die frühere zeilenweise Formatierung mit f-Strings."""
+    zeilen = []
+    for index, werte in tabelle.iterrows():
+        total = werte.sum()
+        zeilen.append([str(index), *[f"{int(v)} ({(v / total * 100) if total > 0 else 0:.1f}%)" for v in werte], total])
+    summen = tabelle.sum()
+    gesamt = summen.sum()
+    zeilen.append(["Total", *[f"{int(v)} ({(v / gesamt * 100) if gesamt else 0:.1f}%)" for v in summen], gesamt])
+    return pd.DataFrame(zeilen, columns=[index_name, *[str(c) for c in tabelle.columns], "Total"])
+
+
+TABELLEN = [
+    pd.DataFrame([[1, 2, 0, 3], [0, 0, 0, 0], [7, 1, 1, 1]], index=["bis 10", "10-20", "20-50"],
+                 columns=["Rotwein", "Weisswein", "Roséwein", "Schaumwein"]),
+    # Sechzehntel (6.25 %, 18.75 %, ...) liegen genau zwischen zwei Rundungsstufen
+    pd.DataFrame([[1, 15], [3, 13], [5, 11], [7, 9]], index=list("abcd"), columns=["x", "y"]),
+    pd.DataFrame(np.random.default_rng(3).integers(0, 500, size=(30, 5)), index=[f"k{i}" for i in range(30)],
+                 columns=list("ABCDE")),
+]
+
+
+@pytest.mark.parametrize("tabelle", TABELLEN)
+def test_format_crosstab_entspricht_fstrings(tabelle):
+    ergebnis = format_crosstab(tabelle, "Preisklasse")
+    erwartet = _format_crosstab_fstrings(tabelle, "Preisklasse")
+
+    assert list(ergebnis.columns) == list(erwartet.columns)
+    pd.testing.assert_frame_equal(ergebnis.astype(str), erwartet.astype(str))
+
+
+def _anzahl_je_wert(werte: pd.Series) -> pd.Series:
+    return werte.value_counts()
+
+
+def test_verteilung_trennt_teilmengen_gleicher_laenge():
+    df = pd.DataFrame({"Weintyp": ["Rotwein", "Rotwein", "Weisswein", "Weisswein"], "Preis": [10, 20, 10, 20]})
+    guenstig, teuer = df[df["Preis"] < 15], df[df["Preis"] >= 15]
+    rot, weiss = df[df["Weintyp"] == "Rotwein"], df[df["Weintyp"] == "Weisswein"]
+
+    assert verteilung(rot["Weintyp"], _anzahl_je_wert, "v1").to_dict() == {"Rotwein": 2}
+    assert verteilung(weiss["Weintyp"], _anzahl_je_wert, "v1").to_dict() == {"Weisswein": 2}
+    assert verteilung(guenstig["Weintyp"], _anzahl_je_wert, "v1").to_dict() == {"Rotwein": 1, "Weisswein": 1}
+    assert verteilung(teuer["Weintyp"], _anzahl_je_wert, "v1").to_dict() == {"Rotwein": 1, "Weisswein": 1}
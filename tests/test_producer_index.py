@@ -0,0 +1,60 @@
+# tests/test_producer_index.py
+import pandas as pd
+import pytest
+
+import producer_index
+from producer_index import DEFAULT_AEHNLICHKEIT_SCHWELLE, ProduzentenIndex, load_or_build_produzenten_index
+
+
+@pytest.fixture(scope="module")
+def index():
+    return ProduzentenIndex(["Domaine du Paradis", "Cave de Bonvillars SA", "Château de la Motte", "Antinori",
+                             "Antinori", "Marchesi Antinori", "Weingut Dr. Loosen", None, ""])
+
+
+def test_rechtsform_zaehlt_nicht():
+    fp_produzent, score = ProduzentenIndex(["Chateau X SA"]).lookup("Château X")
+
+    assert (fp_produzent, score) == ("Chateau X SA", 100.0)
+    assert ProduzentenIndex(["Chateau X SA"]).lookup_batch(["Château X"])["Bei_FP"].tolist() == [True]
+
+
+def test_exakter_schluessel(index):
+    assert index.lookup("ANTINORI") == ("Antinori", 100.0)
+    # "Weingut" gehört nicht zum normalisierten Schlüssel
+    assert index.lookup("Dr Loosen") == ("Weingut Dr. Loosen", 100.0)
+    assert index.lookup("") == (None, 0.0)
+
+
+def test_gleicher_unscharfer_schluessel_ist_kein_volltreffer(index):
+    fp_produzent, score = index.lookup("Château du Paradis")
+
+    assert fp_produzent == "Domaine du Paradis"
+    assert score < DEFAULT_AEHNLICHKEIT_SCHWELLE
+
+
+def test_tippfehler_ueber_trigramme(index):
+    fp_produzent, score = index.lookup("Antinory")
+
+    assert fp_produzent == "Antinori"
+    assert DEFAULT_AEHNLICHKEIT_SCHWELLE > score > 80
+
+
+def test_lookup_batch(index):
+    ergebnis = index.lookup_batch(["Cave de Bonvillars", "Château du Paradis", "Unbekannt Winzer", None])
+
+    assert ergebnis["FP_Produzent"].tolist()[:2] == ["Cave de Bonvillars SA", "Domaine du Paradis"]
+    assert ergebnis["Bei_FP"].tolist() == [True, False, False, False]
+    assert ergebnis["Ähnlichkeit"].iloc[3] == 0.0
+
+
+def test_index_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(producer_index, "CACHE_DIR", str(tmp_path))
+    df_fp = pd.DataFrame({"Produzent": ["Antinori", "Gaja"]})
+
+    gebaut = load_or_build_produzenten_index(df_fp, "v1")
+    geladen = load_or_build_produzenten_index(pd.DataFrame({"Produzent": []}), "v1")
+
+    assert len(list(tmp_path.glob("produzenten_index_*.pkl"))) == 1
+    assert len(gebaut) == len(geladen) == 2
+    assert geladen.lookup("Gaja") == ("Gaja", 100.0)
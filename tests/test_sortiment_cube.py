@@ -0,0 +1,96 @@
+# tests/test_sortiment_cube.py
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from gap_comparison import default_preisklassen
+from sortiment_cube import (
+    DIM_LAND,
+    DIM_PREISKLASSE,
+    DIM_REGION,
+    DIM_WEINTYP,
+    DIMENSIONEN,
+    SortimentCube,
+    WEINTYP_REIHENFOLGE,
+    preisklassen,
+)
+
+PREISKLASSEN = ["bis 10", "10-20", "20-50", "über 50"]
+
+
+@pytest.fixture(scope="module")
+def merkmale():
+    rng = np.random.default_rng(7)
+    n = 2000
+    land = rng.choice(["Italien", "Frankreich", "Spanien", None], n, p=[0.4, 0.3, 0.2, 0.1])
+    region = np.where(land == "Italien", rng.choice(["Piemont", "Toskana"], n),
+                      np.where(land == "Frankreich", rng.choice(["Bordeaux", "Burgund", None], n), None))
+    return pd.DataFrame({
+        DIM_WEINTYP: rng.choice(WEINTYP_REIHENFOLGE + [None], n),
+        DIM_PREISKLASSE: rng.choice(PREISKLASSEN + [None], n),
+        DIM_LAND: land,
+        DIM_REGION: region,
+    }).astype(object)
+
+
+@pytest.fixture(scope="module")
+def cube(merkmale):
+    return SortimentCube(merkmale, reihenfolgen={DIM_WEINTYP: WEINTYP_REIHENFOLGE, DIM_PREISKLASSE: PREISKLASSEN})
+
+
+AUSWAHLEN = [
+    {},
+    {DIM_WEINTYP: ["Rotwein"]},
+    {DIM_LAND: ["Italien", "Spanien"], DIM_PREISKLASSE: ["10-20"]},
+    {DIM_WEINTYP: ["Weisswein", "Schaumwein"], DIM_LAND: ["Frankreich"], DIM_REGION: ["Bordeaux"]},
+    {DIM_REGION: ["gibt es nicht"]},
+]
+
+
+def _gefiltert(merkmale, auswahl, ohne=None):
+    maske = pd.Series(True, index=merkmale.index)
+    for dimension, werte in auswahl.items():
+        if dimension != ohne and werte:
+            maske &= merkmale[dimension].isin(werte)
+    return merkmale[maske]
+
+
+@pytest.mark.parametrize("auswahl, dimension", list(itertools.product(AUSWAHLEN, DIMENSIONEN)))
+def test_anzahl_entspricht_groupby(merkmale, cube, auswahl, dimension):
+    erwartet = _gefiltert(merkmale, auswahl, ohne=dimension).groupby(dimension).size()
+
+    ergebnis = cube.anzahl(dimension, auswahl)
+
+    assert ergebnis.sum() == erwartet.sum()
+    pd.testing.assert_series_equal(ergebnis[ergebnis > 0].sort_index(), erwartet.sort_index(),
+                                   check_names=False, check_index_type=False, check_dtype=False)
+
+
+@pytest.mark.parametrize("auswahl", AUSWAHLEN)
+def test_total_entspricht_gefilterten_zeilen(merkmale, cube, auswahl):
+    assert cube.total(auswahl) == len(_gefiltert(merkmale, auswahl))
+
+
+def test_feste_reihenfolge(cube):
+    assert list(cube.anzahl(DIM_WEINTYP).index) == WEINTYP_REIHENFOLGE
+    assert list(cube.anzahl(DIM_PREISKLASSE).index) == PREISKLASSEN
+    assert cube.n == 2000
+
+
+def test_preisklassen_grenzen():
+    preise = pd.Series([0.0, 19.95, 20.0, 50.0, 99.9, 100.0, 250.0, 260.0, -1.0, None], index=range(10, 20))
+    bins, labels = default_preisklassen(250.0)
+
+    klassen = preisklassen(preise, bins, labels)
+
+    # [von, bis), der Höchstpreis gehört in die letzte Klasse; ausserhalb und NaN ohne Klasse
+    assert klassen.index.equals(preise.index)
+    assert klassen.cat.codes.tolist() == [0, 0, 1, 2, 2, 3, 3, -1, -1, -1]
+    assert klassen.cat.categories.tolist() == labels and klassen.cat.ordered
+
+
+def test_preisklassen_ungueltige_grenzen():
+    with pytest.raises(ValueError):
+        preisklassen(pd.Series([10.0]), [0, 20, 20, 50], ["a", "b", "c"])
@@ -0,0 +1,34 @@
+# tests/test_table_export.py
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from table_export import schreibe_export
+
+
+@pytest.fixture
+def tabelle():
+    n = 23
+    return pd.DataFrame({
+        "Name": [f"Wein {i}; \"Réserve\"" if i % 4 == 0 else f"Château {i}" for i in range(n)],
+        "Preis": np.linspace(4.95, 120.5, n),
+        "Jahrgang": pd.array([2015 + i % 8 if i % 5 else None for i in range(n)], dtype="Int64"),
+        "Bei_FP": [i % 2 == 0 for i in range(n)],
+        "Region": [None if i % 7 == 0 else "Piemont\nItalien" for i in range(n)],
+    })
+
+
+@pytest.mark.parametrize("sep, encoding", [(",", "utf-8"), (";", "utf-8-sig")])
+@pytest.mark.parametrize("chunk_zeilen", [1, 5, 23, 1000])
+def test_csv_blockweise_identisch_mit_to_csv(tabelle, sep, encoding, chunk_zeilen):
+    puffer = io.BytesIO()
+    schreibe_export(tabelle, puffer, sep=sep, encoding=encoding, chunk_zeilen=chunk_zeilen)
+
+    assert puffer.getvalue() == tabelle.to_csv(index=False, sep=sep).encode(encoding)
+
+
+def test_unbekanntes_format(tabelle):
+    with pytest.raises(ValueError):
+        schreibe_export(tabelle, io.BytesIO(), format="pdf")